@@ -107,6 +107,7 @@ void resetParamsToDefault() {
 #define WIFI_PASSWORD "Derby1961"
 
 #define SOCKET_PORT 5005
+#define PIPELINE_IDLE_MS 50     // Close a command connection after this much silence
 #define LED_PIN 18
 #define LED_COUNT 636
 #define STATUS_LED_PIN 2
@@ -436,11 +437,18 @@ void loop() {
     WiFiClient client = server.available();
     
     if (client) {
-        if (client.connected()) {
+        // A connection may carry several newline-separated commands (the Pi
+        // pipelines result sequences); answer each in order, one line per
+        // command, until the Pi hangs up or goes quiet.
+        unsigned long lastActivity = millis();
+        while (client.connected() && millis() - lastActivity < PIPELINE_IDLE_MS) {
             if (client.available()) {
                 // Read command
                 String command = client.readStringUntil('\n');
                 command.trim();
+                if (command.length() == 0) {
+                    continue;
+                }
                 
                 Serial.println("[CMD] Received: " + command);
                 
@@ -453,6 +461,9 @@ void loop() {
                 
                 // Immediate OLED update after command
                 displayDirty = true;
+                lastActivity = millis();
+            } else {
+                delay(1);
             }
         }
         client.stop();
@@ -1099,6 +1110,28 @@ String processCommand(String cmd) {
         return "ERROR:INVALID_CUP";
     }
     
+    // RACE:LEVELS:hhhh... - Live race brightness map from the Pi's race
+    // simulation: one hex byte (00-FF) per cup, cups 1..N in order. Leaders
+    // glow brighter. Sent at a throttled rate (a few Hz) while RUNNING.
+    else if (cmd.startsWith("RACE:LEVELS:")) {
+        String hex = cmd.substring(12);
+        int cups = hex.length() / 2;
+        if (cups < 1 || cups > NUM_CUPS) {
+            return "ERROR:INVALID_LEVELS";
+        }
+        stopAnimation();
+        currentMode = "RACE_LEVELS";
+        for (int cup = 1; cup <= cups; cup++) {
+            uint8_t level = (uint8_t) strtol(hex.substring((cup - 1) * 2, cup * 2).c_str(), NULL, 16);
+            CRGB color = CRGB(255, 200, 80);   // warm gold
+            color.nscale8_video(level);
+            setCup(cup, color);
+        }
+        FastLED.show();
+        updatePowerEstimate();
+        return "OK:LEVELS:" + String(cups);
+    }
+
     // RESET - Clear all and stop animations
     else if (cmd == "RESET") {
         currentMode = "IDLE";
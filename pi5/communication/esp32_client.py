@@ -61,6 +61,72 @@ class ESP32Client:
             print(f"[ESP32] Exception: {e}")
             return error
     
+    def send_batch(self, commands):
+        """
+        Pipeline several commands over one connection
+
+        All commands are written at once; the firmware answers one line per
+        command, in order. If the connection closes early (firmware that
+        answers a single command per connection), the remaining commands
+        fall back to one send_command() each.
+
+        Args:
+            commands: List of command strings
+
+        Returns:
+            List of response strings, one per command (ERROR:... for any
+            command that got no answer)
+        """
+        commands = list(commands)
+        responses = []
+        closed_early = False
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect((self.ip, self.port))
+
+                payload = ''.join(command + '\n' for command in commands)
+                sock.sendall(payload.encode('utf-8'))
+
+                buffer = b''
+                while len(responses) < len(commands):
+                    chunk = sock.recv(1024)
+                    if not chunk:
+                        closed_early = True
+                        break
+                    buffer += chunk
+                    while b'\n' in buffer and len(responses) < len(commands):
+                        line, buffer = buffer.split(b'\n', 1)
+                        line = line.decode('utf-8').strip()
+                        if line:
+                            responses.append(line)
+            self.connected = True
+
+        except socket.timeout:
+            self.connected = bool(responses)
+            print(f"[ESP32] Timeout in batch after {len(responses)}/{len(commands)} responses")
+
+        except ConnectionRefusedError:
+            self.connected = False
+            print(f"[ESP32] Connection refused to {self.ip}:{self.port}")
+            return ["ERROR:CONNECTION_REFUSED"] * len(commands)
+
+        except Exception as e:
+            self.connected = False
+            print(f"[ESP32] Batch exception: {e}")
+
+        if responses:
+            self.last_response = responses[-1]
+        print(f"[ESP32] Batch sent {len(commands)} | Received {len(responses)}")
+
+        # Older firmware closes after one command — send the rest singly
+        if closed_early and responses:
+            for command in commands[len(responses):]:
+                responses.append(self.send_command(command))
+
+        responses.extend(["ERROR:NO_RESPONSE"] * (len(commands) - len(responses)))
+        return responses
+
     def ping(self):
         """Test connection to ESP32"""
         response = self.send_command("PING")
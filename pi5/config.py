@@ -11,6 +11,19 @@ TOTE_PORT = 80
 TOTE_TIMEOUT = 2.0  # Seconds
 TOTE_ENABLED = True
 
+# Race timing: 1.0 = real time. Values > 1 run the auto-progression and odds
+# drift timers on a compressed clock (e.g. 10.0 runs a 150 s race in 15 s)
+# for rehearsals without touching STATE_DURATIONS.
+RACE_TIME_COMPRESSION = 1.0
+
+# Race card: (race_id, display name) per race, in running order. The first
+# race is featured (drives the mantle LEDs). Add undercard heats here, e.g.
+#   ("undercard-1", "Juvenile Sprint")
+# Each race is addressable at /api/racing/<race_id>/...
+RACE_CARD = [
+    ("derby", "Derby de Mayo"),
+]
+
 # Flask Settings
 FLASK_HOST = "0.0.0.0"  # Listen on all interfaces
 FLASK_PORT = 5000
@@ -49,6 +62,27 @@ ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
 # Race setup data file
 RACE_SETUP_FILE = os.path.join(os.path.dirname(__file__), 'data', 'race_setup.json')
 
+# Race card file (CSV, JSON or JSONL) with real entries — jockeys, trainers,
+# morning lines. Loaded at startup if present; see services/card_importer.py
+# for the accepted columns. Can also be uploaded to POST /api/racing/card/import.
+RACE_CARD_FILE = os.path.join(os.path.dirname(__file__), 'data', 'race_card.csv')
+
+# Crash-safe race state journals (one <race_id>.jsonl + snapshot per race).
+# On restart each race resumes exactly where it was. Set to None to disable.
+RACE_JOURNAL_DIR = os.path.join(os.path.dirname(__file__), 'data', 'race_journal')
+
+# La Quiniela pari-mutuel pools (services/parimutuel.py): tickets on the cups
+# split win / place / show, plus exacta and trifecta pools. Takeout is what
+# the house keeps from each pool before paying out.
+QUINIELA_SPLIT = (0.70, 0.20, 0.10)
+QUINIELA_TAKEOUT = 0.0
+QUINIELA_TICKET_PRICE = 1.0
+
+# La Quiniela pool journals (one <race_id>.jsonl per race): every sale,
+# scratch and settlement, replayed on restart. Set to None to keep the pools
+# in memory only (the cashier then re-sends running totals after a restart).
+QUINIELA_JOURNAL_DIR = os.path.join(os.path.dirname(__file__), 'data', 'pool_journal')
+
 # Animation library data files
 ANIMATION_REGISTRY_FILE = os.path.join(os.path.dirname(__file__), 'data', 'animation_registry.json')
 ANIMATION_ASSIGNMENTS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'animation_assignments.json')
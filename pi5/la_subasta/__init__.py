@@ -2,9 +2,10 @@
 #
 # Phase 1: Core backend. UI templates/static live here for Phase 2.
 
-from la_subasta.blueprint import la_subasta_bp, init_la_subasta
+from la_subasta.blueprint import la_subasta_bp, init_la_subasta, enter_results
 
 __all__ = [
     "la_subasta_bp",
     "init_la_subasta",
+    "enter_results",
 ]
@@ -0,0 +1,304 @@
+# la_subasta/analytics.py - Live auction aggregates for the spectator TV
+#
+# The spectator TV rotates panels every SPECTATOR_PANEL_SECONDS: bid tempo,
+# most-contested horse, biggest spender, price movers, ownership reveal.
+# Answering those with GROUP BY queries on every rotation (for every TV)
+# scans the bids table again and again. Instead the aggregates are kept
+# incrementally, O(1) per write:
+#
+#   - per-minute bid buckets (sliding 1/5/15-minute windows, 60 min kept)
+#   - per horse: bids, distinct bidders, opening + current price
+#   - per bidder: committed spend (sum of the horses they lead)
+#
+# Fed from the write path: bidding's after_commit hook hands every committed
+# board delta (see changes.record_horse) to observe(), in commit order, under
+# the write lock. Built once from SQLite on first use (one plain scan of
+# bids) and rebuilt after a DB reopen / bid reset, like the order book.
+#
+# panels() serves a precomputed payload, rebuilt at most once per panel
+# interval however many TVs ask.
+
+import calendar
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from la_subasta import order_book
+from la_subasta.config import (
+    EVENT_YEAR, SPECTATOR_OWNERSHIP_REVEAL_PER_HORSE, SPECTATOR_PANEL_SECONDS,
+)
+from la_subasta.models import _db_path, db_generation, get_conn, register_view
+
+logger = logging.getLogger(__name__)
+
+WINDOWS_MINUTES = (1, 5, 15)
+BUCKET_HISTORY_MINUTES = 60
+LEADERBOARD_SIZE = 5
+
+
+def _parse_bid_time(value: str) -> float:
+    """bids.bid_time is SQLite datetime('now') — UTC 'YYYY-MM-DD HH:MM:SS'."""
+    try:
+        return float(calendar.timegm(time.strptime(value, "%Y-%m-%d %H:%M:%S")))
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class _HorseStats:
+    __slots__ = ("bids", "bidders", "opening", "leader_id", "amount")
+
+    def __init__(self):
+        self.bids = 0
+        self.bidders = set()
+        self.opening: Optional[float] = None
+        self.leader_id: Optional[int] = None
+        self.amount: Optional[float] = None
+
+
+class AuctionAnalytics:
+    """Incrementally maintained aggregates for one event year."""
+
+    def __init__(self, event_year: int = EVENT_YEAR,
+                 clock: Callable[[], float] = time.time):
+        self.event_year = event_year
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        self._buckets: Dict[int, int] = {}          # epoch minute -> bids
+        self._minutes: deque = deque()              # minutes in _buckets, oldest first
+        self._horses: Dict[int, _HorseStats] = {}
+        self._spend: Dict[int, float] = {}          # bidder -> committed total
+        self._identities: Dict[int, str] = {}
+        self._active_bidders = set()
+        self.total_bids = 0
+        # Highest bid id counted — a write that commits while load() scans
+        # may be both in the scan and observed afterwards
+        self._last_bid_id = 0
+
+        self.generation = None
+        self.db_path = None
+
+    # -----------------------------------------------------------------
+    # Build
+    # -----------------------------------------------------------------
+
+    def load(self) -> "AuctionAnalytics":
+        """Replay every bid once, then take leaders from the order book."""
+        conn = get_conn()
+        self.generation = db_generation()
+        self.db_path = _db_path()
+        book = order_book.get_book(self.event_year)
+        with self._lock:
+            for row in conn.execute(
+                "SELECT b.id, b.bidder_id, b.horse_id, b.amount, b.bid_time, d.identity "
+                "FROM bids b JOIN bidders d ON d.id = b.bidder_id "
+                "WHERE b.event_year = ? ORDER BY b.id",
+                (self.event_year,),
+            ):
+                self._identities[row["bidder_id"]] = row["identity"]
+                self._last_bid_id = row["id"]
+                self._count_bid(row["horse_id"], row["bidder_id"], row["amount"],
+                                _parse_bid_time(row["bid_time"]))
+            for horse_id, stats in self._horses.items():
+                hb = book.high_bid(horse_id)
+                self._set_leader(stats, hb["bidder_id"] if hb else None,
+                                 hb["amount"] if hb else None)
+        return self
+
+    # -----------------------------------------------------------------
+    # Writes — one committed board delta at a time
+    # -----------------------------------------------------------------
+
+    def observe(self, change: dict) -> None:
+        """Fold a changes.record_horse() delta into the aggregates."""
+        horse_id = change.get("horse_id")
+        if horse_id is None:
+            return
+        with self._lock:
+            leader_id = change.get("leader_id")
+            if leader_id is not None and change.get("leader_identity"):
+                self._identities[leader_id] = change["leader_identity"]
+            bid_id = change.get("bid_id")
+            if change["kind"] == "bid" and leader_id is not None and \
+                    (bid_id is None or bid_id > self._last_bid_id):
+                # An accepted bid is always the new leader
+                self._count_bid(horse_id, leader_id, change["amount"], self.clock())
+                if bid_id is not None:
+                    self._last_bid_id = bid_id
+            stats = self._horses.get(horse_id)
+            if stats is None:
+                stats = self._horses[horse_id] = _HorseStats()
+            self._set_leader(stats, leader_id, change.get("amount"))
+
+    def _count_bid(self, horse_id: int, bidder_id: int, amount: float,
+                   at: float) -> None:
+        minute = int(at // 60)
+        if minute in self._buckets:
+            self._buckets[minute] += 1
+        else:
+            self._buckets[minute] = 1
+            self._minutes.append(minute)
+            while self._minutes and self._minutes[0] <= minute - BUCKET_HISTORY_MINUTES:
+                self._buckets.pop(self._minutes.popleft(), None)
+        stats = self._horses.get(horse_id)
+        if stats is None:
+            stats = self._horses[horse_id] = _HorseStats()
+        stats.bids += 1
+        stats.bidders.add(bidder_id)
+        if stats.opening is None:
+            stats.opening = amount
+        self._active_bidders.add(bidder_id)
+        self.total_bids += 1
+
+    def _set_leader(self, stats: _HorseStats, leader_id: Optional[int],
+                    amount: Optional[float]) -> None:
+        """Absolute, so re-applying a delta is harmless."""
+        if stats.leader_id is not None:
+            self._spend[stats.leader_id] = self._spend.get(stats.leader_id, 0.0) - stats.amount
+        if leader_id is not None:
+            self._spend[leader_id] = self._spend.get(leader_id, 0.0) + amount
+        stats.leader_id, stats.amount = leader_id, amount
+
+    # -----------------------------------------------------------------
+    # Reads
+    # -----------------------------------------------------------------
+
+    def bids_in_window(self, minutes: int, now: Optional[float] = None) -> int:
+        current = int((self.clock() if now is None else now) // 60)
+        with self._lock:
+            return sum(self._buckets.get(m, 0) for m in range(current - minutes + 1, current + 1))
+
+    def summary(self) -> dict:
+        """Every panel's numbers. O(horses + bidders), not O(bids)."""
+        now = self.clock()
+        current = int(now // 60)
+        with self._lock:
+            per_minute = [self._buckets.get(m, 0)
+                          for m in range(current - max(WINDOWS_MINUTES) + 1, current + 1)]
+            tempo = {f"{w}m": sum(per_minute[-w:]) for w in WINDOWS_MINUTES}
+            tempo["per_minute"] = per_minute
+
+            contested = None
+            movers = []
+            ownership = []
+            for horse_id in sorted(self._horses):
+                stats = self._horses[horse_id]
+                key = (len(stats.bidders), stats.bids)
+                if stats.bids and (contested is None or key > contested[0]):
+                    contested = (key, horse_id, stats)
+                if stats.amount is not None and stats.opening is not None:
+                    movers.append({
+                        "horse_id": horse_id,
+                        "opening": stats.opening,
+                        "current": stats.amount,
+                        "change": round(stats.amount - stats.opening, 2),
+                    })
+                if stats.leader_id is not None:
+                    ownership.append({
+                        "horse_id": horse_id,
+                        "identity": self._identities.get(stats.leader_id),
+                        "amount": stats.amount,
+                    })
+            movers.sort(key=lambda m: (-m["change"], m["horse_id"]))
+
+            spender = None
+            for bidder_id, total in self._spend.items():
+                if total > 0 and (spender is None or total > spender[1]):
+                    spender = (bidder_id, total)
+
+            return {
+                "total_bids": self.total_bids,
+                "bids_per_minute": tempo,
+                "most_contested": None if contested is None else {
+                    "horse_id": contested[1],
+                    "bidders": len(contested[2].bidders),
+                    "bids": contested[2].bids,
+                },
+                "biggest_spender": None if spender is None else {
+                    "bidder_id": spender[0],
+                    "identity": self._identities.get(spender[0]),
+                    "total": round(spender[1], 2),
+                },
+                "price_movers": movers[:LEADERBOARD_SIZE],
+                "active_bidders": len(self._active_bidders),
+                "ownership": ownership,
+            }
+
+
+# -----------------------------------------------------------------------------
+# Registry + panel cache
+# -----------------------------------------------------------------------------
+
+_engines: Dict[int, AuctionAnalytics] = {}
+_engines_lock = threading.Lock()
+_panels: Dict[int, tuple] = {}          # year -> (built monotonic, engine, payload)
+
+
+def _is_current(engine: Optional[AuctionAnalytics]) -> bool:
+    return (engine is not None and engine.generation == db_generation()
+            and engine.db_path == _db_path())
+
+
+def get_analytics(event_year: int = EVENT_YEAR) -> AuctionAnalytics:
+    engine = _engines.get(event_year)
+    if _is_current(engine):
+        return engine
+    with _engines_lock:
+        engine = _engines.get(event_year)
+        if not _is_current(engine):
+            start = time.perf_counter()
+            engine = AuctionAnalytics(event_year).load()
+            _engines[event_year] = engine
+            logger.info("Analytics %d built in %.1f ms (%d bids)", event_year,
+                        (time.perf_counter() - start) * 1000.0, engine.total_bids)
+        return engine
+
+
+def observe(event_year: int, change: dict) -> None:
+    """Apply a committed delta. No engine yet means nothing to do — the first
+    read builds from SQLite, which already has the write."""
+    with _engines_lock:
+        engine = _engines.get(event_year)
+        if not _is_current(engine):
+            return
+        try:
+            engine.observe(change)
+        except Exception:
+            logger.exception("Analytics update failed — rebuilding on next read")
+            _engines.pop(event_year, None)
+
+
+def invalidate(event_year: Optional[int] = None) -> None:
+    with _engines_lock:
+        if event_year is None:
+            _engines.clear()
+            _panels.clear()
+        else:
+            _engines.pop(event_year, None)
+            _panels.pop(event_year, None)
+
+
+def panels(event_year: int = EVENT_YEAR,
+           max_age_s: float = SPECTATOR_PANEL_SECONDS) -> dict:
+    """The spectator payload, rebuilt at most once per panel interval."""
+    engine = get_analytics(event_year)
+    cached = _panels.get(event_year)
+    now = time.monotonic()
+    if cached is not None and cached[1] is engine and now - cached[0] < max_age_s:
+        return cached[2]
+    book = order_book.get_book(event_year)
+    payload = {
+        **engine.summary(),
+        "registered_bidders": book.count_bidders(),
+        "total_pot": book.total_pot(),
+        "generated_at": time.time(),
+        "panel_seconds": SPECTATOR_PANEL_SECONDS,
+        "ownership_reveal_seconds": SPECTATOR_OWNERSHIP_REVEAL_PER_HORSE,
+    }
+    _panels[event_year] = (now, engine, payload)
+    return payload
+
+
+register_view(invalidate)
@@ -0,0 +1,258 @@
+# la_subasta/bench_bids.py - Sustained bid-placement throughput benchmark
+#
+# Run with: python -m la_subasta.bench_bids [--seconds N] [--threads 1,4,16] [--json]
+#           (from pi5/; run it on the Pi 5 itself for deployment numbers)
+#
+# Each worker thread plays a handful of bidders: pick a horse, read the
+# current high bid, pick one of its bidders who isn't leading it and is
+# under the max-horses cap, and raise by $1-3. Workers race each other, so
+# some bids are rejected (outbid between read and write) exactly like
+# phones on the night. Compared paths:
+#   legacy  — the pre-rewrite place_bid: six reads before the write txn, a
+#             grouped max-bid query inside it, a second SELECT for bid_time
+#   fast    — bidding.place_bid: one BEGIN IMMEDIATE, cached settings,
+#             indexed leader seek, INSERT ... RETURNING
+#   group   — the same through bid_writer.BidWriter: one commit per batch of
+#             bids that queued while the previous commit was in flight
+# Every run uses a fresh temp database with the real schema (WAL, default
+# synchronous), so commit fsync cost on the storage is included.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from la_subasta import config as la_config  # noqa: E402
+
+la_config.DB_PATH = tempfile.mktemp(prefix="la_subasta_bench_", suffix=".db")
+
+from la_subasta import bidding, order_book, settings  # noqa: E402
+from la_subasta.bid_writer import BidWriter  # noqa: E402
+from la_subasta.bidding import BidError, PlacedBid  # noqa: E402
+from la_subasta.config import EVENT_YEAR, MIN_RAISE, NUM_HORSES  # noqa: E402
+from la_subasta.models import (  # noqa: E402
+    after_commit, close_conn, close_pool, get_conn, reset_db_for_tests, write_txn,
+)
+from la_subasta.order_book import BookBid  # noqa: E402
+from la_subasta.state_machine import AuctionState, is_biddable, transition  # noqa: E402
+
+THREAD_COUNTS = (1, 4, 16)
+# Enough that some bidders are always under the max-horses cap (3 x 6 < 20)
+BIDDERS_PER_THREAD = 8
+
+
+def _legacy_setting(key):
+    """get_setting before the snapshot cache: one overrides query per call."""
+    row = get_conn().execute(
+        "SELECT value FROM auction_overrides WHERE setting_key = ?", (key,),
+    ).fetchone()
+    return la_config.DEFAULTS[key] if row is None else int(row["value"])
+
+
+def _legacy_place_bid(bidder_id, horse_id, amount, event_year=EVENT_YEAR):
+    """place_bid as it was before the single-transaction rewrite."""
+    min_bid = _legacy_setting("MIN_BID")
+    max_raise = _legacy_setting("MAX_RAISE")
+    max_horses_per_bidder = _legacy_setting("MAX_HORSES_PER_BIDDER")
+    amount = float(amount)
+    if amount < min_bid or amount != int(amount):
+        raise BidError("bad amount")
+    if not is_biddable(event_year):
+        raise BidError("closed")
+    scratched = get_conn().execute(
+        "SELECT scratched FROM horse_state WHERE horse_id = ? AND event_year = ?",
+        (horse_id, event_year),
+    ).fetchone()
+    if scratched and scratched["scratched"]:
+        raise BidError("scratched")
+    if bidding.get_bidder(bidder_id) is None:
+        raise BidError("Unknown bidder")
+
+    with write_txn() as conn:
+        hb_row = conn.execute(
+            """
+            SELECT b.id, b.bidder_id, b.amount, bd.identity
+              FROM bids b JOIN bidders bd ON bd.id = b.bidder_id
+             WHERE b.horse_id = ? AND b.voided = 0 AND b.event_year = ?
+             ORDER BY b.amount DESC, b.bid_time ASC, b.id ASC LIMIT 1
+            """,
+            (horse_id, event_year),
+        ).fetchone()
+        current_amount = hb_row["amount"] if hb_row else 0.0
+        current_bidder = hb_row["bidder_id"] if hb_row else None
+        if current_bidder == bidder_id:
+            raise BidError("self")
+        if current_amount <= 0:
+            if amount > min_bid + max_raise:
+                raise BidError("opening too high")
+        elif not current_amount + MIN_RAISE <= amount <= current_amount + max_raise:
+            raise BidError("raise out of range")
+        leading_rows = conn.execute(
+            """
+            SELECT b.horse_id FROM bids b
+              JOIN (SELECT horse_id, MAX(amount) AS max_amt FROM bids
+                     WHERE voided = 0 AND event_year = ? GROUP BY horse_id
+                   ) top ON top.horse_id = b.horse_id AND top.max_amt = b.amount
+             WHERE b.bidder_id = ? AND b.voided = 0 AND b.event_year = ?
+            """,
+            (event_year, bidder_id, event_year),
+        ).fetchall()
+        currently_leading = {r["horse_id"] for r in leading_rows}
+        if horse_id not in currently_leading and len(currently_leading) >= max_horses_per_bidder:
+            raise BidError("max horses")
+        bid_id = conn.execute(
+            "INSERT INTO bids (bidder_id, horse_id, amount, event_year) VALUES (?, ?, ?, ?)",
+            (bidder_id, horse_id, amount, event_year),
+        ).lastrowid
+        bid_time = conn.execute(
+            "SELECT bid_time FROM bids WHERE id = ?", (bid_id,),
+        ).fetchone()["bid_time"]
+        # Keep the order book current so both paths see the same reads
+        book_bid = BookBid(bid_id, bidder_id, horse_id, amount, bid_time)
+        after_commit(lambda: order_book.apply(event_year, lambda b: b.add_bid(book_bid)))
+
+    return PlacedBid(bid_id, bidder_id, horse_id, amount, bid_time, current_bidder,
+                     hb_row["identity"] if hb_row else None)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def _bench(place_fn, threads, seconds):
+    reset_db_for_tests()
+    transition(AuctionState.OPEN)
+    palette = la_config.EMOJI_PALETTE
+    bidders = [bidding.register_bidder(f"Bench {i}", palette[i % len(palette)])["id"]
+               for i in range(threads * BIDDERS_PER_THREAD)]
+    cap = settings.get_setting("MAX_HORSES_PER_BIDDER")
+
+    lock = threading.Lock()
+    totals = {"accepted": 0, "rejected": 0}
+    latencies = []
+    start_gate = threading.Event()
+
+    def worker(idx):
+        rng = random.Random(idx)
+        mine = bidders[idx * BIDDERS_PER_THREAD:(idx + 1) * BIDDERS_PER_THREAD]
+        accepted = rejected = 0
+        lat = []
+        start_gate.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            horse = rng.randint(1, NUM_HORSES)
+            hb = bidding.current_high_bid(horse)
+            leader = hb["bidder_id"] if hb else None
+            eligible = [b for b in mine
+                        if b != leader and len(bidding.horses_leading_by(b)) < cap]
+            if not eligible:
+                continue
+            amount = (hb["amount"] if hb else 0) + rng.randint(1, 3)
+            t0 = time.perf_counter()
+            try:
+                place_fn(rng.choice(eligible), horse, amount)
+                accepted += 1
+            except BidError:
+                rejected += 1
+            lat.append(time.perf_counter() - t0)
+        close_conn()
+        with lock:
+            totals["accepted"] += accepted
+            totals["rejected"] += rejected
+            latencies.extend(lat)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    t_start = time.perf_counter()
+    start_gate.set()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+
+    latencies.sort()
+    attempts = totals["accepted"] + totals["rejected"]
+    return {
+        "accepted_per_s": round(totals["accepted"] / elapsed, 1),
+        "attempts_per_s": round(attempts / elapsed, 1),
+        "rejected_pct": round(100.0 * totals["rejected"] / attempts, 1) if attempts else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000.0, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000.0, 2),
+    }
+
+
+def run(seconds=3.0, thread_counts=THREAD_COUNTS):
+    rows = []
+    for threads in thread_counts:
+        legacy = _bench(_legacy_place_bid, threads, seconds)
+        fast = _bench(bidding.place_bid, threads, seconds)
+        writer = BidWriter()
+        try:
+            group = _bench(writer.place_bid, threads, seconds)
+        finally:
+            writer.stop()
+        rows.append({
+            "threads": threads,
+            "legacy": legacy,
+            "fast": fast,
+            "group": group,
+            "speedup": (round(fast["accepted_per_s"] / legacy["accepted_per_s"], 2)
+                        if legacy["accepted_per_s"] else None),
+            "group_speedup": (round(group["accepted_per_s"] / legacy["accepted_per_s"], 2)
+                              if legacy["accepted_per_s"] else None),
+        })
+    return rows
+
+
+def _cleanup():
+    close_pool()
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(la_config.DB_PATH + suffix)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bid placement throughput benchmark")
+    parser.add_argument("--seconds", type=float, default=3.0, help="per run")
+    parser.add_argument("--threads", default=",".join(map(str, THREAD_COUNTS)),
+                        help="comma-separated concurrent bidder threads")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    thread_counts = [int(t) for t in args.threads.split(",") if t.strip()]
+    try:
+        rows = run(args.seconds, thread_counts)
+    finally:
+        _cleanup()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    print(f"Bid placement, {args.seconds:g}s per run, {BIDDERS_PER_THREAD} bidders per thread\n")
+    print(f"{'threads':>7} {'path':>7} {'bids/s':>9} {'tries/s':>9} {'rej %':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for r in rows:
+        for path in ("legacy", "fast", "group"):
+            m = r[path]
+            print(f"{r['threads']:>7} {path:>7} {m['accepted_per_s']:>9} "
+                  f"{m['attempts_per_s']:>9} {m['rejected_pct']:>6} "
+                  f"{m['p50_ms']:>8} {m['p99_ms']:>8}")
+        print(f"{'':>7} {'speedup':>7} {r['speedup']:>8}x fast, "
+              f"{r['group_speedup']}x group")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
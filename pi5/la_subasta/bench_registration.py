@@ -0,0 +1,126 @@
+# la_subasta/bench_registration.py - Emoji availability benchmark
+#
+# Run with: python -m la_subasta.bench_registration [--bidders 500] [--repeat 200]
+#                                                   [--json]
+#           (from pi5/; run it on the Pi 5 itself for deployment numbers)
+#
+# Builds a fresh temp database with the real schema and a roster of bidders,
+# then answers "which emojis are free for this name?" both ways:
+#   query   — one get_bidder_by_identity() lookup per palette emoji, the
+#             way check-identity answered a phone trying emojis in turn
+#   index   — registration IdentityIndex.availability(): the whole palette
+#             from memory in one call
+# Both must agree for every name asked.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from la_subasta import config as la_config  # noqa: E402
+
+la_config.DB_PATH = tempfile.mktemp(prefix="la_subasta_bench_", suffix=".db")
+
+from la_subasta import registration  # noqa: E402
+from la_subasta.bidding import get_bidder_by_identity  # noqa: E402
+from la_subasta.config import EMOJI_PALETTE, EVENT_YEAR  # noqa: E402
+from la_subasta.models import close_pool, reset_db_for_tests, write_txn  # noqa: E402
+
+BIDDERS = 500
+REPEAT = 200
+
+
+def populate(bidders=BIDDERS):
+    """A roster where the first names come back with several emojis each."""
+    reset_db_for_tests()
+    rows = []
+    for i in range(bidders):
+        name = f"Guest {i // 4}"
+        emoji = EMOJI_PALETTE[(i * 5) % len(EMOJI_PALETTE)]
+        rows.append((name, emoji, f"{name} {emoji}", EVENT_YEAR))
+    with write_txn() as conn:
+        conn.executemany(
+            "INSERT INTO bidders (name, emoji, identity, event_year) VALUES (?, ?, ?, ?)",
+            rows)
+    return [f"Guest {n}" for n in range(0, bidders // 4 + 10, 7)]
+
+
+def _by_query(name):
+    return [get_bidder_by_identity(f"{name} {e}") is None for e in EMOJI_PALETTE]
+
+
+def _by_index(name):
+    return [e["status"] == "free" for e in registration.get_index().availability(name)]
+
+
+def _median_us(fn, names, repeat):
+    times = []
+    for i in range(repeat):
+        name = names[i % len(names)]
+        t0 = time.perf_counter()
+        fn(name)
+        times.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(times)
+
+
+def run(bidders=BIDDERS, repeat=REPEAT):
+    names = populate(bidders)
+    t0 = time.perf_counter()
+    registration.get_index()
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    query_us = _median_us(_by_query, names, repeat)
+    index_us = _median_us(_by_index, names, repeat)
+    return {
+        "bidders": bidders,
+        "palette": len(EMOJI_PALETTE),
+        "repeat": repeat,
+        "index_build_ms": round(build_ms, 2),
+        "query_us": round(query_us, 1),
+        "index_us": round(index_us, 1),
+        "speedup": round(query_us / index_us, 1) if index_us else None,
+        "identical": all(_by_query(n) == _by_index(n) for n in names),
+    }
+
+
+def _cleanup():
+    close_pool()
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(la_config.DB_PATH + suffix)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emoji availability benchmark")
+    parser.add_argument("--bidders", type=int, default=BIDDERS)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="median of N lookups")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    try:
+        report = run(args.bidders, args.repeat)
+    finally:
+        _cleanup()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0 if report["identical"] else 1
+
+    print(f"Emoji availability for one name, {report['bidders']} bidders, "
+          f"{report['palette']} emojis, median of {report['repeat']}\n")
+    print(f"{'path':>7} {'us':>10}")
+    print(f"{'query':>7} {report['query_us']:>10}")
+    print(f"{'index':>7} {report['index_us']:>10}")
+    print(f"\n{report['speedup']}x (index built once in {report['index_build_ms']} ms), "
+          f"answers {'identical' if report['identical'] else 'DIFFER'}")
+    return 0 if report["identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
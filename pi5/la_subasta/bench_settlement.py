@@ -0,0 +1,233 @@
+# la_subasta/bench_settlement.py - Settlement (lock + results) benchmark
+#
+# Run with: python -m la_subasta.bench_settlement [--bidders 500] [--bids 30000]
+#                                                 [--repeat 5] [--json]
+#           (from pi5/; run it on the Pi 5 itself for deployment numbers)
+#
+# Builds a fresh temp database with the real schema, a full year of bids
+# (random horses, rising prices, a few voided, two horses scratched) and
+# settles it both ways:
+#   legacy  — the per-row code: the lock freezes ownership horse by horse
+#             (scratch check + high bid each), results look the owner up
+#             per finish, and a statement is built bidder by bidder
+#   set     — payouts.freeze_ownership + compute_and_persist_payouts:
+#             one INSERT ... SELECT each for ownership (an index seek per
+#             horse), payouts and bidder_statements, one transaction
+# Both must produce the same ownership, payouts and statements.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from la_subasta import config as la_config  # noqa: E402
+
+la_config.DB_PATH = tempfile.mktemp(prefix="la_subasta_bench_", suffix=".db")
+
+from la_subasta import order_book, payouts  # noqa: E402
+from la_subasta.bidding import current_high_bid, is_horse_scratched  # noqa: E402
+from la_subasta.config import EVENT_YEAR, NUM_HORSES  # noqa: E402
+from la_subasta.models import (  # noqa: E402
+    close_pool, get_conn, house_bidder_id, reset_db_for_tests, write_txn,
+)
+from la_subasta.state_machine import AuctionState, transition  # noqa: E402
+
+BIDDERS = 500
+BIDS = 30000
+REPEAT = 5
+SCRATCHED = (4, 17)
+RESULTS = (7, 3, 12)        # win / place / show
+
+
+# -----------------------------------------------------------------------------
+# Data
+# -----------------------------------------------------------------------------
+
+def populate(bidders=BIDDERS, bids=BIDS, seed=48):
+    """A year's worth of bids written straight to SQLite (not via place_bid)."""
+    reset_db_for_tests()
+    rng = random.Random(seed)
+    palette = la_config.EMOJI_PALETTE
+    price = [0] * (NUM_HORSES + 1)
+    with write_txn() as conn:
+        conn.executemany(
+            "INSERT INTO bidders (name, emoji, identity, event_year) VALUES (?, ?, ?, ?)",
+            [(f"Bench {i}", palette[i % len(palette)], f"Bench {i} {palette[i % len(palette)]}",
+              EVENT_YEAR) for i in range(bidders)])
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM bidders WHERE identity LIKE 'Bench %'")]
+        rows = []
+        start = time.time() - bids
+        for n in range(bids):
+            horse = rng.randint(1, NUM_HORSES)
+            price[horse] += rng.randint(1, 5)
+            rows.append((rng.choice(ids), horse, float(price[horse]),
+                         time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + n)),
+                         1 if rng.random() < 0.02 else 0, EVENT_YEAR))
+        conn.executemany(
+            "INSERT INTO bids (bidder_id, horse_id, amount, bid_time, voided, event_year) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany(
+            "INSERT INTO horse_state (horse_id, scratched, event_year) VALUES (?, 1, ?)",
+            [(h, EVENT_YEAR) for h in SCRATCHED])
+    transition(AuctionState.LOCKED, force=True)
+    house_bidder_id()
+    # A live server has the order book warm long before the lock
+    t0 = time.perf_counter()
+    order_book.get_book(EVENT_YEAR)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+# -----------------------------------------------------------------------------
+# Legacy per-row settlement
+# -----------------------------------------------------------------------------
+
+def _legacy_freeze(event_year=EVENT_YEAR):
+    with write_txn() as conn:
+        conn.execute("DELETE FROM ownership WHERE event_year = ?", (event_year,))
+        for horse_id in range(1, NUM_HORSES + 1):
+            if is_horse_scratched(horse_id, event_year):
+                continue
+            hb = current_high_bid(horse_id, event_year)
+            if hb is None:
+                continue
+            conn.execute(
+                "INSERT INTO ownership (horse_id, bidder_id, winning_bid, event_year) "
+                "VALUES (?, ?, ?, ?)",
+                (horse_id, hb["bidder_id"], hb["amount"], event_year))
+
+
+def _legacy_settle(win, place, show, event_year=EVENT_YEAR):
+    pot = float(get_conn().execute(
+        "SELECT COALESCE(SUM(winning_bid), 0) FROM ownership WHERE event_year = ?",
+        (event_year,)).fetchone()[0])
+    amounts = payouts.compute_payout_amounts(pot)
+    house_id = house_bidder_id()
+    with write_txn() as conn:
+        conn.execute("DELETE FROM payouts WHERE event_year = ?", (event_year,))
+        for finish, horse_id in (("win", win), ("place", place), ("show", show)):
+            owner = payouts.get_owner(horse_id, event_year)
+            conn.execute(
+                "INSERT INTO payouts (bidder_id, horse_id, finish, amount, event_year) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (owner["bidder_id"] if owner else house_id, horse_id, finish,
+                 amounts[finish], event_year))
+    with write_txn() as conn:
+        conn.execute("UPDATE auction_state SET total_pot = ? WHERE event_year = ?",
+                     (pot, event_year))
+    # Statements, one bidder at a time
+    bidder_ids = [r[0] for r in get_conn().execute(
+        "SELECT id FROM bidders WHERE event_year = ? OR id = ?", (event_year, house_id))]
+    with write_txn() as conn:
+        conn.execute("DELETE FROM bidder_statements WHERE event_year = ?", (event_year,))
+        for bidder_id in bidder_ids:
+            horses, owed = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(winning_bid), 0) FROM ownership "
+                "WHERE bidder_id = ? AND event_year = ?", (bidder_id, event_year)).fetchone()
+            winnings = conn.execute(
+                "SELECT COALESCE(SUM(amount), 0) FROM payouts "
+                "WHERE bidder_id = ? AND event_year = ?", (bidder_id, event_year)).fetchone()[0]
+            conn.execute(
+                "INSERT INTO bidder_statements (bidder_id, horses, owed, winnings, net, "
+                "event_year) VALUES (?, ?, ?, ?, ?, ?)",
+                (bidder_id, horses, owed, winnings, round(winnings - owed, 2), event_year))
+
+
+# -----------------------------------------------------------------------------
+# Runs
+# -----------------------------------------------------------------------------
+
+def _snapshot(event_year=EVENT_YEAR):
+    conn = get_conn()
+    return {
+        "ownership": [tuple(r) for r in conn.execute(
+            "SELECT horse_id, bidder_id, winning_bid FROM ownership "
+            "WHERE event_year = ? ORDER BY horse_id", (event_year,))],
+        "payouts": [tuple(r) for r in conn.execute(
+            "SELECT finish, horse_id, bidder_id, amount FROM payouts "
+            "WHERE event_year = ? ORDER BY finish", (event_year,))],
+        "statements": [tuple(r) for r in conn.execute(
+            "SELECT bidder_id, horses, owed, winnings, net FROM bidder_statements "
+            "WHERE event_year = ? ORDER BY bidder_id", (event_year,))],
+    }
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def run(bidders=BIDDERS, bids=BIDS, repeat=REPEAT):
+    book_ms = populate(bidders, bids)
+    times = {"legacy": {"freeze": [], "settle": []}, "set": {"freeze": [], "settle": []}}
+    snapshots = {}
+    for _ in range(repeat):
+        times["legacy"]["freeze"].append(_timed(_legacy_freeze))
+        times["legacy"]["settle"].append(_timed(_legacy_settle, *RESULTS))
+        snapshots["legacy"] = _snapshot()
+        times["set"]["freeze"].append(_timed(payouts.freeze_ownership))
+        times["set"]["settle"].append(_timed(payouts.compute_and_persist_payouts, *RESULTS))
+        snapshots["set"] = _snapshot()
+
+    report = {
+        "bidders": bidders,
+        "bids": bids,
+        "repeat": repeat,
+        "order_book_build_ms": round(book_ms, 2),
+        "statements": len(snapshots["set"]["statements"]),
+        "identical": snapshots["legacy"] == snapshots["set"],
+    }
+    for path, stages in times.items():
+        report[path] = {stage: round(statistics.median(ms), 2) for stage, ms in stages.items()}
+        report[path]["total"] = round(report[path]["freeze"] + report[path]["settle"], 2)
+    report["speedup"] = (round(report["legacy"]["total"] / report["set"]["total"], 2)
+                         if report["set"]["total"] else None)
+    return report
+
+
+def _cleanup():
+    close_pool()
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(la_config.DB_PATH + suffix)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Settlement benchmark")
+    parser.add_argument("--bidders", type=int, default=BIDDERS)
+    parser.add_argument("--bids", type=int, default=BIDS)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="median of N runs")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    try:
+        report = run(args.bidders, args.bids, args.repeat)
+    finally:
+        _cleanup()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0 if report["identical"] else 1
+
+    print(f"Settlement, {report['bidders']} bidders, {report['bids']} bids, "
+          f"median of {report['repeat']}\n")
+    print(f"{'path':>7} {'freeze ms':>10} {'settle ms':>10} {'total ms':>10}")
+    for path in ("legacy", "set"):
+        m = report[path]
+        print(f"{path:>7} {m['freeze']:>10} {m['settle']:>10} {m['total']:>10}")
+    print(f"\n{report['speedup']}x, {report['statements']} statements, "
+          f"results {'identical' if report['identical'] else 'DIFFER'}")
+    return 0 if report["identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+# la_subasta/bid_writer.py - Group-commit writer for bids and undos
+#
+# Every bid is its own BEGIN IMMEDIATE / COMMIT, i.e. one fsync per bid, and
+# request threads queue on models._write_lock behind it. When the whole
+# party piles on in FINAL_HOUR that queue is the bottleneck.
+#
+# BidWriter owns ONE writer thread. Request threads submit bids/undos and
+# wait on a Future; the writer drains whatever has queued up (at most
+# max_batch), runs each operation in arrival order inside ONE write_txn,
+# commits once, then resolves every Future with its own result or BidError.
+#
+# Semantics are exactly serial execution in queue order:
+#   - each operation is validated against the live state, including the
+#     earlier operations of the same batch (its checks are SQL reads inside
+#     the transaction, which see the uncommitted rows)
+#   - each operation runs under a SAVEPOINT, so an unexpected error undoes
+#     just that operation
+#   - if the batch COMMIT itself fails, nothing was applied and every
+#     operation is re-run on its own, in order, with its own commit. An
+#     error after a successful COMMIT is logged and never replayed — the
+#     operations are in the database and their results stand
+# No batching delay is added: a lone bid commits immediately, and batches
+# form only from bids that arrive while the previous commit is in flight.
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from la_subasta import bidding
+from la_subasta.config import EVENT_YEAR
+from la_subasta.models import after_commit, close_conn, write_txn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 64
+
+# Caller wait before giving up on the writer. The operation may still commit
+# afterwards, so this is a safety valve, not a normal outcome.
+RESULT_TIMEOUT_S = 30.0
+
+_PLACE = "place"
+_UNDO = "undo"
+
+
+class BidWriter:
+    """
+    Single writer thread that group-commits bids and undos.
+
+    Args:
+        max_batch: Most operations committed in one transaction.
+        name: Thread name (logs / debugging).
+    """
+
+    def __init__(self, max_batch: int = DEFAULT_MAX_BATCH, name: str = "BidWriter"):
+        self.max_batch = max(1, int(max_batch))
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # Monitoring
+        self.batches = 0
+        self.operations = 0
+        self.rejected = 0
+        self.max_batch_seen = 0
+        self.commit_failures = 0
+
+    # -----------------------------------------------------------------
+    # Submission
+    # -----------------------------------------------------------------
+
+    def submit_bid(self, bidder_id: int, horse_id: int, amount,
+                   event_year: int = EVENT_YEAR) -> Future:
+        """Queue a bid. The Future resolves to a PlacedBid or raises BidError."""
+        # Pure argument checks never need the writer
+        amount = bidding._check_bid_args(horse_id, amount)
+        return self._submit((_PLACE, (bidder_id, horse_id, amount, event_year)))
+
+    def submit_undo(self, bid_id: int, bidder_id: int) -> Future:
+        """Queue an undo. The Future resolves to undo_bid()'s dict or raises BidError."""
+        return self._submit((_UNDO, (bid_id, bidder_id)))
+
+    def place_bid(self, bidder_id: int, horse_id: int, amount,
+                  event_year: int = EVENT_YEAR) -> "bidding.PlacedBid":
+        """Blocking bidding.place_bid() through the writer."""
+        return self.submit_bid(bidder_id, horse_id, amount, event_year).result(RESULT_TIMEOUT_S)
+
+    def undo_bid(self, bid_id: int, bidder_id: int) -> dict:
+        """Blocking bidding.undo_bid() through the writer."""
+        return self.submit_undo(bid_id, bidder_id).result(RESULT_TIMEOUT_S)
+
+    def _submit(self, op) -> Future:
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((op, future))
+        return future
+
+    # -----------------------------------------------------------------
+    # Writer thread
+    # -----------------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._process(batch)
+                        return
+                    batch.append(item)
+                self._process(batch)
+        finally:
+            close_conn()
+
+    @staticmethod
+    def _execute(conn, kind, args):
+        if kind == _PLACE:
+            bidder_id, horse_id, amount, event_year = args
+            return bidding._place_bid_in_txn(conn, bidder_id, horse_id, amount, event_year)
+        bid_id, bidder_id = args
+        return bidding._undo_bid_in_txn(conn, bid_id, bidder_id)
+
+    def _process(self, batch) -> None:
+        outcomes = []       # (future, result, exc) — resolved after COMMIT
+        committed = []
+        try:
+            with write_txn() as conn:
+                # First callback: runs only once COMMIT has succeeded
+                after_commit(lambda: committed.append(True))
+                for (kind, args), future in batch:
+                    conn.execute("SAVEPOINT bid_op")
+                    try:
+                        result = self._execute(conn, kind, args)
+                    except Exception as exc:
+                        # Nothing of this op survives; earlier ops are kept
+                        conn.execute("ROLLBACK TO bid_op")
+                        conn.execute("RELEASE bid_op")
+                        if not isinstance(exc, bidding.BidError):
+                            logger.exception("%s: %s failed", self.name, kind)
+                        outcomes.append((future, None, exc))
+                    else:
+                        conn.execute("RELEASE bid_op")
+                        outcomes.append((future, result, None))
+        except Exception:
+            if committed:
+                # Every operation ran and the batch is in the database;
+                # replaying would apply it twice. Their results stand.
+                logger.exception("%s: error after committing a batch of %d — not replayed",
+                                 self.name, len(batch))
+            else:
+                outcomes = self._replay(batch)
+
+        self.batches += 1
+        self.operations += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        for future, result, exc in outcomes:
+            if exc is not None:
+                self.rejected += 1
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def _replay(self, batch) -> list:
+        """COMMIT failed — nothing applied. Re-run one by one, in order."""
+        self.commit_failures += 1
+        logger.exception("%s: batch of %d failed to commit — replaying serially",
+                         self.name, len(batch))
+        outcomes = []
+        for (kind, args), future in batch:
+            try:
+                with write_txn() as conn:
+                    result = self._execute(conn, kind, args)
+                outcomes.append((future, result, None))
+            except Exception as exc:
+                outcomes.append((future, None, exc))
+        return outcomes
+
+    def stop(self) -> None:
+        """Finish what's queued, then stop the thread."""
+        with self._start_lock:
+            thread = self._thread
+            if thread is not None and thread.is_alive():
+                self._queue.put(None)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "operations": self.operations,
+            "rejected": self.rejected,
+            "avg_batch": round(self.operations / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "commit_failures": self.commit_failures,
+        }
+
+
+# -----------------------------------------------------------------------------
+# Process-wide writer — started by init_la_subasta()
+# -----------------------------------------------------------------------------
+
+_writer: Optional[BidWriter] = None
+
+
+def start_writer(max_batch: int = DEFAULT_MAX_BATCH) -> BidWriter:
+    """Create (once) the shared writer. Safe to call repeatedly."""
+    global _writer
+    if _writer is None:
+        _writer = BidWriter(max_batch=max_batch)
+    return _writer
+
+
+def stop_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def get_writer() -> Optional[BidWriter]:
+    return _writer
+
+
+def place_bid(bidder_id: int, horse_id: int, amount,
+              event_year: int = EVENT_YEAR) -> "bidding.PlacedBid":
+    """bidding.place_bid via the shared writer, or directly if none is running."""
+    if _writer is None:
+        return bidding.place_bid(bidder_id, horse_id, amount, event_year)
+    return _writer.place_bid(bidder_id, horse_id, amount, event_year)
+
+
+def undo_bid(bid_id: int, bidder_id: int) -> dict:
+    """bidding.undo_bid via the shared writer, or directly if none is running."""
+    if _writer is None:
+        return bidding.undo_bid(bid_id, bidder_id)
+    return _writer.undo_bid(bid_id, bidder_id)
@@ -8,14 +8,15 @@ import sqlite3
 from dataclasses import dataclass
 from typing import Optional, List, Dict
 
-from la_subasta import settings
+from la_subasta import analytics, changes, deadlines, order_book, registration, settings
 from la_subasta.config import (
     EMOJI_PALETTE, EVENT_YEAR, MIN_RAISE,
     BID_UNDO_WINDOW_SECONDS, NUM_HORSES,
     HOUSE_BIDDER_IDENTITY,
 )
-from la_subasta.models import get_conn, write_txn
-from la_subasta.state_machine import is_biddable
+from la_subasta.models import after_commit, get_conn, write_txn
+from la_subasta.order_book import BookBid
+from la_subasta.state_machine import BIDDABLE_STATES, AuctionState
 
 
 # -----------------------------------------------------------------------------
@@ -29,17 +30,39 @@ class BidError(Exception):
         self.reason = reason
 
 
+# -----------------------------------------------------------------------------
+# Commit hooks — in-memory views follow every committed write
+# -----------------------------------------------------------------------------
+
+def _apply_and_record(event_year: int, horse_id: int, kind: str, fn,
+                      bid_id: Optional[int] = None) -> dict:
+    """after_commit body: apply the write to the order book, log the horse's
+    new board state as a sequenced change, and fold it into the analytics."""
+    order_book.apply(event_year, fn)
+    change = changes.record_horse(event_year, kind, horse_id, bid_id)
+    analytics.observe(event_year, change)
+    return change
+
+
+def _record_into(result: dict, change: dict) -> None:
+    result["seq"] = change["seq"]
+    result["pot"] = change["pot"]
+
+
 # -----------------------------------------------------------------------------
 # Bidders
 # -----------------------------------------------------------------------------
 
 def register_bidder(name: str, emoji: str,
-                    event_year: int = EVENT_YEAR) -> dict:
+                    event_year: int = EVENT_YEAR,
+                    hold: Optional[str] = None) -> dict:
     """
     Create a new bidder. Enforces:
       - name+emoji identity is globally unique (per event_year)
       - emoji is from the approved palette
       - name is non-empty
+      - an identity another phone is holding (registration.hold) can only
+        be claimed with that hold's token
 
     Returns the created bidder row as a dict.
     """
@@ -52,6 +75,12 @@ def register_bidder(name: str, emoji: str,
         raise BidError("Pick an emoji from the palette")
 
     identity = f"{name} {emoji}"
+    # Check the hold and claim the identity in one step, so no other phone
+    # can hold it between here and the INSERT. Taken identities are left to
+    # the UNIQUE constraint below.
+    claim = registration.claim(identity, hold)
+    if claim is None:
+        raise BidError("That name + emoji combo is being claimed — pick another emoji")
 
     try:
         with write_txn() as conn:
@@ -61,8 +90,15 @@ def register_bidder(name: str, emoji: str,
                 (name, emoji, identity, event_year),
             )
             bidder_id = cursor.lastrowid
+            row = {"id": bidder_id, "identity": identity, "name": name, "emoji": emoji}
+            after_commit(lambda: order_book.apply(
+                event_year, lambda book: book.add_bidder(row)))
+            after_commit(lambda: registration.registered(identity))
     except sqlite3.IntegrityError:
         raise BidError("That name + emoji combo is taken — pick another emoji")
+    finally:
+        # Committed: registered() already marked it taken. Rolled back: free again.
+        registration.unclaim(identity, claim)
 
     return get_bidder(bidder_id)
 
@@ -84,12 +120,14 @@ def get_bidder_by_identity(identity: str,
 
 
 def identity_available(name: str, emoji: str,
-                       event_year: int = EVENT_YEAR) -> bool:
+                       event_year: int = EVENT_YEAR,
+                       hold: Optional[str] = None) -> bool:
+    """Served from the in-memory identity index — no query per keystroke."""
     name = (name or "").strip()
     emoji = (emoji or "").strip()
     if not name or not emoji:
         return False
-    return get_bidder_by_identity(f"{name} {emoji}", event_year) is None
+    return registration.get_index().is_free(name, emoji, hold)
 
 
 def list_bidders(event_year: int = EVENT_YEAR,
@@ -117,23 +155,13 @@ def list_bidders(event_year: int = EVENT_YEAR,
 def count_bidders(event_year: int = EVENT_YEAR,
                   include_house: bool = False) -> int:
     """Number of registered bidders (House sentinel excluded by default)."""
-    return len(list_bidders(event_year, include_house))
+    return order_book.get_book(event_year).count_bidders(include_house)
 
 
 def count_bids(event_year: int = EVENT_YEAR,
                include_voided: bool = True) -> int:
     """Total bids placed for the event year (voided rows counted by default)."""
-    if include_voided:
-        row = get_conn().execute(
-            "SELECT COUNT(*) AS c FROM bids WHERE event_year = ?",
-            (event_year,),
-        ).fetchone()
-    else:
-        row = get_conn().execute(
-            "SELECT COUNT(*) AS c FROM bids WHERE event_year = ? AND voided = 0",
-            (event_year,),
-        ).fetchone()
-    return row["c"]
+    return order_book.get_book(event_year).count_bids(include_voided)
 
 
 # -----------------------------------------------------------------------------
@@ -147,33 +175,15 @@ def current_high_bid(horse_id: int,
     or None if no active bids exist.
 
     Ties broken by earliest bid_time (per spec — tiebreaker = earliest wins).
+    Served from the in-memory order book.
     """
-    row = get_conn().execute(
-        """
-        SELECT b.id, b.bidder_id, b.horse_id, b.amount, b.bid_time,
-               bd.identity, bd.name, bd.emoji
-          FROM bids b
-          JOIN bidders bd ON bd.id = b.bidder_id
-         WHERE b.horse_id = ?
-           AND b.voided = 0
-           AND b.event_year = ?
-         ORDER BY b.amount DESC, b.bid_time ASC, b.id ASC
-         LIMIT 1
-        """,
-        (horse_id, event_year),
-    ).fetchone()
-    return dict(row) if row else None
+    return order_book.get_book(event_year).high_bid(horse_id)
 
 
 def horses_leading_by(bidder_id: int,
                       event_year: int = EVENT_YEAR) -> List[int]:
     """Return list of horse_ids this bidder is currently leading on."""
-    leading = []
-    for horse_id in range(1, NUM_HORSES + 1):
-        hb = current_high_bid(horse_id, event_year)
-        if hb and hb["bidder_id"] == bidder_id:
-            leading.append(horse_id)
-    return leading
+    return order_book.get_book(event_year).leading_by(bidder_id)
 
 
 # Scratched state lives ONLY in La Subasta's horse_state table. The dashboard's
@@ -187,11 +197,7 @@ def horses_leading_by(bidder_id: int,
 # iPad view (Phase 3) POSTs to /la-subasta/api/admin/scratch directly.
 def is_horse_scratched(horse_id: int,
                        event_year: int = EVENT_YEAR) -> bool:
-    row = get_conn().execute(
-        "SELECT scratched FROM horse_state WHERE horse_id = ? AND event_year = ?",
-        (horse_id, event_year),
-    ).fetchone()
-    return bool(row and row["scratched"])
+    return order_book.get_book(event_year).is_scratched(horse_id)
 
 
 def scratch_horse(horse_id: int, event_year: int = EVENT_YEAR) -> None:
@@ -205,6 +211,9 @@ def scratch_horse(horse_id: int, event_year: int = EVENT_YEAR) -> None:
             """,
             (horse_id, event_year),
         )
+        after_commit(lambda: _apply_and_record(
+            event_year, horse_id, "scratch",
+            lambda book: book.set_scratched(horse_id, True)))
 
 
 def unscratch_horse(horse_id: int, event_year: int = EVENT_YEAR) -> None:
@@ -224,6 +233,9 @@ def unscratch_horse(horse_id: int, event_year: int = EVENT_YEAR) -> None:
             """,
             (horse_id, event_year),
         )
+        after_commit(lambda: _apply_and_record(
+            event_year, horse_id, "unscratch",
+            lambda book: book.set_scratched(horse_id, False)))
 
 
 # -----------------------------------------------------------------------------
@@ -239,31 +251,78 @@ class PlacedBid:
     bid_time: str
     previous_bidder_id: Optional[int]
     previous_bidder_identity: Optional[str]
+    # Change-log position + pot after this bid, filled in on commit
+    seq: Optional[int] = None
+    pot: Optional[float] = None
+    # Soft close: the "deadline" change when this bid pushed the close out
+    extension: Optional[dict] = None
 
 
 def place_bid(bidder_id: int, horse_id: int, amount: float,
               event_year: int = EVENT_YEAR) -> PlacedBid:
     """
-    Validate and insert a bid. All validation happens inside the write txn
-    so a concurrent bid can't slip past the max-raise / max-horses checks.
+    Validate and insert a bid in ONE write transaction: cached settings
+    snapshot (no query), auction/horse/bidder context, indexed leader
+    lookup, then INSERT ... RETURNING. Holding the write lock for the whole
+    check means a concurrent bid can't slip past the max-raise / max-horses
+    checks, and rules are read at bid time so admin overrides apply to the
+    next bid. The close (closes_at) is checked under the same lock, to the
+    millisecond, and a soft close is extended in the same transaction.
 
     Raises BidError with a user-facing reason on any rejection.
     """
-    # ---- Cheap pre-checks (outside txn is fine) ----------------------------
-    # Read mutable rules at bid time so runtime override changes take effect
-    # immediately on the next bid (no server restart required).
-    min_bid = settings.get_setting("MIN_BID")
-    max_raise = settings.get_setting("MAX_RAISE")
-    max_horses_per_bidder = settings.get_setting("MAX_HORSES_PER_BIDDER")
+    amount = _check_bid_args(horse_id, amount)
+    with write_txn() as conn:
+        return _place_bid_in_txn(conn, bidder_id, horse_id, amount, event_year)
+
 
+def _check_bid_args(horse_id, amount) -> float:
+    """Pure checks (no DB). Returns the amount as a float."""
     if not isinstance(horse_id, int) or horse_id < 1 or horse_id > NUM_HORSES:
         raise BidError(f"Invalid horse (must be 1-{NUM_HORSES})")
 
     try:
-        amount = float(amount)
+        return float(amount)
     except (TypeError, ValueError):
         raise BidError("Amount must be a number")
 
+
+# Leader lookup — one seek on idx_bids_leader. Same columns as
+# current_high_bid() so undo can return it as new_high_bid.
+_LEADER_SQL = """
+    SELECT b.id, b.bidder_id, b.horse_id, b.amount, b.bid_time,
+           bd.identity, bd.name, bd.emoji
+      FROM bids b
+      JOIN bidders bd ON bd.id = b.bidder_id
+     WHERE b.horse_id = ?
+       AND b.event_year = ?
+       AND b.voided = 0
+     ORDER BY b.amount DESC, b.bid_time ASC, b.id ASC
+     LIMIT 1
+"""
+
+
+# Horses a bidder leads: the distinct horses they have live bids on
+# (idx_bids_bidder), each checked with the leader seek (idx_bids_leader)
+_LEADING_COUNT_SQL = """
+    SELECT COUNT(*)
+      FROM (SELECT DISTINCT horse_id FROM bids
+             WHERE bidder_id = :bidder AND voided = 0 AND event_year = :year) mine
+     WHERE (SELECT b.bidder_id FROM bids b
+             WHERE b.horse_id = mine.horse_id AND b.event_year = :year AND b.voided = 0
+             ORDER BY b.amount DESC, b.bid_time ASC, b.id ASC
+             LIMIT 1) = :bidder
+"""
+
+
+def _place_bid_in_txn(conn, bidder_id: int, horse_id: int, amount: float,
+                      event_year: int = EVENT_YEAR) -> PlacedBid:
+    """place_bid's checks + insert, inside the caller's write_txn."""
+    rules = settings.current()
+    min_bid = rules["MIN_BID"]
+    max_raise = rules["MAX_RAISE"]
+    max_horses_per_bidder = rules["MAX_HORSES_PER_BIDDER"]
+
     if amount < min_bid:
         raise BidError(f"Minimum bid is ${min_bid}")
 
@@ -271,95 +330,83 @@ def place_bid(bidder_id: int, horse_id: int, amount: float,
     if amount != int(amount):
         raise BidError("Bid must be a whole dollar amount")
 
-    if not is_biddable(event_year):
+    ctx = conn.execute(
+        """
+        SELECT (SELECT state FROM auction_state WHERE event_year = :year) AS state,
+               (SELECT closes_at FROM auction_state WHERE event_year = :year) AS closes_at,
+               (SELECT scratched FROM horse_state
+                 WHERE horse_id = :horse AND event_year = :year) AS scratched,
+               (SELECT 1 FROM bidders WHERE id = :bidder) AS bidder_exists
+        """,
+        {"year": event_year, "horse": horse_id, "bidder": bidder_id},
+    ).fetchone()
+
+    if ctx["state"] is None or AuctionState(ctx["state"]) not in BIDDABLE_STATES:
         raise BidError("Auction is not accepting bids right now")
 
-    if is_horse_scratched(horse_id, event_year):
+    # The LOCKED timer may not have fired yet — the deadline is what counts
+    now = deadlines.now()
+    if ctx["closes_at"] is not None and now >= deadlines.parse_ts(ctx["closes_at"]):
+        raise BidError("Bidding has closed")
+
+    if ctx["scratched"]:
         raise BidError("That horse has been scratched")
 
-    if get_bidder(bidder_id) is None:
+    if not ctx["bidder_exists"]:
         raise BidError("Unknown bidder")
 
-    # ---- Serialized validation + insert ------------------------------------
-    with write_txn() as conn:
-        # Current high bid (re-queried inside txn)
-        hb_row = conn.execute(
-            """
-            SELECT b.id, b.bidder_id, b.amount, bd.identity
-              FROM bids b
-              JOIN bidders bd ON bd.id = b.bidder_id
-             WHERE b.horse_id = ?
-               AND b.voided = 0
-               AND b.event_year = ?
-             ORDER BY b.amount DESC, b.bid_time ASC, b.id ASC
-             LIMIT 1
-            """,
-            (horse_id, event_year),
-        ).fetchone()
+    hb_row = conn.execute(_LEADER_SQL, (horse_id, event_year)).fetchone()
 
-        current_amount = hb_row["amount"] if hb_row else 0.0
-        current_bidder = hb_row["bidder_id"] if hb_row else None
-        previous_identity = hb_row["identity"] if hb_row else None
-
-        # Can't outbid yourself
-        if current_bidder == bidder_id:
-            raise BidError("You're already leading on this horse")
-
-        # Opening bid vs raise
-        if current_amount <= 0:
-            # No existing bid — must be at least MIN_BID (already checked) and
-            # at most MIN_BID + MAX_RAISE. Opening bids are effectively
-            # MIN_BID..MIN_BID+MAX_RAISE per spec.
-            if amount > min_bid + max_raise:
-                raise BidError(f"Opening bid max is ${min_bid + max_raise}")
-        else:
-            min_allowed = current_amount + MIN_RAISE
-            max_allowed = current_amount + max_raise
-            if amount < min_allowed:
-                raise BidError(f"Must bid at least ${int(min_allowed)}")
-            if amount > max_allowed:
-                raise BidError(f"Max raise is ${max_raise} (so ${int(max_allowed)} max)")
-
-        # Max horses owned — checked against horses where bidder is CURRENTLY leading.
-        # Outbidding someone on a horse you're already leading is impossible
-        # (caught above), so this check is purely "are you about to become
-        # leader on a NEW horse that would push them past the cap?"
-        leading_rows = conn.execute(
-            """
-            SELECT b.horse_id
-              FROM bids b
-              JOIN (
-                SELECT horse_id, MAX(amount) AS max_amt
-                  FROM bids
-                 WHERE voided = 0 AND event_year = ?
-                 GROUP BY horse_id
-              ) top ON top.horse_id = b.horse_id AND top.max_amt = b.amount
-             WHERE b.bidder_id = ?
-               AND b.voided = 0
-               AND b.event_year = ?
-            """,
-            (event_year, bidder_id, event_year),
-        ).fetchall()
-        currently_leading = {r["horse_id"] for r in leading_rows}
-
-        # If bidder isn't currently leading this horse AND adding it would
-        # push them past the cap, reject.
-        if horse_id not in currently_leading and len(currently_leading) >= max_horses_per_bidder:
-            raise BidError(f"Max {max_horses_per_bidder} horses per bidder")
-
-        # ---- Insert the bid ------------------------------------------------
-        cursor = conn.execute(
-            "INSERT INTO bids (bidder_id, horse_id, amount, event_year) "
-            "VALUES (?, ?, ?, ?)",
-            (bidder_id, horse_id, amount, event_year),
-        )
-        bid_id = cursor.lastrowid
+    current_amount = hb_row["amount"] if hb_row else 0.0
+    current_bidder = hb_row["bidder_id"] if hb_row else None
+    previous_identity = hb_row["identity"] if hb_row else None
+
+    # Can't outbid yourself
+    if current_bidder == bidder_id:
+        raise BidError("You're already leading on this horse")
+
+    # Opening bid vs raise
+    if current_amount <= 0:
+        # No existing bid — must be at least MIN_BID (already checked) and
+        # at most MIN_BID + MAX_RAISE. Opening bids are effectively
+        # MIN_BID..MIN_BID+MAX_RAISE per spec.
+        if amount > min_bid + max_raise:
+            raise BidError(f"Opening bid max is ${min_bid + max_raise}")
+    else:
+        min_allowed = current_amount + MIN_RAISE
+        max_allowed = current_amount + max_raise
+        if amount < min_allowed:
+            raise BidError(f"Must bid at least ${int(min_allowed)}")
+        if amount > max_allowed:
+            raise BidError(f"Max raise is ${max_raise} (so ${int(max_allowed)} max)")
+
+    # Max horses owned — checked against horses where bidder is CURRENTLY
+    # leading (this horse isn't one of them, caught above). Counted in SQL
+    # inside the BEGIN IMMEDIATE, not from the order book: the book is
+    # per-process and never sees another worker's bids, while this read
+    # sees every committed bid plus this transaction's own (a batch's
+    # earlier bids and undos).
+    currently_leading = conn.execute(
+        _LEADING_COUNT_SQL, {"bidder": bidder_id, "year": event_year}).fetchone()[0]
+    if currently_leading >= max_horses_per_bidder:
+        raise BidError(f"Max {max_horses_per_bidder} horses per bidder")
+
+    # ---- Insert the bid ----------------------------------------------------
+    inserted = conn.execute(
+        "INSERT INTO bids (bidder_id, horse_id, amount, event_year) "
+        "VALUES (?, ?, ?, ?) RETURNING id, bid_time",
+        (bidder_id, horse_id, amount, event_year),
+    ).fetchone()
+    bid_id, bid_time = inserted["id"], inserted["bid_time"]
 
-        bid_time = conn.execute(
-            "SELECT bid_time FROM bids WHERE id = ?", (bid_id,),
-        ).fetchone()["bid_time"]
+    extend_to = deadlines.soft_close(now, ctx["closes_at"])
+    if extend_to is not None:
+        conn.execute(
+            "UPDATE auction_state SET closes_at = ? WHERE event_year = ?",
+            (extend_to, event_year),
+        )
 
-    return PlacedBid(
+    placed = PlacedBid(
         bid_id=bid_id,
         bidder_id=bidder_id,
         horse_id=horse_id,
@@ -369,6 +416,19 @@ def place_bid(bidder_id: int, horse_id: int, amount: float,
         previous_bidder_identity=previous_identity,
     )
 
+    # Registered last (see _undo_bid_in_txn)
+    book_bid = BookBid(bid_id, bidder_id, horse_id, amount, bid_time)
+
+    def committed():
+        change = _apply_and_record(event_year, horse_id, "bid",
+                                   lambda book: book.add_bid(book_bid), bid_id)
+        placed.seq, placed.pot = change["seq"], change["pot"]
+        if extend_to is not None:
+            placed.extension = deadlines.extended(event_year, extend_to, bid_id)
+
+    after_commit(committed)
+    return placed
+
 
 # -----------------------------------------------------------------------------
 # Undo (10-second window)
@@ -384,10 +444,15 @@ def undo_bid(bid_id: int, bidder_id: int) -> dict:
 
     Returns a dict with the voided bid + restored leader info.
     """
-    conn = get_conn()
+    with write_txn() as conn:
+        return _undo_bid_in_txn(conn, bid_id, bidder_id)
+
+
+def _undo_bid_in_txn(conn, bid_id: int, bidder_id: int) -> dict:
+    """undo_bid's checks + void, inside the caller's write_txn."""
     row = conn.execute(
         """
-        SELECT id, bidder_id, horse_id, amount, bid_time, voided,
+        SELECT id, bidder_id, horse_id, amount, bid_time, voided, event_year,
                (strftime('%s','now') - strftime('%s', bid_time)) AS age_seconds
           FROM bids
          WHERE id = ?
@@ -408,19 +473,28 @@ def undo_bid(bid_id: int, bidder_id: int) -> dict:
             f"Undo window ({BID_UNDO_WINDOW_SECONDS}s) expired"
         )
 
-    with write_txn() as conn:
-        conn.execute(
-            "UPDATE bids SET voided = 1, voided_reason = 'undo' WHERE id = ?",
-            (bid_id,),
-        )
+    horse_id, event_year = row["horse_id"], row["event_year"]
+    old_high = conn.execute(_LEADER_SQL, (horse_id, event_year)).fetchone()
+    conn.execute(
+        "UPDATE bids SET voided = 1, voided_reason = 'undo' WHERE id = ?",
+        (bid_id,),
+    )
+    new_high = conn.execute(_LEADER_SQL, (horse_id, event_year)).fetchone()
+    new_high = dict(new_high) if new_high else None
 
-    new_high = current_high_bid(row["horse_id"])
-    return {
+    result = {
         "voided_bid_id": bid_id,
-        "horse_id": row["horse_id"],
+        "horse_id": horse_id,
         "new_high_bid": new_high,
+        "previous_bidder_id": old_high["bidder_id"] if old_high else None,
     }
 
+    # Registered last: nothing below can fail, so a batch that rolls this
+    # operation back to its savepoint never leaves a stale callback behind
+    after_commit(lambda: _record_into(result, _apply_and_record(
+        event_year, horse_id, "void", lambda book: book.void_bid(bid_id))))
+    return result
+
 
 # -----------------------------------------------------------------------------
 # Admin void (re-award to 2nd-highest, per spec § Welch / Void Policy)
@@ -430,22 +504,29 @@ def void_bid(bid_id: int, reason: str) -> dict:
     """Admin void — no time limit, records reason, re-awards horse to runner-up."""
     with write_txn() as conn:
         row = conn.execute(
-            "SELECT horse_id, voided FROM bids WHERE id = ?", (bid_id,),
+            "SELECT horse_id, voided, event_year FROM bids WHERE id = ?", (bid_id,),
         ).fetchone()
         if row is None:
             raise BidError("Bid not found")
         if row["voided"]:
             raise BidError("Bid already voided")
+        old_high = conn.execute(
+            _LEADER_SQL, (row["horse_id"], row["event_year"])).fetchone()
         conn.execute(
             "UPDATE bids SET voided = 1, voided_reason = ? WHERE id = ?",
             (reason or "admin void", bid_id),
         )
+        result = {
+            "voided_bid_id": bid_id,
+            "horse_id": row["horse_id"],
+            "previous_bidder_id": old_high["bidder_id"] if old_high else None,
+        }
+        after_commit(lambda: _record_into(result, _apply_and_record(
+            row["event_year"], row["horse_id"], "void",
+            lambda book: book.void_bid(bid_id))))
 
-    return {
-        "voided_bid_id": bid_id,
-        "horse_id": row["horse_id"],
-        "new_high_bid": current_high_bid(row["horse_id"]),
-    }
+    result["new_high_bid"] = current_high_bid(row["horse_id"], row["event_year"])
+    return result
 
 
 # -----------------------------------------------------------------------------
@@ -454,24 +535,17 @@ def void_bid(bid_id: int, reason: str) -> dict:
 
 def total_pot(event_year: int = EVENT_YEAR) -> float:
     """Sum of current high bids across all non-scratched horses."""
-    pot = 0.0
-    for horse_id in range(1, NUM_HORSES + 1):
-        if is_horse_scratched(horse_id, event_year):
-            continue
-        hb = current_high_bid(horse_id, event_year)
-        if hb:
-            pot += hb["amount"]
-    return pot
+    return order_book.get_book(event_year).total_pot()
 
 
 def bidder_portfolio(bidder_id: int,
                      event_year: int = EVENT_YEAR) -> Dict:
     """Return what horses a bidder is leading + total owed."""
-    leading = horses_leading_by(bidder_id, event_year)
+    book = order_book.get_book(event_year)
     total = 0.0
     horses = []
-    for h in leading:
-        hb = current_high_bid(h, event_year)
+    for h in book.leading_by(bidder_id):
+        hb = book.high_bid(h)
         if hb:
             horses.append({"horse_id": h, "amount": hb["amount"]})
             total += hb["amount"]
@@ -5,13 +5,17 @@
 
 import logging
 import time
+from typing import Optional
 
-from flask import Blueprint, jsonify, render_template, request
+from flask import Blueprint, g, jsonify, render_template, request
 
-from la_subasta import bidding, notifications, payouts, reset, settings
+from la_subasta import (
+    analytics, bid_writer, bidding, changes, deadlines, maintenance, notifications,
+    payouts, registration, reset, settings,
+)
 from la_subasta.bidding import BidError
 from la_subasta.config import EMOJI_PALETTE, EVENT_YEAR, NUM_HORSES
-from la_subasta.models import init_db
+from la_subasta.models import close_conn, holds_reader, init_db, pool_stats
 from la_subasta.settings import SettingsError
 from la_subasta.state_machine import (
     AuctionState, get_state, get_state_row, transition,
@@ -46,6 +50,23 @@ def _no_store_api_responses(response):
     return response
 
 
+# -----------------------------------------------------------------------------
+# Connection pool — a request returns the reader it borrowed when it ends
+# -----------------------------------------------------------------------------
+
+@la_subasta_bp.before_request
+def _note_reader_held():
+    # A thread that already held one (test client on the caller's thread)
+    # keeps it; only what this request borrowed goes back
+    g.la_subasta_held_reader = holds_reader()
+
+
+@la_subasta_bp.teardown_request
+def _return_reader(_exc=None):
+    if not g.pop("la_subasta_held_reader", True):
+        close_conn()
+
+
 # -----------------------------------------------------------------------------
 # Init — called from main.py at app startup
 # -----------------------------------------------------------------------------
@@ -63,6 +84,12 @@ def init_la_subasta(socketio=None, racing_service=None) -> None:
     init_db()
     notifications.init_notifications(socketio)
     _set_racing_service(racing_service)
+    # Guest bids/undos are group-committed by one writer thread
+    bid_writer.start_writer()
+    # WAL checkpoints + ANALYZE off the write path
+    maintenance.start_daemon()
+    # Timed OPEN / FINAL_HOUR / LOCKED (resumes a day armed before a restart)
+    deadlines.start_engine(on_phase=_scheduled_phase)
     logger.info("La Subasta initialised (DB ready, socketio=%s)",
                 "yes" if socketio else "no")
 
@@ -136,6 +163,21 @@ def spectator_view():
     return jsonify({"view": "spectator", "status": "Phase 4 UI pending"})
 
 
+@la_subasta_bp.route("/api/history", methods=["GET"])
+def api_history():
+    """Per-year summaries + year-over-year, from the attached year files."""
+    # Imported here: history is also a CLI (python -m la_subasta.history)
+    from la_subasta import history
+    return jsonify({"success": True, "years": history.event_years(),
+                    "year_over_year": history.year_over_year()})
+
+
+@la_subasta_bp.route("/api/spectator/panels", methods=["GET"])
+def api_spectator_panels():
+    """Spectator TV panel data — precomputed, refreshed once per panel slot."""
+    return jsonify({"success": True, "panels": analytics.panels()})
+
+
 # -----------------------------------------------------------------------------
 # State
 # -----------------------------------------------------------------------------
@@ -148,6 +190,8 @@ def api_state():
         "state": row["state"],
         "opens_at": row["opens_at"],
         "closes_at": row["closes_at"],
+        # Countdown clocks correct for phone clock skew with this
+        "server_time_ms": int(deadlines.now() * 1000),
         "total_pot": bidding.total_pot(),
         "updated_at": row["updated_at"],
         "event_year": EVENT_YEAR,
@@ -164,6 +208,15 @@ def api_state():
 
 @la_subasta_bp.route("/api/horses", methods=["GET"])
 def api_horses():
+    # Read the log position first: the snapshot may then include a few
+    # newer changes, which replay harmlessly (deltas are absolute)
+    log = changes.get_log()
+    seq = log.seq
+    return jsonify({"success": True, "horses": _horses_snapshot(),
+                    "seq": seq, "epoch": log.epoch})
+
+
+def _horses_snapshot() -> list:
     horses = []
     for horse_id in range(1, NUM_HORSES + 1):
         meta = _horse_meta(horse_id)
@@ -184,7 +237,40 @@ def api_horses():
             meta["current_leader_identity"] = None
             meta["current_leader_bidder_id"] = None
         horses.append(meta)
-    return jsonify({"success": True, "horses": horses})
+    return horses
+
+
+@la_subasta_bp.route("/api/changes", methods=["GET"])
+def api_changes():
+    """
+    Catch-up for a reconnecting phone: the board changes after ?since=N in
+    the phone's ?epoch=E, or — if the log no longer reaches back that far,
+    or the epoch is gone — a full snapshot (horses + state + pot).
+    """
+    log = changes.get_log()
+    seq = log.seq
+    try:
+        since = int(request.args.get("since", ""))
+    except ValueError:
+        since = None
+    missed = None
+    if since is not None and request.args.get("epoch") == log.epoch:
+        missed = log.since(since)
+    if missed is not None:
+        return jsonify({"success": True, "epoch": log.epoch,
+                        "seq": missed[-1]["seq"] if missed else since,
+                        "changes": missed})
+    return jsonify({
+        "success": True,
+        "epoch": log.epoch,
+        "seq": seq,
+        "snapshot": {
+            "state": get_state().value,
+            "closes_at": get_state_row()["closes_at"],
+            "total_pot": bidding.total_pot(),
+            "horses": _horses_snapshot(),
+        },
+    })
 
 
 # -----------------------------------------------------------------------------
@@ -198,6 +284,7 @@ def api_register():
         bidder = bidding.register_bidder(
             name=data.get("name", ""),
             emoji=data.get("emoji", ""),
+            hold=data.get("hold") or None,
         )
     except BidError as exc:
         return _bid_err(exc, status=409)
@@ -209,10 +296,42 @@ def api_check_identity():
     data = request.get_json(silent=True) or {}
     available = bidding.identity_available(
         data.get("name", ""), data.get("emoji", ""),
+        hold=data.get("hold") or None,
     )
     return jsonify({"success": True, "available": available})
 
 
+@la_subasta_bp.route("/api/identity", methods=["GET"])
+def api_identity_matrix():
+    """Every palette emoji's status for ?name= in one answer (no SQL):
+    free / taken / held (another phone) / yours (?hold= token's hold)."""
+    name = (request.args.get("name") or "").strip()
+    if not name:
+        return jsonify({"success": False, "error": "Name is required"}), 400
+    emojis = registration.get_index().availability(
+        name, request.args.get("hold") or None)
+    return jsonify({"success": True, "name": name, "emojis": emojis,
+                    "free": sum(1 for e in emojis if e["status"] in ("free", "yours"))})
+
+
+@la_subasta_bp.route("/api/identity/hold", methods=["POST"])
+def api_identity_hold():
+    """Hold name+emoji for this phone until it registers (or the hold
+    lapses). Body: {"name", "emoji", "hold": <token from an earlier hold>}."""
+    data = request.get_json(silent=True) or {}
+    name = (data.get("name") or "").strip()
+    emoji = (data.get("emoji") or "").strip()
+    if not name:
+        return jsonify({"success": False, "error": "Name is required"}), 400
+    if emoji not in EMOJI_PALETTE:
+        return jsonify({"success": False, "error": "Pick an emoji from the palette"}), 400
+    held = registration.get_index().hold(name, emoji, data.get("hold") or None)
+    if held is None:
+        return jsonify({"success": False,
+                        "error": "That name + emoji combo is taken — pick another emoji"}), 409
+    return jsonify({"success": True, **held})
+
+
 @la_subasta_bp.route("/api/bidders", methods=["GET"])
 def api_bidders():
     include_house = request.args.get("include_house", "").lower() in ("1", "true", "yes")
@@ -242,7 +361,7 @@ def api_bid():
         return _err("bidder_id and horse_id must be integers")
 
     try:
-        placed = bidding.place_bid(bidder_id, horse_id, data.get("amount"))
+        placed = bid_writer.place_bid(bidder_id, horse_id, data.get("amount"))
     except BidError as exc:
         return _bid_err(exc)
 
@@ -256,6 +375,9 @@ def api_bid():
         "bid_time": placed.bid_time,
         "previous_bidder_id": placed.previous_bidder_id,
         "previous_bidder_identity": placed.previous_bidder_identity,
+        "seq": placed.seq,
+        "pot": placed.pot,
+        "closes_at": placed.extension["closes_at"] if placed.extension else None,
     }
 
     notifications.bid_placed(
@@ -265,7 +387,13 @@ def api_bid():
         amount=placed.amount,
         previous_bidder_id=placed.previous_bidder_id,
         previous_bidder_identity=placed.previous_bidder_identity,
+        seq=placed.seq,
+        pot=placed.pot,
     )
+    if placed.extension is not None:
+        notifications.auction_extended(placed.extension["closes_at"],
+                                       bid_id=placed.bid_id,
+                                       seq=placed.extension["seq"])
     if placed.previous_bidder_id is not None:
         notifications.outbid(
             horse_id=placed.horse_id,
@@ -275,6 +403,13 @@ def api_bid():
             new_bidder_identity=payload["bidder_identity"] or "",
             amount=placed.amount,
         )
+    _notify_lead_change(placed.horse_id, placed.previous_bidder_id,
+                        placed.bidder_id, placed.amount)
+    notifications.watched_horse(placed.horse_id, "bid", {
+        "amount": placed.amount,
+        "bidder_id": placed.bidder_id,
+        "bidder_identity": payload["bidder_identity"],
+    })
 
     return jsonify({"success": True, "bid": payload,
                     "total_pot": bidding.total_pot()})
@@ -290,28 +425,70 @@ def api_bid_undo():
         return _err("bid_id and bidder_id must be integers")
 
     try:
-        result = bidding.undo_bid(bid_id, bidder_id)
+        result = bid_writer.undo_bid(bid_id, bidder_id)
     except BidError as exc:
         return _bid_err(exc)
 
-    notifications.bid_voided(result["voided_bid_id"], result["horse_id"],
-                             result["new_high_bid"])
+    _notify_voided(result)
     return jsonify({"success": True, **result,
                     "total_pot": bidding.total_pot()})
 
 
+def _notify_lead_change(horse_id: int, old_bidder_id: Optional[int],
+                        new_bidder_id: Optional[int], amount=None) -> None:
+    """portfolio_changed to the bidders who lost / gained a horse."""
+    if old_bidder_id == new_bidder_id:
+        return
+    notifications.portfolio_changed(old_bidder_id, horse_id, leading=False)
+    notifications.portfolio_changed(new_bidder_id, horse_id, leading=True,
+                                    amount=amount)
+
+
+def _notify_voided(result: dict) -> None:
+    new_high = result["new_high_bid"]
+    notifications.bid_voided(result["voided_bid_id"], result["horse_id"], new_high,
+                             seq=result.get("seq"), pot=result.get("pot"))
+    _notify_lead_change(result["horse_id"], result["previous_bidder_id"],
+                        new_high["bidder_id"] if new_high else None,
+                        new_high["amount"] if new_high else None)
+    notifications.watched_horse(result["horse_id"], "voided",
+                                {"new_high_bid": new_high})
+
+
 # -----------------------------------------------------------------------------
 # Admin endpoints
 # -----------------------------------------------------------------------------
 
+def _last_seq() -> Optional[int]:
+    """seq of the change this request thread's last commit recorded."""
+    change = changes.last_recorded()
+    return change["seq"] if change else None
+
+
 def _transition_with_broadcast(new_state: AuctionState):
     """Transition and emit auction_state_changed. Returns (ok, old_state_value)."""
     old_state = get_state().value
     transition(new_state)
-    notifications.auction_state_changed(new_state.value, old_state)
+    notifications.auction_state_changed(new_state.value, old_state,
+                                        seq=_last_seq())
     return old_state
 
 
+def _lock_auction() -> None:
+    """Transition to LOCKED, freeze ownership, announce it."""
+    _transition_with_broadcast(AuctionState.LOCKED)
+    payouts.freeze_ownership()
+    notifications.auction_locked(time.time())
+
+
+def _scheduled_phase(new_state: AuctionState) -> None:
+    """Deadline engine timer — same effects as the admin button."""
+    if new_state is AuctionState.LOCKED:
+        _lock_auction()
+    else:
+        _transition_with_broadcast(new_state)
+
+
 @la_subasta_bp.route("/api/admin/start", methods=["POST"])
 def api_admin_start():
     try:
@@ -352,7 +529,8 @@ def api_admin_transition():
 
     old_state = get_state().value
     transition(new_state, force=True)
-    notifications.auction_state_changed(new_state.value, old_state)
+    notifications.auction_state_changed(new_state.value, old_state,
+                                        seq=_last_seq())
     return jsonify({"success": True, "state": get_state().value,
                     "previous_state": old_state})
 
@@ -360,11 +538,9 @@ def api_admin_transition():
 @la_subasta_bp.route("/api/admin/lock", methods=["POST"])
 def api_admin_lock():
     try:
-        _transition_with_broadcast(AuctionState.LOCKED)
+        _lock_auction()
     except ValueError as exc:
         return _err(str(exc), status=409)
-    payouts.freeze_ownership()
-    notifications.auction_locked(time.time())
     return jsonify({"success": True, "state": get_state().value})
 
 
@@ -389,20 +565,42 @@ def api_admin_results():
         if pos < 1 or pos > NUM_HORSES:
             return _err(f"Invalid horse id: {pos}")
 
+    try:
+        result = enter_results(win, place, show)
+    except ValueError as exc:
+        return _err(str(exc), status=409)
+
+    return jsonify({"success": True, **result, "state": get_state().value})
+
+
+def enter_results(win: int, place: int, show: int,
+                  only_if_awaiting: bool = False) -> Optional[dict]:
+    """
+    Settle the auction on race results: LOCKED/RACE_COMPLETE -> SETTLED,
+    payouts computed and broadcast. Arguments are assumed validated.
+
+    Args:
+        only_if_awaiting: Return None instead of raising when the auction
+            isn't waiting for results (the dashboard's results transaction
+            calls this on every race, auction or not).
+
+    Raises:
+        ValueError: If the auction can't take results from its current state.
+    """
     current = get_state()
+    if current not in (AuctionState.LOCKED, AuctionState.RACE_COMPLETE):
+        if only_if_awaiting:
+            return None
+        raise ValueError(f"Cannot enter results from state {current.value}")
     if current == AuctionState.LOCKED:
         _transition_with_broadcast(AuctionState.RACE_COMPLETE)
-    elif current != AuctionState.RACE_COMPLETE:
-        return _err(f"Cannot enter results from state {current.value}",
-                    status=409)
 
     result = payouts.compute_and_persist_payouts(win, place, show)
     _transition_with_broadcast(AuctionState.SETTLED)
 
     notifications.results_entered(win, place, show)
     notifications.payout_computed(result)
-
-    return jsonify({"success": True, **result, "state": get_state().value})
+    return result
 
 
 @la_subasta_bp.route("/api/admin/void", methods=["POST"])
@@ -416,8 +614,7 @@ def api_admin_void():
         result = bidding.void_bid(bid_id, data.get("reason", ""))
     except BidError as exc:
         return _bid_err(exc)
-    notifications.bid_voided(result["voided_bid_id"], result["horse_id"],
-                             result["new_high_bid"])
+    _notify_voided(result)
     return jsonify({"success": True, **result})
 
 
@@ -431,7 +628,10 @@ def api_admin_scratch():
     if horse_id < 1 or horse_id > NUM_HORSES:
         return _err(f"Invalid horse_id: {horse_id}")
     bidding.scratch_horse(horse_id)
-    notifications.horse_scratched(horse_id)
+    change = changes.last_recorded() or {}
+    notifications.horse_scratched(horse_id, seq=change.get("seq"),
+                                  pot=change.get("pot"))
+    notifications.watched_horse(horse_id, "scratched")
     return jsonify({"success": True, "horse_id": horse_id})
 
 
@@ -446,6 +646,9 @@ def api_admin_unscratch():
     if horse_id < 1 or horse_id > NUM_HORSES:
         return _err(f"Invalid horse_id: {horse_id}")
     bidding.unscratch_horse(horse_id)
+    change = changes.last_recorded() or {}
+    notifications.horse_unscratched(horse_id, seq=change.get("seq"),
+                                    pot=change.get("pot"))
     return jsonify({"success": True, "horse_id": horse_id})
 
 
@@ -461,17 +664,9 @@ def api_admin_paid():
     if bidder is None:
         return _err("Unknown bidder", status=404)
 
-    from la_subasta.models import write_txn
-    portfolio = bidding.bidder_portfolio(bidder_id)
-    with write_txn() as conn:
-        conn.execute(
-            "UPDATE bidders SET paid = 1, paid_at = datetime('now'), "
-            "paid_amount = ? WHERE id = ?",
-            (portfolio["total"], bidder_id),
-        )
+    amount = payouts.mark_paid(bidder_id)
     notifications.paid_marked(bidder_id)
-    return jsonify({"success": True, "bidder_id": bidder_id,
-                    "amount": portfolio["total"]})
+    return jsonify({"success": True, "bidder_id": bidder_id, "amount": amount})
 
 
 @la_subasta_bp.route("/api/admin/payouts", methods=["GET"])
@@ -479,6 +674,88 @@ def api_admin_payouts():
     return jsonify({"success": True, "payouts": payouts.list_payouts()})
 
 
+@la_subasta_bp.route("/api/admin/statements", methods=["GET"])
+def api_admin_statements():
+    """Per-bidder settlement: owed, winnings, net (empty until results)."""
+    return jsonify({"success": True, "statements": payouts.list_statements()})
+
+
+@la_subasta_bp.route("/api/admin/fanout", methods=["GET"])
+def api_admin_fanout():
+    """SocketIO fan-out per event: deliveries vs. the broadcast equivalent."""
+    return jsonify({"success": True, "fanout": notifications.fanout_stats()})
+
+
+@la_subasta_bp.route("/api/admin/storage", methods=["GET"])
+def api_admin_storage():
+    """WAL size, checkpoint timings, open connections, pool waits/leaks."""
+    daemon = maintenance.get_daemon()
+    storage = (daemon.stats() if daemon
+               else {"running": False, "wal_bytes": maintenance.wal_bytes()})
+    return jsonify({"success": True, "storage": storage, "pool": pool_stats()})
+
+
+# -----------------------------------------------------------------------------
+# Deadline schedule
+# -----------------------------------------------------------------------------
+
+def _announce_schedule() -> None:
+    status = deadlines.get_engine().status()
+    notifications.auction_scheduled(status["opens_at"], status["closes_at"],
+                                    seq=_last_seq())
+
+
+@la_subasta_bp.route("/api/admin/schedule", methods=["GET"])
+def api_admin_schedule_get():
+    engine = deadlines.get_engine()
+    return jsonify({"success": True,
+                    "schedule": engine.status() if engine else {"armed": False}})
+
+
+@la_subasta_bp.route("/api/admin/schedule", methods=["POST"])
+def api_admin_schedule_set():
+    """Arm the timed day. Body JSON (all optional): {"date": "YYYY-MM-DD",
+    "soft_close_seconds": N}. Defaults to today and SOFT_CLOSE_SECONDS."""
+    data = request.get_json(silent=True) or {}
+    engine = deadlines.get_engine()
+    if engine is None:
+        return _err("Deadline engine not running", status=503)
+    soft_close = data.get("soft_close_seconds")
+    try:
+        schedule = engine.arm(
+            data.get("date"),
+            soft_close_seconds=int(soft_close) if soft_close is not None else None,
+        )
+    except (TypeError, ValueError) as exc:
+        status = 409 if "Cannot schedule" in str(exc) else 400
+        return _err(str(exc), status=status)
+    _announce_schedule()
+    return jsonify({"success": True, "schedule": schedule})
+
+
+@la_subasta_bp.route("/api/admin/schedule/cancel", methods=["POST"])
+def api_admin_schedule_cancel():
+    engine = deadlines.get_engine()
+    if engine is not None:
+        engine.disarm()
+        _announce_schedule()
+    return jsonify({"success": True})
+
+
+def _replan_after(keys) -> None:
+    """Open time / lockdown changed: move an armed day's deadlines."""
+    engine = deadlines.get_engine()
+    if engine is None or engine.armed_date is None \
+            or not deadlines.PLAN_SETTINGS.intersection(keys):
+        return
+    try:
+        engine.arm(engine.armed_date)
+    except ValueError as exc:
+        logger.warning("Auction schedule not re-planned: %s", exc)
+        return
+    _announce_schedule()
+
+
 # -----------------------------------------------------------------------------
 # Admin-tunable settings (Phase 1.5)
 # -----------------------------------------------------------------------------
@@ -515,6 +792,7 @@ def api_admin_settings_set():
         new_value=result["new_value"],
         changed_at=result["changed_at"],
     )
+    _replan_after({result["key"]})
     return jsonify({"success": True, "change": result})
 
 
@@ -533,6 +811,7 @@ def api_admin_settings_reset():
                 key=key, old_value=info["value"],
                 new_value=info["default"], changed_at=None,
             )
+    _replan_after({key for key, info in before.items() if info["is_override"]})
     return jsonify({"success": True, "reset_count": count})
 
 
@@ -585,6 +864,10 @@ def api_admin_reset():
     else:  # scope == "state"
         deleted = reset.reset_state()
 
+    # opens_at/closes_at were cleared with the state; drop their timers too
+    engine = deadlines.get_engine()
+    if engine is not None:
+        engine.disarm(clear=False)
     notifications.auction_reset(scope=scope, timestamp=time.time())
 
     return jsonify({
@@ -0,0 +1,153 @@
+# la_subasta/changes.py - Sequenced change log for guest board deltas
+#
+# Every auction mutation a guest board cares about (bid, undo/void, scratch,
+# unscratch, state transition, close time) is recorded here with a monotonic sequence
+# number, in commit order: records are made from models.after_commit()
+# callbacks, i.e. under the write lock, right after the order book applied
+# the same write.
+#
+# A change is a compact, absolute delta — the horse's leader, amount and
+# scratch flag plus the pot AFTER the write — so applying one twice, or one
+# the client's snapshot already includes, is harmless. Socket events carry
+# the same delta, and GET /api/changes?since=N&epoch=E replays what a phone
+# missed. The log is bounded; a phone further behind than the log reaches
+# (or on another epoch — process restart, DB reopen, bid reset) gets a full
+# snapshot instead.
+
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from la_subasta import order_book
+from la_subasta.config import EVENT_YEAR
+from la_subasta.models import _db_path, db_generation, register_view
+
+# Changes kept in memory per event year. A busy auction does a few thousand
+# bids all day; this covers any phone that was away for a few minutes.
+CHANGE_LOG_SIZE = 2000
+
+_local = threading.local()
+
+
+class ChangeLog:
+    """Bounded, sequenced log of board changes for one event year."""
+
+    def __init__(self, event_year: int = EVENT_YEAR, size: int = CHANGE_LOG_SIZE):
+        self.event_year = event_year
+        # New token per log: seq numbers from another epoch mean nothing here
+        self.epoch = os.urandom(4).hex()
+        self._lock = threading.Lock()
+        self._changes: deque = deque(maxlen=max(1, int(size)))
+        self._seq = 0
+
+        self.generation = db_generation()
+        self.db_path = _db_path()
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def record(self, kind: str, **fields) -> dict:
+        with self._lock:
+            self._seq += 1
+            change = {"seq": self._seq, "kind": kind, **fields}
+            self._changes.append(change)
+        _local.last = change
+        return change
+
+    def since(self, seq: int) -> Optional[List[dict]]:
+        """Changes after `seq`, or None if the log no longer reaches back that
+        far (or `seq` is from the future) — the caller needs a snapshot."""
+        with self._lock:
+            if seq > self._seq or seq < 0:
+                return None
+            if seq == self._seq:
+                return []
+            if not self._changes or self._changes[0]["seq"] > seq + 1:
+                return None
+            skip = seq + 1 - self._changes[0]["seq"]
+            return [self._changes[i] for i in range(skip, len(self._changes))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "event_year": self.event_year,
+                "epoch": self.epoch,
+                "seq": self._seq,
+                "retained": len(self._changes),
+                "oldest_seq": self._changes[0]["seq"] if self._changes else None,
+            }
+
+
+# -----------------------------------------------------------------------------
+# Registry — one log per event year, restarted when the DB is reopened/reset
+# -----------------------------------------------------------------------------
+
+_logs: Dict[int, ChangeLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_log(event_year: int = EVENT_YEAR) -> ChangeLog:
+    log = _logs.get(event_year)
+    if (log is not None and log.generation == db_generation()
+            and log.db_path == _db_path()):
+        return log
+    with _logs_lock:
+        log = _logs.get(event_year)
+        if (log is None or log.generation != db_generation()
+                or log.db_path != _db_path()):
+            log = ChangeLog(event_year)
+            _logs[event_year] = log
+        return log
+
+
+def reset_log(event_year: int = EVENT_YEAR) -> None:
+    """Start a new epoch — every phone re-snapshots on its next catch-up."""
+    with _logs_lock:
+        _logs[event_year] = ChangeLog(event_year)
+
+
+def _drop_logs() -> None:
+    """A record may be missing — new epochs make every phone re-snapshot."""
+    with _logs_lock:
+        _logs.clear()
+
+
+register_view(_drop_logs)
+
+
+def last_recorded() -> Optional[dict]:
+    """The last change recorded by the calling thread (its own commit)."""
+    return getattr(_local, "last", None)
+
+
+# -----------------------------------------------------------------------------
+# Recorders — call from after_commit, after the order book has the write
+# -----------------------------------------------------------------------------
+
+def record_horse(event_year: int, kind: str, horse_id: int,
+                 bid_id: Optional[int] = None) -> dict:
+    """Record the horse's post-write leader/amount/scratch + the pot."""
+    book = order_book.get_book(event_year)
+    hb = book.high_bid(horse_id)
+    extra = {"bid_id": bid_id} if bid_id is not None else {}
+    return get_log(event_year).record(
+        kind,
+        **extra,
+        horse_id=horse_id,
+        leader_id=hb["bidder_id"] if hb else None,
+        leader_identity=hb["identity"] if hb else None,
+        amount=hb["amount"] if hb else None,
+        scratched=book.is_scratched(horse_id),
+        pot=book.total_pot(),
+    )
+
+
+def record_state(event_year: int, state: str) -> dict:
+    return get_log(event_year).record("state", state=state)
+
+
+def record_deadline(event_year: int, closes_at: Optional[str], **fields) -> dict:
+    """The close moved: armed/disarmed (deadlines) or pushed out by a bid."""
+    return get_log(event_year).record("deadline", closes_at=closes_at, **fields)
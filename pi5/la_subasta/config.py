@@ -47,6 +47,11 @@ AUCTION_OPEN_TIME = DEFAULTS["AUCTION_OPEN_TIME"]
 DERBY_POST_TIME = "17:57"              # Official Derby post (local time)
 LOCKDOWN_MINUTES_BEFORE_POST = DEFAULTS["LOCKDOWN_MINUTES_BEFORE_POST"]
 FINAL_HOUR_MINUTES = 15                # Last X min = urgency mode
+# Soft close: a bid in the last SOFT_CLOSE_SECONDS before the close pushes
+# the close out to bid time + SOFT_CLOSE_SECONDS (0 = hard close). Capped
+# at SOFT_CLOSE_MAX_EXTENSION_MINUTES past the planned close, and at post.
+SOFT_CLOSE_SECONDS = 0
+SOFT_CLOSE_MAX_EXTENSION_MINUTES = 10
 
 # -----------------------------------------------------------------------------
 # Bidding rules
@@ -0,0 +1,407 @@
+# la_subasta/deadlines.py - Timer-driven auction deadlines + soft close
+#
+# The auction day is fixed by the settings: OPEN at AUCTION_OPEN_TIME,
+# LOCKED at DERBY_POST_TIME - LOCKDOWN_MINUTES_BEFORE_POST, FINAL_HOUR the
+# FINAL_HOUR_MINUTES before that. arm() writes opens_at/closes_at to
+# auction_state and puts one timer per phase on a services.scheduler heap —
+# no polling; the scheduler thread sleeps until the next deadline. The
+# transitions themselves go through the blueprint's on_phase callback, so a
+# scheduled lock has the same side effects (ownership freeze, broadcasts) as
+# the admin button.
+#
+# The close is enforced in the bid write transaction, not by the timer:
+# bidding compares now() with closes_at (millisecond precision) while it
+# holds the write lock, so a bid can't slip in between the deadline and the
+# LOCKED transition. The LOCKED timer re-reads closes_at under the same lock
+# before it fires.
+#
+# Soft close (SOFT_CLOSE_SECONDS > 0): a bid accepted in the last N seconds
+# pushes closes_at out to bid time + N, never past the original close +
+# SOFT_CLOSE_MAX_EXTENSION_MINUTES nor past post time. The new close is
+# written in the bid's own transaction and recorded as a "deadline" change,
+# and the blueprint broadcasts auction_extended.
+#
+# Timestamps are stored UTC, 'YYYY-MM-DD HH:MM:SS.fff' — the datetime('now')
+# format with milliseconds.
+
+import calendar
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from la_subasta import changes, settings
+from la_subasta.config import (
+    DERBY_POST_TIME, EVENT_YEAR, FINAL_HOUR_MINUTES,
+    SOFT_CLOSE_MAX_EXTENSION_MINUTES, SOFT_CLOSE_SECONDS,
+)
+from la_subasta.models import after_commit, close_conn, holds_reader, write_txn
+from la_subasta.state_machine import (
+    AuctionState, _ensure_row, get_state_row, transition,
+)
+from services.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+# Settings the day plan is computed from — changing one re-plans an armed day
+PLAN_SETTINGS = frozenset({"AUCTION_OPEN_TIME", "LOCKDOWN_MINUTES_BEFORE_POST"})
+
+# Scheduled phases, in lifecycle order, with the plan key each fires at
+_PHASES = (
+    (AuctionState.OPEN, "opens_at"),
+    (AuctionState.FINAL_HOUR, "final_hour_at"),
+    (AuctionState.LOCKED, "closes_at"),
+)
+_ORDER = list(AuctionState)
+
+# A schedule can be (re)armed until the auction locks
+_ARMABLE = frozenset({AuctionState.NOT_STARTED, AuctionState.OPEN,
+                      AuctionState.FINAL_HOUR})
+
+
+# -----------------------------------------------------------------------------
+# Timestamps
+# -----------------------------------------------------------------------------
+
+def to_ts(t: float) -> str:
+    """Epoch seconds -> UTC 'YYYY-MM-DD HH:MM:SS.fff'."""
+    secs, ms = divmod(int(round(t * 1000)), 1000)
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(secs)) + f".{ms:03d}"
+
+
+def parse_ts(value: str) -> float:
+    """UTC 'YYYY-MM-DD HH:MM:SS[.fff]' -> epoch seconds."""
+    head, _, frac = value.replace("T", " ").partition(".")
+    secs = calendar.timegm(time.strptime(head, "%Y-%m-%d %H:%M:%S"))
+    return secs + (float("0." + frac) if frac else 0.0)
+
+
+def local_epoch(date: str, hhmm: str) -> float:
+    """Local wall time `hhmm` on `date` (YYYY-MM-DD) -> epoch seconds."""
+    year, month, day = (int(p) for p in date.split("-"))
+    hours, minutes = (int(p) for p in hhmm.split(":"))
+    return time.mktime((year, month, day, hours, minutes, 0, 0, 0, -1))
+
+
+def _check_date(date: str) -> str:
+    try:
+        time.strptime(date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError("date must be YYYY-MM-DD")
+    return date
+
+
+# -----------------------------------------------------------------------------
+# Engine
+# -----------------------------------------------------------------------------
+
+class DeadlineEngine:
+    """
+    Schedules the day's OPEN / FINAL_HOUR / LOCKED transitions.
+
+    Args:
+        scheduler: Timer heap to run on (default: its own, on the system
+            clock). Pass one on a VirtualClock to drive the day in tests.
+        on_phase: Called with the AuctionState when its deadline passes.
+            Defaults to a bare state_machine.transition().
+        event_year: Event year whose auction_state row is scheduled.
+        soft_close_seconds: Soft-close window; 0 = hard close.
+        soft_close_max_extension_s: Most the close can be pushed out, in total.
+    """
+
+    def __init__(self, scheduler: Optional[Scheduler] = None,
+                 on_phase: Optional[Callable[[AuctionState], None]] = None,
+                 event_year: int = EVENT_YEAR,
+                 soft_close_seconds: int = SOFT_CLOSE_SECONDS,
+                 soft_close_max_extension_s: float = SOFT_CLOSE_MAX_EXTENSION_MINUTES * 60):
+        self.scheduler = scheduler if scheduler is not None else Scheduler(name="AuctionDeadlines")
+        self.on_phase = on_phase
+        self.event_year = event_year
+        self.soft_close_seconds = int(soft_close_seconds)
+        self.soft_close_max_extension_s = float(soft_close_max_extension_s)
+
+        self._lock = threading.Lock()
+        self._timers: Dict[AuctionState, object] = {}
+        self._plan: Optional[dict] = None
+        # opens_at as written by arm(): a row without it was reset or
+        # re-armed elsewhere, and this plan's timers no longer apply
+        self._armed_opens_at: Optional[str] = None
+        self._cap: Optional[float] = None
+
+        # Monitoring
+        self.fired = 0
+        self.extensions = 0
+
+    def now(self) -> float:
+        return self.scheduler.now()
+
+    @property
+    def armed_date(self) -> Optional[str]:
+        """The local date whose deadlines are scheduled, or None."""
+        plan = self._plan
+        return plan["date"] if plan else None
+
+    # -----------------------------------------------------------------
+    # Planning
+    # -----------------------------------------------------------------
+
+    def plan(self, date: Optional[str] = None) -> dict:
+        """The day's phase deadlines (epoch seconds) from the current settings."""
+        if date is None:
+            date = time.strftime("%Y-%m-%d", time.localtime(self.now()))
+        rules = settings.current()
+        opens = local_epoch(_check_date(date), rules["AUCTION_OPEN_TIME"])
+        post = local_epoch(date, DERBY_POST_TIME)
+        closes = post - rules["LOCKDOWN_MINUTES_BEFORE_POST"] * 60
+        if closes <= opens:
+            raise ValueError("Auction opens after lockdown — check AUCTION_OPEN_TIME")
+        return {
+            "date": date,
+            "opens_at": opens,
+            "final_hour_at": max(opens, closes - FINAL_HOUR_MINUTES * 60),
+            "closes_at": closes,
+            "post_at": post,
+        }
+
+    def arm(self, date: Optional[str] = None,
+            soft_close_seconds: Optional[int] = None) -> dict:
+        """Write the day's opens_at/closes_at and schedule its transitions.
+        Deadlines already behind us fire straight away, in order.
+
+        soft_close_seconds holds for this process; after a restart the
+        resumed day uses SOFT_CLOSE_SECONDS again."""
+        if soft_close_seconds is not None:
+            if int(soft_close_seconds) < 0:
+                raise ValueError("soft_close_seconds must be >= 0")
+            self.soft_close_seconds = int(soft_close_seconds)
+        plan = self.plan(date)
+        opens_at, closes_at = to_ts(plan["opens_at"]), to_ts(plan["closes_at"])
+        year = self.event_year
+        with write_txn() as conn:
+            _ensure_row(conn, year)
+            state = AuctionState(conn.execute(
+                "SELECT state FROM auction_state WHERE event_year = ?", (year,),
+            ).fetchone()["state"])
+            if state not in _ARMABLE:
+                raise ValueError(f"Cannot schedule the auction while it is {state.value}")
+            conn.execute(
+                "UPDATE auction_state SET opens_at = ?, closes_at = ?, "
+                "updated_at = datetime('now') WHERE event_year = ?",
+                (opens_at, closes_at, year),
+            )
+            after_commit(lambda: changes.record_deadline(
+                year, closes_at, opens_at=opens_at))
+        self._install(plan, opens_at, plan["closes_at"])
+        logger.info("Auction deadlines armed for %s: opens %s, closes %s (UTC)",
+                    plan["date"], opens_at, closes_at)
+        return self.status()
+
+    def resume(self) -> bool:
+        """Re-schedule a day armed before a restart. False if there is none."""
+        row = get_state_row(self.event_year)
+        if (not row["opens_at"] or not row["closes_at"]
+                or AuctionState(row["state"]) not in _ARMABLE):
+            self._uninstall()
+            return False
+        try:
+            opens = parse_ts(row["opens_at"])
+            plan = self.plan(time.strftime("%Y-%m-%d", time.localtime(opens)))
+        except ValueError:
+            logger.exception("Saved auction schedule unusable — not resumed")
+            self._uninstall()
+            return False
+        plan["opens_at"] = opens
+        self._install(plan, row["opens_at"], parse_ts(row["closes_at"]))
+        return True
+
+    def disarm(self, clear: bool = True) -> None:
+        """Cancel the timers; with clear, also drop opens_at/closes_at
+        (unless the auction already locked — then they are history)."""
+        self._uninstall()
+        if not clear:
+            return
+        year = self.event_year
+        with write_txn() as conn:
+            cur = conn.execute(
+                "UPDATE auction_state SET opens_at = NULL, closes_at = NULL, "
+                "updated_at = datetime('now') WHERE event_year = ? "
+                "AND state IN (?, ?, ?)",
+                (year, *(s.value for s in _ARMABLE)),
+            )
+            if cur.rowcount:
+                after_commit(lambda: changes.record_deadline(year, None, opens_at=None))
+
+    def _install(self, plan: dict, opens_at: str, lock_at: float) -> None:
+        with self._lock:
+            for timer in self._timers.values():
+                self.scheduler.cancel(timer)
+            self._plan = plan
+            self._armed_opens_at = opens_at
+            self._cap = min(plan["closes_at"] + self.soft_close_max_extension_s,
+                            plan["post_at"])
+            self._timers = {}
+            for phase, key in _PHASES:
+                at = lock_at if phase is AuctionState.LOCKED else plan[key]
+                self._timers[phase] = self.scheduler.call_at(at, self._fire, phase, opens_at)
+
+    def _uninstall(self) -> None:
+        with self._lock:
+            for timer in self._timers.values():
+                self.scheduler.cancel(timer)
+            self._timers = {}
+            self._plan = None
+            self._armed_opens_at = None
+            self._cap = None
+
+    # -----------------------------------------------------------------
+    # Timers
+    # -----------------------------------------------------------------
+
+    def _fire(self, phase: AuctionState, opens_at: str) -> None:
+        held = holds_reader()
+        try:
+            with self._lock:
+                if opens_at != self._armed_opens_at:
+                    return
+                self._timers.pop(phase, None)
+            # Read under the write lock: a bid mid-transaction may be
+            # extending the close right now
+            with write_txn() as conn:
+                row = conn.execute(
+                    "SELECT state, opens_at, closes_at FROM auction_state "
+                    "WHERE event_year = ?", (self.event_year,),
+                ).fetchone()
+            if row is None or row["opens_at"] != opens_at:
+                return                      # reset or re-armed since
+            if phase is AuctionState.LOCKED and row["closes_at"]:
+                closes = parse_ts(row["closes_at"])
+                if self.now() < closes:     # soft close moved it out
+                    self._reschedule_lock(closes, opens_at)
+                    return
+            if _ORDER.index(AuctionState(row["state"])) >= _ORDER.index(phase):
+                return                      # admin got there first
+            if self.on_phase is not None:
+                self.on_phase(phase)
+            else:
+                transition(phase, self.event_year)
+            self.fired += 1
+            logger.info("Auction deadline reached: %s", phase.value)
+        except Exception:
+            logger.exception("Auction deadline %s failed", phase.value)
+        finally:
+            if not held:
+                close_conn()
+
+    def _reschedule_lock(self, closes: float, opens_at: str) -> None:
+        with self._lock:
+            if opens_at != self._armed_opens_at:
+                return
+            self.scheduler.cancel(self._timers.get(AuctionState.LOCKED))
+            self._timers[AuctionState.LOCKED] = self.scheduler.call_at(
+                closes, self._fire, AuctionState.LOCKED, opens_at)
+
+    # -----------------------------------------------------------------
+    # Soft close
+    # -----------------------------------------------------------------
+
+    def soft_close(self, now: float, closes: float) -> Optional[float]:
+        """New close for a bid accepted at `now`, or None if it doesn't move."""
+        window = self.soft_close_seconds
+        cap = self._cap
+        if window <= 0 or cap is None or closes - now >= window:
+            return None
+        new_close = min(now + window, cap)
+        return new_close if new_close > closes else None
+
+    def extended(self, closes_at: str) -> None:
+        """A committed bid moved the close: move the LOCKED timer with it."""
+        self.extensions += 1
+        opens_at = self._armed_opens_at
+        if opens_at is not None:
+            self._reschedule_lock(parse_ts(closes_at), opens_at)
+
+    # -----------------------------------------------------------------
+    # Monitoring
+    # -----------------------------------------------------------------
+
+    def status(self) -> dict:
+        row = get_state_row(self.event_year)
+        plan = self._plan
+        with self._lock:
+            pending = {phase.value: to_ts(timer.deadline)
+                       for phase, timer in self._timers.items() if not timer.cancelled}
+        return {
+            "armed": plan is not None,
+            "date": plan["date"] if plan else None,
+            "opens_at": row["opens_at"],
+            "final_hour_at": to_ts(plan["final_hour_at"]) if plan else None,
+            "closes_at": row["closes_at"],
+            "post_at": to_ts(plan["post_at"]) if plan else None,
+            "soft_close_seconds": self.soft_close_seconds,
+            "extension_cap_at": to_ts(self._cap) if self._cap is not None else None,
+            "pending": pending,
+            "fired": self.fired,
+            "extensions": self.extensions,
+            "now": to_ts(self.now()),
+            "scheduler": self.scheduler.stats(),
+        }
+
+
+# -----------------------------------------------------------------------------
+# Process-wide engine — started by init_la_subasta()
+# -----------------------------------------------------------------------------
+
+_engine: Optional[DeadlineEngine] = None
+
+
+def start_engine(on_phase: Optional[Callable[[AuctionState], None]] = None,
+                 **kwargs) -> DeadlineEngine:
+    """Create (once) the shared engine and pick up a day armed before a
+    restart. Safe to call repeatedly."""
+    global _engine
+    if _engine is None:
+        _engine = DeadlineEngine(on_phase=on_phase, **kwargs)
+    elif on_phase is not None:
+        _engine.on_phase = on_phase
+    _engine.resume()
+    return _engine
+
+
+def stop_engine() -> None:
+    global _engine
+    if _engine is not None:
+        _engine._uninstall()
+        _engine.scheduler.stop()
+        _engine = None
+
+
+def get_engine() -> Optional[DeadlineEngine]:
+    return _engine
+
+
+def now() -> float:
+    """Deadline time: the engine's clock, else the wall clock."""
+    engine = _engine
+    return engine.now() if engine is not None else time.time()
+
+
+# -----------------------------------------------------------------------------
+# Bid path — called by bidding inside its write transaction
+# -----------------------------------------------------------------------------
+
+def soft_close(now_s: float, closes_at: Optional[str]) -> Optional[str]:
+    """closes_at to write for a bid accepted at `now_s`, or None."""
+    engine = _engine
+    if engine is None or closes_at is None:
+        return None
+    new_close = engine.soft_close(now_s, parse_ts(closes_at))
+    return to_ts(new_close) if new_close is not None else None
+
+
+def extended(event_year: int, closes_at: str, bid_id: int) -> dict:
+    """After the extending bid commits: record the change, move the timer."""
+    change = changes.record_deadline(event_year, closes_at, bid_id=bid_id)
+    engine = _engine
+    if engine is not None and engine.event_year == event_year:
+        engine.extended(closes_at)
+    return change
@@ -0,0 +1,324 @@
+# la_subasta/history.py - Per-year database files + ATTACH-based history
+#
+# Storage is partitioned by event year (see models.year_db_path):
+#
+#   data/la_subasta.db        the CURRENT year — everything the live auction
+#                             reads and writes; stays small however many
+#                             Derbies have been run
+#   data/la_subasta.2025.db   one file per past year, written once by
+#                             split_years() and attached read-only after
+#
+# History never touches the hot connections: each query opens its own
+# connection, ATTACHes the current file and the archives read-only (as
+# "cur" / "y2025" ...) and UNIONs across them.
+#
+# split_years() is also the migration tool for a combined DB that still
+# mixes years by event_year. Run it with the server stopped:
+#
+#   python -m la_subasta.history --split [--db PATH] [--dry-run]
+#   python -m la_subasta.history              # per-year summaries
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Make sure pi5/ is on sys.path when run directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from la_subasta import config as la_config, registration  # noqa: E402
+from la_subasta.models import (  # noqa: E402
+    SCHEMA_SQL, _db_path, _ro_uri, archived_years, year_db_path,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-year tables, in copy order (bidders first for the FKs)
+YEAR_TABLES = ("bidders", "bids", "ownership", "payouts", "bidder_statements",
+               "auction_state", "horse_state")
+
+# SQLite's default SQLITE_MAX_ATTACHED is 10; "cur" takes one slot
+MAX_ATTACHED_ARCHIVES = 9
+
+
+@contextmanager
+def history_conn(path: Optional[str] = None):
+    """
+    A private read-only connection with the current DB attached as "cur" and
+    each archive as "y<year>". Yields (conn, {year: schema}) for the archives.
+    Only the newest MAX_ATTACHED_ARCHIVES archives fit.
+    """
+    path = path or _db_path()
+    conn = sqlite3.connect(":memory:", uri=True)
+    conn.row_factory = sqlite3.Row
+    schemas: Dict[int, str] = {}
+    try:
+        conn.execute("ATTACH DATABASE ? AS cur", (_ro_uri(path),))
+        years = archived_years(path)
+        if len(years) > MAX_ATTACHED_ARCHIVES:
+            logger.warning("Only the newest %d of %d archived years are attached",
+                           MAX_ATTACHED_ARCHIVES, len(years))
+            years = years[-MAX_ATTACHED_ARCHIVES:]
+        for year in years:
+            schema = f"y{year}"
+            conn.execute(f"ATTACH DATABASE ? AS {schema}",
+                         (_ro_uri(year_db_path(year, path)),))
+            schemas[year] = schema
+        yield conn, schemas
+    finally:
+        conn.close()
+
+
+# -----------------------------------------------------------------------------
+# Summaries (event_years rows)
+# -----------------------------------------------------------------------------
+
+_SUMMARY_SQL = """
+SELECT
+  :year AS year,
+  (SELECT substr(updated_at, 1, 10) FROM {s}.auction_state
+    WHERE event_year = :year) AS derby_date,
+  COALESCE(
+    (SELECT SUM(winning_bid) FROM {s}.ownership WHERE event_year = :year),
+    (SELECT SUM(top) FROM (SELECT MAX(amount) AS top FROM {s}.bids
+                            WHERE event_year = :year AND voided = 0
+                            GROUP BY horse_id)),
+    0) AS total_pot,
+  (SELECT COUNT(*) FROM {s}.bidders
+    WHERE event_year = :year AND identity != :house) AS num_bidders,
+  (SELECT '#' || horse_id FROM {s}.payouts
+    WHERE event_year = :year AND finish = 'win') AS winner_horse_name,
+  (SELECT d.identity FROM {s}.payouts p JOIN {s}.bidders d ON d.id = p.bidder_id
+    WHERE p.event_year = :year AND p.finish = 'win') AS winner_owner,
+  (SELECT d.identity FROM {s}.ownership o JOIN {s}.bidders d ON d.id = o.bidder_id
+    WHERE o.event_year = :year AND d.identity != :house
+    GROUP BY o.bidder_id ORDER BY SUM(o.winning_bid) DESC, o.bidder_id
+    LIMIT 1) AS biggest_spender
+"""
+
+_SUMMARY_COLUMNS = ("year", "derby_date", "total_pot", "num_bidders",
+                    "winner_horse_name", "winner_owner", "biggest_spender")
+
+
+def summarize_year(conn: sqlite3.Connection, year: int, schema: str = "main") -> dict:
+    """Compute a year's event_years row from its tables in `schema`."""
+    row = conn.execute(_SUMMARY_SQL.format(s=schema),
+                       {"year": year, "house": la_config.HOUSE_BIDDER_IDENTITY}).fetchone()
+    return dict(zip(_SUMMARY_COLUMNS, tuple(row)))
+
+
+def _years_in(conn: sqlite3.Connection, schema: str) -> List[int]:
+    """Years with any auction data in `schema`. The House row doesn't count:
+    it is created once and carried over."""
+    return sorted({r[0] for r in conn.execute(
+        f"SELECT event_year FROM {schema}.auction_state UNION "
+        f"SELECT event_year FROM {schema}.bids UNION "
+        f"SELECT event_year FROM {schema}.bidders WHERE identity != ?",
+        (la_config.HOUSE_BIDDER_IDENTITY,))})
+
+
+def event_years(path: Optional[str] = None) -> List[dict]:
+    """One summary per year: archives (stored row, else computed) + whatever
+    years the current file holds."""
+    summaries: Dict[int, dict] = {}
+    with history_conn(path) as (conn, schemas):
+        for year, schema in schemas.items():
+            stored = conn.execute(
+                f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM {schema}.event_years "
+                "WHERE year = ?", (year,)).fetchone()
+            summaries[year] = dict(stored) if stored else summarize_year(conn, year, schema)
+            summaries[year]["source"] = "archive"
+        for year in _years_in(conn, "cur"):
+            if year not in summaries:
+                summaries[year] = {**summarize_year(conn, year, "cur"), "source": "current"}
+    return [summaries[y] for y in sorted(summaries)]
+
+
+def year_over_year(path: Optional[str] = None) -> List[dict]:
+    """Pot and turnout per year vs. the year before, plus returning bidders
+    (same name + emoji identity) — a join across the attached year files."""
+    years = event_years(path)
+    with history_conn(path) as (conn, schemas):
+        # Each year's identities from wherever that year lives
+        parts, params = [], []
+        for summary in years:
+            schema = schemas.get(summary["year"], "cur")
+            parts.append(f"SELECT identity, ? AS year FROM {schema}.bidders "
+                         "WHERE event_year = ? AND identity != ?")
+            params += [summary["year"], summary["year"], la_config.HOUSE_BIDDER_IDENTITY]
+        seen: Dict[str, set] = {}
+        if parts:
+            for row in conn.execute(" UNION ALL ".join(parts), params):
+                seen.setdefault(row["identity"], set()).add(row["year"])
+
+    rows = []
+    previous = None
+    for summary in years:
+        year = summary["year"]
+        entry = {
+            "year": year,
+            "total_pot": summary["total_pot"],
+            "num_bidders": summary["num_bidders"],
+            "pot_change": None,
+            "bidder_change": None,
+            "returning_bidders": 0,
+        }
+        if previous is not None:
+            entry["pot_change"] = round((summary["total_pot"] or 0) - (previous["total_pot"] or 0), 2)
+            entry["bidder_change"] = (summary["num_bidders"] or 0) - (previous["num_bidders"] or 0)
+            entry["returning_bidders"] = sum(
+                1 for ys in seen.values() if year in ys and any(y < year for y in ys))
+        rows.append(entry)
+        previous = summary
+    return rows
+
+
+# -----------------------------------------------------------------------------
+# Migration: combined DB -> one file per past year
+# -----------------------------------------------------------------------------
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _year_filter(table: str) -> str:
+    if table == "bidders":
+        # The year's own bidders plus any older row its bids/payouts point at
+        # (the House is created once and reused across years)
+        return ("event_year = :year OR id IN ("
+                "SELECT bidder_id FROM main.bids WHERE event_year = :year UNION "
+                "SELECT bidder_id FROM main.ownership WHERE event_year = :year UNION "
+                "SELECT bidder_id FROM main.payouts WHERE event_year = :year)")
+    return "event_year = :year"
+
+
+def split_years(path: Optional[str] = None, keep_year: int = None,
+                dry_run: bool = False) -> List[dict]:
+    """
+    Move every year except `keep_year` (default: EVENT_YEAR) out of the
+    combined DB at `path` into its own year_db_path() file, with its
+    event_years summary row. Each year is copied, verified and deleted in
+    one transaction; the combined file is VACUUMed at the end.
+    Refuses to overwrite an existing archive.
+    """
+    path = path or _db_path()
+    keep_year = la_config.EVENT_YEAR if keep_year is None else keep_year
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    report = []
+    try:
+        years = [y for y in _years_in(conn, "main") if y != keep_year]
+        # A file last opened by an older build may lack newer tables
+        tables = [t for t in YEAR_TABLES if _columns(conn, "main", t)]
+        for year in years:
+            dest = year_db_path(year, path)
+            params = {"year": year, "house": la_config.HOUSE_BIDDER_IDENTITY}
+            counts = {t: conn.execute(f"SELECT COUNT(*) FROM main.{t} WHERE {_year_filter(t)}",
+                                      params).fetchone()[0] for t in tables}
+            entry = {"year": year, "path": dest, "rows": counts}
+            report.append(entry)
+            if dry_run:
+                continue
+            if os.path.exists(dest):
+                raise FileExistsError(f"{dest} already exists — year {year} was split before")
+
+            init = sqlite3.connect(dest)
+            init.executescript(SCHEMA_SQL)
+            init.close()
+
+            conn.execute("ATTACH DATABASE ? AS dst", (dest,))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for table in tables:
+                        cols = [c for c in _columns(conn, "main", table)
+                                if c in set(_columns(conn, "dst", table))]
+                        col_list = ", ".join(cols)
+                        conn.execute(
+                            f"INSERT INTO dst.{table} ({col_list}) SELECT {col_list} "
+                            f"FROM main.{table} WHERE {_year_filter(table)}", params)
+                        copied = conn.execute(f"SELECT COUNT(*) FROM dst.{table}").fetchone()[0]
+                        if copied != counts[table]:
+                            raise RuntimeError(f"{table} {year}: copied {copied} of {counts[table]}")
+                    summary = summarize_year(conn, year, "dst")
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO dst.event_years ({', '.join(_SUMMARY_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' for _ in _SUMMARY_COLUMNS)})",
+                        [summary[c] for c in _SUMMARY_COLUMNS])
+                    entry["summary"] = summary
+
+                    for table in tables[1:]:
+                        conn.execute(f"DELETE FROM main.{table} WHERE event_year = :year", params)
+                    # Bidders still referenced by the remaining years stay
+                    conn.execute(
+                        "DELETE FROM main.bidders WHERE event_year = :year "
+                        "AND identity != :house "
+                        "AND id NOT IN (SELECT bidder_id FROM main.bids UNION "
+                        "SELECT bidder_id FROM main.ownership UNION "
+                        "SELECT bidder_id FROM main.payouts)", params)
+                    conn.execute("DELETE FROM main.event_years WHERE year = :year", params)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE dst")
+            logger.info("Year %d moved to %s (%s)", year, dest, counts)
+        if report and not dry_run:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    if report and not dry_run:
+        # Archived names are free again; an in-process identity index
+        # still lists them (it only follows commits made through models)
+        registration.invalidate()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="La Subasta per-year history")
+    parser.add_argument("--db", default=None, help="current-year DB (default: config.DB_PATH)")
+    parser.add_argument("--split", action="store_true",
+                        help="move past years out of the DB into per-year files")
+    parser.add_argument("--keep", type=int, default=None,
+                        help="year that stays in the DB (default: config.EVENT_YEAR)")
+    parser.add_argument("--dry-run", action="store_true", help="with --split: only report")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    path = args.db or _db_path()
+    if not os.path.exists(path):
+        print(f"No database at {path}")
+        return 1
+
+    if args.split:
+        report = split_years(path, args.keep, args.dry_run)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        elif not report:
+            print("Nothing to split — the DB holds only the current year.")
+        for entry in report if not args.json else ():
+            verb = "would move" if args.dry_run else "moved"
+            rows = ", ".join(f"{t} {n}" for t, n in entry["rows"].items())
+            print(f"{entry['year']}: {verb} to {entry['path']} ({rows})")
+        return 0
+
+    report = {"years": event_years(path), "year_over_year": year_over_year(path)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{'year':>4} {'source':>8} {'pot':>8} {'bidders':>7} {'returning':>9}  winner")
+    yoy = {r["year"]: r for r in report["year_over_year"]}
+    for y in report["years"]:
+        print(f"{y['year']:>4} {y['source']:>8} {y['total_pot'] or 0:>8g} "
+              f"{y['num_bidders'] or 0:>7} {yoy[y['year']]['returning_bidders']:>9}  "
+              f"{y['winner_owner'] or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+# la_subasta/loadtest.py - Concurrent HTTP load test for the La Subasta API
+#
+# Run with: python -m la_subasta.loadtest [--url http://pi5.local:5000]
+#                                         [--clients 10,50,100,300] [--seconds N]
+#                                         [--out results.json] [--compare old.json]
+#           (from pi5/)
+#
+# Without --url the harness serves the La Subasta blueprint itself on a
+# threaded werkzeug server (127.0.0.1, ephemeral port, throwaway database),
+# so every request goes over a real socket. With --url it drives a running
+# instance; pass --reset to let it wipe that instance's auction between
+# levels (admin reset, scope=full), otherwise the auction must already be
+# OPEN there.
+#
+# Each client is a closed loop over one keep-alive connection: register,
+# then a weighted mix of
+#
+#   horses 35%  state 30%  bid 20%  portfolio 10%  undo 3%  register 2%
+#
+# Per level the report has p50/p95/p99 per endpoint, errors (5xx, timeouts,
+# connection failures — a rejected bid's 400 is not an error), SQLITE_BUSY
+# ("database is locked") failures and accepted bids per second. --out
+# writes it as JSON; --compare prints deltas against an earlier file so runs
+# can be compared across commits.
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from la_subasta import config as la_config  # noqa: E402
+
+CLIENT_COUNTS = (10, 50, 100, 300)
+DEFAULT_SECONDS = 10.0
+REQUEST_TIMEOUT_S = 10.0
+PREFIX = "/la-subasta"
+
+MIX = (
+    ("horses", 35),
+    ("state", 30),
+    ("bid", 20),
+    ("portfolio", 10),
+    ("undo", 3),
+    ("register", 2),
+)
+
+_BUSY_MARKERS = ("database is locked", "SQLITE_BUSY", "database table is locked")
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+# -----------------------------------------------------------------------------
+# Self-served target
+# -----------------------------------------------------------------------------
+
+class _BusyCounter(logging.Handler):
+    """Counts request exceptions that were SQLite lock contention."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        exc = record.exc_info[1] if record.exc_info else None
+        if exc is not None and any(m in str(exc) for m in _BUSY_MARKERS):
+            self.count += 1
+
+
+class LocalServer:
+    """The La Subasta blueprint on a threaded werkzeug server."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        from flask import Flask
+        from werkzeug.serving import make_server
+        from la_subasta import init_la_subasta, la_subasta_bp
+
+        self._temp = db_path is None
+        la_config.DB_PATH = db_path or tempfile.mktemp(prefix="la_subasta_load_", suffix=".db")
+        app = Flask(__name__)
+        init_la_subasta(socketio=None, racing_service=None)
+        app.register_blueprint(la_subasta_bp)
+        self.busy = _BusyCounter()
+        app.logger.addHandler(self.busy)
+
+        # Per-request access lines would swamp the report
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        self._server = make_server("127.0.0.1", 0, app, threaded=True)
+        # Serve the large client counts without refusing connections
+        self._server.socket.listen(1024)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="LoadTestServer", daemon=True)
+
+    def start(self) -> "LocalServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._thread.join(timeout=5.0)
+        if self._temp:
+            from la_subasta.models import close_pool
+            close_pool()
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(la_config.DB_PATH + suffix)
+                except OSError:
+                    pass
+
+
+# -----------------------------------------------------------------------------
+# Client
+# -----------------------------------------------------------------------------
+
+class _Client:
+    """One simulated phone: a keep-alive connection and its own bidder."""
+
+    def __init__(self, url: str, name: str, rng: random.Random):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.name = name
+        self.rng = rng
+        self.conn: Optional[http.client.HTTPConnection] = None
+        self.bidder_id: Optional[int] = None
+        self.last_bid = None                # (bid_id, placed_at)
+        self.registrations = 0
+
+    def request(self, method: str, path: str, body: Optional[dict] = None):
+        """Returns (status, parsed JSON or raw text). Raises on transport errors."""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port,
+                                                   timeout=REQUEST_TIMEOUT_S)
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, PREFIX + path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+            raw = resp.read()
+        except Exception:
+            self.close()
+            raise
+        if resp.getheader("Connection", "").lower() == "close" or resp.version == 10:
+            self.close()
+        try:
+            return resp.status, json.loads(raw)
+        except ValueError:
+            return resp.status, raw.decode("utf-8", "replace")
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def register(self):
+        self.registrations += 1
+        emoji = la_config.EMOJI_PALETTE[self.rng.randrange(len(la_config.EMOJI_PALETTE))]
+        status, data = self.request("POST", "/api/register", {
+            "name": f"{self.name}.{self.registrations}", "emoji": emoji,
+        })
+        if status == 200:
+            self.bidder_id = data["bidder"]["id"]
+        return status, data
+
+
+# -----------------------------------------------------------------------------
+# Level runner
+# -----------------------------------------------------------------------------
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.error_samples: List[str] = []
+        self.busy = 0
+        self.bids_accepted = 0
+        self.bids_rejected = 0
+        self.undos = 0
+
+    def record(self, op, elapsed, status, data):
+        with self.lock:
+            self.latency[op].append(elapsed)
+            if status is None or status >= 500:
+                self.errors[op] += 1
+                text = data if isinstance(data, str) else json.dumps(data)
+                if any(m in text for m in _BUSY_MARKERS):
+                    self.busy += 1
+                if len(self.error_samples) < 10:
+                    self.error_samples.append(f"{op}: {status} {text[:120]}")
+            elif op == "bid":
+                if status == 200:
+                    self.bids_accepted += 1
+                else:
+                    self.bids_rejected += 1
+            elif op == "undo" and status == 200:
+                self.undos += 1
+
+
+def _step(client: _Client, op: str, stats: _Stats) -> None:
+    rng = client.rng
+    if op == "bid" and client.bidder_id is not None:
+        horse = rng.randint(1, la_config.NUM_HORSES)
+        # Bid off the horse's current price, like the guest UI does
+        t0 = time.perf_counter()
+        status, data = client.request("GET", "/api/horses")
+        stats.record("horses", time.perf_counter() - t0, status, data)
+        hb = None
+        if status == 200:
+            hb = data["horses"][horse - 1]["current_high_bid"]
+        amount = (hb["amount"] if hb else 0) + rng.randint(1, 3)
+        call = ("POST", "/api/bid",
+                {"bidder_id": client.bidder_id, "horse_id": horse, "amount": amount})
+    elif op == "undo" and client.last_bid and time.monotonic() - client.last_bid[1] < 8:
+        call = ("POST", "/api/bid/undo",
+                {"bid_id": client.last_bid[0], "bidder_id": client.bidder_id})
+        client.last_bid = None
+    elif op == "portfolio" and client.bidder_id is not None:
+        call = ("GET", f"/api/bidders/{client.bidder_id}/portfolio")
+    elif op == "register":
+        t0 = time.perf_counter()
+        status, data = client.register()
+        stats.record(op, time.perf_counter() - t0, status, data)
+        return
+    elif op == "state":
+        call = ("GET", "/api/state")
+    else:
+        op, call = "horses", ("GET", "/api/horses")
+
+    t0 = time.perf_counter()
+    try:
+        status, data = client.request(*call)
+    except Exception as exc:
+        stats.record(op, time.perf_counter() - t0, None, f"{type(exc).__name__}: {exc}")
+        return
+    stats.record(op, time.perf_counter() - t0, status, data)
+    if op == "bid" and status == 200:
+        client.last_bid = (data["bid"]["bid_id"], time.monotonic())
+
+
+def run_level(url: str, clients: int, seconds: float, seed: int = 0) -> dict:
+    """Run `clients` closed-loop clients for `seconds`. Returns the level report."""
+    ops = [name for name, _ in MIX]
+    weights = [w for _, w in MIX]
+    stats = _Stats()
+    start_gate = threading.Event()
+    ready = threading.Barrier(clients + 1)
+
+    def worker(idx):
+        rng = random.Random(seed * 100003 + idx)
+        client = _Client(url, f"Load {clients}-{idx}", rng)
+        try:
+            try:
+                client.register()
+            except Exception as exc:
+                stats.record("register", 0.0, None, str(exc))
+            ready.wait()
+            start_gate.wait()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                try:
+                    _step(client, rng.choices(ops, weights)[0], stats)
+                except Exception as exc:
+                    stats.record("client", 0.0, None, f"{type(exc).__name__}: {exc}")
+        finally:
+            client.close()
+
+    pool = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    for t in pool:
+        t.start()
+    ready.wait()
+    # Measured window starts once every client is registered and connected
+    stats.latency.clear()
+    stats.errors.clear()
+    stats.busy = stats.bids_accepted = stats.bids_rejected = stats.undos = 0
+    t_start = time.perf_counter()
+    start_gate.set()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+
+    endpoints = {}
+    total = 0
+    for op, values in sorted(stats.latency.items()):
+        values.sort()
+        total += len(values)
+        endpoints[op] = {
+            "count": len(values),
+            "errors": stats.errors.get(op, 0),
+            "p50_ms": round(_percentile(values, 50) * 1000.0, 2),
+            "p95_ms": round(_percentile(values, 95) * 1000.0, 2),
+            "p99_ms": round(_percentile(values, 99) * 1000.0, 2),
+        }
+    every = sorted(v for values in stats.latency.values() for v in values)
+    return {
+        "clients": clients,
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "requests_per_s": round(total / elapsed, 1) if elapsed else 0.0,
+        "errors": sum(stats.errors.values()),
+        "sqlite_busy": stats.busy,
+        "bids_accepted_per_s": round(stats.bids_accepted / elapsed, 1) if elapsed else 0.0,
+        "bids_rejected": stats.bids_rejected,
+        "undos": stats.undos,
+        "p50_ms": round(_percentile(every, 50) * 1000.0, 2),
+        "p95_ms": round(_percentile(every, 95) * 1000.0, 2),
+        "p99_ms": round(_percentile(every, 99) * 1000.0, 2),
+        "endpoints": endpoints,
+        "error_samples": stats.error_samples,
+    }
+
+
+def _prepare(url: str, reset: bool) -> None:
+    """Fresh OPEN auction on the target (reset) or check it's already OPEN."""
+    admin = _Client(url, "admin", random.Random(0))
+    try:
+        if reset:
+            status, data = admin.request("POST", "/api/admin/reset?confirm=TESTING&scope=full")
+            if status != 200:
+                raise RuntimeError(f"reset failed: {data}")
+            status, data = admin.request("POST", "/api/admin/start")
+            if status != 200:
+                raise RuntimeError(f"could not open the auction: {data}")
+        else:
+            status, data = admin.request("GET", "/api/state")
+            if status != 200 or data.get("state") not in ("OPEN", "FINAL_HOUR"):
+                raise RuntimeError(
+                    f"auction on {url} is {data.get('state') if status == 200 else status}; "
+                    "open it first or pass --reset")
+    finally:
+        admin.close()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(url: Optional[str] = None, client_counts=CLIENT_COUNTS,
+        seconds: float = DEFAULT_SECONDS, reset: bool = False, seed: int = 0) -> dict:
+    """Run every level. Without `url`, serves a local instance for the run."""
+    server = None
+    if url is None:
+        server = LocalServer().start()
+        url, reset = server.url, True
+    try:
+        levels = []
+        for clients in client_counts:
+            _prepare(url, reset)
+            busy_before = server.busy.count if server else 0
+            level = run_level(url, clients, seconds, seed)
+            if server is not None:
+                # Server-side count also sees locks the error pages hide
+                level["sqlite_busy"] = max(level["sqlite_busy"],
+                                           server.busy.count - busy_before)
+            levels.append(level)
+    finally:
+        if server is not None:
+            server.stop()
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target": "local" if server is not None else url,
+            "seconds_per_level": seconds,
+            "mix": dict(MIX),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "levels": levels,
+    }
+
+
+def compare(old: dict, new: dict) -> List[str]:
+    """One line per client level present in both reports."""
+    before = {lv["clients"]: lv for lv in old.get("levels", [])}
+    lines = []
+    for lv in new.get("levels", []):
+        prev = before.get(lv["clients"])
+        if prev is None:
+            continue
+
+        def pct(key):
+            if not prev[key]:
+                return "n/a"
+            return f"{(lv[key] - prev[key]) / prev[key] * 100.0:+.1f}%"
+
+        lines.append(
+            f"{lv['clients']:>5} clients  req/s {pct('requests_per_s'):>7}  "
+            f"bids/s {pct('bids_accepted_per_s'):>7}  p99 {pct('p99_ms'):>7}  "
+            f"errors {prev['errors']} -> {lv['errors']}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="La Subasta HTTP load test")
+    parser.add_argument("--url", default=None,
+                        help="running instance, e.g. http://pi5.local:5000 (default: serve locally)")
+    parser.add_argument("--clients", default=",".join(map(str, CLIENT_COUNTS)),
+                        help="comma-separated concurrent client counts")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS, help="per level")
+    parser.add_argument("--reset", action="store_true",
+                        help="wipe and reopen the target's auction before each level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--compare", default=None, help="earlier JSON report to diff against")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    counts = [int(c) for c in args.clients.split(",") if c.strip()]
+    report = run(args.url, counts, args.seconds, args.reset, args.seed)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        meta = report["meta"]
+        print(f"La Subasta load test — {meta['target']}, {args.seconds:g}s per level, "
+              f"commit {meta['commit']}\n")
+        print(f"{'clients':>7} {'req/s':>8} {'bids/s':>7} {'p50':>7} {'p95':>7} "
+              f"{'p99':>7} {'errors':>6} {'busy':>5}")
+        for lv in report["levels"]:
+            print(f"{lv['clients']:>7} {lv['requests_per_s']:>8} {lv['bids_accepted_per_s']:>7} "
+                  f"{lv['p50_ms']:>7} {lv['p95_ms']:>7} {lv['p99_ms']:>7} "
+                  f"{lv['errors']:>6} {lv['sqlite_busy']:>5}")
+        for lv in report["levels"]:
+            for sample in lv["error_samples"][:3]:
+                print(f"  [{lv['clients']}] {sample}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        print(f"\nvs {args.compare} (commit {old.get('meta', {}).get('commit')}):")
+        for line in compare(old, report):
+            print("  " + line)
+
+    return 1 if any(lv["errors"] for lv in report["levels"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
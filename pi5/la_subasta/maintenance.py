@@ -0,0 +1,270 @@
+# la_subasta/maintenance.py - WAL checkpoints + storage upkeep for la_subasta.db
+#
+# models._connect() puts the DB in WAL mode, and every commit appends to the
+# -wal file. SQLite's automatic checkpoint copies it back into the DB inside
+# whichever COMMIT crosses the threshold — in the middle of a bid. So the
+# threshold is raised well out of the way (models.WAL_AUTOCHECKPOINT_PAGES)
+# and this daemon does the work instead, off the write path:
+#
+#   - PASSIVE checkpoint once writes have been quiet for QUIET_SECONDS
+#     (or sooner if the WAL passes CHECKPOINT_WAL_BYTES). PASSIVE never
+#     waits on readers or writers; it copies what it can.
+#   - TRUNCATE checkpoint when bidding is closed and the DB is quiet, so
+#     the -wal file shrinks back to nothing between sessions.
+#   - ANALYZE / PRAGMA optimize when bidding is closed, at most once per
+#     OPTIMIZE_INTERVAL_SECONDS, so the planner's stats follow the data.
+#
+# Each tick also sweeps the connection pool for readers leaked by threads
+# that died. stats() reports WAL size, checkpoint durations and every open
+# connection by role and thread (GET /api/admin/storage).
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from la_subasta.models import (
+    _db_path, close_conn, each_tracked_connection, get_conn, get_pool,
+    last_write_at, set_conn_role,
+)
+from la_subasta.state_machine import AuctionState, get_state
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_SECONDS = 5.0
+QUIET_SECONDS = 3.0
+CHECKPOINT_WAL_BYTES = 4 * 1024 * 1024
+OPTIMIZE_INTERVAL_SECONDS = 15 * 60
+
+# Bidding in progress: checkpoints stay PASSIVE, no ANALYZE
+_BIDDING_STATES = frozenset({AuctionState.OPEN, AuctionState.FINAL_HOUR})
+
+
+def wal_bytes(path: Optional[str] = None) -> int:
+    try:
+        return os.path.getsize((path or _db_path()) + "-wal")
+    except OSError:
+        return 0
+
+
+# -----------------------------------------------------------------------------
+# Daemon
+# -----------------------------------------------------------------------------
+
+class MaintenanceDaemon:
+    """
+    Background thread that checkpoints the WAL and refreshes planner stats.
+
+    Args:
+        interval_s: Seconds between ticks.
+        quiet_s: No write for this long = quiet enough to checkpoint.
+        checkpoint_wal_bytes: Checkpoint (PASSIVE) at this WAL size even
+            while writes continue.
+        optimize_interval_s: Least time between ANALYZE/optimize runs.
+        clock: Monotonic clock (tests).
+    """
+
+    def __init__(self, interval_s: float = INTERVAL_SECONDS,
+                 quiet_s: float = QUIET_SECONDS,
+                 checkpoint_wal_bytes: int = CHECKPOINT_WAL_BYTES,
+                 optimize_interval_s: float = OPTIMIZE_INTERVAL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic,
+                 name: str = "LaSubastaMaintenance"):
+        self.interval_s = interval_s
+        self.quiet_s = quiet_s
+        self.checkpoint_wal_bytes = checkpoint_wal_bytes
+        self.optimize_interval_s = optimize_interval_s
+        self.clock = clock
+        self.name = name
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()       # one tick at a time
+
+        # Write stamp (models.last_write_at) the last full checkpoint covered
+        self._checkpointed_write = None
+        self._partial = False               # last checkpoint left frames behind
+        self._analyzed_write = None
+        self._last_optimize_at: Optional[float] = None
+
+        # Monitoring
+        self.checkpoints = 0
+        self.checkpoint_ms_total = 0.0
+        self.checkpoint_ms_max = 0.0
+        self.last_checkpoint: Optional[dict] = None
+        self.optimizes = 0
+        self.last_optimize: Optional[dict] = None
+        self.errors = 0
+
+    # -----------------------------------------------------------------
+    # Operations
+    # -----------------------------------------------------------------
+
+    def checkpoint(self, mode: str = "PASSIVE") -> dict:
+        """Run one wal_checkpoint and record how it went."""
+        if mode not in ("PASSIVE", "TRUNCATE"):
+            raise ValueError(f"unsupported checkpoint mode {mode!r}")
+        conn = get_conn()
+        before = wal_bytes()
+        start = time.perf_counter()
+        busy, log, done = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+        ms = (time.perf_counter() - start) * 1000.0
+        result = {
+            "mode": mode,
+            "duration_ms": round(ms, 3),
+            "busy": bool(busy),
+            "wal_pages": log,
+            "checkpointed_pages": done,
+            "wal_bytes_before": before,
+            "wal_bytes_after": wal_bytes(),
+            "at": time.time(),
+        }
+        self._partial = bool(busy) or (log >= 0 and done < log)
+        self.checkpoints += 1
+        self.checkpoint_ms_total += ms
+        self.checkpoint_ms_max = max(self.checkpoint_ms_max, ms)
+        self.last_checkpoint = result
+        return result
+
+    def optimize(self) -> dict:
+        """Full ANALYZE the first time, PRAGMA optimize afterwards."""
+        conn = get_conn()
+        start = time.perf_counter()
+        analyzed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+        if analyzed is None:
+            conn.execute("ANALYZE;")
+            kind = "analyze"
+        else:
+            # 0x10002: consider every table, not just ones this connection
+            # queried (SQLite >= 3.46; older builds only see the latter)
+            conn.execute("PRAGMA optimize = 0x10002;")
+            kind = "optimize"
+        result = {
+            "kind": kind,
+            "duration_ms": round((time.perf_counter() - start) * 1000.0, 3),
+            "at": time.time(),
+        }
+        self.optimizes += 1
+        self.last_optimize = result
+        return result
+
+    def run_once(self) -> dict:
+        """One tick: decide what (if anything) to do, do it. Returns what ran.
+
+        Checkpoints need a read-write connection: call from a thread on the
+        "maintenance" connection role (the daemon thread is)."""
+        ran = {}
+        with self._lock:
+            if not os.path.exists(_db_path()):
+                return ran          # being reset/replaced — don't recreate it
+            # Readers left out by threads that died go back to the pool
+            get_pool().check_leaks()
+            now = self.clock()
+            last_write = last_write_at()
+            quiet = last_write is None or now - last_write >= self.quiet_s
+            bidding = get_state() in _BIDDING_STATES
+
+            # First: ANALYZE writes its stats to the WAL, so the checkpoint
+            # below should come after it
+            if (quiet and not bidding and last_write != self._analyzed_write
+                    and (self._last_optimize_at is None
+                         or now - self._last_optimize_at >= self.optimize_interval_s)):
+                ran["optimize"] = self.optimize()
+                self._analyzed_write = last_write
+                self._last_optimize_at = now
+
+            size = wal_bytes()
+            pending = self._partial or "optimize" in ran or (
+                last_write is not None and last_write != self._checkpointed_write)
+            if pending and (quiet or size >= self.checkpoint_wal_bytes):
+                mode = "TRUNCATE" if quiet and not bidding else "PASSIVE"
+                ran["checkpoint"] = self.checkpoint(mode)
+                self._checkpointed_write = last_write
+            elif quiet and not bidding and size > 0:
+                # Frames already copied; just give the file back
+                ran["checkpoint"] = self.checkpoint("TRUNCATE")
+        return ran
+
+    # -----------------------------------------------------------------
+    # Thread
+    # -----------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        set_conn_role("maintenance")
+        try:
+            while not self._stop.wait(self.interval_s):
+                try:
+                    ran = self.run_once()
+                except Exception:
+                    self.errors += 1
+                    logger.exception("%s: tick failed", self.name)
+                    continue
+                if "checkpoint" in ran and ran["checkpoint"]["duration_ms"] > 100:
+                    logger.info("%s: slow %s checkpoint %.1f ms", self.name,
+                                ran["checkpoint"]["mode"], ran["checkpoint"]["duration_ms"])
+        finally:
+            close_conn()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+        self._thread = None
+
+    def stats(self) -> dict:
+        last_write = last_write_at()
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "wal_bytes": wal_bytes(),
+            "last_write_age_s": (None if last_write is None
+                                 else round(self.clock() - last_write, 3)),
+            "checkpoints": self.checkpoints,
+            "checkpoint_ms": {
+                "avg": round(self.checkpoint_ms_total / self.checkpoints, 3)
+                if self.checkpoints else 0.0,
+                "max": round(self.checkpoint_ms_max, 3),
+            },
+            "last_checkpoint": self.last_checkpoint,
+            "optimizes": self.optimizes,
+            "last_optimize": self.last_optimize,
+            "errors": self.errors,
+            "connections": each_tracked_connection(
+                lambda role, name, conn: {"role": role, "thread": name}),
+        }
+
+
+# -----------------------------------------------------------------------------
+# Process-wide daemon — started by init_la_subasta()
+# -----------------------------------------------------------------------------
+
+_daemon: Optional[MaintenanceDaemon] = None
+
+
+def start_daemon(**kwargs) -> MaintenanceDaemon:
+    """Create and start (once) the shared daemon. Safe to call repeatedly."""
+    global _daemon
+    if _daemon is None:
+        _daemon = MaintenanceDaemon(**kwargs)
+    _daemon.start()
+    return _daemon
+
+
+def stop_daemon() -> None:
+    global _daemon
+    if _daemon is not None:
+        _daemon.stop()
+        _daemon = None
+
+
+def get_daemon() -> Optional[MaintenanceDaemon]:
+    return _daemon
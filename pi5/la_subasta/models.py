@@ -3,23 +3,46 @@
 # Owns the la_subasta.db file. Creates its own tables only — never touches
 # dashboard tables or data. Uses raw sqlite3 for zero extra dependencies.
 
+import logging
 import os
+import pathlib
+import re
 import sqlite3
 import threading
+import time
 from contextlib import contextmanager
+from typing import Optional
 
 from la_subasta import config as _config
 
+logger = logging.getLogger(__name__)
+
 # Proxy that always reads the *current* config value. Tests patch
 # la_subasta.config.DB_PATH before calling init_db(), so default args must
 # resolve at call time — not at function definition time.
 def _db_path() -> str:
     return _config.DB_PATH
 
-# Single lock for write serialization — SQLite handles concurrent reads fine
-# but the undo flow + state transitions benefit from serialized writes.
-_write_lock = threading.Lock()
 
+# Year-partitioned storage: DB_PATH holds the CURRENT event year only; each
+# past year lives in its own file beside it ("la_subasta.2025.db"), written
+# once by history.split_years() and only ever attached read-only afterwards.
+def year_db_path(year: int, path: str = None) -> str:
+    root, ext = os.path.splitext(path or _db_path())
+    return f"{root}.{int(year)}{ext or '.db'}"
+
+
+def archived_years(path: str = None) -> list:
+    """Years that have their own archive file next to the current DB."""
+    root, ext = os.path.splitext(path or _db_path())
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"\.(\d{4})"
+                         + re.escape(ext or ".db") + "$")
+    directory = os.path.dirname(root) or "."
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(int(m.group(1)) for m in map(pattern.match, names) if m)
 
 # -----------------------------------------------------------------------------
 # Schema (Phase 1)
@@ -58,6 +81,10 @@ CREATE INDEX IF NOT EXISTS idx_bids_bidder
     ON bids(bidder_id, voided, event_year);
 CREATE INDEX IF NOT EXISTS idx_bids_time
     ON bids(bid_time);
+-- Leader lookup for bid placement: the first row in this order is the
+-- current high bid, so the query is a single index seek.
+CREATE INDEX IF NOT EXISTS idx_bids_leader
+    ON bids(horse_id, event_year, voided, amount DESC, bid_time, id);
 
 CREATE TABLE IF NOT EXISTS ownership (
     id          INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -81,6 +108,19 @@ CREATE TABLE IF NOT EXISTS payouts (
     UNIQUE(finish, event_year)
 );
 
+-- Settlement statement per bidder, written with the payouts: what they
+-- pay in for the horses they own, what they win, and the difference.
+CREATE TABLE IF NOT EXISTS bidder_statements (
+    bidder_id  INTEGER NOT NULL REFERENCES bidders(id),
+    horses     INTEGER NOT NULL DEFAULT 0,
+    owed       REAL    NOT NULL DEFAULT 0,
+    winnings   REAL    NOT NULL DEFAULT 0,
+    net        REAL    NOT NULL DEFAULT 0,
+    settled_at TEXT    NOT NULL DEFAULT (datetime('now')),
+    event_year INTEGER NOT NULL,
+    PRIMARY KEY (bidder_id, event_year)
+);
+
 CREATE TABLE IF NOT EXISTS auction_state (
     id         INTEGER PRIMARY KEY AUTOINCREMENT,
     state      TEXT    NOT NULL,
@@ -139,6 +179,14 @@ CREATE TABLE IF NOT EXISTS settings_audit_log (
 
 CREATE INDEX IF NOT EXISTS idx_settings_audit_changed_at
     ON settings_audit_log(changed_at DESC);
+
+-- Single-row counter bumped by every settings write, so a process holding a
+-- cached settings snapshot can tell it's stale (see settings.current()).
+CREATE TABLE IF NOT EXISTS settings_version (
+    id         INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO settings_version (id, generation) VALUES (1, 0);
 """
 
 
@@ -146,59 +194,328 @@ CREATE INDEX IF NOT EXISTS idx_settings_audit_changed_at
 # Connection / migration
 # -----------------------------------------------------------------------------
 
-def _connect(path: str) -> sqlite3.Connection:
-    """Open a connection with sane defaults (rows as dicts, FK enforced)."""
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+# Per-connection tuning by role. synchronous=NORMAL: in WAL mode that syncs
+# at checkpoint rather than on every commit, and a power cut can lose the
+# last commits but never corrupts the file.
+#
+#   reader       pooled read-only connections: a modest cache each, mmap
+#                shares the OS page cache between them
+#   writer       the one connection write_txn() commits through: bigger
+#                cache for the hot bid pages
+#   maintenance  maintenance.py's own read-write connection (a read-only one
+#                can't checkpoint): tiny cache, short busy timeout so a
+#                checkpoint gives way instead of stalling the writer
+#
+# Automatic checkpoints run inside whichever COMMIT crosses the threshold —
+# i.e. in the middle of a bid. maintenance.py checkpoints during quiet
+# periods instead; the raised threshold is only a backstop if it's not running.
+WAL_AUTOCHECKPOINT_PAGES = 10000
+CONNECTION_ROLES = {
+    "reader": {
+        "cache_size": -2000,                  # KiB
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "writer": {
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": WAL_AUTOCHECKPOINT_PAGES,
+    },
+    "maintenance": {
+        "synchronous": "NORMAL",
+        "cache_size": -1000,
+        "mmap_size": 0,
+        "busy_timeout": 250,                  # ms
+        "wal_autocheckpoint": WAL_AUTOCHECKPOINT_PAGES,
+    },
+}
+# Roles a thread can opt into with set_conn_role(); each such thread gets its
+# own connection instead of a pooled reader
+_PRIVATE_ROLES = ("maintenance",)
+
+
+def _ro_uri(path: str) -> str:
+    return pathlib.Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+
+
+def _connect(path: str, role: str = "writer") -> sqlite3.Connection:
+    """Open a connection with sane defaults (rows as dicts, FK enforced).
+    Readers are opened read-only, so the file must already exist."""
+    if role == "reader":
+        target, uri = _ro_uri(path), True
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        target, uri = path, False
+    conn = sqlite3.connect(target, uri=uri, detect_types=sqlite3.PARSE_DECLTYPES,
                            check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
     conn.execute("PRAGMA journal_mode = WAL;")
+    for name, value in CONNECTION_ROLES[role].items():
+        conn.execute(f"PRAGMA {name} = {value};")
     return conn
 
 
-# One sqlite3 connection PER THREAD (thread-local). A single shared connection
-# is NOT safe under the concurrent access the SocketIO server produces
-# (multiple guests + the 2s dev-panel /api/state poll): concurrent use of one
-# connection raises sqlite3 SQLITE_MISUSE ("bad parameter or other API misuse")
-# and can return torn rows. WAL mode lets each thread hold its own connection
-# to the same file and still see the others' committed writes.
+def _close_quietly(conn: sqlite3.Connection) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+# -----------------------------------------------------------------------------
+# Connection pool
+# -----------------------------------------------------------------------------
+#
+# A sqlite3 connection must never be used by two threads at once: under the
+# concurrent access the SocketIO server produces (multiple guests + the 2s
+# dev-panel /api/state poll) a shared one raises SQLITE_MISUSE ("bad
+# parameter or other API misuse") and can return torn rows. One connection
+# per OS thread fixed that but leaked one per short-lived request thread.
+#
+# So: ONE writer connection, used only by write_txn() under _write_lock, and
+# at most POOL_READERS read-only connections. get_conn() lends the calling
+# thread a reader, which it keeps until close_conn() hands it back — the
+# blueprint does that when each request ends, worker threads in their
+# finally. WAL mode lets the readers see the writer's commits. A reader still
+# held by a thread that has died is reclaimed and counted as a leak; a live
+# thread holding one for LEAK_HOLD_S is reported.
+
+POOL_READERS = 8
+POOL_TIMEOUT_S = 10.0
+LEAK_HOLD_S = 60.0
+
+# Single lock for write serialization — SQLite handles concurrent reads fine
+# but the undo flow + state transitions benefit from serialized writes.
+_write_lock = threading.Lock()
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """No reader connection came free in time."""
+
+
+class ConnectionPool:
+    """
+    The writer + a bounded set of read-only readers for one DB file.
+
+    Args:
+        path: SQLite file. Must exist before the first reader is lent.
+        generation: init_db() generation this pool serves.
+        size: Most readers open at once.
+    """
+
+    def __init__(self, path: str, generation: int, size: int = POOL_READERS):
+        self.path = path
+        self.generation = generation
+        self.size = max(1, int(size))
+        self.writer = _connect(path, "writer")
+        self.closed = False
+
+        self._cond = threading.Condition()
+        self._idle: list = []
+        self._borrowed: dict = {}       # id(conn) -> (conn, thread, since)
+        self._reported: set = set()     # long holders already logged
+
+        # Monitoring
+        self.opened = 0
+        self.acquires = 0
+        self.waits = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.timeouts = 0
+        self.reclaimed = 0
+
+    def acquire(self, timeout: float = POOL_TIMEOUT_S) -> sqlite3.Connection:
+        """Lend the calling thread a reader, waiting up to `timeout` for one."""
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise sqlite3.ProgrammingError("connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if len(self._borrowed) < self.size:
+                    conn = _connect(self.path, "reader")
+                    self.opened += 1
+                    break
+                if self._reclaim_dead():
+                    continue
+                remaining = timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"no free reader connection after {timeout:g}s "
+                                      f"({self.size} in use)")
+                waited = True
+                # Wake periodically: a borrower that dies never notifies
+                self._cond.wait(min(remaining, 0.5))
+            self._borrowed[id(conn)] = (conn, threading.current_thread(), time.monotonic())
+            self.acquires += 1
+            if waited:
+                ms = (time.perf_counter() - start) * 1000.0
+                self.waits += 1
+                self.wait_ms_total += ms
+                self.wait_ms_max = max(self.wait_ms_max, ms)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._cond:
+            if self._borrowed.pop(id(conn), None) is None:
+                return
+            self._reported.discard(id(conn))
+            if self.closed:
+                _close_quietly(conn)
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _reclaim_dead(self) -> int:
+        """Take back readers whose borrowing thread is gone. Caller holds _cond."""
+        dead = [key for key, (_, thread, _) in self._borrowed.items()
+                if not thread.is_alive()]
+        for key in dead:
+            conn, thread, _ = self._borrowed.pop(key)
+            self._reported.discard(key)
+            self._idle.append(conn)
+            logger.warning("Reader connection leaked by finished thread %s — reclaimed",
+                           thread.name)
+        self.reclaimed += len(dead)
+        return len(dead)
+
+    def check_leaks(self, hold_s: float = LEAK_HOLD_S) -> list:
+        """Reclaim dead threads' readers; return live threads holding one
+        for `hold_s` or longer (each is logged once)."""
+        now = time.monotonic()
+        held = []
+        with self._cond:
+            if self._reclaim_dead():
+                self._cond.notify_all()
+            for key, (_, thread, since) in self._borrowed.items():
+                if now - since >= hold_s:
+                    held.append({"thread": thread.name, "held_s": round(now - since, 1)})
+                    if key not in self._reported:
+                        self._reported.add(key)
+                        logger.warning("Thread %s has held a reader connection for %.0fs",
+                                       thread.name, now - since)
+        return held
+
+    def each_connection(self, fn) -> list:
+        """[fn(role, holder, conn)] over every open connection, holding the
+        lock that keeps them from being closed meanwhile."""
+        with self._cond:
+            if self.closed:
+                return []
+            out = [fn("writer", "write_txn", self.writer)]
+            out += [fn("reader", "idle", conn) for conn in self._idle]
+            out += [fn("reader", thread.name, conn)
+                    for conn, thread, _ in self._borrowed.values()]
+            return out
+
+    def close(self) -> None:
+        """Close the writer and idle readers; lent ones close as they return."""
+        with _write_lock:           # never mid-transaction
+            with self._cond:
+                if self.closed:
+                    return
+                self.closed = True
+                for conn in self._idle:
+                    _close_quietly(conn)
+                self._idle.clear()
+                _close_quietly(self.writer)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        long_held = self.check_leaks()
+        with self._cond:
+            return {
+                "readers": self.size,
+                "open": len(self._idle) + len(self._borrowed),
+                "in_use": len(self._borrowed),
+                "opened": self.opened,
+                "acquires": self.acquires,
+                "waits": self.waits,
+                "wait_ms": {
+                    "avg": round(self.wait_ms_total / self.waits, 3) if self.waits else 0.0,
+                    "max": round(self.wait_ms_max, 3),
+                },
+                "timeouts": self.timeouts,
+                "reclaimed": self.reclaimed,
+                "long_held": long_held,
+            }
+
+
+# Bumped whenever init_db (re)opens the database, so in-memory views built
+# from it (order_book) know to rebuild — e.g. after reset_db_for_tests().
+_generation = 0
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
 _local = threading.local()
 
 
-def _open_for_thread(path: str) -> sqlite3.Connection:
-    """(Re)open the calling thread's connection at `path`, closing any prior one."""
-    old = getattr(_local, "conn", None)
-    if old is not None:
-        try:
-            old.close()
-        except Exception:
-            pass
-    conn = _connect(path)
-    _local.conn = conn
-    _local.path = path
-    return conn
+def db_generation() -> int:
+    return _generation
+
+
+def get_pool() -> ConnectionPool:
+    """The pool for the current DB path + generation. Repointing
+    config.DB_PATH (tests) transparently opens a new one."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.path == _db_path() and pool.generation == _generation:
+        return pool
+    with _pool_lock:
+        old = _pool
+        if old is None or old.path != _db_path() or old.generation != _generation:
+            _pool = ConnectionPool(_db_path(), _generation)
+        pool = _pool
+    if old is not None and old is not pool:
+        old.close()
+    return pool
 
 
 def init_db(path: str = None) -> sqlite3.Connection:
     """
     Create la_subasta.db (if missing) and apply schema.
 
-    Idempotent — safe to call on every server start. Returns the calling
-    thread's connection. Schema is file-level, so connections opened later on
-    other threads (via get_conn) see the same tables. Does NOT create or touch
-    the dashboard's horses table.
+    Idempotent — safe to call on every server start. Opens a fresh pool on
+    the file and returns the calling thread's reader. Does NOT create or
+    touch the dashboard's horses table.
     """
-    global _house_bidder_id
+    global _house_bidder_id, _generation, _pool
     if path is None:
         path = _db_path()
-    conn = _open_for_thread(path)
-    conn.executescript(SCHEMA_SQL)
-    _house_bidder_id = None  # force re-lookup after schema apply
-    _ensure_house_bidder(conn)
+    with _pool_lock:
+        # Not published until the schema is in, so no reader sees a bare file
+        pool = ConnectionPool(path, _generation + 1)
+        pool.writer.executescript(SCHEMA_SQL)
+        _house_bidder_id = None  # force re-lookup after schema apply
+        _ensure_house_bidder(pool.writer)
+        old, _pool = _pool, pool
+        _generation += 1
+    if old is not None:
+        old.close()
+    conn = get_conn()
+    _warn_other_years(conn)
     return conn
 
 
+def _warn_other_years(conn: sqlite3.Connection) -> None:
+    """The current-year file should hold only EVENT_YEAR's auction."""
+    other = [r[0] for r in conn.execute(
+        "SELECT DISTINCT event_year FROM auction_state WHERE event_year != ?",
+        (_config.EVENT_YEAR,),
+    )]
+    if other:
+        logger.warning("La Subasta DB still holds past years %s — move them to "
+                       "per-year files with: python -m la_subasta.history --split",
+                       sorted(other))
+
+
 # -----------------------------------------------------------------------------
 # House bidder sentinel
 # -----------------------------------------------------------------------------
@@ -233,56 +550,211 @@ def _ensure_house_bidder(conn: sqlite3.Connection) -> int:
 def house_bidder_id() -> int:
     """Return the House bidder's id. init_db() must have run first."""
     if _house_bidder_id is None:
-        _ensure_house_bidder(get_conn())
+        txn = getattr(_local, "txn", None)
+        if txn is not None:
+            _ensure_house_bidder(txn)
+        else:
+            with write_txn() as conn:
+                _ensure_house_bidder(conn)
     return _house_bidder_id
 
 
 def get_conn() -> sqlite3.Connection:
-    """Return this thread's connection, opening one if needed.
+    """Return the connection the calling thread should use.
 
-    Each thread gets its own connection (keyed on the current DB path so tests
-    that repoint config.DB_PATH transparently reconnect). init_db() applies the
-    schema; a fresh thread's first call here opens against the existing file.
+    Inside write_txn() that is the writer, so reads see the transaction's own
+    writes. Otherwise it is a read-only reader lent from the pool, kept by
+    this thread until close_conn() (a new one is lent after the DB is
+    reopened or config.DB_PATH repointed). Threads that set_conn_role()
+    get their own connection instead.
     """
-    conn = getattr(_local, "conn", None)
-    if conn is None or getattr(_local, "path", None) != _db_path():
-        conn = _open_for_thread(_db_path())
+    txn = getattr(_local, "txn", None)
+    if txn is not None:
+        return txn
+    role = getattr(_local, "role", "reader")
+    if role != "reader":
+        return _private_conn(role)
+    pool = get_pool()
+    held = getattr(_local, "reader", None)
+    if held is not None:
+        if held[0] is pool:
+            return held[1]
+        held[0].release(held[1])
+    _local.reader = None
+    conn = pool.acquire()
+    _local.reader = (pool, conn)
     return conn
 
 
+def holds_reader() -> bool:
+    """True if the calling thread has a pooled reader out."""
+    return getattr(_local, "reader", None) is not None
+
+
 def close_conn() -> None:
-    """Close and drop the calling thread's connection, if any.
+    """Hand the calling thread's connection back, if it has one.
 
-    Lets worker threads release their file handle deterministically — matters
-    on Windows, where a lingering open SQLite handle blocks deleting the file
-    in reset_db_for_tests().
+    Request threads (via the blueprint) and worker threads call this when
+    they're done, so the reader goes back to the pool. A private
+    (set_conn_role) connection is closed — matters on Windows, where a
+    lingering open SQLite handle blocks deleting the file in
+    reset_db_for_tests().
     """
-    conn = getattr(_local, "conn", None)
-    if conn is not None:
-        try:
-            conn.close()
-        except Exception:
-            pass
+    held = getattr(_local, "reader", None)
+    _local.reader = None
+    if held is not None:
+        held[0].release(held[1])
+    _drop_private()
+
+
+# Private connections of set_conn_role() threads, so maintenance.py can list
+# them alongside the pool's.
+_tracked: dict = {}                 # thread ident -> (role, thread name, conn)
+_tracked_lock = threading.Lock()
+
+
+def _drop_private() -> None:
+    old = getattr(_local, "conn", None)
     _local.conn = None
-    _local.path = None
+    with _tracked_lock:
+        _tracked.pop(threading.get_ident(), None)
+        if old is not None:
+            _close_quietly(old)
+
+
+def _private_conn(role: str) -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if (conn is not None and getattr(_local, "path", None) == _db_path()
+            and getattr(_local, "generation", None) == _generation):
+        return conn
+    _drop_private()
+    conn = _connect(_db_path(), role)
+    with _tracked_lock:
+        _tracked[threading.get_ident()] = (role, threading.current_thread().name, conn)
+    _local.conn = conn
+    _local.path = _db_path()
+    _local.generation = _generation
+    return conn
+
+
+def set_conn_role(role: str) -> None:
+    """Give the calling thread its own connection tuned for `role` (see
+    CONNECTION_ROLES), or back to pooled readers with "reader". Call at the
+    top of a long-lived worker thread."""
+    if role != "reader" and role not in _PRIVATE_ROLES:
+        raise ValueError(f"unknown connection role {role!r}")
+    if getattr(_local, "role", "reader") != role:
+        close_conn()
+        _local.role = role
+
+
+def each_tracked_connection(fn) -> list:
+    """[fn(role, holder, conn)] over the pool's connections and the private
+    ones, holding the locks that keep them from being closed meanwhile."""
+    pool = _pool
+    out = pool.each_connection(fn) if pool is not None else []
+    with _tracked_lock:
+        out += [fn(role, name, conn) for role, name, conn in _tracked.values()]
+    return out
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
+def close_pool() -> None:
+    """Return the caller's reader and close the pool's connections, e.g.
+    before deleting the DB file. The next get_conn() / write_txn() opens a
+    new pool."""
+    global _pool
+    close_conn()
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def last_write_at():
+    """time.monotonic() of the last write_txn COMMIT in this process, or None."""
+    return _last_write
+
+
+# Quiet-period detection for maintenance.py
+_last_write = None
 
 
 @contextmanager
 def write_txn():
     """
-    Serialize writes with an explicit transaction. Use for any multi-statement
-    write (bid placement, void+re-award, etc.) so readers see a consistent
-    view and undo/state transitions don't interleave.
+    Serialize writes with an explicit transaction on the pool's writer. Use
+    for any write at all (readers are read-only) — multi-statement ones (bid
+    placement, void+re-award, etc.) commit atomically, so readers see a
+    consistent view and undo/state transitions don't interleave.
+
+    Callbacks registered with after_commit() run once the COMMIT succeeds,
+    still under the write lock, so in-memory views apply writes in commit
+    order. They are dropped on ROLLBACK. A callback that raises is logged
+    and every registered view is dropped (see register_view()) so it
+    rebuilds from SQLite; the rest still run, and nothing is raised to a
+    caller whose write is already committed.
     """
-    with _write_lock:
-        conn = get_conn()
+    global _last_write
+    while True:
+        pool = get_pool()
+        _write_lock.acquire()
+        if not pool.closed:
+            break
+        _write_lock.release()       # init_db replaced it meanwhile
+    try:
+        conn = pool.writer
         conn.execute("BEGIN IMMEDIATE;")
+        _local.txn = conn
+        _local.after_commit = []
         try:
             yield conn
             conn.execute("COMMIT;")
         except Exception:
             conn.execute("ROLLBACK;")
             raise
+        _last_write = time.monotonic()
+        callbacks, _local.after_commit = _local.after_commit, None
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                logger.exception("after_commit callback failed — dropping in-memory views")
+                drop_views()
+    finally:
+        _local.txn = None
+        _local.after_commit = None
+        _write_lock.release()
+
+
+def after_commit(fn) -> None:
+    """Run `fn()` when the calling thread's open write_txn commits."""
+    pending = getattr(_local, "after_commit", None)
+    if pending is None:
+        raise RuntimeError("after_commit() called outside write_txn()")
+    pending.append(fn)
+
+
+# In-memory views kept current by after_commit (order book, analytics,
+# change log, identity index, settings cache) register how to drop
+# themselves; a failed callback may have left any of them short a write.
+_view_drops = []
+
+
+def register_view(drop) -> None:
+    """Register `drop()`, which discards a view so its next read rebuilds."""
+    _view_drops.append(drop)
+
+
+def drop_views() -> None:
+    for drop in _view_drops:
+        try:
+            drop()
+        except Exception:
+            logger.exception("Dropping in-memory view failed")
 
 
 # -----------------------------------------------------------------------------
@@ -293,9 +765,9 @@ def reset_db_for_tests(path: str = None) -> sqlite3.Connection:
     """Drop and recreate all tables. Only for smoke tests / sandbox."""
     if path is None:
         path = _db_path()
-    # Close the calling thread's connection so the file can be removed on
-    # Windows (an open SQLite handle blocks deletion).
-    close_conn()
+    # Close the pool so the file can be removed on Windows (an open SQLite
+    # handle blocks deletion).
+    close_pool()
     # Remove db + any WAL/SHM sidecar files so the fresh DB starts empty.
     for suffix in ("", "-wal", "-shm"):
         candidate = path + suffix
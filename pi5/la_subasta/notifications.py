@@ -2,34 +2,237 @@
 #
 # Thin wrapper around the shared SocketIO instance so bidding/state/payout
 # modules don't need to know about Flask-SocketIO directly.
+#
+# Board-wide events (bids, scratches, state changes) still go to everyone.
+# Events that only matter to one guest go to that guest's room instead of
+# being broadcast and filtered on every phone:
+#   bidder:<id>  - joined on connect (auth {bidder_id}) or via la_subasta_join;
+#                  receives outbid, portfolio_changed, paid_marked
+#   horse:<id>   - joined via la_subasta_join {horses} / la_subasta_watch;
+#                  receives watched_horse
+# Membership is mirrored here so fan-out (deliveries per event vs. what a
+# broadcast would have cost) can be reported by fanout_stats().
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
 
-from typing import Optional, Any
+logger = logging.getLogger(__name__)
 
 # Set via init_notifications() from the blueprint at app startup.
 _socketio = None
 
+# Room membership mirror — only maintained when the real Flask-SocketIO
+# handlers are registered (stubs in tests have no sessions).
+_lock = threading.Lock()
+_tracking = False
+_connected: Set[str] = set()
+_members: Dict[str, Set[str]] = defaultdict(set)      # room -> sids
+_sid_rooms: Dict[str, Set[str]] = defaultdict(set)    # sid -> rooms
+_sid_bidder: Dict[str, int] = {}
+
+# Fan-out counters, per event name
+_emits: Dict[str, int] = defaultdict(int)
+_deliveries: Dict[str, int] = defaultdict(int)
+_broadcast_equivalent: Dict[str, int] = defaultdict(int)
+_skipped: Dict[str, int] = defaultdict(int)
+
+
+def bidder_room(bidder_id: int) -> str:
+    return f"bidder:{int(bidder_id)}"
+
+
+def horse_room(horse_id: int) -> str:
+    return f"horse:{int(horse_id)}"
+
 
 def init_notifications(socketio) -> None:
-    """Register the shared SocketIO instance for broadcasts."""
-    global _socketio
+    """Register the shared SocketIO instance for broadcasts (and, for a real
+    Flask-SocketIO server, the room join/leave handlers)."""
+    global _socketio, _tracking
     _socketio = socketio
+    with _lock:
+        _connected.clear()
+        _members.clear()
+        _sid_rooms.clear()
+        _sid_bidder.clear()
+        _tracking = False
+    if socketio is not None and hasattr(socketio, "on_event"):
+        _register_handlers(socketio)
+        _tracking = True
 
 
 def emit(event: str, payload: dict, room: Optional[str] = None) -> None:
     """Emit a SocketIO event to all clients (or a specific room)."""
     if _socketio is None:
         return
+    with _lock:
+        connected = len(_connected)
+        if room and _tracking:
+            recipients = len(_members.get(room, ()))
+        else:
+            recipients = connected
+        _emits[event] += 1
+        _deliveries[event] += recipients
+        _broadcast_equivalent[event] += connected
+        # Nobody is in the room — don't make the server walk it
+        skip = bool(room) and _tracking and recipients == 0
+        if skip:
+            _skipped[event] += 1
+    if skip:
+        return
     if room:
         _socketio.emit(event, payload, room=room)
     else:
         _socketio.emit(event, payload)
 
 
+# -----------------------------------------------------------------------------
+# Room membership
+# -----------------------------------------------------------------------------
+
+def _enter(sid: str, room: str) -> None:
+    with _lock:
+        _members[room].add(sid)
+        _sid_rooms[sid].add(room)
+
+
+def _exit(sid: str, room: str) -> None:
+    with _lock:
+        members = _members.get(room)
+        if members is not None:
+            members.discard(sid)
+            if not members:
+                del _members[room]
+        _sid_rooms.get(sid, set()).discard(room)
+
+
+def _forget(sid: str) -> None:
+    with _lock:
+        _connected.discard(sid)
+        _sid_bidder.pop(sid, None)
+        for room in _sid_rooms.pop(sid, ()):
+            members = _members.get(room)
+            if members is not None:
+                members.discard(sid)
+                if not members:
+                    del _members[room]
+
+
+def _parse_id(value) -> Optional[int]:
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed > 0 else None
+
+
+def _join(sid: str, bidder_id=None, horses: Iterable = ()) -> list:
+    """Join sid to its bidder room (replacing any previous one) and to the
+    given horse rooms. Returns the rooms joined."""
+    from flask_socketio import join_room, leave_room
+
+    joined = []
+    bidder_id = _parse_id(bidder_id)
+    if bidder_id is not None:
+        previous = _sid_bidder.get(sid)
+        if previous is not None and previous != bidder_id:
+            leave_room(bidder_room(previous))
+            _exit(sid, bidder_room(previous))
+        _sid_bidder[sid] = bidder_id
+        join_room(bidder_room(bidder_id))
+        _enter(sid, bidder_room(bidder_id))
+        joined.append(bidder_room(bidder_id))
+    for horse_id in horses or ():
+        horse_id = _parse_id(horse_id)
+        if horse_id is None:
+            continue
+        join_room(horse_room(horse_id))
+        _enter(sid, horse_room(horse_id))
+        joined.append(horse_room(horse_id))
+    return joined
+
+
+def _register_handlers(socketio) -> None:
+    from flask import request
+    from flask_socketio import leave_room
+
+    def _on_connect(auth=None):
+        sid = request.sid
+        with _lock:
+            _connected.add(sid)
+        if isinstance(auth, dict):
+            _join(sid, auth.get("bidder_id"), auth.get("horses") or ())
+
+    def _on_disconnect(*_args):
+        # Flask-SocketIO drops the real room membership itself
+        _forget(request.sid)
+
+    def _on_join(data=None):
+        data = data if isinstance(data, dict) else {}
+        return {"rooms": _join(request.sid, data.get("bidder_id"),
+                               data.get("horses") or ())}
+
+    def _on_watch(data=None):
+        data = data if isinstance(data, dict) else {}
+        horse_id = _parse_id(data.get("horse_id"))
+        if horse_id is None:
+            return {"rooms": []}
+        if data.get("watch", True):
+            return {"rooms": _join(request.sid, horses=[horse_id])}
+        leave_room(horse_room(horse_id))
+        _exit(request.sid, horse_room(horse_id))
+        return {"rooms": []}
+
+    socketio.on_event("connect", _on_connect)
+    socketio.on_event("disconnect", _on_disconnect)
+    socketio.on_event("la_subasta_join", _on_join)
+    socketio.on_event("la_subasta_watch", _on_watch)
+
+
+def fanout_stats() -> dict:
+    """Server-side fan-out: per event, emits and socket deliveries, next to
+    what the same emits would have cost as broadcasts."""
+    with _lock:
+        events = {
+            name: {
+                "emits": _emits[name],
+                "deliveries": _deliveries[name],
+                "broadcast_equivalent": _broadcast_equivalent[name],
+                "skipped_empty_room": _skipped[name],
+            }
+            for name in sorted(_emits)
+        }
+        rooms = {"bidder": 0, "horse": 0}
+        for room in _members:
+            kind = room.split(":", 1)[0]
+            if kind in rooms:
+                rooms[kind] += 1
+        return {
+            "tracking": _tracking,
+            "connected": len(_connected),
+            "rooms": rooms,
+            "events": events,
+            "deliveries": sum(_deliveries.values()),
+            "broadcast_equivalent": sum(_broadcast_equivalent.values()),
+        }
+
+
+def reset_fanout_stats() -> None:
+    with _lock:
+        _emits.clear()
+        _deliveries.clear()
+        _broadcast_equivalent.clear()
+        _skipped.clear()
+
+
 # --- Convenience wrappers for the named events in the spec -------------------
 
 def bid_placed(horse_id: int, bidder_id: int, bidder_identity: str,
                amount: float, previous_bidder_id: Optional[int],
-               previous_bidder_identity: Optional[str]) -> None:
+               previous_bidder_identity: Optional[str],
+               seq: Optional[int] = None, pot: Optional[float] = None) -> None:
     emit("bid_placed", {
         "horse_id": horse_id,
         "bidder_id": bidder_id,
@@ -37,12 +240,15 @@ def bid_placed(horse_id: int, bidder_id: int, bidder_identity: str,
         "amount": amount,
         "previous_bidder_id": previous_bidder_id,
         "previous_bidder_identity": previous_bidder_identity,
+        "seq": seq,
+        "pot": pot,
     })
 
 
 def outbid(horse_id: int, old_bidder_id: int, old_bidder_identity: str,
            new_bidder_id: int, new_bidder_identity: str,
            amount: float) -> None:
+    """Tell only the guest who lost the lead."""
     emit("outbid", {
         "horse_id": horse_id,
         "old_bidder_id": old_bidder_id,
@@ -50,24 +256,65 @@ def outbid(horse_id: int, old_bidder_id: int, old_bidder_identity: str,
         "new_bidder_id": new_bidder_id,
         "new_bidder_identity": new_bidder_identity,
         "amount": amount,
-    })
+    }, room=bidder_room(old_bidder_id))
+
+
+def portfolio_changed(bidder_id: Optional[int], horse_id: int, leading: bool,
+                      amount: Optional[float] = None) -> None:
+    """A horse entered (leading=True) or left a bidder's portfolio."""
+    if bidder_id is None:
+        return
+    emit("portfolio_changed", {
+        "bidder_id": bidder_id,
+        "horse_id": horse_id,
+        "leading": leading,
+        "amount": amount,
+    }, room=bidder_room(bidder_id))
+
+
+def watched_horse(horse_id: int, kind: str, payload: Optional[dict] = None) -> None:
+    """Activity on a horse, for guests watching it (kind: bid/voided/scratched)."""
+    emit("watched_horse", {"horse_id": horse_id, "kind": kind, **(payload or {})},
+         room=horse_room(horse_id))
 
 
 def auction_locked(timestamp: float) -> None:
     emit("auction_locked", {"timestamp": timestamp})
 
 
-def auction_state_changed(new_state: str, old_state: Optional[str] = None) -> None:
+def auction_state_changed(new_state: str, old_state: Optional[str] = None,
+                          seq: Optional[int] = None) -> None:
     """Broadcast whenever the auction state transitions. Guest UIs use this
     to re-render bid button enabled/disabled states without a page reload."""
     emit("auction_state_changed", {
         "new_state": new_state,
         "old_state": old_state,
+        "seq": seq,
     })
 
 
-def horse_scratched(horse_id: int) -> None:
-    emit("horse_scratched", {"horse_id": horse_id})
+def auction_extended(closes_at: str, bid_id: Optional[int] = None,
+                     seq: Optional[int] = None) -> None:
+    """Soft close: a late bid pushed the close out. Guests re-arm their
+    countdown to the new closes_at."""
+    emit("auction_extended", {"closes_at": closes_at, "bid_id": bid_id, "seq": seq})
+
+
+def auction_scheduled(opens_at: Optional[str], closes_at: Optional[str],
+                      seq: Optional[int] = None) -> None:
+    """The deadline engine was armed, re-planned or cancelled."""
+    emit("auction_scheduled", {"opens_at": opens_at, "closes_at": closes_at,
+                               "seq": seq})
+
+
+def horse_scratched(horse_id: int, seq: Optional[int] = None,
+                    pot: Optional[float] = None) -> None:
+    emit("horse_scratched", {"horse_id": horse_id, "seq": seq, "pot": pot})
+
+
+def horse_unscratched(horse_id: int, seq: Optional[int] = None,
+                      pot: Optional[float] = None) -> None:
+    emit("horse_unscratched", {"horse_id": horse_id, "seq": seq, "pot": pot})
 
 
 def results_entered(win: int, place: int, show: int) -> None:
@@ -79,14 +326,17 @@ def payout_computed(payload: Any) -> None:
 
 
 def paid_marked(bidder_id: int) -> None:
-    emit("paid_marked", {"bidder_id": bidder_id})
+    emit("paid_marked", {"bidder_id": bidder_id}, room=bidder_room(bidder_id))
 
 
-def bid_voided(bid_id: int, horse_id: int, new_high_bid: Optional[dict]) -> None:
+def bid_voided(bid_id: int, horse_id: int, new_high_bid: Optional[dict],
+               seq: Optional[int] = None, pot: Optional[float] = None) -> None:
     emit("bid_voided", {
         "bid_id": bid_id,
         "horse_id": horse_id,
         "new_high_bid": new_high_bid,
+        "seq": seq,
+        "pot": pot,
     })
 
 
@@ -0,0 +1,272 @@
+# la_subasta/order_book.py - In-memory auction order book
+#
+# Every guest phone polls /api/state (and the horse list) every couple of
+# seconds. Answered from SQLite, one poll costs ~100 queries: total_pot()
+# alone checks scratch + current_high_bid for each of the 20 horses. The
+# order book keeps the same answers in memory:
+#
+#   - per-horse heap of active bids keyed (-amount, bid_time, id), i.e. the
+#     same order as current_high_bid's ORDER BY. Voided bids are dropped
+#     lazily when they surface at the top.
+#   - leader per horse, horses each bidder leads, running pot, counters
+#
+# It is rebuilt from SQLite on first use (and after init_db/reset), then
+# kept current by bidding/reset writes through models.after_commit(), i.e.
+# in commit order, under the write lock. SQLite stays the source of truth:
+# bid validation still runs inside the write transaction, and a failed
+# in-memory update just drops the book so the next read rebuilds it.
+
+import heapq
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from la_subasta.config import EVENT_YEAR, HOUSE_BIDDER_IDENTITY
+from la_subasta.models import _db_path, db_generation, get_conn, register_view
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BookBid:
+    id: int
+    bidder_id: int
+    horse_id: int
+    amount: float
+    bid_time: str
+
+
+class OrderBook:
+    """Active bids, leaders and totals for one event year."""
+
+    def __init__(self, event_year: int = EVENT_YEAR):
+        self.event_year = event_year
+        self._lock = threading.RLock()
+
+        self._active: Dict[int, BookBid] = {}          # bid id -> active bid
+        self._seen: Set[int] = set()                   # every bid id, voided too
+        self._heaps: Dict[int, list] = {}              # horse -> [(-amt, time, id)]
+        self._leaders: Dict[int, BookBid] = {}         # horse -> leading bid
+        self._leading: Dict[int, Set[int]] = {}        # bidder -> horses led
+        self._bidders: Dict[int, dict] = {}            # id -> identity/name/emoji
+        self._scratched: Set[int] = set()
+        self._pot = 0.0
+
+        # Build provenance — see get_book()
+        self.generation = None
+        self.db_path = None
+        self.build_ms = 0.0
+
+    # -----------------------------------------------------------------
+    # Build
+    # -----------------------------------------------------------------
+
+    def load(self) -> "OrderBook":
+        """Populate from SQLite (bidders, scratches, every bid)."""
+        start = time.perf_counter()
+        conn = get_conn()
+        self.generation = db_generation()
+        self.db_path = _db_path()
+        with self._lock:
+            for row in conn.execute(
+                "SELECT id, identity, name, emoji FROM bidders WHERE event_year = ?",
+                (self.event_year,),
+            ):
+                self.add_bidder(dict(row))
+            for row in conn.execute(
+                "SELECT horse_id FROM horse_state WHERE scratched = 1 AND event_year = ?",
+                (self.event_year,),
+            ):
+                self._scratched.add(row["horse_id"])
+            for row in conn.execute(
+                "SELECT id, bidder_id, horse_id, amount, bid_time, voided "
+                "FROM bids WHERE event_year = ?",
+                (self.event_year,),
+            ):
+                self._seen.add(row["id"])
+                if not row["voided"]:
+                    bid = BookBid(row["id"], row["bidder_id"], row["horse_id"],
+                                  row["amount"], row["bid_time"])
+                    self._active[bid.id] = bid
+                    self._heaps.setdefault(bid.horse_id, []).append(
+                        (-bid.amount, bid.bid_time, bid.id))
+            for horse_id, heap in self._heaps.items():
+                heapq.heapify(heap)
+                self._refresh_leader(horse_id)
+        self.build_ms = round((time.perf_counter() - start) * 1000.0, 2)
+        return self
+
+    # -----------------------------------------------------------------
+    # Writes (called after commit)
+    # -----------------------------------------------------------------
+
+    def add_bidder(self, row: dict) -> None:
+        with self._lock:
+            self._bidders[row["id"]] = {
+                "identity": row["identity"], "name": row["name"], "emoji": row["emoji"],
+            }
+
+    def add_bid(self, bid: BookBid) -> None:
+        with self._lock:
+            if bid.id in self._seen:
+                return      # already loaded by a rebuild that raced the commit
+            self._seen.add(bid.id)
+            self._active[bid.id] = bid
+            heapq.heappush(self._heaps.setdefault(bid.horse_id, []),
+                           (-bid.amount, bid.bid_time, bid.id))
+            self._refresh_leader(bid.horse_id)
+
+    def void_bid(self, bid_id: int) -> None:
+        with self._lock:
+            bid = self._active.pop(bid_id, None)
+            if bid is not None:
+                self._refresh_leader(bid.horse_id)
+
+    def set_scratched(self, horse_id: int, scratched: bool) -> None:
+        with self._lock:
+            if scratched == (horse_id in self._scratched):
+                return
+            leader = self._leaders.get(horse_id)
+            if scratched:
+                self._scratched.add(horse_id)
+                if leader is not None:
+                    self._pot -= leader.amount
+            else:
+                self._scratched.discard(horse_id)
+                if leader is not None:
+                    self._pot += leader.amount
+
+    def _refresh_leader(self, horse_id: int) -> None:
+        """Drop voided heap tops and re-point the leader maps + pot."""
+        heap = self._heaps.get(horse_id, [])
+        while heap and heap[0][2] not in self._active:
+            heapq.heappop(heap)
+        new = self._active[heap[0][2]] if heap else None
+        old = self._leaders.get(horse_id)
+        if new == old:
+            return
+
+        counted = horse_id not in self._scratched
+        if old is not None:
+            self._leading.get(old.bidder_id, set()).discard(horse_id)
+            if counted:
+                self._pot -= old.amount
+        if new is not None:
+            self._leaders[horse_id] = new
+            self._leading.setdefault(new.bidder_id, set()).add(horse_id)
+            if counted:
+                self._pot += new.amount
+        else:
+            self._leaders.pop(horse_id, None)
+
+    # -----------------------------------------------------------------
+    # Reads
+    # -----------------------------------------------------------------
+
+    def high_bid(self, horse_id: int) -> Optional[dict]:
+        """Same shape as bidding.current_high_bid's row."""
+        with self._lock:
+            bid = self._leaders.get(horse_id)
+            if bid is None:
+                return None
+            who = self._bidders.get(bid.bidder_id, {})
+            return {
+                "id": bid.id, "bidder_id": bid.bidder_id, "horse_id": bid.horse_id,
+                "amount": bid.amount, "bid_time": bid.bid_time,
+                "identity": who.get("identity"), "name": who.get("name"),
+                "emoji": who.get("emoji"),
+            }
+
+    def leading_by(self, bidder_id: int) -> List[int]:
+        with self._lock:
+            return sorted(self._leading.get(bidder_id, ()))
+
+    def is_scratched(self, horse_id: int) -> bool:
+        return horse_id in self._scratched
+
+    def total_pot(self) -> float:
+        # Re-rounded so float drift from += / -= never shows up in the UI
+        return round(self._pot, 2)
+
+    def count_bidders(self, include_house: bool = False) -> int:
+        with self._lock:
+            if include_house:
+                return len(self._bidders)
+            return sum(1 for b in self._bidders.values()
+                       if b["identity"] != HOUSE_BIDDER_IDENTITY)
+
+    def count_bids(self, include_voided: bool = True) -> int:
+        return len(self._seen) if include_voided else len(self._active)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "event_year": self.event_year,
+                "active_bids": len(self._active),
+                "bids": len(self._seen),
+                "bidders": len(self._bidders),
+                "leaders": len(self._leaders),
+                "heap_entries": sum(len(h) for h in self._heaps.values()),
+                "build_ms": self.build_ms,
+            }
+
+
+# -----------------------------------------------------------------------------
+# Registry — one book per event year, rebuilt when the DB is reopened/reset
+# -----------------------------------------------------------------------------
+
+_books: Dict[int, OrderBook] = {}
+_books_lock = threading.Lock()
+
+
+def _is_current(book: Optional[OrderBook]) -> bool:
+    return (book is not None and book.generation == db_generation()
+            and book.db_path == _db_path())
+
+
+def get_book(event_year: int = EVENT_YEAR) -> OrderBook:
+    """The event year's book, (re)built from SQLite if missing or stale."""
+    book = _books.get(event_year)
+    if _is_current(book):
+        return book
+    with _books_lock:
+        book = _books.get(event_year)
+        if not _is_current(book):
+            book = OrderBook(event_year).load()
+            _books[event_year] = book
+            logger.info("Order book %d built in %.1f ms (%d active bids)",
+                        event_year, book.build_ms, book.count_bids(include_voided=False))
+        return book
+
+
+def invalidate(event_year: Optional[int] = None) -> None:
+    """Drop a book (or all) — the next read rebuilds from SQLite."""
+    with _books_lock:
+        if event_year is None:
+            _books.clear()
+        else:
+            _books.pop(event_year, None)
+
+
+def apply(event_year: int, fn: Callable[[OrderBook], None]) -> None:
+    """
+    Apply a committed write to the year's book. No book yet means nothing to
+    do (the first read loads the write from SQLite); an error drops the book
+    rather than leave it wrong.
+    """
+    # Taking the registry lock waits out a rebuild in progress on another
+    # thread, so a write that committed after its SQL snapshot still lands
+    with _books_lock:
+        book = _books.get(event_year)
+        if not _is_current(book):
+            return
+        try:
+            fn(book)
+        except Exception:
+            logger.exception("Order book update failed — rebuilding on next read")
+            _books.pop(event_year, None)
+
+
+register_view(invalidate)
@@ -1,13 +1,18 @@
-# la_subasta/payouts.py - 60/25/15 win/place/show split
+# la_subasta/payouts.py - 60/25/15 win/place/show split + settlement
 #
 # Called after race results are entered. Freezes ownership from current
-# high bids, computes payouts against the total pot, persists them.
+# high bids, computes payouts against the total pot, persists them, and
+# writes every bidder's statement (owed / winnings / net).
+#
+# Settlement is set-based: each table is filled by one INSERT ... SELECT
+# over the whole year, all in one write transaction, so the cost doesn't
+# grow with a query per horse, per finish or per bidder.
 
 from typing import Dict, List, Optional
 
 from la_subasta import settings
 from la_subasta.config import EVENT_YEAR, NUM_HORSES
-from la_subasta.bidding import current_high_bid, is_horse_scratched
+from la_subasta.bidding import bidder_portfolio
 from la_subasta.models import get_conn, house_bidder_id, write_txn
 
 
@@ -48,9 +53,12 @@ def current_payout_pcts() -> Dict[str, float]:
     return parse_payout_preset(settings.get_setting("PAYOUT_PRESET"))
 
 
-def compute_payout_amounts(total_pot: float) -> Dict[str, float]:
-    """Return the three payout amounts for a given pot. Pure-ish (reads settings)."""
-    pcts = current_payout_pcts()
+def compute_payout_amounts(total_pot: float,
+                           pcts: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Return the three payout amounts for a given pot. Pure-ish (reads
+    settings unless `pcts` is given)."""
+    if pcts is None:
+        pcts = current_payout_pcts()
     return {
         "win":   round(total_pot * pcts["win"], 2),
         "place": round(total_pot * pcts["place"], 2),
@@ -58,6 +66,65 @@ def compute_payout_amounts(total_pot: float) -> Dict[str, float]:
     }
 
 
+# Leader per horse: one seek per horse on idx_bids_leader (the same order
+# bid placement uses — amount, then the earlier bid), scratched horses left
+# out. A ROW_NUMBER() window over the year's bids gives the same rows but
+# has to scan and sort every bid; the index already has them in order.
+_FREEZE_SQL = """
+    WITH RECURSIVE horse(id) AS (
+        SELECT 1 UNION ALL SELECT id + 1 FROM horse WHERE id < :horses
+    )
+    INSERT INTO ownership (horse_id, bidder_id, winning_bid, event_year)
+    SELECT l.horse_id, l.bidder_id, l.amount, l.event_year
+      FROM horse h
+      JOIN bids l ON l.id = (SELECT b.id FROM bids b
+                              WHERE b.horse_id = h.id AND b.event_year = :year
+                                AND b.voided = 0
+                              ORDER BY b.amount DESC, b.bid_time, b.id
+                              LIMIT 1)
+     WHERE NOT EXISTS (SELECT 1 FROM horse_state s
+                        WHERE s.horse_id = h.id AND s.event_year = :year
+                          AND s.scratched = 1)
+    RETURNING horse_id, bidder_id, winning_bid
+"""
+
+# One row per finish; an unowned horse's share goes to The House
+_PAYOUTS_SQL = """
+    INSERT INTO payouts (bidder_id, horse_id, finish, amount, event_year)
+    SELECT COALESCE(o.bidder_id, :house), f.column2, f.column1, f.column3, :year
+      FROM (VALUES ('win', :win, :win_amt), ('place', :place, :place_amt),
+                   ('show', :show, :show_amt)) f
+      LEFT JOIN ownership o ON o.horse_id = f.column2 AND o.event_year = :year
+    RETURNING finish, horse_id, bidder_id, amount
+"""
+
+# Every bidder of the year, plus anyone else holding a horse or a payout
+# (The House): what they pay in, what they win, and the difference
+_STATEMENTS_SQL = """
+    INSERT INTO bidder_statements (bidder_id, horses, owed, winnings, net, event_year)
+    SELECT bd.id, COALESCE(o.horses, 0), COALESCE(o.owed, 0), COALESCE(w.winnings, 0),
+           ROUND(COALESCE(w.winnings, 0) - COALESCE(o.owed, 0), 2), :year
+      FROM bidders bd
+      LEFT JOIN (SELECT bidder_id, COUNT(*) AS horses, SUM(winning_bid) AS owed
+                   FROM ownership WHERE event_year = :year GROUP BY bidder_id) o
+             ON o.bidder_id = bd.id
+      LEFT JOIN (SELECT bidder_id, SUM(amount) AS winnings
+                   FROM payouts WHERE event_year = :year GROUP BY bidder_id) w
+             ON w.bidder_id = bd.id
+     WHERE bd.event_year = :year OR o.bidder_id IS NOT NULL OR w.bidder_id IS NOT NULL
+"""
+
+_FINISH_ORDER = {"win": 0, "place": 1, "show": 2}
+
+
+def _freeze_in_txn(conn, event_year: int) -> List[dict]:
+    conn.execute("DELETE FROM ownership WHERE event_year = ?", (event_year,))
+    rows = [dict(r) for r in conn.execute(
+        _FREEZE_SQL, {"year": event_year, "horses": NUM_HORSES})]
+    rows.sort(key=lambda r: r["horse_id"])
+    return rows
+
+
 def freeze_ownership(event_year: int = EVENT_YEAR) -> List[dict]:
     """
     Snapshot current high bidders into the `ownership` table. Called once
@@ -66,28 +133,8 @@ def freeze_ownership(event_year: int = EVENT_YEAR) -> List[dict]:
     Horses with no bids get no ownership row (they go to The House at $0
     for payout purposes, handled by compute_and_persist_payouts).
     """
-    rows = []
     with write_txn() as conn:
-        conn.execute(
-            "DELETE FROM ownership WHERE event_year = ?", (event_year,),
-        )
-        for horse_id in range(1, NUM_HORSES + 1):
-            if is_horse_scratched(horse_id, event_year):
-                continue
-            hb = current_high_bid(horse_id, event_year)
-            if hb is None:
-                continue
-            conn.execute(
-                "INSERT INTO ownership (horse_id, bidder_id, winning_bid, event_year) "
-                "VALUES (?, ?, ?, ?)",
-                (horse_id, hb["bidder_id"], hb["amount"], event_year),
-            )
-            rows.append({
-                "horse_id": horse_id,
-                "bidder_id": hb["bidder_id"],
-                "winning_bid": hb["amount"],
-            })
-    return rows
+        return _freeze_in_txn(conn, event_year)
 
 
 def get_owner(horse_id: int, event_year: int = EVENT_YEAR) -> Optional[dict]:
@@ -108,62 +155,42 @@ def compute_and_persist_payouts(win_horse_id: int, place_horse_id: int,
                                 show_horse_id: int,
                                 event_year: int = EVENT_YEAR) -> dict:
     """
-    Compute 60/25/15 payouts and persist to the `payouts` table.
+    Settle the year in one write transaction: ownership (frozen now if the
+    lock didn't), the three payouts against the pot, every bidder's
+    statement, and auction_state.total_pot.
 
-    If a winning horse has no owner (went to The House), the payout row is
-    still computed but bidder_id is set to 0 and the caller can route the
-    amount to the House fund.
+    If a finishing horse has no owner, its payout goes to The House and the
+    row is flagged is_house.
 
     Returns a dict with the payout breakdown + total pot used.
     """
-    # Total pot = sum of winning bids in ownership (post-lock snapshot).
-    # If freeze_ownership hasn't been called yet, call it now.
-    own_count = get_conn().execute(
-        "SELECT COUNT(*) AS c FROM ownership WHERE event_year = ?",
-        (event_year,),
-    ).fetchone()["c"]
-    if own_count == 0:
-        freeze_ownership(event_year)
-
-    pot_row = get_conn().execute(
-        "SELECT COALESCE(SUM(winning_bid), 0) AS pot "
-        "FROM ownership WHERE event_year = ?",
-        (event_year,),
-    ).fetchone()
-    pot = float(pot_row["pot"])
-
-    amounts = compute_payout_amounts(pot)
-
-    finishes = [
-        ("win",   win_horse_id,   amounts["win"]),
-        ("place", place_horse_id, amounts["place"]),
-        ("show",  show_horse_id,  amounts["show"]),
-    ]
-
+    pcts = current_payout_pcts()
     house_id = house_bidder_id()
-    results = []
-    with write_txn() as conn:
-        conn.execute(
-            "DELETE FROM payouts WHERE event_year = ?", (event_year,),
-        )
-        for finish, horse_id, amount in finishes:
-            owner = get_owner(horse_id, event_year)
-            bidder_id = owner["bidder_id"] if owner else house_id
-            conn.execute(
-                "INSERT INTO payouts (bidder_id, horse_id, finish, amount, event_year) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (bidder_id, horse_id, finish, amount, event_year),
-            )
-            results.append({
-                "finish": finish,
-                "horse_id": horse_id,
-                "bidder_id": bidder_id,
-                "amount": amount,
-                "is_house": owner is None,
-            })
-
-    # Update total_pot on auction_state for display convenience
     with write_txn() as conn:
+        # Total pot = sum of winning bids in ownership (post-lock snapshot)
+        if conn.execute("SELECT 1 FROM ownership WHERE event_year = ? LIMIT 1",
+                        (event_year,)).fetchone() is None:
+            _freeze_in_txn(conn, event_year)
+        pot = float(conn.execute(
+            "SELECT COALESCE(SUM(winning_bid), 0) FROM ownership WHERE event_year = ?",
+            (event_year,),
+        ).fetchone()[0])
+        amounts = compute_payout_amounts(pot, pcts)
+
+        conn.execute("DELETE FROM payouts WHERE event_year = ?", (event_year,))
+        rows = conn.execute(_PAYOUTS_SQL, {
+            "year": event_year, "house": house_id,
+            "win": win_horse_id, "win_amt": amounts["win"],
+            "place": place_horse_id, "place_amt": amounts["place"],
+            "show": show_horse_id, "show_amt": amounts["show"],
+        }).fetchall()
+        results = sorted(({**dict(r), "is_house": r["bidder_id"] == house_id}
+                          for r in rows), key=lambda r: _FINISH_ORDER[r["finish"]])
+
+        conn.execute("DELETE FROM bidder_statements WHERE event_year = ?", (event_year,))
+        conn.execute(_STATEMENTS_SQL, {"year": event_year})
+
+        # Update total_pot on auction_state for display convenience
         conn.execute(
             "UPDATE auction_state SET total_pot = ? WHERE event_year = ?",
             (pot, event_year),
@@ -176,6 +203,42 @@ def compute_and_persist_payouts(win_horse_id: int, place_horse_id: int,
     }
 
 
+def list_statements(event_year: int = EVENT_YEAR) -> List[dict]:
+    """Every bidder's settlement statement, biggest winners first."""
+    rows = get_conn().execute(
+        """
+        SELECT s.bidder_id, bd.identity, s.horses, s.owed, s.winnings, s.net,
+               bd.paid, bd.paid_amount, s.settled_at
+          FROM bidder_statements s
+          JOIN bidders bd ON bd.id = s.bidder_id
+         WHERE s.event_year = ?
+         ORDER BY s.net DESC, s.bidder_id
+        """,
+        (event_year,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def mark_paid(bidder_id: int, event_year: int = EVENT_YEAR) -> float:
+    """
+    Record that a bidder paid up. The amount is their statement's `owed`
+    once the year is settled; before that, what their leading horses cost
+    right now. Returns the amount recorded.
+    """
+    with write_txn() as conn:
+        row = conn.execute(
+            "SELECT owed FROM bidder_statements WHERE bidder_id = ? AND event_year = ?",
+            (bidder_id, event_year),
+        ).fetchone()
+        amount = row["owed"] if row else bidder_portfolio(bidder_id, event_year)["total"]
+        conn.execute(
+            "UPDATE bidders SET paid = 1, paid_at = datetime('now'), "
+            "paid_amount = ? WHERE id = ?",
+            (amount, bidder_id),
+        )
+    return amount
+
+
 def list_payouts(event_year: int = EVENT_YEAR) -> List[dict]:
     rows = get_conn().execute(
         """
@@ -0,0 +1,303 @@
+# la_subasta/registration.py - Registration fast path: identity index + holds
+#
+# A guest's identity is their name plus one of the EMOJI_PALETTE emojis, and
+# it has to be unique. Finding a free one used to mean a check-identity
+# round trip (and a SQLite query) per emoji tried, again after every name
+# edit — several per guest during the arrival rush. Instead:
+#
+#   - IdentityIndex keeps every registered identity in memory. It is built
+#     from SQLite on first use (and after init_db/reset) and kept current
+#     through models.after_commit(), like the order book, so availability()
+#     answers for the whole palette with set lookups and no query.
+#   - hold() reserves the emoji a phone just picked for HOLD_SECONDS. Other
+#     phones see it as taken, and register_bidder() refuses it to anyone
+#     but the hold's token. Holds are in-memory and lapse on their own.
+#   - claim() is register_bidder()'s check-and-claim: under the index lock
+#     it checks the hold and marks the identity pending, so no hold() can
+#     slip in between the check and the INSERT. unclaim() ends it once the
+#     write has committed (the identity is taken by then) or rolled back.
+#
+# The bidders.identity UNIQUE constraint is still the last word: a guest
+# registering without a hold can lose the race, and gets the usual 409.
+
+import logging
+import secrets
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from la_subasta.config import EMOJI_PALETTE
+from la_subasta.models import _db_path, db_generation, get_conn, register_view
+
+logger = logging.getLogger(__name__)
+
+# Long enough to type a name and tap Enter, short enough that an abandoned
+# phone gives the emoji back before anyone minds
+HOLD_SECONDS = 60.0
+
+
+def identity_of(name: str, emoji: str) -> str:
+    """The stored identity string (matches register_bidder)."""
+    return f"{(name or '').strip()} {(emoji or '').strip()}"
+
+
+class IdentityIndex:
+    """
+    Registered identities plus short-lived holds, for one database.
+
+    Args:
+        hold_seconds: How long a hold lasts without being renewed.
+        clock: Monotonic clock (tests).
+    """
+
+    def __init__(self, hold_seconds: float = HOLD_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.hold_seconds = hold_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._taken: Set[str] = set()
+        self._holds: Dict[str, Tuple[str, float]] = {}     # identity -> (token, expires)
+        self._by_token: Dict[str, str] = {}                # token -> identity
+        self._pending: Dict[str, Tuple[str, Optional[str]]] = {}  # identity -> (claim, token)
+
+        # Build provenance — see get_index()
+        self.generation = None
+        self.db_path = None
+        self.build_ms = 0.0
+
+        # Monitoring
+        self.lookups = 0
+        self.holds_granted = 0
+        self.holds_refused = 0
+        self.holds_expired = 0
+
+    def load(self) -> "IdentityIndex":
+        """Every identity in the bidders table (UNIQUE across all years)."""
+        start = time.perf_counter()
+        self.generation = db_generation()
+        self.db_path = _db_path()
+        rows = get_conn().execute("SELECT identity FROM bidders").fetchall()
+        with self._lock:
+            self._taken = {r["identity"] for r in rows}
+        self.build_ms = round((time.perf_counter() - start) * 1000.0, 2)
+        return self
+
+    # -----------------------------------------------------------------
+    # Holds
+    # -----------------------------------------------------------------
+
+    def _expire(self, now: float) -> None:
+        """Drop lapsed holds. Caller holds self._lock."""
+        for identity in [i for i, (_, exp) in self._holds.items() if exp <= now]:
+            token, _ = self._holds.pop(identity)
+            if self._by_token.get(token) == identity:
+                del self._by_token[token]
+            self.holds_expired += 1
+
+    def _status(self, identity: str, token: Optional[str], now: float) -> str:
+        if identity in self._taken:
+            return "taken"
+        pending = self._pending.get(identity)
+        if pending is not None:
+            return "yours" if token is not None and pending[1] == token else "held"
+        held = self._holds.get(identity)
+        if held is not None and held[1] > now:
+            return "yours" if token is not None and held[0] == token else "held"
+        return "free"
+
+    def availability(self, name: str, token: Optional[str] = None) -> List[dict]:
+        """
+        Every palette emoji for a name, in palette order:
+        free / taken / held (by another phone) / yours (this token's hold).
+        """
+        name = (name or "").strip()
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self.lookups += 1
+            return [{"emoji": e, "status": self._status(f"{name} {e}", token, now)}
+                    for e in EMOJI_PALETTE]
+
+    def status(self, name: str, emoji: str, token: Optional[str] = None) -> str:
+        """One identity's status (see availability())."""
+        with self._lock:
+            self.lookups += 1
+            return self._status(identity_of(name, emoji), token, self.clock())
+
+    def is_free(self, name: str, emoji: str, token: Optional[str] = None) -> bool:
+        return self.status(name, emoji, token) in ("free", "yours")
+
+    def hold(self, name: str, emoji: str, token: Optional[str] = None) -> Optional[dict]:
+        """
+        Reserve name+emoji for this token, moving any hold the token had.
+        Returns {"token", "identity", "expires_in"}, or None when the
+        identity is registered or held by another phone.
+        """
+        identity = identity_of(name, emoji)
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            if self._status(identity, token, now) not in ("free", "yours"):
+                self.holds_refused += 1
+                return None
+            token = token or secrets.token_urlsafe(12)
+            previous = self._by_token.get(token)
+            if previous is not None and previous != identity:
+                self._holds.pop(previous, None)
+            self._holds[identity] = (token, now + self.hold_seconds)
+            self._by_token[token] = identity
+            self.holds_granted += 1
+        return {"token": token, "identity": identity, "expires_in": self.hold_seconds}
+
+    def release(self, token: str) -> None:
+        with self._lock:
+            identity = self._by_token.pop(token, None)
+            if identity is not None:
+                self._holds.pop(identity, None)
+
+    # -----------------------------------------------------------------
+    # Registration claims
+    # -----------------------------------------------------------------
+
+    def claim(self, identity: str, token: Optional[str] = None) -> Optional[str]:
+        """
+        Check and claim an identity for one registration, atomically.
+        Returns a claim id for unclaim(), or None when another phone holds
+        it or is registering it. Registered identities are left to the
+        UNIQUE constraint (a name can come back after an archive).
+        """
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            if self._status(identity, token, now) == "held":
+                return None
+            claim = secrets.token_urlsafe(12)
+            self._pending[identity] = (claim, token)
+            return claim
+
+    def unclaim(self, identity: str, claim: str) -> None:
+        """End a claim (committed or rolled back). Stale claim ids are ignored."""
+        with self._lock:
+            pending = self._pending.get(identity)
+            if pending is not None and pending[0] == claim:
+                del self._pending[identity]
+
+    # -----------------------------------------------------------------
+    # Writes (called after commit)
+    # -----------------------------------------------------------------
+
+    def add(self, identity: str) -> None:
+        """A bidder was registered: taken for good, and any hold on it ends."""
+        with self._lock:
+            self._taken.add(identity)
+            self._pending.pop(identity, None)
+            held = self._holds.pop(identity, None)
+            if held is not None and self._by_token.get(held[0]) == identity:
+                del self._by_token[held[0]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(self.clock())
+            return {
+                "identities": len(self._taken),
+                "holds": len(self._holds),
+                "pending": len(self._pending),
+                "build_ms": self.build_ms,
+                "lookups": self.lookups,
+                "holds_granted": self.holds_granted,
+                "holds_refused": self.holds_refused,
+                "holds_expired": self.holds_expired,
+            }
+
+
+# -----------------------------------------------------------------------------
+# Registry — one index per database, rebuilt when the DB is reopened/reset
+# -----------------------------------------------------------------------------
+
+_index: Optional[IdentityIndex] = None
+_index_lock = threading.Lock()
+_options: dict = {}
+
+
+def _is_current(index: Optional[IdentityIndex]) -> bool:
+    return (index is not None and index.generation == db_generation()
+            and index.db_path == _db_path())
+
+
+def configure(**kwargs) -> None:
+    """Options (hold_seconds, clock) for indexes built from now on (tests)."""
+    _options.clear()
+    _options.update(kwargs)
+    invalidate()
+
+
+def get_index() -> IdentityIndex:
+    """The index, (re)built from SQLite if missing or stale."""
+    index = _index
+    if _is_current(index):
+        return index
+    return _rebuild()
+
+
+def _rebuild(keep_holds: bool = True) -> IdentityIndex:
+    global _index
+    with _index_lock:
+        index = _index
+        if _is_current(index):
+            return index
+        fresh = IdentityIndex(**_options).load()
+        if keep_holds and index is not None:
+            # Holds and claims outlive a rebuild (e.g. after a bids reset);
+            # ones on identities that are registered now are dropped
+            with index._lock:
+                holds = dict(index._holds)
+                pending = dict(index._pending)
+            for identity, (token, expires) in holds.items():
+                if identity not in fresh._taken:
+                    fresh._holds[identity] = (token, expires)
+                    fresh._by_token[token] = identity
+            fresh._pending = {i: p for i, p in pending.items() if i not in fresh._taken}
+        _index = fresh
+        logger.info("Identity index built in %.1f ms (%d identities)",
+                    fresh.build_ms, len(fresh._taken))
+        return fresh
+
+
+def invalidate() -> None:
+    """Drop the index (bidders deleted) — the next read rebuilds from SQLite."""
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.generation = None
+
+
+def claim(identity: str, token: Optional[str] = None) -> Optional[str]:
+    """IdentityIndex.claim() on the current index."""
+    return get_index().claim(identity, token)
+
+
+def unclaim(identity: str, claim_id: str) -> None:
+    """
+    IdentityIndex.unclaim() on the current index (a rebuild since the claim
+    carried it over).
+    """
+    get_index().unclaim(identity, claim_id)
+
+
+def registered(identity: str) -> None:
+    """
+    Apply a committed registration. No index yet means nothing to do (the
+    first read loads it); an error drops the index rather than leave it wrong.
+    """
+    with _index_lock:
+        index = _index
+        if not _is_current(index):
+            return
+        try:
+            index.add(identity)
+        except Exception:
+            logger.exception("Identity index update failed — rebuilding on next read")
+            index.generation = None
+
+
+register_view(invalidate)
@@ -5,14 +5,16 @@
 # confirm=TESTING parameter at the HTTP layer.
 #
 # All three functions filter by event_year so prior years' data is never
-# touched. settings_audit_log and auction_overrides are deliberately NOT
-# reset — they persist across test runs (audit trail + admin tunables stay
-# intact).
+# touched — past years normally live in their own files anyway (see
+# history.py), so this only ever walks the current year's rows.
+# settings_audit_log and auction_overrides are deliberately NOT reset — they
+# persist across test runs (audit trail + admin tunables stay intact).
 
 from typing import Dict
 
+from la_subasta import analytics, changes, order_book, registration
 from la_subasta.config import EVENT_YEAR, HOUSE_BIDDER_IDENTITY
-from la_subasta.models import _ensure_house_bidder, write_txn
+from la_subasta.models import _ensure_house_bidder, after_commit, write_txn
 from la_subasta.state_machine import AuctionState
 
 
@@ -35,7 +37,7 @@ def _reset_auction_state_row(conn, event_year: int) -> None:
 
 
 def _do_reset_bids(conn, event_year: int) -> Dict[str, int]:
-    """Wipe bids/ownership/payouts + clear scratched flags + reset state.
+    """Wipe bids/ownership/payouts/statements + clear scratched flags + reset state.
     Caller must already be inside write_txn so the whole reset commits atomically."""
     bids_cur = conn.execute(
         "DELETE FROM bids WHERE event_year = ?", (event_year,),
@@ -52,6 +54,10 @@ def _do_reset_bids(conn, event_year: int) -> Dict[str, int]:
     )
     pay_deleted = pay_cur.rowcount or 0
 
+    conn.execute(
+        "DELETE FROM bidder_statements WHERE event_year = ?", (event_year,),
+    )
+
     conn.execute(
         "UPDATE horse_state SET scratched = 0, scratched_at = NULL "
         "WHERE event_year = ?",
@@ -59,6 +65,9 @@ def _do_reset_bids(conn, event_year: int) -> Dict[str, int]:
     )
 
     _reset_auction_state_row(conn, event_year)
+    after_commit(lambda: order_book.invalidate(event_year))
+    after_commit(lambda: changes.reset_log(event_year))
+    after_commit(lambda: analytics.invalidate(event_year))
 
     return {
         "bids":      bids_deleted,
@@ -95,6 +104,7 @@ def reset_full(event_year: int = EVENT_YEAR) -> Dict[str, int]:
             (HOUSE_BIDDER_IDENTITY, event_year),
         )
         result["bidders"] = bd_cur.rowcount or 0
+        after_commit(registration.invalidate)
         # Defensive: re-insert House if somehow missing, and refresh the
         # models-level cached id so house_bidder_id() returns the right row.
         _ensure_house_bidder(conn)
@@ -110,4 +120,6 @@ def reset_state(event_year: int = EVENT_YEAR) -> Dict[str, int]:
     """
     with write_txn() as conn:
         _reset_auction_state_row(conn, event_year)
+        after_commit(lambda: changes.record_state(
+            event_year, AuctionState.NOT_STARTED.value))
     return {"bids": 0, "ownership": 0, "payouts": 0, "bidders": 0}
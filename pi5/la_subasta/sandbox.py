@@ -1,4 +1,684 @@
-# la_subasta/sandbox.py - Auto-simulation (Phase 6, stub for now)
+# la_subasta/sandbox.py - Compressed-time auction rehearsal (Phase 6)
 #
-# Phase 6 will spawn fake bidders and run a compressed-time simulation.
-# Kept as a placeholder so the package layout matches the spec.
+# Run with: python -m la_subasta.sandbox [--bidders N] [--compression X]
+#                                        [--mix early=4,chaser=5,sniper=3]
+#                                        [--seed N] [--db PATH] [--json]
+#           (from pi5/; defaults to a throwaway temp database)
+#
+# Plays a whole auction day against the real blueprint API (Flask test
+# client, so every request goes through routing, validation and the bid
+# writer exactly like a phone's would):
+#
+#   AUCTION_OPEN_TIME   admin start                      -> OPEN
+#   lock - 15 min       admin final-hour                 -> FINAL_HOUR
+#   post - LOCKDOWN     admin lock (ownership frozen)    -> LOCKED
+#   post + 2 min        admin results                    -> RACE_COMPLETE -> SETTLED
+#
+# Fake bidders register through /api/register and bid through /api/bid with
+# one of three strategies:
+#
+#   early   opens cold horses in the morning, then drifts off
+#   chaser  keeps raising the most expensive horses all day
+#   sniper  silent until FINAL_HOUR, then max-raises its targets
+#
+# Bidder gaps are real seconds (spec: 5-30 s apart), so the request rate on
+# the Pi is realistic whatever the compression; the day's phases run on a
+# services.scheduler ScaledClock (SANDBOX_TIME_COMPRESSION = 32 -> a full day
+# in about 16 minutes). Tests pass a VirtualClock and the day runs in
+# seconds. The report covers the HTTP, database and realtime (SocketIO) load
+# the run generated.
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from la_subasta import config as la_config  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+RESULTS_AFTER_POST_S = 120       # race runs ~2 min before results go in
+POLL_INTERVAL_S = 2.0            # guest phones poll /api/state + /api/horses
+UNDO_CHANCE = 0.04               # fat-finger undos, within the 10 s window
+DEFAULT_MIX = {"early": 0.4, "chaser": 0.35, "sniper": 0.25}
+
+
+# -----------------------------------------------------------------------------
+# Fake bidders
+# -----------------------------------------------------------------------------
+
+class FakeBidder:
+    """One simulated guest. Subclasses pick when to act and what to bid."""
+
+    strategy = "base"
+
+    def __init__(self, idx: int, rng: random.Random):
+        self.idx = idx
+        self.rng = rng
+        self.name = f"{self.strategy.title()} {idx}"
+        self.emoji = la_config.EMOJI_PALETTE[idx % len(la_config.EMOJI_PALETTE)]
+        self.bidder_id: Optional[int] = None
+        self.accepted = 0
+        self.rejected = 0
+
+    def gap(self, phase: str, day_fraction: float) -> Optional[float]:
+        """Real seconds until the next look at the board; None = sit out."""
+        return self.rng.uniform(5.0, 30.0)
+
+    def pick(self, horses: List[dict], rules: dict, phase: str):
+        """(horse_id, amount) to bid, or None."""
+        raise NotImplementedError
+
+    # Shared helpers
+    def _open_horses(self, horses):
+        return [h for h in horses if not h["scratched"]
+                and h["current_leader_bidder_id"] != self.bidder_id]
+
+    def _leading(self, horses) -> int:
+        return sum(1 for h in horses if h["current_leader_bidder_id"] == self.bidder_id)
+
+    @staticmethod
+    def _current(h) -> float:
+        hb = h["current_high_bid"]
+        return hb["amount"] if hb else 0.0
+
+    def _raise(self, h, rules, lo=1, hi=None) -> int:
+        current = self._current(h)
+        hi = rules["MAX_RAISE"] if hi is None else min(hi, rules["MAX_RAISE"])
+        if current <= 0:
+            return rules["MIN_BID"] + self.rng.randint(0, min(2, rules["MAX_RAISE"]))
+        return int(current) + self.rng.randint(lo, max(lo, hi))
+
+
+class EarlyOpener(FakeBidder):
+    """Busy in the morning opening cold horses; rarely back after that."""
+
+    strategy = "early"
+
+    def gap(self, phase, day_fraction):
+        if day_fraction < 0.35:
+            return self.rng.uniform(5.0, 20.0)
+        return self.rng.uniform(30.0, 90.0)
+
+    def pick(self, horses, rules, phase):
+        if self._leading(horses) >= rules["MAX_HORSES_PER_BIDDER"]:
+            return None
+        candidates = self._open_horses(horses)
+        cold = [h for h in candidates if h["current_high_bid"] is None]
+        pool = cold or candidates
+        if not pool:
+            return None
+        h = self.rng.choice(pool)
+        return h["horse_id"], self._raise(h, rules, hi=3)
+
+
+class FavouriteChaser(FakeBidder):
+    """Keeps bidding the hottest horses up, a dollar or two at a time."""
+
+    strategy = "chaser"
+
+    def gap(self, phase, day_fraction):
+        if phase == "FINAL_HOUR":
+            return self.rng.uniform(4.0, 12.0)
+        return self.rng.uniform(10.0, 30.0)
+
+    def pick(self, horses, rules, phase):
+        if self._leading(horses) >= rules["MAX_HORSES_PER_BIDDER"]:
+            return None
+        candidates = sorted(self._open_horses(horses), key=self._current, reverse=True)
+        if not candidates:
+            return None
+        h = self.rng.choice(candidates[:4])
+        return h["horse_id"], self._raise(h, rules, hi=2)
+
+
+class Sniper(FakeBidder):
+    """Waits for FINAL_HOUR, then max-raises a couple of target horses."""
+
+    strategy = "sniper"
+
+    def __init__(self, idx, rng):
+        super().__init__(idx, rng)
+        self.targets = rng.sample(range(1, la_config.NUM_HORSES + 1), 3)
+
+    def gap(self, phase, day_fraction):
+        if phase == "FINAL_HOUR":
+            return self.rng.uniform(3.0, 8.0)
+        return None
+
+    def pick(self, horses, rules, phase):
+        if phase != "FINAL_HOUR" or self._leading(horses) >= rules["MAX_HORSES_PER_BIDDER"]:
+            return None
+        candidates = [h for h in self._open_horses(horses) if h["horse_id"] in self.targets]
+        if not candidates:
+            candidates = self._open_horses(horses)
+        if not candidates:
+            return None
+        h = self.rng.choice(candidates)
+        return h["horse_id"], self._raise(h, rules, lo=rules["MAX_RAISE"])
+
+
+STRATEGIES = {
+    "early": EarlyOpener,
+    "chaser": FavouriteChaser,
+    "sniper": Sniper,
+}
+
+
+def build_population(count: int, mix: Optional[Dict[str, float]] = None,
+                     seed: Optional[int] = None) -> List[FakeBidder]:
+    """`count` bidders split by `mix` weights (strategy -> weight)."""
+    mix = mix or DEFAULT_MIX
+    unknown = set(mix) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(sorted(unknown))}")
+    total = float(sum(mix.values()))
+    if total <= 0:
+        raise ValueError("mix weights must be positive")
+    rng = random.Random(seed)
+    # Largest-remainder split so the counts add up to exactly `count`
+    shares = {k: count * w / total for k, w in mix.items()}
+    counts = {k: int(v) for k, v in shares.items()}
+    for k in sorted(shares, key=lambda k: shares[k] - counts[k], reverse=True):
+        if sum(counts.values()) >= count:
+            break
+        counts[k] += 1
+    bidders: List[FakeBidder] = []
+    for kind, n in counts.items():
+        for _ in range(n):
+            bidders.append(STRATEGIES[kind](len(bidders), random.Random(rng.random())))
+    return bidders
+
+
+# -----------------------------------------------------------------------------
+# Realtime counter
+# -----------------------------------------------------------------------------
+
+class CountingSocketIO:
+    """Stands in for Flask-SocketIO: counts events and payload bytes, and
+    forwards to a real server if given one."""
+
+    def __init__(self, forward=None, clock=None):
+        self.forward = forward
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.events: Counter = Counter()
+        self.bytes = 0
+        self.per_minute: Counter = Counter()
+
+    def emit(self, event, payload=None, room=None, **kwargs):
+        size = len(json.dumps(payload, default=str)) if payload is not None else 0
+        with self._lock:
+            self.events[event] += 1
+            self.bytes += size
+            if self.clock is not None:
+                self.per_minute[int(self.clock.now() // 60)] += 1
+        if self.forward is not None:
+            if room is not None:
+                self.forward.emit(event, payload, room=room, **kwargs)
+            else:
+                self.forward.emit(event, payload, **kwargs)
+
+
+# -----------------------------------------------------------------------------
+# Timeline
+# -----------------------------------------------------------------------------
+
+def _hhmm_seconds(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+def day_timeline(open_time: str, post_time: str, lockdown_minutes: int,
+                 final_hour_minutes: int = la_config.FINAL_HOUR_MINUTES) -> Dict[str, float]:
+    """Phase offsets in seconds from the auction opening."""
+    open_s = _hhmm_seconds(open_time)
+    post = _hhmm_seconds(post_time) - open_s
+    lock = post - lockdown_minutes * 60
+    if lock <= 0:
+        raise ValueError("Auction opens after lockdown — check AUCTION_OPEN_TIME")
+    return {
+        "OPEN": 0.0,
+        "FINAL_HOUR": float(max(0, lock - final_hour_minutes * 60)),
+        "LOCKED": float(lock),
+        "RESULTS": float(post + RESULTS_AFTER_POST_S),
+    }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+# -----------------------------------------------------------------------------
+# Simulation
+# -----------------------------------------------------------------------------
+
+class Sandbox:
+    """
+    One rehearsal of the auction day.
+
+    Args:
+        app: Flask app with la_subasta_bp registered. None builds one.
+        bidders: Fake bidder population (see build_population()).
+        compression: Clock seconds per real second.
+        clock: services.scheduler clock. Default ScaledClock(compression);
+            pass a VirtualClock to run the whole day inside run().
+        seed: RNG seed for results/scratches/undos.
+        workers: Concurrent request threads (real clocks only).
+        poll_interval: Real seconds between guest polls; None disables them.
+        scratches: Horses the admin scratches mid-morning.
+    """
+
+    def __init__(self, app=None, bidders: Optional[List[FakeBidder]] = None,
+                 compression: float = la_config.SANDBOX_TIME_COMPRESSION,
+                 clock=None, seed: Optional[int] = None, workers: int = 8,
+                 poll_interval: Optional[float] = POLL_INTERVAL_S,
+                 scratches: int = 1):
+        from services.scheduler import ScaledClock, Scheduler, VirtualClock
+
+        self.compression = float(compression)
+        self.clock = clock if clock is not None else ScaledClock(self.compression)
+        self.virtual = isinstance(self.clock, VirtualClock)
+        self.scheduler = Scheduler(self.clock, name="SandboxScheduler")
+        self.rng = random.Random(seed)
+        self.bidders = bidders if bidders is not None else build_population(
+            la_config.SANDBOX_FAKE_BIDDER_COUNT, seed=seed)
+        self.poll_interval = poll_interval
+        self.scratches = scratches
+        self.socketio = CountingSocketIO(clock=self.clock)
+        self.app = app if app is not None else self._make_app()
+        self._pool = (ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sandbox")
+                      if workers and not self.virtual else None)
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._phase = "NOT_STARTED"
+        self._start = 0.0
+        self._timeline: Dict[str, float] = {}
+        self._rules: dict = {}
+        self._writer_before: Optional[dict] = None
+        self._wall_s = 0.0
+
+        # Report
+        self.phases: Dict[str, float] = {}
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.status: Counter = Counter()
+        self.rejections: Counter = Counter()
+        self.bids_per_minute: Counter = Counter()
+        self.undos = 0
+        self.errors: List[str] = []
+        self.results: Optional[dict] = None
+
+    def _make_app(self):
+        from flask import Flask
+        from la_subasta import init_la_subasta, la_subasta_bp
+        app = Flask(__name__)
+        init_la_subasta(socketio=self.socketio, racing_service=None)
+        app.register_blueprint(la_subasta_bp)
+        return app
+
+    # -----------------------------------------------------------------
+    # HTTP
+    # -----------------------------------------------------------------
+
+    def _call(self, method: str, path: str, body: Optional[dict] = None,
+              label: Optional[str] = None):
+        label = label or path
+        client = self.app.test_client()
+        t0 = time.perf_counter()
+        resp = client.open("/la-subasta" + path, method=method, json=body)
+        elapsed = time.perf_counter() - t0
+        data = resp.get_json(silent=True) or {}
+        with self._lock:
+            self.latency[label].append(elapsed)
+            self.status[resp.status_code // 100 * 100] += 1
+            if resp.status_code >= 500:
+                self.errors.append(f"{method} {path} -> {resp.status_code}")
+        return resp.status_code, data
+
+    def _admin(self, path: str, body: Optional[dict] = None) -> dict:
+        status, data = self._call("POST", path, body or {}, label="admin")
+        if status != 200:
+            self.errors.append(f"admin {path}: {data.get('error', status)}")
+        return data
+
+    # -----------------------------------------------------------------
+    # Scheduling helpers
+    # -----------------------------------------------------------------
+
+    def _elapsed(self) -> float:
+        return self.clock.now() - self._start
+
+    def _day_fraction(self) -> float:
+        return min(1.0, self._elapsed() / self._timeline["LOCKED"])
+
+    def _at(self, offset: float, fn, *args) -> None:
+        self.scheduler.call_at(self._start + offset, self._dispatch, fn, args)
+
+    def _later(self, real_seconds: float, fn, *args) -> None:
+        self.scheduler.call_later(real_seconds * self.compression, self._dispatch, fn, args)
+
+    def _dispatch(self, fn, args) -> None:
+        if self._done.is_set():
+            return
+        if self._pool is not None:
+            self._pool.submit(self._guarded, fn, args)
+        else:
+            self._guarded(fn, args)
+
+    def _guarded(self, fn, args) -> None:
+        try:
+            fn(*args)
+        except Exception as exc:
+            logger.exception("Sandbox step %s failed", getattr(fn, "__name__", fn))
+            with self._lock:
+                self.errors.append(f"{getattr(fn, '__name__', fn)}: {exc}")
+
+    # -----------------------------------------------------------------
+    # Admin script
+    # -----------------------------------------------------------------
+
+    def _enter_phase(self, phase: str, path: str) -> None:
+        self._admin(path)
+        self._phase = phase
+        self.phases[phase] = round(self._elapsed(), 1)
+
+    def _open(self) -> None:
+        self._enter_phase("OPEN", "/api/admin/start")
+        for b in self.bidders:
+            # Guests trickle in over the first couple of hours
+            self._at(self.rng.uniform(0, min(7200, self._timeline["FINAL_HOUR"])),
+                     self._register, b)
+        for _ in range(self.scratches):
+            self._at(self._timeline["LOCKED"] * self.rng.uniform(0.2, 0.5), self._scratch)
+
+    def _scratch(self) -> None:
+        _, data = self._call("GET", "/api/horses")
+        unscratched = [h["horse_id"] for h in data.get("horses", []) if not h["scratched"]]
+        if unscratched:
+            self._admin("/api/admin/scratch", {"horse_id": self.rng.choice(unscratched)})
+
+    def _final_hour(self) -> None:
+        self._enter_phase("FINAL_HOUR", "/api/admin/final-hour")
+        # Snipers wake up
+        for b in self.bidders:
+            if b.bidder_id is not None and isinstance(b, Sniper):
+                self._later(b.rng.uniform(0, 5.0), self._act, b)
+
+    def _lock_auction(self) -> None:
+        self._enter_phase("LOCKED", "/api/admin/lock")
+
+    def _results(self) -> None:
+        _, data = self._call("GET", "/api/horses")
+        running = [h["horse_id"] for h in data.get("horses", []) if not h["scratched"]]
+        win, place, show = self.rng.sample(running, 3)
+        self.results = self._admin("/api/admin/results",
+                                   {"win": win, "place": place, "show": show})
+        self.phases["RACE_COMPLETE"] = self.phases["SETTLED"] = round(self._elapsed(), 1)
+        self._phase = self.results.get("state", "SETTLED")
+        self._done.set()
+
+    # -----------------------------------------------------------------
+    # Guests
+    # -----------------------------------------------------------------
+
+    def _register(self, b: FakeBidder) -> None:
+        status, data = self._call("POST", "/api/register",
+                                  {"name": b.name, "emoji": b.emoji})
+        if status != 200:
+            self.errors.append(f"register {b.name}: {data.get('error', status)}")
+            return
+        b.bidder_id = data["bidder"]["id"]
+        self._schedule_next(b)
+        if self.poll_interval:
+            self._later(b.rng.uniform(0, self.poll_interval), self._poll, b)
+
+    def _schedule_next(self, b: FakeBidder) -> None:
+        gap = b.gap(self._phase, self._day_fraction())
+        if gap is not None:
+            self._later(gap, self._act, b)
+
+    def _act(self, b: FakeBidder) -> None:
+        if self._phase not in ("OPEN", "FINAL_HOUR"):
+            return
+        _, data = self._call("GET", "/api/horses")
+        choice = b.pick(data.get("horses", []), self._rules, self._phase)
+        if choice is not None:
+            horse_id, amount = choice
+            status, resp = self._call("POST", "/api/bid", {
+                "bidder_id": b.bidder_id, "horse_id": horse_id, "amount": amount,
+            })
+            with self._lock:
+                if status == 200:
+                    b.accepted += 1
+                    self.bids_per_minute[int(self._elapsed() // 60)] += 1
+                else:
+                    b.rejected += 1
+                    self.rejections[resp.get("error", str(status))] += 1
+            if status == 200 and b.rng.random() < UNDO_CHANCE:
+                status, _ = self._call("POST", "/api/bid/undo", {
+                    "bid_id": resp["bid"]["bid_id"], "bidder_id": b.bidder_id,
+                })
+                if status == 200:
+                    with self._lock:
+                        self.undos += 1
+        # A sniper sleeping until FINAL_HOUR is woken by _final_hour()
+        self._schedule_next(b)
+
+    def _poll(self, b: FakeBidder) -> None:
+        if self._phase == "SETTLED":
+            return
+        self._call("GET", "/api/state")
+        self._call("GET", "/api/horses")
+        self._later(self.poll_interval, self._poll, b)
+
+    # -----------------------------------------------------------------
+    # Run
+    # -----------------------------------------------------------------
+
+    def run(self, timeout: Optional[float] = None) -> dict:
+        """Reset the auction, play the day, return report()."""
+        from la_subasta import bid_writer, reset
+
+        reset.reset_full()
+        status, data = self._call("GET", "/api/admin/settings")
+        self._rules = {k: v["value"] for k, v in data["settings"].items()}
+        self._timeline = day_timeline(self._rules["AUCTION_OPEN_TIME"],
+                                      la_config.DERBY_POST_TIME,
+                                      self._rules["LOCKDOWN_MINUTES_BEFORE_POST"])
+        writer = bid_writer.get_writer()
+        self._writer_before = writer.stats() if writer else None
+
+        wall_start = time.perf_counter()
+        self._start = self.clock.now()
+        self._at(self._timeline["OPEN"], self._open)
+        self._at(self._timeline["FINAL_HOUR"], self._final_hour)
+        self._at(self._timeline["LOCKED"], self._lock_auction)
+        self._at(self._timeline["RESULTS"], self._results)
+
+        try:
+            if self.virtual:
+                self.scheduler.advance(self._timeline["RESULTS"] + 1)
+            else:
+                if timeout is None:
+                    timeout = self._timeline["RESULTS"] / self.compression + 60
+                if not self._done.wait(timeout):
+                    self.errors.append("timed out before results")
+        finally:
+            self._done.set()
+            self.scheduler.stop()
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+        self._wall_s = time.perf_counter() - wall_start
+        return self.report()
+
+    def report(self) -> dict:
+        from la_subasta import bid_writer, bidding
+        from la_subasta.models import _db_path
+
+        requests_ = {}
+        for label, values in sorted(self.latency.items()):
+            values = sorted(values)
+            requests_[label] = {
+                "count": len(values),
+                "p50_ms": round(_percentile(values, 50) * 1000.0, 2),
+                "p99_ms": round(_percentile(values, 99) * 1000.0, 2),
+            }
+
+        by_strategy: Dict[str, dict] = {}
+        for b in self.bidders:
+            s = by_strategy.setdefault(b.strategy, {"bidders": 0, "accepted": 0,
+                                                    "rejected": 0, "horses_won": 0})
+            s["bidders"] += 1
+            s["accepted"] += b.accepted
+            s["rejected"] += b.rejected
+            if b.bidder_id is not None:
+                s["horses_won"] += len(bidding.horses_leading_by(b.bidder_id))
+
+        db_bytes = sum(os.path.getsize(_db_path() + sfx) for sfx in ("", "-wal")
+                       if os.path.exists(_db_path() + sfx))
+        writer = bid_writer.get_writer()
+        db = {
+            "bids": bidding.count_bids(),
+            "active_bids": bidding.count_bids(include_voided=False),
+            "bidders": bidding.count_bidders(),
+            "file_bytes": db_bytes,
+            "peak_bids_per_sim_minute": max(self.bids_per_minute.values(), default=0),
+        }
+        if writer is not None and self._writer_before is not None:
+            after = writer.stats()
+            batches = after["batches"] - self._writer_before["batches"]
+            ops = after["operations"] - self._writer_before["operations"]
+            db.update({"bid_commits": batches,
+                       "ops_per_commit": round(ops / batches, 2) if batches else 0.0})
+
+        total_requests = sum(v["count"] for v in requests_.values())
+        return {
+            "ok": not self.errors and self._phase == "SETTLED",
+            "final_state": self._phase,
+            "wall_s": round(self._wall_s, 1),
+            "sim_hours": round(self._timeline["RESULTS"] / 3600.0, 2),
+            "phases_at_sim_s": self.phases,
+            "requests": {
+                "total": total_requests,
+                "per_real_s": round(total_requests / self._wall_s, 1) if self._wall_s else 0.0,
+                "by_status": dict(self.status),
+                "endpoints": requests_,
+            },
+            "bids": {
+                "accepted": sum(b.accepted for b in self.bidders),
+                "rejected": sum(b.rejected for b in self.bidders),
+                "undone": self.undos,
+                "top_rejections": self.rejections.most_common(5),
+                "by_strategy": by_strategy,
+            },
+            "db": db,
+            "realtime": {
+                "events": sum(self.socketio.events.values()),
+                "bytes": self.socketio.bytes,
+                "by_event": dict(self.socketio.events),
+                "peak_per_sim_minute": max(self.socketio.per_minute.values(), default=0),
+            },
+            "pot": bidding.total_pot(),
+            "payouts": (self.results or {}).get("payouts"),
+            "errors": self.errors[:20],
+        }
+
+
+# -----------------------------------------------------------------------------
+# CLI
+# -----------------------------------------------------------------------------
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        if part.strip():
+            name, _, weight = part.partition("=")
+            mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="La Subasta compressed-time rehearsal")
+    parser.add_argument("--bidders", type=int, default=la_config.SANDBOX_FAKE_BIDDER_COUNT)
+    parser.add_argument("--mix", default=None,
+                        help="strategy weights, e.g. early=4,chaser=5,sniper=3")
+    parser.add_argument("--compression", type=float,
+                        default=la_config.SANDBOX_TIME_COMPRESSION,
+                        help="clock seconds per real second")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--db", default=None,
+                        help="database file (default: throwaway temp file)")
+    parser.add_argument("--no-poll", action="store_true", help="skip guest polling")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    temp = args.db is None
+    la_config.DB_PATH = args.db or tempfile.mktemp(prefix="la_subasta_sandbox_", suffix=".db")
+
+    bidders = build_population(args.bidders, _parse_mix(args.mix) if args.mix else None,
+                               seed=args.seed)
+    sandbox = Sandbox(bidders=bidders, compression=args.compression, seed=args.seed,
+                      poll_interval=None if args.no_poll else POLL_INTERVAL_S)
+    if not args.json:
+        print(f"Rehearsing the auction day with {len(bidders)} fake bidders at "
+              f"{args.compression:g}x ...")
+    try:
+        report = sandbox.run()
+    finally:
+        if temp:
+            from la_subasta.models import close_pool
+            close_pool()
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(la_config.DB_PATH + suffix)
+                except OSError:
+                    pass
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+        return 0 if report["ok"] else 1
+
+    print(f"\n{report['final_state']} after {report['wall_s']}s real "
+          f"({report['sim_hours']} simulated hours)")
+    print(f"phases (sim s): {report['phases_at_sim_s']}")
+    r = report["requests"]
+    print(f"\nHTTP: {r['total']} requests, {r['per_real_s']}/s, status {r['by_status']}")
+    for label, m in r["endpoints"].items():
+        print(f"  {label:<22} {m['count']:>6}  p50 {m['p50_ms']:>6} ms  p99 {m['p99_ms']:>6} ms")
+    b = report["bids"]
+    print(f"\nBids: {b['accepted']} accepted, {b['rejected']} rejected, {b['undone']} undone")
+    for name, s in b["by_strategy"].items():
+        print(f"  {name:<7} {s['bidders']:>3} bidders  {s['accepted']:>5} accepted  "
+              f"{s['rejected']:>4} rejected  {s['horses_won']:>2} horses")
+    for reason, n in b["top_rejections"]:
+        print(f"  rejected x{n}: {reason}")
+    d = report["db"]
+    print(f"\nDB: {d}")
+    rt = report["realtime"]
+    print(f"Realtime: {rt['events']} events, {rt['bytes']} bytes, "
+          f"peak {rt['peak_per_sim_minute']}/sim-minute")
+    print(f"Pot: ${report['pot']:.2f}")
+    if report["errors"]:
+        print("\nErrors:")
+        for e in report["errors"]:
+            print(f"  {e}")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,12 +9,25 @@
 # running state (anything other than NOT_STARTED) are rejected — Joey can't
 # change MAX_RAISE mid-auction and invalidate bids already accepted under
 # the old rule.
+#
+# Reads are served from an immutable SettingsSnapshot cached in process —
+# bid placement, payouts and the admin panel read settings without touching
+# SQLite. Writes bump settings_version.generation in the same transaction;
+# this process drops its snapshot on commit, and other processes sharing the
+# file notice within CHECK_INTERVAL_S: PRAGMA data_version says whether
+# anything was committed elsewhere, and only then is the generation re-read.
 
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
 
 from la_subasta import config
-from la_subasta.models import get_conn, write_txn
+from la_subasta.models import (
+    _db_path, after_commit, db_generation, get_conn, register_view, write_txn,
+)
 from la_subasta.state_machine import AuctionState, get_state
 
 
@@ -120,15 +133,99 @@ def _known(key: str) -> None:
         raise SettingsError(f"Unknown setting: {key}")
 
 
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Every setting's value at one settings generation. Immutable."""
+    generation: int
+    values: Mapping[str, Any]
+    overridden: FrozenSet[str]
+    source: tuple           # (models.db_generation(), db path) it was read from
+
+    def __getitem__(self, key: str) -> Any:
+        return self.values[key]
+
+
+# How stale a snapshot may get when ANOTHER process changes a setting. Writes
+# from this process are visible immediately. Bid rules are LOCKED_WHEN_OPEN,
+# so they can't change under a running auction either way.
+CHECK_INTERVAL_S = 0.5
+
+_cache_lock = threading.Lock()
+_cached: Optional[SettingsSnapshot] = None
+_checked_at = 0.0
+_seen = threading.local()     # last PRAGMA data_version per thread connection
+
+
+def _load() -> SettingsSnapshot:
+    """Read generation + overrides in one statement (one consistent read)."""
+    conn = get_conn()
+    generation = 0
+    values = dict(config.DEFAULTS)
+    overridden = set()
+    for r in conn.execute(
+        "SELECT NULL AS setting_key, generation AS value FROM settings_version "
+        "UNION ALL SELECT setting_key, value FROM auction_overrides"
+    ):
+        key = r["setting_key"]
+        if key is None:
+            generation = int(r["value"])
+        elif key in values:
+            values[key] = _coerce_from_str(key, r["value"])
+            overridden.add(key)
+    return SettingsSnapshot(generation, MappingProxyType(values), frozenset(overridden),
+                            (db_generation(), _db_path()))
+
+
+def _changed_elsewhere() -> bool:
+    """True if any other connection committed since this thread last looked."""
+    conn = get_conn()
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    last = getattr(_seen, "version", None)
+    if last == (id(conn), version):
+        return False
+    _seen.version = (id(conn), version)
+    return True
+
+
+def current() -> SettingsSnapshot:
+    """The current settings snapshot; no SQL unless it may be stale."""
+    global _cached, _checked_at
+    snap = _cached
+    if snap is not None and snap.source == (db_generation(), _db_path()):
+        now = time.monotonic()
+        if now - _checked_at < CHECK_INTERVAL_S:
+            return snap
+        _checked_at = now
+        if not _changed_elsewhere():
+            return snap
+        row = get_conn().execute(
+            "SELECT generation FROM settings_version WHERE id = 1").fetchone()
+        if row is not None and row["generation"] == snap.generation:
+            return snap
+    with _cache_lock:
+        _cached = _load()
+        _checked_at = time.monotonic()
+        return _cached
+
+
+def _invalidate() -> None:
+    # Under the lock so a reload that started before the commit can't
+    # re-cache the old values after we drop them
+    global _cached
+    with _cache_lock:
+        _cached = None
+
+
+def _bump_generation(conn) -> None:
+    """Call inside the write_txn that changes auction_overrides."""
+    conn.execute("UPDATE settings_version SET generation = generation + 1 WHERE id = 1")
+    after_commit(_invalidate)
+
+
 def get_setting(key: str) -> Any:
     """Return the current value: override if present, else the code default."""
     _known(key)
-    row = get_conn().execute(
-        "SELECT value FROM auction_overrides WHERE setting_key = ?", (key,),
-    ).fetchone()
-    if row is None:
-        return config.DEFAULTS[key]
-    return _coerce_from_str(key, row["value"])
+    return current().values[key]
 
 
 def get_all_settings() -> Dict[str, Dict[str, Any]]:
@@ -142,29 +239,17 @@ def get_all_settings() -> Dict[str, Dict[str, Any]]:
         }, ...
       }
     """
-    conn = get_conn()
-    overrides = {
-        r["setting_key"]: r["value"]
-        for r in conn.execute(
-            "SELECT setting_key, value FROM auction_overrides"
-        ).fetchall()
-    }
+    snap = current()
     state = get_state()
     auction_running = state != AuctionState.NOT_STARTED
 
     out: Dict[str, Dict[str, Any]] = {}
     for key, default in config.DEFAULTS.items():
-        if key in overrides:
-            value = _coerce_from_str(key, overrides[key])
-            is_override = True
-        else:
-            value = default
-            is_override = False
         locked_when_open = key in config.LOCKED_WHEN_OPEN
         out[key] = {
-            "value": value,
+            "value": snap.values[key],
             "default": default,
-            "is_override": is_override,
+            "is_override": key in snap.overridden,
             "locked_when_open": locked_when_open,
             "locked_now": locked_when_open and auction_running,
         }
@@ -234,6 +319,7 @@ def set_setting(key: str, value: Any,
             """,
             (key, old_value_str, canonical, changed_by, state_at_change),
         )
+        _bump_generation(conn)
         changed_at = conn.execute(
             "SELECT changed_at FROM auction_overrides WHERE setting_key = ?",
             (key,),
@@ -276,6 +362,7 @@ def reset_to_defaults(changed_by: str = "admin") -> int:
                  changed_by, state_at_change),
             )
         conn.execute("DELETE FROM auction_overrides")
+        _bump_generation(conn)
 
     return len(existing)
 
@@ -303,3 +390,6 @@ def get_audit_log(limit: int = 50) -> List[Dict[str, Any]]:
         (limit,),
     ).fetchall()
     return [dict(r) for r in rows]
+
+
+register_view(_invalidate)
@@ -7,8 +7,9 @@
 
 from enum import Enum
 
+from la_subasta import changes
 from la_subasta.config import EVENT_YEAR
-from la_subasta.models import get_conn, write_txn
+from la_subasta.models import after_commit, get_conn, write_txn
 
 
 class AuctionState(str, Enum):
@@ -105,6 +106,7 @@ def transition(new_state: AuctionState, event_year: int = EVENT_YEAR,
             "WHERE event_year = ?",
             (new_state.value, event_year),
         )
+        after_commit(lambda: changes.record_state(event_year, new_state.value))
 
     return new_state
 
@@ -123,6 +125,8 @@ def reset(event_year: int = EVENT_YEAR) -> None:
             "total_pot = 0 WHERE event_year = ?",
             (AuctionState.NOT_STARTED.value, event_year),
         )
+        after_commit(lambda: changes.record_state(
+            event_year, AuctionState.NOT_STARTED.value))
 
 
 def update_total_pot(pot: float, event_year: int = EVENT_YEAR) -> None:
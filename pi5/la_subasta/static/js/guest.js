@@ -6,8 +6,9 @@
      - Render horse list from /la-subasta/api/horses
      - Place bids with +1 / +3 / +5 / custom; disable out-of-range buttons
      - Live updates via SocketIO (bid_placed, horse_scratched, auction_locked,
-       settings_changed)
-     - Countdown strip (refreshes every 30s)
+       settings_changed, auction_extended)
+     - Countdown strip to the server's closes_at (ticks every second; a
+       soft-close extension moves it)
 
    Out of scope for Phase 2A (coming in 2B): portfolio view, undo toast,
    outbid banner, push notifications.
@@ -20,8 +21,11 @@
         state:    '/la-subasta/api/state',
         horses:   '/la-subasta/api/horses',
         register: '/la-subasta/api/register',
+        identity: '/la-subasta/api/identity',
+        hold:     '/la-subasta/api/identity/hold',
         bid:      '/la-subasta/api/bid',
         settings: '/la-subasta/api/admin/settings',
+        changes:  '/la-subasta/api/changes',
     };
 
     const IDENTITY_KEY   = 'la_subasta_identity';
@@ -33,11 +37,18 @@
         identity: null,          // { bidder_id, name, emoji, identity }
         horses:   {},            // keyed by horse_id
         socket:   null,
+        watched:  {},            // horse_id -> true (horse-watch rooms)
+        seq:      0,             // last change-log seq applied
+        epoch:    null,          // change-log epoch the seq belongs to
+        seenSeq:  0,             // highest seq seen on the socket
+        catchingUp: false,
         settings: {              // cached — refreshed on settings_changed
             MAX_RAISE: 5,
             MIN_BID: 1,
         },
         auctionState: 'NOT_STARTED',
+        closesAt: null,          // ms epoch of closes_at, null if unscheduled
+        clockSkewMs: 0,          // server clock minus this phone's clock
         countdownInterval: null,
         settingsRefreshedAt: 0,
     };
@@ -98,23 +109,93 @@
         const grid = document.getElementById('ls-emoji-grid');
 
         let selectedEmoji = null;
+        let holdToken = null;       // server-side hold on name+selectedEmoji
+        let matrixTimer = null;
+        let matrixSeq = 0;          // drop answers for a name already edited
 
         function refreshSubmitState() {
             const name = nameInput.value.trim();
             submitBtn.disabled = !(name && selectedEmoji);
         }
 
-        nameInput.addEventListener('input', refreshSubmitState);
+        function emojiBtn(emoji) {
+            return grid.querySelector('.ls-emoji-btn[data-emoji="' + emoji + '"]');
+        }
 
-        grid.addEventListener('click', function (e) {
-            const btn = e.target.closest('.ls-emoji-btn');
-            if (!btn) return;
+        function clearSelection() {
             grid.querySelectorAll('.ls-emoji-btn').forEach(function (el) {
                 el.setAttribute('aria-checked', 'false');
             });
+            selectedEmoji = null;
+        }
+
+        // One request answers for the whole palette; emojis someone else
+        // has (or is holding) are greyed out before the guest taps them
+        async function refreshAvailability() {
+            const name = nameInput.value.trim();
+            const seq = ++matrixSeq;
+            if (!name) {
+                grid.querySelectorAll('.ls-emoji-btn').forEach(function (el) {
+                    el.classList.remove('ls-emoji-taken');
+                    el.disabled = false;
+                });
+                return;
+            }
+            let url = API.identity + '?name=' + encodeURIComponent(name);
+            if (holdToken) url += '&hold=' + encodeURIComponent(holdToken);
+            const resp = await getJSON(url);
+            if (seq !== matrixSeq || !resp.ok || !resp.data.success) return;
+            resp.data.emojis.forEach(function (entry) {
+                const btn = emojiBtn(entry.emoji);
+                if (!btn) return;
+                const taken = entry.status === 'taken' || entry.status === 'held';
+                btn.classList.toggle('ls-emoji-taken', taken);
+                btn.disabled = taken;
+                if (taken && entry.emoji === selectedEmoji) {
+                    clearSelection();
+                    refreshSubmitState();
+                }
+            });
+        }
+
+        nameInput.addEventListener('input', function () {
+            refreshSubmitState();
+            clearTimeout(matrixTimer);
+            matrixTimer = setTimeout(async function () {
+                await refreshAvailability();
+                // Keep the hold on the picked emoji following the name
+                if (selectedEmoji) holdSelected();
+            }, 200);
+        });
+
+        async function holdSelected() {
+            const name = nameInput.value.trim();
+            const emoji = selectedEmoji;
+            if (!name || !emoji) return;
+            const resp = await postJSON(API.hold, { name: name, emoji: emoji, hold: holdToken });
+            if (resp.ok && resp.data.success) {
+                holdToken = resp.data.token;
+                return;
+            }
+            if (resp.status === 409 && emoji === selectedEmoji) {
+                const btn = emojiBtn(emoji);
+                if (btn) {
+                    btn.classList.add('ls-emoji-taken');
+                    btn.disabled = true;
+                }
+                clearSelection();
+                refreshSubmitState();
+            }
+        }
+
+        grid.addEventListener('click', function (e) {
+            const btn = e.target.closest('.ls-emoji-btn');
+            if (!btn || btn.disabled) return;
+            clearSelection();
             btn.setAttribute('aria-checked', 'true');
             selectedEmoji = btn.dataset.emoji;
             refreshSubmitState();
+            holdSelected();
         });
 
         submitBtn.addEventListener('click', async function () {
@@ -128,6 +209,7 @@
             const resp = await postJSON(API.register, {
                 name: name,
                 emoji: selectedEmoji,
+                hold: holdToken,
             });
 
             if (resp.ok && resp.data.success) {
@@ -149,6 +231,7 @@
             submitBtn.disabled = false;
 
             if (resp.status === 409) {
+                refreshAvailability();
                 errorEl.textContent = 'That name + emoji combo is taken. Pick another emoji.';
                 errorEl.hidden = false;
                 grid.classList.remove('ls-highlight-grid');
@@ -180,6 +263,7 @@
             .then(function () {
                 renderHorseList();
                 renderIdentityTotal();
+                watchLeadingHorses();
                 startCountdown();
             });
     }
@@ -214,14 +298,100 @@
         (resp.data.horses || []).forEach(function (h) {
             state.horses[h.horse_id] = h;
         });
+        if (resp.data.epoch) {
+            state.epoch = resp.data.epoch;
+            state.seq = resp.data.seq || 0;
+        }
         renderHorseList();
         renderIdentityTotal();
     }
 
+    // ---------------------------------------------------------------------
+    // Change feed — socket deltas carry a seq; a gap or a reconnect pulls
+    // just the missed changes from /api/changes (or a full snapshot)
+    // ---------------------------------------------------------------------
+
+    // true = apply this socket delta now; false = already have it, or a gap
+    // was found and catchUp() will bring it in.
+    function acceptSeq(payload) {
+        if (!payload || payload.seq == null || !state.epoch) return true;
+        state.seenSeq = Math.max(state.seenSeq, payload.seq);
+        if (payload.seq <= state.seq) return false;
+        if (payload.seq > state.seq + 1) {
+            catchUp();
+            return false;
+        }
+        state.seq = payload.seq;
+        return true;
+    }
+
+    function applyChange(c) {
+        if (c.kind === 'state') {
+            state.auctionState = c.state;
+            return;
+        }
+        if (c.kind === 'deadline') {
+            state.closesAt = parseServerTime(c.closes_at);
+            return;
+        }
+        const h = state.horses[c.horse_id];
+        if (!h) return;
+        h.scratched = !!c.scratched;
+        if (c.leader_id) {
+            h.current_high_bid = {
+                amount: c.amount,
+                bidder_id: c.leader_id,
+                bidder_identity: c.leader_identity,
+            };
+            h.current_leader_identity = c.leader_identity;
+            h.current_leader_bidder_id = c.leader_id;
+        } else {
+            h.current_high_bid = null;
+            h.current_leader_identity = null;
+            h.current_leader_bidder_id = null;
+        }
+    }
+
+    async function catchUp() {
+        if (state.catchingUp || !state.epoch) return;
+        state.catchingUp = true;
+        try {
+            const resp = await getJSON(API.changes + '?since=' + state.seq +
+                                       '&epoch=' + encodeURIComponent(state.epoch));
+            if (!resp.ok) return;
+            const d = resp.data;
+            if (d.snapshot) {
+                state.horses = {};
+                (d.snapshot.horses || []).forEach(function (h) {
+                    state.horses[h.horse_id] = h;
+                });
+                state.auctionState = d.snapshot.state;
+                state.closesAt = parseServerTime(d.snapshot.closes_at);
+            } else {
+                (d.changes || []).forEach(applyChange);
+            }
+            state.epoch = d.epoch;
+            state.seq = d.seq;
+            state.seenSeq = Math.min(state.seenSeq, d.seq);
+            updateLockedBanner();
+            tickCountdown();
+            renderHorseList();
+            renderIdentityTotal();
+        } finally {
+            state.catchingUp = false;
+        }
+        // Deltas that arrived while the request was in flight
+        if (state.seenSeq > state.seq) catchUp();
+    }
+
     async function refreshState() {
         const resp = await getJSON(API.state);
         if (resp.ok) {
             state.auctionState = resp.data.state;
+            state.closesAt = parseServerTime(resp.data.closes_at);
+            if (resp.data.server_time_ms) {
+                state.clockSkewMs = resp.data.server_time_ms - Date.now();
+            }
             updateLockedBanner();
             // Buttons depend on auctionState — re-render so they toggle
             // enabled when we land on OPEN / FINAL_HOUR.
@@ -433,6 +603,7 @@
             renderIdentityTotal();
             flashCard(horseId);
             vibrate();
+            watchHorse(horseId);
             return true;
         }
 
@@ -544,7 +715,23 @@
     function startCountdown() {
         if (state.countdownInterval) clearInterval(state.countdownInterval);
         tickCountdown();
-        state.countdownInterval = setInterval(tickCountdown, 30000);
+        state.countdownInterval = setInterval(tickCountdown, 1000);
+    }
+
+    // closes_at is UTC 'YYYY-MM-DD HH:MM:SS.fff' -> ms epoch (null if unset)
+    function parseServerTime(value) {
+        if (!value) return null;
+        const ms = Date.parse(value.replace(' ', 'T') + 'Z');
+        return isNaN(ms) ? null : ms;
+    }
+
+    function formatRemaining(ms) {
+        const total = Math.max(0, Math.ceil(ms / 1000));
+        const h = Math.floor(total / 3600);
+        const m = Math.floor((total % 3600) / 60);
+        const sec = String(total % 60).padStart(2, '0');
+        return h > 0 ? h + ':' + String(m).padStart(2, '0') + ':' + sec
+                     : m + ':' + sec;
     }
 
     function tickCountdown() {
@@ -552,17 +739,22 @@
         const strip = document.getElementById('ls-countdown');
         if (!text) return;
 
-        // Phase 2A: no real lockdown clock yet on the backend. Display a
-        // state-driven message instead. Phase 2B will wire the real T-15 timer.
+        // The server enforces the close; this is display only, corrected
+        // for the phone's clock skew. Without a schedule, state text only.
         const s = state.auctionState;
+        const left = state.closesAt == null ? null
+            : state.closesAt - (Date.now() + state.clockSkewMs);
         if (s === 'NOT_STARTED') {
             text.textContent = 'Auction not yet open';
             strip.classList.remove('ls-countdown-urgent');
         } else if (s === 'OPEN') {
-            text.textContent = 'Bidding is OPEN';
+            text.textContent = left == null ? 'Bidding is OPEN'
+                : 'Bidding is OPEN — closes in ' + formatRemaining(left);
             strip.classList.remove('ls-countdown-urgent');
         } else if (s === 'FINAL_HOUR') {
-            text.textContent = 'FINAL HOUR — get your bids in';
+            text.textContent = left == null ? 'FINAL HOUR — get your bids in'
+                : left > 0 ? 'FINAL HOUR — ' + formatRemaining(left) + ' left'
+                : 'Bidding is closing…';
             strip.classList.add('ls-countdown-urgent');
         } else if (s === 'LOCKED' || s === 'RACE_COMPLETE' || s === 'SETTLED') {
             text.textContent = 'Bidding closed';
@@ -576,12 +768,73 @@
     // SocketIO
     // ---------------------------------------------------------------------
 
+    // Horses this guest has bid on — their horse:<id> rooms deliver
+    // watched_horse activity after the guest is outbid.
+    function watchedHorses() {
+        return Object.keys(state.watched).map(Number);
+    }
+
+    function watchHorse(horseId) {
+        if (state.watched[horseId]) return;
+        state.watched[horseId] = true;
+        if (state.socket && state.socket.connected) {
+            state.socket.emit('la_subasta_watch', { horse_id: horseId, watch: true });
+        }
+    }
+
+    function watchLeadingHorses() {
+        if (!state.identity) return;
+        Object.keys(state.horses).forEach(function (id) {
+            if (state.horses[id].current_leader_bidder_id === state.identity.bidder_id) {
+                watchHorse(Number(id));
+            }
+        });
+    }
+
     function initSocket() {
         if (!window.io) return;
-        const socket = io();
+        // auth is re-read on every (re)connect, so the server puts this
+        // socket back in its bidder + horse rooms after a drop.
+        const socket = io({
+            auth: function (cb) {
+                cb({
+                    bidder_id: state.identity ? state.identity.bidder_id : null,
+                    horses: watchedHorses(),
+                });
+            },
+        });
         state.socket = socket;
 
+        // Targeted events — the server only sends these to this guest's room
+        socket.on('outbid', function (payload) {
+            if (!payload) return;
+            flashCard(payload.horse_id);
+            vibrate();
+        });
+
+        socket.on('portfolio_changed', function () {
+            renderIdentityTotal();
+        });
+
+        socket.on('paid_marked', function () {
+            if (state.identity) state.identity.paid = true;
+        });
+
+        socket.on('watched_horse', function (payload) {
+            if (payload && payload.kind === 'bid') flashCard(payload.horse_id);
+        });
+
+        // Reconnect: pull only what was missed while offline
+        socket.on('connect', function () {
+            if (state.epoch) catchUp();
+        });
+
+        socket.on('auction_reset', function () {
+            catchUp();
+        });
+
         socket.on('bid_placed', function (payload) {
+            if (!acceptSeq(payload)) return;
             const h = state.horses[payload.horse_id];
             if (!h) return;
             h.current_high_bid = {
@@ -597,6 +850,7 @@
         });
 
         socket.on('horse_scratched', function (payload) {
+            if (!acceptSeq(payload)) return;
             const h = state.horses[payload.horse_id];
             if (!h) return;
             h.scratched = true;
@@ -604,6 +858,15 @@
             renderIdentityTotal();
         });
 
+        socket.on('horse_unscratched', function (payload) {
+            if (!acceptSeq(payload)) return;
+            const h = state.horses[payload.horse_id];
+            if (!h) return;
+            h.scratched = false;
+            renderHorseList();
+            renderIdentityTotal();
+        });
+
         socket.on('auction_locked', function () {
             state.auctionState = 'LOCKED';
             updateLockedBanner();
@@ -616,17 +879,32 @@
         // every guest's buttons enable without a refresh).
         socket.on('auction_state_changed', function (payload) {
             if (!payload || !payload.new_state) return;
+            if (!acceptSeq(payload)) return;
             state.auctionState = payload.new_state;
             updateLockedBanner();
             tickCountdown();
             renderHorseList();
         });
 
+        // Soft close: a late bid pushed the close out
+        socket.on('auction_extended', function (payload) {
+            if (!payload || !acceptSeq(payload)) return;
+            state.closesAt = parseServerTime(payload.closes_at);
+            tickCountdown();
+        });
+
+        socket.on('auction_scheduled', function (payload) {
+            if (!payload || !acceptSeq(payload)) return;
+            state.closesAt = parseServerTime(payload.closes_at);
+            tickCountdown();
+        });
+
         socket.on('settings_changed', function () {
             refreshSettings();
         });
 
         socket.on('bid_voided', function (payload) {
+            if (!acceptSeq(payload)) return;
             const h = state.horses[payload.horse_id];
             if (!h) return;
             if (payload.new_high_bid) {
@@ -10,6 +10,22 @@
 #   - Valid bids accepted
 #   - Bid undo within 10s, rejected after
 #   - Payout math: 60/25/15 of test pot
+#   - In-memory order book agrees with SQL and serves reads query-free
+#   - Bid placement runs in one transaction with an indexed leader seek
+#   - A failing after_commit hook is contained and the in-memory views rebuild
+#   - Settings reads are cached and invalidated by the settings generation
+#   - Group-committed bids/undos match serial execution exactly
+#   - Sandbox rehearses a full auction day through the API
+#   - HTTP load test harness runs a level against a served instance
+#   - Outbid / portfolio / paid events reach only the bidder's room
+#   - Board changes are sequenced; /api/changes replays what a phone missed
+#   - Spectator analytics are kept incrementally and served precomputed
+#   - Past years split into per-year files and read back through ATTACH
+#   - WAL checkpoints / ANALYZE run off the write path, with storage stats
+#   - Readers come from a bounded read-only pool; requests give theirs back
+#   - Timed OPEN/FINAL_HOUR/LOCKED; close enforced per bid; soft close extends
+#   - Settlement is set-based and writes a statement per bidder
+#   - Emoji availability comes from memory; holds stop two phones racing
 
 import io
 import json
@@ -168,8 +184,8 @@ def test_state_endpoint_concurrent_no_sqlite_misuse():
     """Regression for the actual root cause: concurrent /api/state requests
     used to raise sqlite3 InterfaceError ('bad parameter or other API misuse')
     because every thread shared ONE sqlite connection (total_pot() fires ~20-40
-    execute() calls per request). With per-thread connections, concurrent
-    reads must all succeed. This test reliably reproduced the 500 before the
+    execute() calls per request). With a connection per thread (now a pooled
+    reader each), concurrent reads must all succeed. This test reliably reproduced the 500 before the
     fix."""
     import threading
     from la_subasta.models import close_conn
@@ -197,7 +213,7 @@ def test_state_endpoint_concurrent_no_sqlite_misuse():
         except Exception as exc:                       # pragma: no cover
             errors.append(repr(exc))
         finally:
-            close_conn()   # release this worker thread's sqlite handle
+            close_conn()   # return this worker thread's reader to the pool
 
     threads = [threading.Thread(target=worker) for _ in range(8)]
     for t in threads:
@@ -369,12 +385,12 @@ def test_bid_undo():
     bid_id2 = resp.get_json()["bid"]["bid_id"]
 
     # Simulate the clock moving past the undo window
-    from la_subasta.models import get_conn
-    conn = get_conn()
-    conn.execute(
-        "UPDATE bids SET bid_time = datetime('now', '-60 seconds') WHERE id = ?",
-        (bid_id2,),
-    )
+    from la_subasta.models import write_txn
+    with write_txn() as conn:
+        conn.execute(
+            "UPDATE bids SET bid_time = datetime('now', '-60 seconds') WHERE id = ?",
+            (bid_id2,),
+        )
 
     resp = client.post("/la-subasta/api/bid/undo",
                        json={"bid_id": bid_id2, "bidder_id": alice["id"]})
@@ -769,6 +785,53 @@ def test_bidding_picks_up_max_raise_change():
            r.status_code == 200, f"got {r.get_json()}")
 
 
+def test_settings_snapshot_cache():
+    """Reads come from the cached snapshot; local writes show up at once,
+    another process's writes once the generation check runs."""
+    import sqlite3
+    from la_subasta.models import get_conn
+
+    _reset()
+    settings.get_setting("MAX_RAISE")      # warm the cache
+    statements = []
+    conn = get_conn()
+    conn.set_trace_callback(statements.append)
+    try:
+        for _ in range(50):
+            settings.get_setting("MIN_BID")
+            settings.current()["MAX_HORSES_PER_BIDDER"]
+    finally:
+        conn.set_trace_callback(None)
+    _check("cached reads issue no SQL", statements == [], f"{len(statements)} statements")
+
+    gen = settings.current().generation
+    settings.set_setting("MAX_RAISE", 7)
+    _check("local write visible on the next read",
+           settings.get_setting("MAX_RAISE") == 7 and settings.current().generation == gen + 1)
+    settings.reset_to_defaults()
+    _check("reset_to_defaults visible on the next read",
+           settings.get_setting("MAX_RAISE") == la_config.DEFAULTS["MAX_RAISE"]
+           and not settings.current().overridden)
+
+    # Another process: a separate connection writing the same file
+    other = sqlite3.connect(_TMP_DB, isolation_level=None)
+    try:
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("INSERT INTO auction_overrides (setting_key, value) VALUES ('MIN_BID', '3')")
+        other.execute("UPDATE settings_version SET generation = generation + 1")
+        other.execute("COMMIT")
+    finally:
+        other.close()
+    saved = settings.CHECK_INTERVAL_S
+    settings.CHECK_INTERVAL_S = 0
+    try:
+        _check("other process's change picked up via generation check",
+               settings.get_setting("MIN_BID") == 3
+               and settings.get_all_settings()["MIN_BID"]["is_override"])
+    finally:
+        settings.CHECK_INTERVAL_S = saved
+
+
 def test_payout_preset_parser():
     # Valid presets
     for preset, expected in [
@@ -1929,6 +1992,1292 @@ def test_existing_dashboard_still_loads():
            "/la-subasta/api/bid/undo" in rules)
 
 
+def _sql_high_bid(horse_id):
+    """Reference leader query (what current_high_bid ran before the order book)."""
+    from la_subasta.models import get_conn
+    row = get_conn().execute(
+        """
+        SELECT b.id, b.bidder_id, b.amount FROM bids b
+         WHERE b.horse_id = ? AND b.voided = 0 AND b.event_year = ?
+         ORDER BY b.amount DESC, b.bid_time ASC, b.id ASC LIMIT 1
+        """,
+        (horse_id, la_config.EVENT_YEAR),
+    ).fetchone()
+    return (row["id"], row["bidder_id"], row["amount"]) if row else None
+
+
+def test_order_book_matches_sql():
+    """Random bids, undos, voids and scratches: every order-book read must
+    equal the SQL answer, and the reads must not touch SQLite."""
+    import random
+    from la_subasta import order_book
+    from la_subasta.models import get_conn
+
+    _reset()
+    transition(AuctionState.OPEN)
+    rng = random.Random(35)
+    emojis = la_config.EMOJI_PALETTE
+    bidders = [bidding.register_bidder(f"P{i}", emojis[i % len(emojis)])["id"]
+               for i in range(8)]
+    placed = []
+    for _ in range(300):
+        roll = rng.random()
+        if roll < 0.8:
+            horse = rng.randint(1, la_config.NUM_HORSES)
+            hb = bidding.current_high_bid(horse)
+            amount = (hb["amount"] if hb else 0) + rng.randint(1, 5)
+            try:
+                placed.append(bidding.place_bid(rng.choice(bidders), horse, amount))
+            except bidding.BidError:
+                pass
+        elif roll < 0.9 and placed:
+            p = placed.pop(rng.randrange(len(placed)))
+            try:
+                bidding.void_bid(p.bid_id, "test")
+            except bidding.BidError:
+                pass
+        elif placed:
+            horse = rng.randint(1, la_config.NUM_HORSES)
+            if bidding.is_horse_scratched(horse):
+                bidding.unscratch_horse(horse)
+            else:
+                bidding.scratch_horse(horse)
+    p = placed[-1]
+    bidding.undo_bid(p.bid_id, p.bidder_id)
+
+    mismatched = []
+    sql_pot = 0.0
+    for horse in range(1, la_config.NUM_HORSES + 1):
+        ref = _sql_high_bid(horse)
+        hb = bidding.current_high_bid(horse)
+        got = (hb["id"], hb["bidder_id"], hb["amount"]) if hb else None
+        if ref != got:
+            mismatched.append((horse, ref, got))
+        scratched = get_conn().execute(
+            "SELECT scratched FROM horse_state WHERE horse_id = ? AND event_year = ?",
+            (horse, la_config.EVENT_YEAR)).fetchone()
+        if ref and not (scratched and scratched["scratched"]):
+            sql_pot += ref[2]
+    _check("order book leaders match SQL for every horse", not mismatched,
+           str(mismatched[:3]))
+    _check("order book pot matches SQL", abs(bidding.total_pot() - sql_pot) < 0.001,
+           f"{bidding.total_pot()} vs {sql_pot}")
+    _check("bid counters match SQL",
+           bidding.count_bids() == get_conn().execute(
+               "SELECT COUNT(*) AS c FROM bids").fetchone()["c"]
+           and bidding.count_bids(include_voided=False) == get_conn().execute(
+               "SELECT COUNT(*) AS c FROM bids WHERE voided = 0").fetchone()["c"])
+    _check("bidder count excludes House", bidding.count_bidders() == len(bidders))
+
+    # A rebuild from SQLite lands on the same answers
+    live = {h: bidding.current_high_bid(h) for h in range(1, la_config.NUM_HORSES + 1)}
+    live_pot = bidding.total_pot()
+    order_book.invalidate()
+    rebuilt = {h: bidding.current_high_bid(h) for h in range(1, la_config.NUM_HORSES + 1)}
+    _check("rebuilt book equals incrementally maintained book",
+           live == rebuilt and bidding.total_pot() == live_pot)
+
+    # Poll-path reads don't issue a single SQL statement
+    statements = []
+    conn = get_conn()
+    conn.set_trace_callback(statements.append)
+    try:
+        bidding.total_pot()
+        bidding.count_bidders()
+        bidding.count_bids()
+        for horse in range(1, la_config.NUM_HORSES + 1):
+            bidding.current_high_bid(horse)
+            bidding.is_horse_scratched(horse)
+        for b in bidders:
+            bidding.bidder_portfolio(b)
+    finally:
+        conn.set_trace_callback(None)
+    _check("pot / leaders / portfolios served without SQL", statements == [],
+           f"{len(statements)} statements")
+
+    # Reset drops the book with the rows
+    from la_subasta import reset as la_reset
+    la_reset.reset_bids()
+    _check("reset_bids empties the book",
+           bidding.total_pot() == 0 and bidding.count_bids() == 0
+           and bidding.current_high_bid(1) is None)
+
+
+def test_bid_writer_matches_serial():
+    """Group-committed bids/undos give exactly the results of running the
+    same operations one by one, in the same order."""
+    import random
+    from la_subasta import bid_writer, order_book
+    from la_subasta.models import _write_lock
+
+    def setup():
+        _reset()
+        transition(AuctionState.OPEN)
+        return [bidding.register_bidder(f"W{i}", la_config.EMOJI_PALETTE[i])["id"]
+                for i in range(10)]
+
+    bidders = setup()
+    rng = random.Random(38)
+    ops = []
+    for i in range(300):
+        if rng.random() < 0.85:
+            # Amounts creep up so a fair share of raises land in range
+            amount = i // 12 + rng.randint(1, 6)
+            ops.append(("bid", rng.choice(bidders), rng.randint(1, 6), amount))
+        else:
+            ops.append(("undo", rng.randint(1, 120), rng.choice(bidders)))
+
+    def outcome(fn):
+        try:
+            r = fn()
+        except bidding.BidError as exc:
+            return ("rejected", exc.reason)
+        if isinstance(r, bidding.PlacedBid):
+            return ("bid", r.bid_id, r.bidder_id, r.horse_id, r.amount,
+                    r.previous_bidder_id)
+        nh = r["new_high_bid"]
+        return ("undo", r["voided_bid_id"], nh and (nh["id"], nh["bidder_id"]))
+
+    writer = bid_writer.BidWriter(max_batch=64)
+    try:
+        # Hold the write lock while queueing so the writer has to batch
+        with _write_lock:
+            futures = [writer.submit_bid(op[1], op[2], op[3]) if op[0] == "bid"
+                       else writer.submit_undo(op[1], op[2]) for op in ops]
+        batched = [outcome(lambda f=f: f.result(10)) for f in futures]
+        stats = writer.stats()
+    finally:
+        writer.stop()
+    batched_leaders = {h: bidding.current_high_bid(h) for h in range(1, 7)}
+    order_book.invalidate()
+    rebuilt_leaders = {h: bidding.current_high_bid(h) for h in range(1, 7)}
+
+    setup()
+    serial = [outcome(lambda op=op: bidding.place_bid(op[1], op[2], op[3]) if op[0] == "bid"
+                      else bidding.undo_bid(op[1], op[2])) for op in ops]
+
+    accepted = sum(1 for o in batched if o[0] != "rejected")
+    _check("writer actually batched", stats["max_batch"] > 1 and stats["batches"] < len(ops),
+           str(stats))
+    _check("batched outcomes identical to serial execution", batched == serial,
+           str(next(((i, b, s) for i, (b, s) in enumerate(zip(batched, serial)) if b != s), None)))
+    _check("mix of accepted and rejected operations",
+           50 < accepted < len(ops), f"{accepted} accepted")
+    _check("order book after batches matches a rebuild from SQLite",
+           batched_leaders == rebuilt_leaders)
+
+
+def test_bid_writer_never_replays_committed_batch():
+    """An error after a batch COMMITs (an after_commit hook throwing, even
+    one that escapes write_txn) never replays the batch's operations."""
+    from la_subasta import analytics, bid_writer
+    from la_subasta.models import _write_lock
+
+    _reset()
+    transition(AuctionState.OPEN)
+    a = bidding.register_bidder("Once A", la_config.EMOJI_PALETTE[0])["id"]
+    b = bidding.register_bidder("Once B", la_config.EMOJI_PALETTE[1])["id"]
+    first = bidding.place_bid(a, 1, 2)
+
+    real_observe, real_drop = analytics.observe, models.drop_views
+
+    def observe_fails(event_year, change):
+        raise RuntimeError("analytics down")
+
+    def drop_fails():
+        raise RuntimeError("escaped after COMMIT")
+
+    def run_batch(escape):
+        writer = bid_writer.BidWriter()
+        analytics.observe = observe_fails
+        if escape:
+            models.drop_views = drop_fails
+        try:
+            with _write_lock:
+                futures = [writer.submit_undo(first.bid_id, a) if not escape else
+                           writer.submit_bid(a, 3, 2),
+                           writer.submit_bid(a if escape else b, 2, 2 + escape)]
+            outcomes = []
+            for f in futures:
+                try:
+                    outcomes.append(f.result(10))
+                except Exception as exc:
+                    outcomes.append(exc)
+            return outcomes, writer.stats()
+        finally:
+            analytics.observe, models.drop_views = real_observe, real_drop
+            writer.stop()
+
+    outcomes, stats = run_batch(escape=False)
+    _check("hook error: undo + bid both succeed, batch not replayed",
+           isinstance(outcomes[0], dict) and isinstance(outcomes[1], bidding.PlacedBid)
+           and stats["commit_failures"] == 0, str(outcomes))
+
+    outcomes, stats = run_batch(escape=True)
+    _check("error escaping after COMMIT: results stand, no replay",
+           all(isinstance(o, bidding.PlacedBid) for o in outcomes)
+           and stats["commit_failures"] == 0, str(outcomes))
+    rows = models.get_conn().execute(
+        "SELECT horse_id, COUNT(*) AS n, SUM(voided) AS v FROM bids GROUP BY horse_id "
+        "ORDER BY horse_id").fetchall()
+    _check("each operation written exactly once",
+           [tuple(r) for r in rows] == [(1, 1, 1), (2, 2, 0), (3, 1, 0)],
+           str([tuple(r) for r in rows]))
+    _check("order book rebuilds to the committed bids",
+           bidding.current_high_bid(1) is None
+           and bidding.current_high_bid(2)["amount"] == 3
+           and bidding.current_high_bid(3)["bidder_id"] == a)
+
+
+def test_sandbox_full_day():
+    """The sandbox plays a whole auction day on a virtual clock through the
+    real API and reports the load it generated."""
+    from la_subasta import sandbox
+    from services.scheduler import VirtualClock
+
+    _reset()
+    bidders = sandbox.build_population(9, {"early": 1, "chaser": 1, "sniper": 1}, seed=39)
+    _check("population split by mix",
+           [b.strategy for b in bidders].count("sniper") == 3 and len(bidders) == 9)
+    _check("snipers sit out until FINAL_HOUR",
+           all(b.gap("OPEN", 0.9) is None for b in bidders if b.strategy == "sniper"))
+
+    sb = sandbox.Sandbox(bidders=bidders, clock=VirtualClock(0.0), seed=39,
+                         poll_interval=None)
+    report = sb.run()
+    phases = report["phases_at_sim_s"]
+    _check("day runs OPEN -> FINAL_HOUR -> LOCKED -> SETTLED",
+           report["final_state"] == "SETTLED"
+           and phases["OPEN"] < phases["FINAL_HOUR"] < phases["LOCKED"] < phases["SETTLED"],
+           str(phases))
+    _check("no errors, no 5xx", report["ok"] and 500 not in report["requests"]["by_status"],
+           str(report["errors"]))
+    by = report["bids"]["by_strategy"]
+    _check("every strategy placed bids",
+           all(by[k]["accepted"] > 0 for k in ("early", "chaser", "sniper")), str(by))
+    _check("realtime load counted",
+           report["realtime"]["by_event"].get("bid_placed") == report["bids"]["accepted"]
+           and report["realtime"]["bytes"] > 0)
+    _check("payouts computed from the simulated pot",
+           report["payouts"] and abs(sum(p["amount"] for p in report["payouts"])
+                                     - report["pot"]) < 0.05)
+
+
+def test_loadtest_local_level():
+    """A short load-test level against a locally served instance yields a
+    complete, comparable JSON report with no errors."""
+    import json as _json
+    from la_subasta import loadtest
+
+    report = loadtest.run(client_counts=(4,), seconds=0.5)
+    # LocalServer pointed DB_PATH at its own temp file; put the suite's back
+    la_config.DB_PATH = _TMP_DB
+    _reset()
+    level = report["levels"][0]
+    _check("level ran every client and a mix of endpoints",
+           level["clients"] == 4 and {"horses", "state", "bid"} <= set(level["endpoints"]),
+           str(list(level["endpoints"])))
+    _check("no errors or SQLITE_BUSY", level["errors"] == 0 and level["sqlite_busy"] == 0,
+           str(level["error_samples"]))
+    _check("bids accepted over HTTP", level["bids_accepted_per_s"] > 0)
+    _check("latency percentiles ordered",
+           0 < level["p50_ms"] <= level["p95_ms"] <= level["p99_ms"])
+    _check("report is JSON with commit metadata",
+           _json.loads(_json.dumps(report))["meta"]["seconds_per_level"] == 0.5
+           and "commit" in report["meta"])
+    _check("compare() lines up levels", len(loadtest.compare(report, report)) == 1)
+
+
+def test_targeted_notifications_rooms():
+    """Bidder-specific events reach only that bidder's sockets; board events
+    still reach everyone; fan-out is counted server-side."""
+    from flask_socketio import SocketIO
+    from la_subasta import notifications as nots
+
+    _reset()
+    transition(AuctionState.OPEN)
+    alice = bidding.register_bidder("Alice", la_config.EMOJI_PALETTE[0])["id"]
+    bob = bidding.register_bidder("Bob", la_config.EMOJI_PALETTE[1])["id"]
+
+    app = _make_app()
+    socketio = SocketIO(app, async_mode="threading")
+    nots.init_notifications(socketio)
+    nots.reset_fanout_stats()
+    try:
+        # Alice joins on connect via auth; Bob joins after connecting; a
+        # spectator only watches horse 1
+        a = socketio.test_client(app, auth={"bidder_id": alice})
+        b = socketio.test_client(app)
+        ack = b.emit("la_subasta_join", {"bidder_id": bob}, callback=True)
+        _check("la_subasta_join acks the bidder room",
+               ack == {"rooms": [nots.bidder_room(bob)]}, f"got {ack}")
+        watcher = socketio.test_client(app)
+        watcher.emit("la_subasta_watch", {"horse_id": 1}, callback=True)
+        for c in (a, b, watcher):
+            c.get_received()
+
+        client = app.test_client()
+        r = client.post("/la-subasta/api/bid",
+                        json={"bidder_id": alice, "horse_id": 1, "amount": 3})
+        _check("alice's bid accepted", r.status_code == 200, r.get_data(as_text=True))
+        r = client.post("/la-subasta/api/bid",
+                        json={"bidder_id": bob, "horse_id": 1, "amount": 5})
+        _check("bob's raise accepted", r.status_code == 200, r.get_data(as_text=True))
+
+        got = {name: [m["name"] for m in c.get_received()]
+               for name, c in (("a", a), ("b", b), ("w", watcher))}
+        _check("everyone sees both bid_placed",
+               all(got[n].count("bid_placed") == 2 for n in got), str(got))
+        _check("only alice gets outbid",
+               got["a"].count("outbid") == 1 and "outbid" not in got["b"]
+               and "outbid" not in got["w"], str(got))
+        _check("portfolio_changed only to the two bidders involved",
+               got["a"].count("portfolio_changed") == 2       # gained, lost
+               and got["b"].count("portfolio_changed") == 1
+               and "portfolio_changed" not in got["w"], str(got))
+        _check("horse watcher gets watched_horse, bidders not subscribed don't",
+               got["w"].count("watched_horse") == 2
+               and "watched_horse" not in got["b"], str(got))
+
+        r = client.post("/la-subasta/api/admin/paid", json={"bidder_id": bob})
+        _check("admin/paid returns 200", r.status_code == 200)
+        got = {name: [m["name"] for m in c.get_received()]
+               for name, c in (("a", a), ("b", b), ("w", watcher))}
+        _check("paid_marked only to bob",
+               got["b"] == ["paid_marked"] and not got["a"] and not got["w"],
+               str(got))
+
+        stats = client.get("/la-subasta/api/admin/fanout").get_json()["fanout"]
+        _check("fanout sees 3 connected sockets and 2 bidder rooms",
+               stats["connected"] == 3 and stats["rooms"] == {"bidder": 2, "horse": 1},
+               str(stats))
+        outbid = stats["events"].get("outbid", {})
+        _check("outbid delivered once instead of to all 3",
+               outbid.get("deliveries") == 1 and outbid.get("broadcast_equivalent") == 3,
+               str(outbid))
+        _check("targeted traffic is below the broadcast equivalent",
+               stats["deliveries"] < stats["broadcast_equivalent"], str(stats))
+
+        b.disconnect()
+        stats = nots.fanout_stats()
+        _check("disconnect leaves the bidder room",
+               stats["connected"] == 2 and stats["rooms"]["bidder"] == 1, str(stats))
+        nots.paid_marked(bob)
+        _check("emit to an empty room is skipped",
+               nots.fanout_stats()["events"]["paid_marked"]["skipped_empty_room"] == 1)
+        a.disconnect()
+        watcher.disconnect()
+    finally:
+        nots.init_notifications(None)
+
+
+def test_change_feed_catch_up():
+    """Mutations get consecutive seqs, socket payloads carry the delta, and
+    /api/changes returns just what a phone missed (or a snapshot)."""
+    from la_subasta import changes
+    from la_subasta import notifications as nots
+    from la_subasta.reset import reset_bids
+
+    events = []
+
+    class _StubSocketIO:
+        def emit(self, event, payload, room=None):
+            events.append((event, payload, room))
+
+    _reset()
+    app = _make_app()
+    nots.init_notifications(_StubSocketIO())
+    client = app.test_client()
+    try:
+        client.post("/la-subasta/api/admin/start")
+        alice = bidding.register_bidder("Alice", la_config.EMOJI_PALETTE[0])["id"]
+        bob = bidding.register_bidder("Bob", la_config.EMOJI_PALETTE[1])["id"]
+
+        board = client.get("/la-subasta/api/horses").get_json()
+        epoch, seq0 = board["epoch"], board["seq"]
+        _check("/api/horses carries the log position", seq0 == 1 and epoch,
+               f"seq={seq0}")
+
+        r1 = client.post("/la-subasta/api/bid",
+                         json={"bidder_id": alice, "horse_id": 4, "amount": 3}).get_json()
+        r2 = client.post("/la-subasta/api/bid",
+                         json={"bidder_id": bob, "horse_id": 4, "amount": 6}).get_json()
+        client.post("/la-subasta/api/admin/scratch", json={"horse_id": 9})
+        client.post("/la-subasta/api/bid/undo",
+                    json={"bid_id": r2["bid"]["bid_id"], "bidder_id": bob})
+
+        placed = [e[1] for e in events if e[0] == "bid_placed"]
+        _check("bid responses + bid_placed carry consecutive seqs and the pot",
+               [r1["bid"]["seq"], r2["bid"]["seq"]] == [seq0 + 1, seq0 + 2]
+               and [p["seq"] for p in placed] == [seq0 + 1, seq0 + 2]
+               and placed[-1]["pot"] == 6,
+               f"{r1['bid']} / {placed}")
+        scratched = next(e[1] for e in events if e[0] == "horse_scratched")
+        voided = next(e[1] for e in events if e[0] == "bid_voided")
+        _check("scratch + undo deltas continue the sequence",
+               scratched["seq"] == seq0 + 3 and voided["seq"] == seq0 + 4
+               and voided["pot"] == 3, f"{scratched} / {voided}")
+
+        r = client.get(f"/la-subasta/api/changes?since={seq0 + 1}&epoch={epoch}").get_json()
+        kinds = [c["kind"] for c in r.get("changes", [])]
+        _check("catch-up returns only the missed changes",
+               "snapshot" not in r and kinds == ["bid", "scratch", "void"]
+               and r["seq"] == seq0 + 4, str(r))
+        last = r["changes"][-1]
+        _check("void delta restores alice as leader",
+               last["horse_id"] == 4 and last["leader_id"] == alice
+               and last["amount"] == 3 and last["pot"] == 3, str(last))
+        r = client.get(f"/la-subasta/api/changes?since={seq0 + 4}&epoch={epoch}").get_json()
+        _check("caught-up phone gets an empty list", r.get("changes") == [], str(r))
+
+        r = client.get(f"/la-subasta/api/changes?since=1&epoch=stale").get_json()
+        _check("unknown epoch falls back to a snapshot",
+               "snapshot" in r and len(r["snapshot"]["horses"]) == la_config.NUM_HORSES
+               and r["snapshot"]["total_pot"] == 3, str(r)[:200])
+
+        log = changes.get_log()
+        small = changes.ChangeLog(size=2)
+        for _ in range(5):
+            small.record("state", state="OPEN")
+        _check("log too short to reach back -> snapshot needed",
+               small.since(1) is None and len(small.since(3)) == 2
+               and small.since(99) is None)
+
+        reset_bids()
+        _check("bid reset starts a new epoch", changes.get_log().epoch != log.epoch)
+    finally:
+        nots.init_notifications(None)
+
+
+def test_spectator_analytics_incremental():
+    """Live aggregates fed from the bid path match a from-scratch rebuild
+    and SQL; panels are served without SQL and cached per panel slot."""
+    import random
+    from la_subasta import analytics
+    from la_subasta.models import get_conn
+
+    _reset()
+    transition(AuctionState.OPEN)
+    bidders = [bidding.register_bidder(f"S{i}", la_config.EMOJI_PALETTE[i])["id"]
+               for i in range(6)]
+    engine = analytics.get_analytics()      # built empty, then fed live
+
+    rng = random.Random(43)
+    placed = []
+    for i in range(120):
+        try:
+            placed.append(bidding.place_bid(rng.choice(bidders), rng.randint(1, 5),
+                                            i // 8 + rng.randint(1, 6)))
+        except bidding.BidError:
+            pass
+    for p in placed[-3:]:
+        try:
+            bidding.undo_bid(p.bid_id, p.bidder_id)
+        except bidding.BidError:
+            pass
+    bidding.scratch_horse(5)
+
+    live = engine.summary()
+    conn = get_conn()
+    n_bids = conn.execute("SELECT COUNT(*) FROM bids").fetchone()[0]
+    _check("live engine counted every bid", live["total_bids"] == n_bids == len(placed),
+           f"{live['total_bids']} vs {n_bids}")
+    _check("bid tempo windows hold this minute's bids",
+           live["bids_per_minute"]["15m"] == n_bids
+           and live["bids_per_minute"]["1m"] <= live["bids_per_minute"]["5m"] <= n_bids,
+           str(live["bids_per_minute"]))
+
+    spend = {}
+    for h in range(1, la_config.NUM_HORSES + 1):
+        hb = bidding.current_high_bid(h)
+        if hb:
+            spend[hb["bidder_id"]] = spend.get(hb["bidder_id"], 0) + hb["amount"]
+    top = max(spend.items(), key=lambda kv: kv[1])
+    _check("biggest spender matches the order book",
+           live["biggest_spender"]["total"] == top[1]
+           and spend[live["biggest_spender"]["bidder_id"]] == top[1],
+           f"{live['biggest_spender']} vs {top}")
+    contested = conn.execute(
+        "SELECT horse_id, COUNT(DISTINCT bidder_id) AS n FROM bids "
+        "GROUP BY horse_id ORDER BY n DESC LIMIT 1").fetchone()
+    _check("most contested horse has the most distinct bidders",
+           live["most_contested"]["bidders"] == contested["n"],
+           f"{live['most_contested']} vs {dict(contested)}")
+
+    analytics.invalidate()
+    rebuilt = analytics.get_analytics().summary()
+    same = all(rebuilt[k] == live[k] for k in
+               ("total_bids", "most_contested", "biggest_spender",
+                "price_movers", "active_bidders", "ownership"))
+    _check("rebuild from SQLite matches the live aggregates", same,
+           f"live={live} rebuilt={rebuilt}")
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        first = analytics.panels()
+        second = analytics.panels()
+    finally:
+        conn.set_trace_callback(None)
+    _check("panels served without SQL", statements == [], f"{statements}")
+    _check("panel payload cached within the panel interval", first is second)
+    _check("payload carries panel timing from config",
+           first["panel_seconds"] == la_config.SPECTATOR_PANEL_SECONDS
+           and first["registered_bidders"] == len(bidders))
+    _check("max_age 0 rebuilds the payload",
+           analytics.panels(max_age_s=0) is not first)
+
+    app = _make_app()
+    r = app.test_client().get("/la-subasta/api/spectator/panels")
+    _check("/api/spectator/panels returns the payload",
+           r.status_code == 200 and r.get_json()["panels"]["total_bids"] == n_bids)
+
+
+def test_year_split_and_history():
+    """split_years() moves past years into their own files; history reads
+    them back through ATTACH; the current file keeps only its own year."""
+    from la_subasta import history
+    from la_subasta.models import close_conn, get_conn, write_txn, year_db_path
+
+    combined = tempfile.mktemp(prefix="la_subasta_years_", suffix=".db")
+    la_config.DB_PATH = combined
+    try:
+        init_db(combined)
+        current = la_config.EVENT_YEAR
+        for year, names in ((current - 2, ["Ana", "Ben"]),
+                            (current - 1, ["Cy", "Dee", "Eve"]),
+                            (current, ["Fay"])):
+            transition(AuctionState.OPEN, event_year=year)
+            ids = [bidding.register_bidder(n, la_config.EMOJI_PALETTE[i], event_year=year)["id"]
+                   for i, n in enumerate(names)]
+            for i, bidder_id in enumerate(ids):
+                bidding.place_bid(bidder_id, i + 1, 2 + i, event_year=year)
+        with write_txn() as conn:
+            last = current - 1
+            cy = conn.execute("SELECT id FROM bidders WHERE name = 'Cy'").fetchone()[0]
+            conn.execute("INSERT INTO ownership (horse_id, bidder_id, winning_bid, event_year) "
+                         "VALUES (1, ?, 2, ?), (2, ?, 3, ?)", (cy, last, cy, last))
+            conn.execute("INSERT INTO payouts (bidder_id, horse_id, finish, amount, event_year) "
+                         "VALUES (?, 1, 'win', 4, ?)", (cy, last))
+
+        before = [y["year"] for y in history.event_years(combined)]
+        _check("combined DB: history sees all three years",
+               before == [current - 2, current - 1, current], str(before))
+
+        planned = history.split_years(combined, dry_run=True)
+        _check("dry run plans two archives, writes nothing",
+               [e["year"] for e in planned] == [current - 2, current - 1]
+               and not os.path.exists(year_db_path(current - 1, combined)))
+
+        close_conn()
+        report = history.split_years(combined)
+        _check("split moved the two past years",
+               [e["year"] for e in report] == [current - 2, current - 1]
+               and report[1]["rows"]["bids"] == 3 and report[1]["rows"]["payouts"] == 1,
+               str(report))
+        years_left = sorted({r[0] for r in get_conn().execute(
+            "SELECT event_year FROM bids UNION SELECT event_year FROM auction_state")})
+        _check("current file keeps only the current year", years_left == [current],
+               str(years_left))
+        _check("live reads still work after the split",
+               bidding.current_high_bid(1)["amount"] == 2)
+
+        years = history.event_years(combined)
+        by_year = {y["year"]: y for y in years}
+        _check("history reads archives back through ATTACH",
+               [y["year"] for y in years] == [current - 2, current - 1, current]
+               and by_year[current - 1]["source"] == "archive"
+               and by_year[current]["source"] == "current", str(years))
+        _check("archived event_years row: pot, turnout, winner, spender",
+               by_year[current - 1]["total_pot"] == 5
+               and by_year[current - 1]["num_bidders"] == 3
+               and by_year[current - 1]["winner_owner"].startswith("Cy")
+               and by_year[current - 1]["biggest_spender"].startswith("Cy"),
+               str(by_year[current - 1]))
+
+        # The same name + emoji can come back now that last year is archived
+        again = bidding.register_bidder("Cy", la_config.EMOJI_PALETTE[0])
+        yoy = {r["year"]: r for r in history.year_over_year(combined)}
+        _check("returning bidder counted year over year",
+               again and yoy[current]["returning_bidders"] == 1
+               and yoy[current - 1]["bidder_change"] == 1, str(yoy))
+
+        raised = False
+        try:
+            with write_txn() as conn:
+                conn.execute("INSERT INTO auction_state (state, event_year) VALUES ('SETTLED', ?)",
+                             (current - 1,))
+            close_conn()
+            history.split_years(combined)
+        except FileExistsError:
+            raised = True
+        _check("split refuses to overwrite an existing archive", raised)
+    finally:
+        close_conn()
+        la_config.DB_PATH = _TMP_DB
+        for year in (la_config.EVENT_YEAR - 2, la_config.EVENT_YEAR - 1, None):
+            target = year_db_path(year, combined) if year else combined
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(target + suffix)
+                except OSError:
+                    pass
+        _reset()
+
+
+def test_after_commit_failure_drops_views():
+    """A failing after_commit callback doesn't skip the others or raise to
+    the committed caller; the in-memory views are dropped and rebuild."""
+    from la_subasta import analytics, changes, order_book
+    from la_subasta.models import after_commit, write_txn
+
+    _reset()
+    transition(AuctionState.OPEN)
+    a = bidding.register_bidder("Hook A", la_config.EMOJI_PALETTE[0])["id"]
+    b = bidding.register_bidder("Hook B", la_config.EMOJI_PALETTE[1])["id"]
+    bidding.place_bid(a, 1, 3)
+    epoch = changes.get_log().epoch
+
+    ran = []
+    raised = None
+    try:
+        with write_txn():
+            after_commit(lambda: 1 / 0)
+            after_commit(lambda: ran.append("second"))
+    except Exception as exc:
+        raised = exc
+    _check("callback error not raised after COMMIT", raised is None, repr(raised))
+    _check("later callbacks still run", ran == ["second"])
+    _check("views dropped (book, change-log epoch)",
+           not order_book._books and changes.get_log().epoch != epoch)
+
+    # The same through place_bid: analytics blows up once mid-callback
+    order_book.get_book(la_config.EVENT_YEAR)
+    real = analytics.observe
+    calls = []
+
+    def observe_once(event_year, change):
+        calls.append(change)
+        if len(calls) == 1:
+            raise RuntimeError("analytics down")
+        return real(event_year, change)
+
+    analytics.observe = observe_once
+    try:
+        placed = bidding.place_bid(b, 2, 4)
+        second = bidding.place_bid(a, 3, 2)
+    finally:
+        analytics.observe = real
+    _check("bids committed and returned despite the hook error",
+           placed.bid_id and second.bid_id)
+    _check("book rebuilt with every committed bid",
+           bidding.current_high_bid(2)["bidder_id"] == b
+           and bidding.current_high_bid(3)["bidder_id"] == a
+           and bidding.total_pot() == 9, str(bidding.total_pot()))
+
+
+def test_place_bid_single_transaction():
+    """place_bid does all of its reads inside one BEGIN IMMEDIATE, and the
+    leader lookup is an index seek."""
+    from la_subasta.models import get_conn, get_pool
+
+    _reset()
+    transition(AuctionState.OPEN)
+    a = bidding.register_bidder("Fast A", la_config.EMOJI_PALETTE[0])["id"]
+    b = bidding.register_bidder("Fast B", la_config.EMOJI_PALETTE[1])["id"]
+    bidding.place_bid(a, 4, 5)
+
+    # Trace the thread's reader AND the writer: any read outside the
+    # transaction would show up on the former
+    statements = []
+    conn = get_conn()
+    traced = (conn, get_pool().writer)
+    for c in traced:
+        c.set_trace_callback(statements.append)
+    try:
+        placed = bidding.place_bid(b, 4, 7)
+    finally:
+        for c in traced:
+            c.set_trace_callback(None)
+    verbs = [s.split()[0].upper().rstrip(";") for s in statements]
+    _check("bid placed over the previous leader",
+           placed.previous_bidder_id == a and placed.amount == 7)
+    _check("one transaction, no reads outside it",
+           verbs[0] == "BEGIN" and verbs[-1] == "COMMIT"
+           and verbs.count("BEGIN") == 1, str(verbs))
+    _check("bid_time comes back from INSERT ... RETURNING",
+           verbs.count("INSERT") == 1 and verbs.index("INSERT") == len(verbs) - 2
+           and bool(placed.bid_time), str(verbs))
+
+    plan = " ".join(r["detail"] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM bids WHERE horse_id = ? AND event_year = ? "
+        "AND voided = 0 ORDER BY amount DESC, bid_time, id LIMIT 1",
+        (4, la_config.EVENT_YEAR)))
+    _check("leader lookup uses idx_bids_leader without a sort",
+           "idx_bids_leader" in plan and "TEMP B-TREE" not in plan, plan)
+
+    plan = " ".join(r["detail"] for r in conn.execute(
+        "EXPLAIN QUERY PLAN " + bidding._LEADING_COUNT_SQL,
+        {"bidder": a, "year": la_config.EVENT_YEAR}))
+    _check("max-horses count seeks idx_bids_bidder + idx_bids_leader",
+           "idx_bids_bidder" in plan and "idx_bids_leader" in plan, plan)
+
+    # Another worker process's bids never reach this process's order book;
+    # the max-horses cap still holds because it's counted in the transaction
+    import sqlite3
+    from la_subasta import order_book
+    cap = settings.current()["MAX_HORSES_PER_BIDDER"]
+    order_book.get_book(la_config.EVENT_YEAR)
+    other = sqlite3.connect(_TMP_DB)
+    with other:
+        other.executemany(
+            "INSERT INTO bids (bidder_id, horse_id, amount, event_year) VALUES (?, ?, 2, ?)",
+            [(b, 10 + i, la_config.EVENT_YEAR) for i in range(cap - 1)])
+    other.close()
+    _check("book hasn't seen the other worker's bids",
+           len(order_book.get_book(la_config.EVENT_YEAR).leading_by(b)) == 1)
+    try:
+        bidding.place_bid(b, 1, 2)
+        capped = None
+    except bidding.BidError as exc:
+        capped = exc.reason
+    _check("cap enforced across processes", capped and "horses per bidder" in capped,
+           str(capped))
+
+
+def test_storage_maintenance():
+    """Connections are tuned per role; the maintenance daemon checkpoints
+    only when quiet (or the WAL is big), truncates + analyzes when bidding
+    is closed, and reports WAL / checkpoint / cache numbers."""
+    from la_subasta import maintenance
+    from la_subasta.models import get_conn, get_pool, last_write_at, set_conn_role
+
+    maintenance.stop_daemon()   # ticks from the shared one would race the checks
+    _reset()
+    app = _make_app()
+    maintenance.stop_daemon()
+    writer = get_pool().writer
+    _check("writer: synchronous=NORMAL, autocheckpoint backstop raised",
+           writer.execute("PRAGMA synchronous").fetchone()[0] == 1
+           and writer.execute("PRAGMA wal_autocheckpoint").fetchone()[0]
+           == models.WAL_AUTOCHECKPOINT_PAGES)
+    _check("writer: bigger page cache than a reader",
+           writer.execute("PRAGMA cache_size").fetchone()[0]
+           < get_conn().execute("PRAGMA cache_size").fetchone()[0])
+
+    transition(AuctionState.OPEN)
+    a = bidding.register_bidder("Wal A", la_config.EMOJI_PALETTE[0])["id"]
+    b = bidding.register_bidder("Wal B", la_config.EMOJI_PALETTE[1])["id"]
+    for amount in range(5, 25, 2):
+        bidding.place_bid(a, 3, amount)
+        bidding.place_bid(b, 3, amount + 1)
+    _check("bids went to the WAL", maintenance.wal_bytes() > 0)
+
+    # Ticks run here on the maintenance role, as on the daemon thread
+    set_conn_role("maintenance")
+    try:
+        conn = get_conn()
+        _check("maintenance role: own read-write connection, short busy timeout",
+               conn is not writer
+               and conn.execute("PRAGMA busy_timeout").fetchone()[0]
+               == models.CONNECTION_ROLES["maintenance"]["busy_timeout"])
+
+        now = [last_write_at() + 0.5]
+        daemon = maintenance.MaintenanceDaemon(quiet_s=2.0, optimize_interval_s=0,
+                                               clock=lambda: now[0])
+        _check("busy + small WAL: nothing runs", daemon.run_once() == {})
+
+        daemon.checkpoint_wal_bytes = 1
+        ran = daemon.run_once()
+        cp = ran.get("checkpoint") or {}
+        _check("big WAL: PASSIVE checkpoint mid-bidding, all frames copied",
+               cp.get("mode") == "PASSIVE" and not cp["busy"]
+               and cp["checkpointed_pages"] == cp["wal_pages"] > 0, str(ran))
+        _check("already checkpointed: next tick is a no-op", daemon.run_once() == {})
+
+        daemon.checkpoint_wal_bytes = maintenance.CHECKPOINT_WAL_BYTES
+        bidding.place_bid(a, 3, 26)
+        now[0] = last_write_at() + 5.0
+        ran = daemon.run_once()
+        _check("quiet while OPEN: PASSIVE only, no ANALYZE",
+               ran.get("checkpoint", {}).get("mode") == "PASSIVE"
+               and "optimize" not in ran, str(ran))
+
+        transition(AuctionState.LOCKED)
+        now[0] = last_write_at() + 5.0
+        ran = daemon.run_once()
+        _check("bidding closed + quiet: TRUNCATE empties the WAL",
+               ran.get("checkpoint", {}).get("mode") == "TRUNCATE"
+               and maintenance.wal_bytes() == 0, str(ran))
+        _check("first idle optimize is a full ANALYZE",
+               ran.get("optimize", {}).get("kind") == "analyze"
+               and conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0,
+               str(ran))
+        _check("nothing new: idle tick does nothing", daemon.run_once() == {})
+
+        for _ in range(3):
+            conn.execute("SELECT COUNT(*) FROM bids").fetchone()
+        stats = daemon.stats()
+    finally:
+        set_conn_role("reader")
+    _check("stats: WAL size, checkpoint count + timings",
+           stats["wal_bytes"] == 0 and stats["checkpoints"] == 3
+           and stats["checkpoint_ms"]["max"] >= stats["checkpoint_ms"]["avg"] >= 0
+           and stats["optimizes"] == 1, str(stats))
+    roles = {c["role"] for c in stats["connections"]}
+    maint = [c for c in stats["connections"] if c["role"] == "maintenance"]
+    _check("stats: open connections for writer, readers, maintenance",
+           roles == {"writer", "reader", "maintenance"} and len(maint) == 1
+           and "hits" not in maint[0], str(stats["connections"]))
+    _check("a thread leaving the role closes its private connection",
+           not [c for c in daemon.stats()["connections"] if c["role"] == "maintenance"])
+
+    maintenance.start_daemon()
+    resp = app.test_client().get("/la-subasta/api/admin/storage")
+    body = resp.get_json()
+    _check("/api/admin/storage reports the running daemon + pool",
+           resp.status_code == 200 and body["storage"]["running"]
+           and "wal_bytes" in body["storage"] and "wait_ms" in body["pool"], str(body))
+
+
+def test_connection_pool():
+    """Readers are pooled, read-only and bounded; waits, timeouts and leaked
+    readers are counted; requests hand their reader back."""
+    import sqlite3
+    import threading
+    from la_subasta.models import (
+        ConnectionPool, PoolTimeout, close_conn, db_generation, get_conn, get_pool,
+        holds_reader, write_txn,
+    )
+
+    _reset()
+    app = _make_app()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM bids")
+        read_only = False
+    except sqlite3.OperationalError as exc:
+        read_only = "readonly" in str(exc)
+    _check("get_conn() lends a read-only reader", read_only)
+    with write_txn() as txn:
+        _check("inside write_txn, get_conn() is the writer",
+               get_conn() is txn is get_pool().writer)
+    _check("after the transaction the thread has its reader back", get_conn() is conn)
+
+    pool = ConnectionPool(_TMP_DB, db_generation(), size=2)
+    try:
+        first = pool.acquire()
+        out, release = [], threading.Event()
+
+        def hold(then_release):
+            c = pool.acquire()
+            out.append(c)
+            if then_release:
+                release.wait(5)
+                time.sleep(0.05)
+                pool.release(c)
+
+        holder = threading.Thread(target=hold, args=(True,))
+        holder.start()
+        while not out:
+            time.sleep(0.01)
+        try:
+            pool.acquire(timeout=0.1)
+            timed_out = False
+        except PoolTimeout:
+            timed_out = True
+        _check("bounded: a third reader times out", timed_out and pool.timeouts == 1)
+
+        release.set()
+        third = pool.acquire(timeout=5)
+        holder.join(5)
+        _check("a waiter gets the reader another thread returns",
+               third is out[0] and pool.waits == 1 and pool.wait_ms_max > 0,
+               str(pool.stats()))
+        pool.release(third)
+
+        leaker = threading.Thread(target=hold, args=(False,))
+        leaker.start()
+        leaker.join(5)
+        stats = pool.stats()
+        _check("a dead thread's reader is reclaimed as a leak",
+               stats["reclaimed"] == 1 and stats["in_use"] == 1 and stats["open"] == 2,
+               str(stats))
+        long_held = pool.check_leaks(hold_s=0)
+        _check("live long holders are reported",
+               [h["thread"] for h in long_held] == [threading.current_thread().name],
+               str(long_held))
+        pool.release(first)
+    finally:
+        pool.close()
+
+    # Requests on their own threads, like the threaded server: each hands
+    # its reader back when it ends, so connections don't pile up per thread
+    shared = get_pool()
+    baseline = shared.stats()
+    statuses = []
+
+    def request_thread():
+        statuses.append(app.test_client().get("/la-subasta/api/state").status_code)
+        statuses.append(holds_reader())
+
+    for _ in range(30):
+        t = threading.Thread(target=request_thread)
+        t.start()
+        t.join()
+    after = shared.stats()
+    _check("30 request threads: every reader returned, none leaked",
+           statuses == [200, False] * 30 and after["in_use"] == baseline["in_use"]
+           and after["reclaimed"] == baseline["reclaimed"], str(after))
+    _check("... and served from at most a couple of connections",
+           after["opened"] - baseline["opened"] <= 1, str(after))
+    close_conn()
+    _check("close_conn() returns the caller's reader",
+           not holds_reader() and shared.stats()["in_use"] == after["in_use"] - 1)
+
+
+def test_deadline_engine_soft_close():
+    """OPEN / FINAL_HOUR / LOCKED fire off a timer heap at the planned
+    deadlines; the close is enforced to the millisecond in the bid
+    transaction; a late bid extends a soft close and it is broadcast."""
+    from la_subasta import changes, deadlines
+    from la_subasta import notifications as nots
+    from la_subasta.blueprint import _scheduled_phase
+    from services.scheduler import Scheduler, VirtualClock
+
+    _reset()
+    events = []
+
+    class _StubSocketIO:
+        def emit(self, event, payload, room=None):
+            events.append((event, payload, room))
+
+    app = _make_app()
+    nots.init_notifications(_StubSocketIO())
+    client = app.test_client()
+
+    date = "2026-05-02"
+    rules = settings.current()
+    opens = deadlines.local_epoch(date, rules["AUCTION_OPEN_TIME"])
+    post = deadlines.local_epoch(date, la_config.DERBY_POST_TIME)
+    closes = post - rules["LOCKDOWN_MINUTES_BEFORE_POST"] * 60
+    final_hour = closes - la_config.FINAL_HOUR_MINUTES * 60
+
+    def engine_at(t, **kwargs):
+        deadlines.stop_engine()
+        return deadlines.start_engine(on_phase=_scheduled_phase,
+                                      scheduler=Scheduler(VirtualClock(t)), **kwargs)
+
+    def states():
+        return [e[1]["new_state"] for e in events if e[0] == "auction_state_changed"]
+
+    try:
+        engine = engine_at(opens - 60)
+        r = client.post("/la-subasta/api/admin/schedule",
+                        json={"date": date, "soft_close_seconds": 30})
+        sched = (r.get_json() or {}).get("schedule", {})
+        _check("schedule arms opens_at / closes_at from the settings",
+               r.status_code == 200 and sched["opens_at"] == deadlines.to_ts(opens)
+               and sched["closes_at"] == deadlines.to_ts(closes)
+               and sched["final_hour_at"] == deadlines.to_ts(final_hour), str(sched))
+        _check("one timer per phase, nothing polled",
+               sorted(sched["pending"]) == ["FINAL_HOUR", "LOCKED", "OPEN"]
+               and not sched["scheduler"]["running"], str(sched["pending"]))
+        _check("arming is broadcast with the close",
+               any(e[0] == "auction_scheduled"
+                   and e[1]["closes_at"] == sched["closes_at"] for e in events))
+
+        # Restart: the armed day comes back from auction_state (the soft
+        # close window is process config — SOFT_CLOSE_SECONDS in production)
+        engine = engine_at(opens - 60, soft_close_seconds=30)
+        _check("a restarted engine resumes the saved schedule",
+               engine.armed_date == date and len(engine.status()["pending"]) == 3)
+
+        events.clear()
+        engine.scheduler.advance(60)
+        _check("OPEN fires at opens_at", get_state() == AuctionState.OPEN
+               and states() == ["OPEN"], str(states()))
+
+        r = client.post("/la-subasta/api/admin/settings",
+                        json={"key": "LOCKDOWN_MINUTES_BEFORE_POST", "value": 20})
+        _check("a lockdown change re-plans the armed close",
+               r.status_code == 200
+               and get_state_row()["closes_at"] == deadlines.to_ts(post - 20 * 60),
+               get_state_row()["closes_at"])
+        client.post("/la-subasta/api/admin/settings",
+                    json={"key": "LOCKDOWN_MINUTES_BEFORE_POST",
+                          "value": rules["LOCKDOWN_MINUTES_BEFORE_POST"]})
+        _check("... and back", get_state_row()["closes_at"] == deadlines.to_ts(closes))
+
+        alice = bidding.register_bidder("Alice", la_config.EMOJI_PALETTE[0])["id"]
+        bob = bidding.register_bidder("Bob", la_config.EMOJI_PALETTE[1])["id"]
+        placed = bidding.place_bid(alice, 1, 3)
+        _check("an early bid leaves the close alone", placed.extension is None)
+
+        engine.scheduler.advance(final_hour - engine.now())
+        _check("FINAL_HOUR fires at close - FINAL_HOUR_MINUTES",
+               get_state() == AuctionState.FINAL_HOUR and states()[-1] == "FINAL_HOUR")
+
+        events.clear()
+        engine.scheduler.advance(closes - 10 - engine.now())
+        r = client.post("/la-subasta/api/bid",
+                        json={"bidder_id": bob, "horse_id": 1, "amount": 5})
+        extended_to = deadlines.to_ts(closes + 20)
+        ext = [e[1] for e in events if e[0] == "auction_extended"]
+        _check("a bid 10s before the close pushes it to bid time + 30s",
+               r.status_code == 200 and r.get_json()["bid"]["closes_at"] == extended_to
+               and get_state_row()["closes_at"] == extended_to, str(r.get_json()))
+        _check("the extension is broadcast and sequenced after the bid",
+               len(ext) == 1 and ext[0]["closes_at"] == extended_to
+               and ext[0]["seq"] == r.get_json()["bid"]["seq"] + 1, str(ext))
+        last = changes.get_log().since(changes.get_log().seq - 1)
+        _check("... and replayable as a deadline change",
+               last and last[0]["kind"] == "deadline"
+               and last[0]["closes_at"] == extended_to)
+        _check("the LOCKED timer moved with it",
+               engine.status()["pending"].get("LOCKED") == extended_to)
+
+        engine.scheduler.advance(closes + 1 - engine.now())
+        _check("the old close passes without locking",
+               get_state() == AuctionState.FINAL_HOUR and "LOCKED" not in states())
+
+        # One millisecond before the (extended) close: accepted, extends again
+        engine.scheduler.clock.set(deadlines.parse_ts(extended_to) - 0.001)
+        late = bidding.place_bid(alice, 1, 6)
+        extended_again = deadlines.to_ts(engine.now() + 30)
+        _check("a bid 1 ms before the close is accepted",
+               late.extension is not None
+               and late.extension["closes_at"] == extended_again)
+
+        # Exactly at the close, before the timer has run: rejected
+        engine.scheduler.clock.set(deadlines.parse_ts(extended_again))
+        try:
+            bidding.place_bid(bob, 1, 7)
+            rejected = None
+        except bidding.BidError as exc:
+            rejected = exc.reason
+        _check("a bid at closes_at is rejected in the transaction",
+               rejected == "Bidding has closed", str(rejected))
+        _check("... even though the state is still FINAL_HOUR",
+               get_state() == AuctionState.FINAL_HOUR)
+
+        engine.scheduler.run_due()
+        owners = models.get_conn().execute(
+            "SELECT bidder_id FROM ownership WHERE horse_id = 1").fetchall()
+        _check("LOCKED fires at the extended close with the lock side effects",
+               get_state() == AuctionState.LOCKED and states()[-1] == "LOCKED"
+               and any(e[0] == "auction_locked" for e in events)
+               and [o["bidder_id"] for o in owners] == [alice])
+        status = engine.status()
+        cap = deadlines.parse_ts(status["extension_cap_at"])
+        _check("extensions capped at close + max extension, never past post",
+               engine.soft_close(cap - 1, cap - 5) == cap
+               and cap == min(closes + la_config.SOFT_CLOSE_MAX_EXTENSION_MINUTES * 60, post)
+               and status["extensions"] == 2 and not status["pending"], str(status))
+    finally:
+        deadlines.stop_engine()
+        nots.init_notifications(None)
+
+
+def test_settlement_statements():
+    """Lock freezes every horse's leader in one statement; results write
+    payouts and a statement per bidder in one transaction; paid uses it."""
+    from la_subasta.models import get_pool
+
+    _reset()
+    app = _make_app()
+    client = app.test_client()
+    transition(AuctionState.OPEN)
+    alice = bidding.register_bidder("Alice", la_config.EMOJI_PALETTE[0])["id"]
+    bob = bidding.register_bidder("Bob", la_config.EMOJI_PALETTE[1])["id"]
+    carol = bidding.register_bidder("Carol", la_config.EMOJI_PALETTE[2])["id"]
+
+    bidding.place_bid(alice, 1, 3)
+    bidding.place_bid(bob, 1, 4)
+    bidding.place_bid(alice, 1, 5)
+    bidding.place_bid(alice, 4, 2)
+    bidding.place_bid(bob, 2, 3)
+    undone = bidding.place_bid(carol, 2, 5)
+    bidding.undo_bid(undone.bid_id, carol)        # voided: Bob keeps horse 2
+    bidding.place_bid(carol, 5, 4)
+    client.post("/la-subasta/api/admin/scratch", json={"horse_id": 5})
+
+    client.post("/la-subasta/api/admin/lock")
+    owners = {r["horse_id"]: (r["bidder_id"], r["winning_bid"]) for r in models.get_conn().execute(
+        "SELECT horse_id, bidder_id, winning_bid FROM ownership")}
+    _check("lock freezes the leaders, skipping voided bids and scratches",
+           owners == {1: (alice, 5), 2: (bob, 3), 4: (alice, 2)}, str(owners))
+
+    statements = []
+    writer = get_pool().writer
+    writer.set_trace_callback(statements.append)
+    try:
+        resp = client.post("/la-subasta/api/admin/results",
+                           json={"win": 1, "place": 6, "show": 2})
+    finally:
+        writer.set_trace_callback(None)
+    # The state transitions commit on their own; the settlement is one
+    # transaction holding the payouts, the statements and the pot
+    txns = " ".join(" ".join(statements).split()).split("BEGIN")
+    settle = [t for t in txns if "INSERT INTO bidder_statements" in t]
+    _check("payouts + statements + pot written in one transaction",
+           resp.status_code == 200 and len(settle) == 1
+           and "INSERT INTO payouts" in settle[0]
+           and "SET total_pot" in settle[0], str(len(settle)))
+
+    house = models.house_bidder_id()
+    rows = client.get("/la-subasta/api/admin/statements").get_json()["statements"]
+    by_id = {r["bidder_id"]: (r["horses"], r["owed"], r["winnings"], r["net"]) for r in rows}
+    # Pot 10 (scratched horse 5 out): win 6 / place 2.50 (House) / show 1.50
+    _check("statements: owed, winnings, net per bidder",
+           by_id == {alice: (2, 7, 6, -1), bob: (1, 3, 1.5, -1.5),
+                     carol: (0, 0, 0, 0), house: (0, 0, 2.5, 2.5)}, str(by_id))
+    _check("statements ordered by net", [r["bidder_id"] for r in rows][0] == house)
+
+    r = client.post("/la-subasta/api/admin/paid", json={"bidder_id": alice})
+    _check("paid records the statement's owed",
+           r.status_code == 200 and r.get_json()["amount"] == 7, str(r.get_json()))
+    paid = {s["bidder_id"]: (s["paid"], s["paid_amount"]) for s in payouts.list_statements()}
+    _check("... and shows on the statement", paid[alice] == (1, 7) and paid[bob][0] == 0)
+
+    # Re-entering results (a correction) rebuilds rather than duplicates
+    payouts.compute_and_persist_payouts(2, 1, 6)
+    rows = payouts.list_statements()
+    by_id = {r["bidder_id"]: r["net"] for r in rows}
+    _check("corrected results replace the statements",
+           len(rows) == 4 and by_id[bob] == 3 and by_id[alice] == -4.5, str(by_id))
+
+
+def test_registration_fast_path():
+    """The palette matrix is answered from the identity index without SQL;
+    a hold keeps an identity for one phone until it registers or lapses."""
+    import contextlib
+    from la_subasta import registration
+    from la_subasta import reset as la_reset
+    from la_subasta.models import get_conn
+
+    _reset()
+    now = [1000.0]
+    registration.configure(hold_seconds=60.0, clock=lambda: now[0])
+    client = _make_app().test_client()
+    palette = la_config.EMOJI_PALETTE
+    try:
+        bidding.register_bidder("Dave K", palette[0])
+        registration.get_index()                      # warm, like a live server
+
+        statements = []
+        conn = get_conn()
+        conn.set_trace_callback(statements.append)
+        try:
+            r = client.get("/la-subasta/api/identity?name=Dave%20K")
+        finally:
+            conn.set_trace_callback(None)
+        body = r.get_json()
+        _check("matrix covers the palette in order",
+               r.status_code == 200 and [e["emoji"] for e in body["emojis"]] == list(palette))
+        _check("registered identity is taken, the rest free",
+               body["emojis"][0]["status"] == "taken" and body["free"] == len(palette) - 1,
+               str(body["emojis"][:2]))
+        _check("matrix served without SQL", statements == [], f"{len(statements)} statements")
+        _check("blank name rejected",
+               client.get("/la-subasta/api/identity?name=%20").status_code == 400)
+
+        # Phone A holds Dave K + palette[1]; phone B can't take it
+        a = client.post("/la-subasta/api/identity/hold",
+                        json={"name": "Dave K", "emoji": palette[1]}).get_json()
+        _check("hold granted with a token", a["success"] and a["token"], str(a))
+        b = client.post("/la-subasta/api/identity/hold",
+                        json={"name": "Dave K", "emoji": palette[1]})
+        _check("second phone refused the held emoji", b.status_code == 409)
+        _check("taken emoji can't be held",
+               client.post("/la-subasta/api/identity/hold",
+                           json={"name": "Dave K", "emoji": palette[0]}).status_code == 409)
+        seen = {e["emoji"]: e["status"] for e in client.get(
+            f"/la-subasta/api/identity?name=Dave%20K&hold={a['token']}").get_json()["emojis"]}
+        others = {e["emoji"]: e["status"] for e in client.get(
+            "/la-subasta/api/identity?name=Dave%20K").get_json()["emojis"]}
+        _check("holder sees 'yours', everyone else 'held'",
+               seen[palette[1]] == "yours" and others[palette[1]] == "held")
+        _check("register without the hold refused",
+               client.post("/la-subasta/api/register",
+                           json={"name": "Dave K", "emoji": palette[1]}).status_code == 409)
+
+        # Re-holding with the same token moves the hold
+        moved = client.post("/la-subasta/api/identity/hold",
+                            json={"name": "Dave K", "emoji": palette[2], "hold": a["token"]})
+        _check("same token moves its hold",
+               moved.get_json()["token"] == a["token"]
+               and registration.get_index().is_free("Dave K", palette[1])
+               and not registration.get_index().is_free("Dave K", palette[2]))
+
+        r = client.post("/la-subasta/api/register",
+                        json={"name": "Dave K", "emoji": palette[2], "hold": a["token"]})
+        _check("register with the hold succeeds", r.status_code == 200, str(r.get_json()))
+        _check("registration marks it taken and ends the hold",
+               registration.get_index().availability("Dave K")[2]["status"] == "taken"
+               and registration.get_index().stats()["holds"] == 0)
+
+        # register_bidder claims the identity before its write: a phone
+        # asking for a hold mid-registration is refused, and a write that
+        # rolls back gives the identity back
+        real_txn = bidding.write_txn
+        seen_hold, fail, emoji = [], [None], [palette[4]]
+
+        @contextlib.contextmanager
+        def racing_txn():
+            seen_hold.append(registration.get_index().hold("Fay", emoji[0]))
+            if fail[0] is not None:
+                raise fail[0]
+            with real_txn() as conn:
+                yield conn
+
+        bidding.write_txn = racing_txn
+        try:
+            bidding.register_bidder("Fay", palette[4])
+            _check("no hold slips in between the check and the INSERT",
+                   seen_hold == [None]
+                   and registration.get_index().stats()["pending"] == 0)
+            fail[0], emoji[0] = RuntimeError("disk I/O error"), palette[5]
+            try:
+                bidding.register_bidder("Fay", palette[5])
+            except RuntimeError:
+                pass
+        finally:
+            bidding.write_txn = real_txn
+        _check("a failed write releases the claim",
+               seen_hold[1] is None and registration.get_index().stats()["pending"] == 0
+               and registration.get_index().is_free("Fay", palette[5]))
+
+        # In the DB but not yet in the index: the UNIQUE constraint decides
+        with real_txn() as conn:
+            conn.execute("INSERT INTO bidders (name, emoji, identity, event_year) "
+                         "VALUES (?, ?, ?, ?)", ("Gus", palette[6], f"Gus {palette[6]}",
+                                                 la_config.EVENT_YEAR))
+        try:
+            bidding.register_bidder("Gus", palette[6])
+            unique = False
+        except bidding.BidError as exc:
+            unique = "taken" in str(exc)
+        _check("IntegrityError releases the claim",
+               unique and registration.get_index().stats()["pending"] == 0
+               and registration.get_index().hold("Gus", palette[6]) is not None)
+
+        # Holds lapse on their own
+        client.post("/la-subasta/api/identity/hold", json={"name": "Eve", "emoji": palette[3]})
+        now[0] += 61
+        _check("expired hold frees the emoji",
+               registration.get_index().is_free("Eve", palette[3])
+               and registration.get_index().stats()["holds_expired"] >= 1)
+
+        # A full reset deletes the bidders — the index rebuilds without them
+        la_reset.reset_full()
+        _check("reset_full rebuilds the index",
+               registration.get_index().is_free("Dave K", palette[0])
+               and bidding.identity_available("Dave K", palette[2]))
+    finally:
+        registration.configure()
+
+
 # -----------------------------------------------------------------------------
 # Entry point
 # -----------------------------------------------------------------------------
@@ -1954,6 +3303,8 @@ def main():
     _run("settings — lock when open", test_settings_lock_when_open)
     _run("settings — reset", test_settings_reset)
     _run("settings — bidding picks up MAX_RAISE", test_bidding_picks_up_max_raise_change)
+    _run("settings — cached snapshot + cross-process invalidation",
+         test_settings_snapshot_cache)
     _run("settings — payout preset parser", test_payout_preset_parser)
     _run("settings — payout uses current preset (3 presets)", test_payout_uses_current_preset)
     _run("settings — API endpoints", test_settings_api_endpoints)
@@ -2003,6 +3354,36 @@ def main():
          test_reset_broadcasts_auction_reset_event)
     _run("reset — endpoint route registered", test_reset_route_registered)
 
+    _run("order book — matches SQL, reads without queries",
+         test_order_book_matches_sql)
+    _run("place_bid — single transaction, indexed leader seek",
+         test_place_bid_single_transaction)
+    _run("after_commit — a failing hook drops views, never raises",
+         test_after_commit_failure_drops_views)
+    _run("bid writer — group commit matches serial execution",
+         test_bid_writer_matches_serial)
+    _run("bid writer — a committed batch is never replayed",
+         test_bid_writer_never_replays_committed_batch)
+    _run("notifications — per-bidder / horse rooms, fan-out counts",
+         test_targeted_notifications_rooms)
+    _run("change feed — sequenced deltas + /api/changes catch-up",
+         test_change_feed_catch_up)
+    _run("analytics — incremental spectator aggregates + panel cache",
+         test_spectator_analytics_incremental)
+    _run("history — per-year files, ATTACH summaries, split tool",
+         test_year_split_and_history)
+    _run("maintenance — role PRAGMAs, quiet checkpoints, ANALYZE, stats",
+         test_storage_maintenance)
+    _run("connection pool — bounded read-only readers, waits, leaks",
+         test_connection_pool)
+    _run("deadlines — timed phases, ms close, soft-close extensions",
+         test_deadline_engine_soft_close)
+    _run("settlement — set-based freeze, payouts, bidder statements",
+         test_settlement_statements)
+    _run("registration — in-memory emoji matrix, identity holds",
+         test_registration_fast_path)
+    _run("sandbox — full auction day on a virtual clock", test_sandbox_full_day)
+    _run("loadtest — local served level, JSON report", test_loadtest_local_level)
     _run("existing dashboard still loads", test_existing_dashboard_still_loads)
 
     passed = sum(1 for r in _results if r[0] == "PASS")
@@ -18,12 +18,18 @@ from config import (FLASK_HOST, FLASK_PORT, FLASK_DEBUG, SYSTEM_NAME, VERSION, N
                    WEATHER_API_KEY, WEATHER_LOCATION, WEATHER_CACHE_MINUTES,
                    TOTE_IP, TOTE_PORT, TOTE_TIMEOUT, TOTE_ENABLED,
                    PARAMS_FILE, ANTHROPIC_API_KEY, RACE_SETUP_FILE,
-                   ANIMATION_REGISTRY_FILE, ANIMATION_ASSIGNMENTS_FILE)
+                   ANIMATION_REGISTRY_FILE, ANIMATION_ASSIGNMENTS_FILE,
+                   RACE_TIME_COMPRESSION, RACE_CARD, RACE_JOURNAL_DIR, RACE_CARD_FILE,
+                   QUINIELA_SPLIT, QUINIELA_TAKEOUT, QUINIELA_TICKET_PRICE,
+                   QUINIELA_JOURNAL_DIR)
 from communication.esp32_client import esp32, check_esp32_connection
 from communication.tote_client import init_tote_client
-from routes.racing_routes import racing_bp, init_racing_service
+from routes.racing_routes import racing_bp, init_racing_service, get_race_card
+from routes.pool_routes import pools_bp, init_pool_service, settle_on_results
 from routes.guest import guest_ui
-from la_subasta import la_subasta_bp, init_la_subasta
+from services.results_txn import ResultsTransaction
+from services.scheduler import ScaledClock
+from la_subasta import la_subasta_bp, init_la_subasta, enter_results
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -319,6 +325,16 @@ def load_results():
     return None
 
 
+def restore_results(previous):
+    """Put back results returned by load_results() (None removes the file)"""
+    if previous is None:
+        if os.path.exists(RESULTS_FILE):
+            os.remove(RESULTS_FILE)
+        return
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump(previous, f)
+
+
 def load_race_setup():
     """Load race setup data from JSON file."""
     try:
@@ -467,6 +483,30 @@ def api_results():
         })
 
 
+@app.route('/api/results/commit', methods=['POST'])
+def api_results_commit():
+    """
+    Enter results in one server-side transaction.
+
+    Body JSON: {"win": 7, "place": 3, "show": 12}
+
+    Validates once, pipelines RESULTS_ENTRY + three CUP:LOCKs + FINALIZE to
+    the ESP32 over one connection, then updates the results file, racing
+    service and La Subasta, and finally tells the tote and SSE clients.
+    Any failure before the announcements rolls everything back. Posting the
+    same results again after a success returns the original outcome.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        outcome = results_txn.commit(data.get('win'), data.get('place'), data.get('show'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    if not outcome['success']:
+        return jsonify({**outcome, 'error': f"Results failed at '{outcome['failed_step']}' (rolled back)"}), 502
+    return jsonify(outcome)
+
+
 @app.route('/api/spectator/state')
 def spectator_state():
     """Return current race state and horse data for spectator display."""
@@ -498,6 +538,8 @@ def api_results_clear():
         if os.path.exists(RESULTS_FILE):
             os.remove(RESULTS_FILE)
         
+        results_txn.reset()
+
         # Turn off all LEDs
         esp32.all_off()
         
@@ -1069,6 +1111,7 @@ def api_race():
 def api_reset():
     """Reset to idle state"""
     response = esp32.reset()
+    results_txn.reset()
     
     # Send welcome to tote board
     tote_send('welcome')
@@ -1079,6 +1122,112 @@ def api_reset():
     })
 
 
+# =====================================================================
+# Batch — run several dashboard actions in one request. The touchscreen
+# used to chain 2–4 sequential fetches (clear → RESET → unlock, results →
+# finalize, unlock → LED:ALL_OFF); each was a Wi-Fi round trip. Steps are
+# dispatched in-process through the normal routes, in order.
+# =====================================================================
+
+BATCH_MAX_STEPS = 32
+BATCH_METHODS = ('GET', 'POST', 'DELETE')
+BATCH_EXCLUDED_PATHS = ('/api/batch', '/api/results/stream')
+
+
+def _run_batch_step(step):
+    """Dispatch one batch step through the app; return (status, json_or_text)."""
+    method = str(step.get('method', 'POST')).upper()
+    path = step.get('path', '')
+    body = step.get('body')
+
+    with app.test_request_context(
+        path,
+        method=method,
+        json=body if body is not None and method != 'GET' else None,
+        query_string=step.get('query'),
+        headers={'Cookie': request.headers.get('Cookie', '')},
+    ):
+        response = app.full_dispatch_request()
+    data = response.get_json(silent=True)
+    if data is None:
+        data = response.get_data(as_text=True)[:500]
+    return response.status_code, data
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    Run an ordered list of dashboard /api/ actions server-side.
+
+    Body JSON:
+        {"steps": [{"path": "/api/results/clear"},
+                   {"path": "/api/command", "body": {"command": "RESET"}},
+                   {"method": "GET", "path": "/api/racing/state"}],
+         "on_error": "stop"}            # or "continue"
+
+    A step fails if it returns HTTP >= 400 or {"success": false}. With
+    "stop" (default) the remaining steps are skipped. A step may set its
+    own "on_error" to override the batch's for its failure only (e.g. a
+    best-effort RESET that shouldn't block what follows). Each result
+    carries its status, response body and duration in ms.
+    """
+    data = request.get_json(silent=True) or {}
+    steps = data.get('steps')
+    on_error = data.get('on_error', 'stop')
+
+    if not isinstance(steps, list) or not steps:
+        return jsonify({'success': False, 'error': 'steps must be a non-empty list'}), 400
+    if len(steps) > BATCH_MAX_STEPS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_STEPS} steps per batch'}), 400
+    if on_error not in ('stop', 'continue'):
+        return jsonify({'success': False, 'error': "on_error must be 'stop' or 'continue'"}), 400
+
+    # Validate everything up front so a typo can't half-run a sequence
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            return jsonify({'success': False, 'error': f'Step {i}: must be an object'}), 400
+        path = step.get('path', '')
+        method = str(step.get('method', 'POST')).upper()
+        if not isinstance(path, str) or not path.startswith('/api/') or path.startswith(BATCH_EXCLUDED_PATHS):
+            return jsonify({'success': False, 'error': f'Step {i}: path not allowed: {path!r}'}), 400
+        if method not in BATCH_METHODS:
+            return jsonify({'success': False, 'error': f'Step {i}: method not allowed: {method}'}), 400
+        if step.get('on_error', on_error) not in ('stop', 'continue'):
+            return jsonify({'success': False, 'error': f"Step {i}: on_error must be 'stop' or 'continue'"}), 400
+
+    batch_start = time.perf_counter()
+    results = []
+    failed = stopped = False
+    for i, step in enumerate(steps):
+        entry = {'index': i, 'method': str(step.get('method', 'POST')).upper(), 'path': step['path']}
+        if stopped:
+            entry.update(ok=False, skipped=True)
+            results.append(entry)
+            continue
+
+        t0 = time.perf_counter()
+        try:
+            status, body = _run_batch_step(step)
+            ok = status < 400 and not (isinstance(body, dict) and body.get('success') is False)
+        except Exception as e:
+            print(f'[BATCH] Step {i} {step["path"]} raised: {e}')
+            status, body, ok = 500, {'success': False, 'error': str(e)}, False
+        entry.update(ok=ok, status=status, data=body,
+                     ms=round((time.perf_counter() - t0) * 1000.0, 2))
+        results.append(entry)
+        if not ok:
+            failed = True
+            stopped = step.get('on_error', on_error) == 'stop'
+
+    return jsonify({
+        'success': not failed,
+        'completed': sum(1 for r in results if not r.get('skipped')),
+        'total': len(steps),
+        'results': results,
+        'total_ms': round((time.perf_counter() - batch_start) * 1000.0, 2),
+    })
+
+
 @app.route('/api/tote/ping', methods=['GET'])
 def api_tote_ping():
     """Test connection to tote board"""
@@ -1318,16 +1467,46 @@ def api_weather():
 # ---------------------------------------------------------------------------
 # Initialize Racing Data Service and register blueprint
 # ---------------------------------------------------------------------------
-racing_service = init_racing_service(socketio=socketio, use_mock=True, esp32_client=esp32)
+race_clock = ScaledClock(RACE_TIME_COMPRESSION) if RACE_TIME_COMPRESSION != 1.0 else None
+racing_service = init_racing_service(socketio=socketio, use_mock=True, esp32_client=esp32,
+                                     clock=race_clock, races=RACE_CARD,
+                                     journal_dir=RACE_JOURNAL_DIR, card_file=RACE_CARD_FILE)
 app.register_blueprint(racing_bp)
 app.register_blueprint(guest_ui)
 print("Racing data service initialised (mock mode)")
+if race_clock is not None:
+    print(f"Race timers compressed {RACE_TIME_COMPRESSION}x")
+
+# La Quiniela pools: odds to the spectator TV and the tote board, rate-bounded
+init_pool_service(get_race_card(), socketio=socketio,
+                  tote=lambda line: tote_send('scroll', line),
+                  split=QUINIELA_SPLIT, takeout=QUINIELA_TAKEOUT,
+                  ticket_price=QUINIELA_TICKET_PRICE, journal_dir=QUINIELA_JOURNAL_DIR)
+app.register_blueprint(pools_bp)
+print("La Quiniela pools initialised (/api/pools)")
 
 # La Subasta auction blueprint
 init_la_subasta(socketio=socketio, racing_service=racing_service)
 app.register_blueprint(la_subasta_bp)
 print("La Subasta initialised (/la-subasta)")
 
+# Results transaction: mantle, results file, featured race, La Subasta,
+# La Quiniela pools, then tote + SSE announcements
+results_txn = ResultsTransaction(
+    esp32_client=esp32,
+    get_racing_service=lambda: get_race_card().get(),
+    load_results=load_results,
+    save_results=save_results,
+    restore_results=restore_results,
+    hooks=[('la_subasta', lambda w, p, s: enter_results(w, p, s, only_if_awaiting=True)),
+           ('quiniela', settle_on_results)],
+    announce=[
+        ('tote', lambda w, p, s: tote_send('official', w, p, s)),
+        ('sse', lambda w, p, s: broadcast_sse('results', {'win': w, 'place': p, 'show': s})),
+    ],
+    num_cups=NUM_CUPS,
+)
+
 
 # ---------------------------------------------------------------------------
 # Socket.IO event handlers
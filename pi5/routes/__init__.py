@@ -1,10 +1,13 @@
 # routes package for DDM Horse Dashboard
 
 from routes.racing_routes import racing_bp, init_racing_service
+from routes.pool_routes import pools_bp, init_pool_service
 from routes.guest import guest_ui
 
 __all__ = [
     "racing_bp",
     "init_racing_service",
+    "pools_bp",
+    "init_pool_service",
     "guest_ui",
 ]
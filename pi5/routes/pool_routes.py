@@ -0,0 +1,327 @@
+# pool_routes.py - Flask API endpoints for La Quiniela pari-mutuel pools
+#
+# One ParimutuelPool per race on the card, created from the race's field the
+# first time it's used. Ticket sales come in from the cashier (single sales
+# or running totals), and every change schedules a rate-bounded push of the
+# live odds to the spectator TV and the tote board. With a journal folder
+# each race's pools are journaled and rebuilt from it after a restart.
+#
+# Like the racing routes, every route is available in two forms:
+#   /api/pools/<route>            — the featured race
+#   /api/pools/<race_id>/<route>  — any race on the card
+
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Blueprint, abort, g, jsonify, make_response, request
+
+from services.parimutuel import (
+    CUP_SPLIT, DEFAULT_TAKEOUT, POOLS, SPECTATOR_INTERVAL, TICKET_PRICE, TOTE_INTERVAL,
+    ParimutuelPool, PoolBroadcaster, PoolJournal,
+)
+from services.race_card import RaceCardManager
+from services.racing_data_service import RaceState, STATE_ORDER
+from services.scheduler import VirtualClock
+
+logger = logging.getLogger(__name__)
+
+pools_bp = Blueprint("pools", __name__, url_prefix="/api/pools")
+
+# Set via init_pool_service
+_card: RaceCardManager = None  # type: ignore[assignment]
+_pools: Dict[str, Tuple[ParimutuelPool, PoolBroadcaster]] = {}
+_options: dict = {}
+_lock = threading.Lock()
+
+# Tickets are refused from the moment the field is at the post
+_CLOSED_FROM = STATE_ORDER.index(RaceState.AT_THE_POST)
+
+
+# ---------------------------------------------------------------------------
+# Service initialisation
+# ---------------------------------------------------------------------------
+
+def init_pool_service(card: RaceCardManager, socketio=None,
+                      tote: Optional[Callable[[str], object]] = None,
+                      split=CUP_SPLIT, takeout: float = DEFAULT_TAKEOUT,
+                      ticket_price: float = TICKET_PRICE,
+                      spectator_interval: float = SPECTATOR_INTERVAL,
+                      tote_interval: float = TOTE_INTERVAL,
+                      journal_dir: Optional[str] = None) -> None:
+    """
+    Attach the pools to the race card. Call once at startup, after
+    init_racing_service().
+
+    Args:
+        card: The race card (get_race_card()).
+        socketio: Flask-SocketIO instance for `pool_update` (or None).
+        tote: Callable taking a scroll line for the tote board (or None).
+        split / takeout / ticket_price: Pool rules (see services.parimutuel).
+        spectator_interval / tote_interval: Minimum seconds between pushes.
+        journal_dir: Folder for per-race pool journals. Sales, scratches
+            and settlements survive a restart; None keeps pools in memory.
+    """
+    global _card
+    for pool, broadcaster in _pools.values():
+        broadcaster.stop()
+        if pool.journal is not None:
+            pool.journal.close()
+    _pools.clear()
+    _card = card
+    clock = card.scheduler.clock
+    virtual = isinstance(clock, VirtualClock)
+    _options.update(
+        emit=socketio.emit if socketio is not None else None, tote=tote,
+        split=tuple(split), takeout=takeout, ticket_price=ticket_price,
+        spectator_interval=spectator_interval, tote_interval=tote_interval,
+        threaded=not virtual, time_fn=clock.now if virtual else None,
+        journal_dir=journal_dir,
+    )
+    logger.info("Quiniela pools initialised (split=%s, takeout=%.0f%%)",
+                "/".join(f"{s:.0%}" for s in split), takeout * 100)
+
+
+def get_pool(race_id: Optional[str] = None) -> Tuple[ParimutuelPool, PoolBroadcaster]:
+    """
+    The (pool, broadcaster) for a race (featured if None), created from its
+    field on first use and replayed from its journal. An empty pool follows
+    the field if it changes (starting a fresh journal).
+    """
+    if _card is None:
+        raise RuntimeError("Pools not initialised. Call init_pool_service() first.")
+    svc = _card.get(race_id)
+    key = svc.race_id
+    posts = sorted(svc.horses)
+    with _lock:
+        entry = _pools.get(key)
+        journal = None
+        if entry is not None:
+            pool = entry[0]
+            if pool.post_positions.tolist() == posts or any(
+                    c.any() for c in pool.counts.values()):
+                return entry
+            entry[1].stop()
+            journal = pool.journal
+            if journal is not None:
+                journal.truncate()
+        pool = ParimutuelPool(posts, split=_options["split"], takeout=_options["takeout"],
+                              ticket_price=_options["ticket_price"])
+        if journal is None and _options.get("journal_dir"):
+            journal = PoolJournal(_options["journal_dir"], key)
+            if journal.replay(pool):
+                logger.info("Quiniela pools for %s restored from journal (%s)",
+                            key, journal.last_recovery)
+        pool.journal = journal
+        broadcaster = PoolBroadcaster(
+            pool, emit=_options["emit"], tote=_options["tote"], race_id=key,
+            is_featured=lambda: _card.featured_id == key,
+            spectator_interval=_options["spectator_interval"],
+            tote_interval=_options["tote_interval"],
+            threaded=_options["threaded"], time_fn=_options["time_fn"],
+        )
+        _pools[key] = (pool, broadcaster)
+        return pool, broadcaster
+
+
+def settle_on_results(win: int, place: int, show: int) -> Optional[dict]:
+    """
+    Results-transaction hook: settle the featured race's pools. The pools
+    never roll back official results, so anything they can't do is
+    reported in "status" instead:
+
+        settled            — paid out (the settlement follows)
+        no_tickets         — nothing to settle
+        already_settled    — settled earlier on these same results
+        settled_elsewhere  — settled earlier on different results; corrected
+                             results are NOT re-paid (reset and settle by hand)
+        not_settled        — results the pools can't pay (a finisher scratched)
+        error              — the settlement couldn't be journaled (disk full,
+                             SD-card error); the pools stay open, settle by hand
+    """
+    if _card is None:
+        return None
+    pool, broadcaster = get_pool()
+    order = [int(win), int(place), int(show)]
+    if pool.result is not None:
+        settled = pool.result["order"]
+        if settled == order:
+            logger.info("Quiniela pools already settled on %d-%d-%d", win, place, show)
+            return {"status": "already_settled", "order": settled}
+        logger.error("Quiniela pools were settled on %s; corrected results %s not re-paid",
+                     "-".join(map(str, settled)), "-".join(map(str, order)))
+        return {"status": "settled_elsewhere", "order": settled, "results": order}
+    if not any(c.any() for c in pool.counts.values()):
+        return {"status": "no_tickets"}
+    try:
+        result = pool.settle(win, place, show)
+    except ValueError as exc:
+        logger.error("Quiniela pools not settled on %d-%d-%d: %s", win, place, show, exc)
+        return {"status": "not_settled", "error": str(exc)}
+    except RuntimeError as exc:
+        logger.error("Quiniela pools not settled on %d-%d-%d: %s", win, place, show, exc)
+        return {"status": "error", "error": str(exc)}
+    broadcaster.changed()
+    broadcaster.flush()
+    return {"status": "settled", **result}
+
+
+@pools_bp.url_value_preprocessor
+def _pull_race_id(endpoint, values):
+    """Resolve /<race_id>/ before the view runs; unknown races are a 404."""
+    race_id = values.pop("race_id", None) if values else None
+    g.race_id = race_id
+    if race_id is not None and _card is not None and race_id not in _card:
+        abort(make_response(jsonify({"success": False, "error": f"Unknown race: {race_id}"}), 404))
+
+
+def _betting_closed() -> bool:
+    state = _card.get(g.get("race_id")).current_state
+    return STATE_ORDER.index(state) >= _CLOSED_FROM
+
+
+# ---------------------------------------------------------------------------
+# Routes — Pools
+# ---------------------------------------------------------------------------
+
+@pools_bp.route("", methods=["GET"])
+@pools_bp.route("/<race_id>", methods=["GET"])
+def get_pools():
+    """Pool totals, each cup's odds and will-pays, and the most-bet exotics."""
+    try:
+        pool, broadcaster = get_pool(g.get("race_id"))
+        return jsonify({"success": True, **broadcaster.payload(),
+                        "combinations": pool.combinations, "result": pool.result,
+                        "broadcast": broadcaster.stats(),
+                        "journal": pool.journal.stats() if pool.journal else None})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+
+
+@pools_bp.route("/tickets", methods=["POST"])
+@pools_bp.route("/<race_id>/tickets", methods=["POST"])
+def sell_tickets():
+    """
+    Record ticket sales.
+
+    Body JSON: {"pool": "exacta", "counts": {"7-3": 2, "3-7": 1}, "replace": false}
+    Cup keys are post positions ("7"); exotic keys are ordered "7-3" /
+    "7-3-12". With "replace": true the counts are running totals for the
+    whole pool (the cashier's tally) and replace what was there.
+    """
+    try:
+        pool, broadcaster = get_pool(g.get("race_id"))
+        data = request.get_json(silent=True) or {}
+        name = data.get("pool")
+        counts = data.get("counts")
+        if name not in POOLS:
+            return jsonify({"success": False,
+                            "error": f"pool must be one of: {', '.join(POOLS)}"}), 400
+        if not isinstance(counts, dict):
+            return jsonify({"success": False, "error": "counts must map combinations to tickets"}), 400
+        if _betting_closed():
+            return jsonify({"success": False, "error": "Betting is closed"}), 409
+        try:
+            if data.get("replace"):
+                version = pool.load(name, counts)
+            else:
+                version = pool.sell_counts(name, counts)
+        except (TypeError, ValueError) as exc:
+            return jsonify({"success": False, "error": str(exc)}), 400
+        broadcaster.changed()
+        return jsonify({"success": True, "version": version, "pools": pool.totals()})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+
+
+@pools_bp.route("/willpays/<pool_name>", methods=["GET"])
+@pools_bp.route("/<race_id>/willpays/<pool_name>", methods=["GET"])
+def get_will_pays(pool_name):
+    """
+    Every held combination's tickets and will-pay, most-bet first.
+    Query: ?horse=<post> keeps combinations with that horse in first.
+    """
+    try:
+        pool, _ = get_pool(g.get("race_id"))
+        if pool_name not in POOLS:
+            return jsonify({"success": False,
+                            "error": f"pool must be one of: {', '.join(POOLS)}"}), 400
+        first = request.args.get("horse")
+        try:
+            rows = pool.held(pool_name, int(first) if first is not None else None)
+        except ValueError:
+            return jsonify({"success": False, "error": f"Invalid horse: {first}"}), 400
+        return jsonify({"success": True, "pool": pool_name, "rows": rows, "count": len(rows)})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+
+
+@pools_bp.route("/scratch", methods=["POST"])
+@pools_bp.route("/<race_id>/scratch", methods=["POST"])
+def scratch_horse():
+    """
+    Take a horse out of every pool; its tickets are refunded.
+    Body JSON: {"horse": 7, "scratched": true}  (false puts it back)
+    """
+    try:
+        pool, broadcaster = get_pool(g.get("race_id"))
+        data = request.get_json(silent=True) or {}
+        try:
+            horse = int(data.get("horse"))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "horse must be an integer"}), 400
+        try:
+            if data.get("scratched", True):
+                refunds = pool.scratch(horse)
+            else:
+                pool.unscratch(horse)
+                refunds = None
+        except ValueError as exc:
+            return jsonify({"success": False, "error": str(exc)}), 400
+        broadcaster.changed()
+        return jsonify({"success": True, "horse": horse, "refunds": refunds,
+                        "pools": pool.totals()})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+
+
+@pools_bp.route("/settle", methods=["POST"])
+@pools_bp.route("/<race_id>/settle", methods=["POST"])
+def settle_pools():
+    """
+    Pay out the pools (the featured race settles itself on official results).
+    Body JSON: {"win": 7, "place": 3, "show": 12}
+    """
+    try:
+        pool, broadcaster = get_pool(g.get("race_id"))
+        data = request.get_json(silent=True) or {}
+        try:
+            win, place, show = int(data.get("win")), int(data.get("place")), int(data.get("show"))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "win, place, and show must be integers"}), 400
+        if pool.result is not None:
+            return jsonify({"success": False, "error": "Pools are settled",
+                            "result": pool.result}), 409
+        try:
+            result = pool.settle(win, place, show)
+        except ValueError as exc:
+            return jsonify({"success": False, "error": str(exc)}), 400
+        broadcaster.changed()
+        broadcaster.flush()
+        return jsonify({"success": True, "result": result})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+
+
+@pools_bp.route("/reset", methods=["POST"])
+@pools_bp.route("/<race_id>/reset", methods=["POST"])
+def reset_pools():
+    """Empty the pools, scratches and result."""
+    try:
+        pool, broadcaster = get_pool(g.get("race_id"))
+        pool.reset()
+        broadcaster.changed()
+        broadcaster.flush()
+        return jsonify({"success": True, "pools": pool.totals()})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
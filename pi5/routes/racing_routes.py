@@ -2,10 +2,18 @@
 #
 # Provides REST endpoints for managing race state, horse entries,
 # auto-progression, and race results.
+#
+# Every per-race route is available in two forms:
+#   /api/racing/<route>            — the featured race (original single-race API)
+#   /api/racing/<race_id>/<route>  — any race on the card
+# GET /api/racing/card lists the whole card.
 
 import logging
-from flask import Blueprint, jsonify, request
+import os
+from flask import Blueprint, abort, g, jsonify, make_response, request
 
+from services.card_importer import CardImportError, import_card
+from services.race_card import DEFAULT_RACE_ID, RaceCardManager
 from services.racing_data_service import RacingDataService, RaceState
 
 logger = logging.getLogger(__name__)
@@ -16,17 +24,19 @@ logger = logging.getLogger(__name__)
 
 racing_bp = Blueprint("racing", __name__, url_prefix="/api/racing")
 
-# Module-level service instance (set via init_racing_service)
-_service: RacingDataService = None  # type: ignore[assignment]
+# Module-level race card (set via init_racing_service)
+_card: RaceCardManager = None  # type: ignore[assignment]
 
 
 # ---------------------------------------------------------------------------
 # Service initialisation
 # ---------------------------------------------------------------------------
 
-def init_racing_service(socketio=None, use_mock: bool = True, esp32_client=None) -> RacingDataService:
+def init_racing_service(socketio=None, use_mock: bool = True, esp32_client=None,
+                        clock=None, races=None, journal_dir=None,
+                        card_file=None) -> RacingDataService:
     """
-    Create and store the RacingDataService instance.
+    Create the race card and store it for the routes.
 
     Call this once at application startup before registering the blueprint
     so the routes have access to the service.
@@ -35,24 +45,58 @@ def init_racing_service(socketio=None, use_mock: bool = True, esp32_client=None)
         socketio: Flask-SocketIO instance (or None for headless operation).
         use_mock: If True, populate with mock horse data on init.
         esp32_client: ESP32 client for sending LED commands (or None).
+        clock: Optional clock for race timers (e.g. ScaledClock for a
+            time-compressed rehearsal). Defaults to wall time.
+        races: List of (race_id, race_name) for the card. The first entry is
+            featured. Defaults to the Derby alone.
+        journal_dir: Folder for crash-safe race journals. Races resume from
+            it on restart. None disables journaling.
+        card_file: Race-card CSV/JSON/JSONL to load entries from, if it
+            exists. Races resumed from their journal keep their field.
 
     Returns:
-        The initialised RacingDataService instance.
+        The featured race's RacingDataService instance.
     """
-    global _service
-    _service = RacingDataService(socketio=socketio, use_mock=use_mock, esp32_client=esp32_client)
-    logger.info("Racing service initialised (mode=manual, esp32=%s)", "connected" if esp32_client else "none")
-    return _service
+    global _card
+    _card = RaceCardManager(socketio=socketio, esp32_client=esp32_client,
+                            clock=clock, use_mock=use_mock, journal_dir=journal_dir)
+    for race_id, race_name in (races or [(DEFAULT_RACE_ID, "Derby de Mayo")]):
+        _card.add_race(race_id, race_name)
+    if card_file and os.path.exists(card_file):
+        try:
+            index, report = import_card(card_file)
+            _card.load_card(index, skip_restored=True)
+            logger.info("Race card loaded from %s (%d entries, %d rejected)",
+                        card_file, report["imported"], report["rejected"])
+        except (OSError, CardImportError) as exc:
+            logger.error("Race card %s not loaded: %s", card_file, exc)
+    logger.info("Racing service initialised (races=%d, mode=manual, esp32=%s)",
+                len(_card), "connected" if esp32_client else "none")
+    return _card.get()
+
+
+def get_race_card() -> RaceCardManager:
+    """Return the race card (None before init_racing_service)."""
+    return _card
 
 
 def _get_service() -> RacingDataService:
-    """Return the service instance or raise if not initialised."""
-    if _service is None:
+    """Return the race addressed by the URL (featured if none) or raise if not initialised."""
+    if _card is None:
         raise RuntimeError(
             "RacingDataService not initialised. "
             "Call init_racing_service() before using racing routes."
         )
-    return _service
+    return _card.get(g.get("race_id"))
+
+
+@racing_bp.url_value_preprocessor
+def _pull_race_id(endpoint, values):
+    """Resolve /<race_id>/ before the view runs; unknown races are a 404."""
+    race_id = values.pop("race_id", None) if values else None
+    g.race_id = race_id
+    if race_id is not None and _card is not None and race_id not in _card:
+        abort(make_response(jsonify({"success": False, "error": f"Unknown race: {race_id}"}), 404))
 
 
 # ---------------------------------------------------------------------------
@@ -111,6 +155,7 @@ def _resolve_state(name: str) -> RaceState:
 # ---------------------------------------------------------------------------
 
 @racing_bp.route("/horses", methods=["GET"])
+@racing_bp.route("/<race_id>/horses", methods=["GET"])
 def get_horses():
     """Return JSON list of all horses with current data."""
     try:
@@ -132,6 +177,7 @@ def get_horses():
 # ---------------------------------------------------------------------------
 
 @racing_bp.route("/state", methods=["GET"])
+@racing_bp.route("/<race_id>/state", methods=["GET"])
 def get_state():
     """Return current race state, mode, horse data, odds, and timing."""
     try:
@@ -149,6 +195,7 @@ def get_state():
 
 
 @racing_bp.route("/state", methods=["POST"])
+@racing_bp.route("/<race_id>/state", methods=["POST"])
 def set_state():
     """
     Manually set the race state (admin override).
@@ -193,6 +240,7 @@ def set_state():
 # ---------------------------------------------------------------------------
 
 @racing_bp.route("/mode", methods=["GET"])
+@racing_bp.route("/<race_id>/mode", methods=["GET"])
 def get_mode():
     """Return current race control mode: 'auto' or 'manual'."""
     try:
@@ -206,6 +254,7 @@ def get_mode():
 
 
 @racing_bp.route("/mode", methods=["POST"])
+@racing_bp.route("/<race_id>/mode", methods=["POST"])
 def set_mode():
     """
     Switch between auto and manual race control.
@@ -245,6 +294,7 @@ def set_mode():
 # ---------------------------------------------------------------------------
 
 @racing_bp.route("/override/state", methods=["POST"])
+@racing_bp.route("/<race_id>/override/state", methods=["POST"])
 def override_state():
     """
     Manually set race state (manual mode only). Triggers LED animation on ESP32.
@@ -288,6 +338,7 @@ def override_state():
 
 
 @racing_bp.route("/override/winner", methods=["POST"])
+@racing_bp.route("/<race_id>/override/winner", methods=["POST"])
 def override_winner():
     """
     Manually trigger winner spotlight. Works in BOTH modes (emergency override).
@@ -343,6 +394,7 @@ def override_winner():
 # ---------------------------------------------------------------------------
 
 @racing_bp.route("/start", methods=["POST"])
+@racing_bp.route("/<race_id>/start", methods=["POST"])
 def start_auto():
     """Start the auto-progression timer through race states."""
     try:
@@ -361,6 +413,7 @@ def start_auto():
 
 
 @racing_bp.route("/stop", methods=["POST"])
+@racing_bp.route("/<race_id>/stop", methods=["POST"])
 def stop_auto():
     """Stop the auto-progression timer."""
     try:
@@ -379,6 +432,7 @@ def stop_auto():
 
 
 @racing_bp.route("/reset", methods=["POST"])
+@racing_bp.route("/<race_id>/reset", methods=["POST"])
 def reset_race():
     """Reset to DORMANT state with fresh horses."""
     try:
@@ -401,6 +455,7 @@ def reset_race():
 # ---------------------------------------------------------------------------
 
 @racing_bp.route("/winners", methods=["POST"])
+@racing_bp.route("/<race_id>/winners", methods=["POST"])
 def set_winners():
     """
     Set the finishing positions and transition to OFFICIAL state.
@@ -468,6 +523,7 @@ def set_winners():
 
 
 @racing_bp.route("/results", methods=["GET"])
+@racing_bp.route("/<race_id>/results", methods=["GET"])
 def get_results():
     """
     Return win/place/show horse data if results have been set.
@@ -505,3 +561,155 @@ def get_results():
     except Exception as exc:
         logger.exception("Error in get_results")
         return jsonify({"success": False, "error": str(exc)}), 500
+
+
+# ---------------------------------------------------------------------------
+# Routes — Race Simulation (RUNNING)
+# ---------------------------------------------------------------------------
+
+@racing_bp.route("/sim", methods=["GET"])
+@racing_bp.route("/<race_id>/sim", methods=["GET"])
+def get_sim_stats():
+    """Return race simulation tick/stream stats and LED sender latency."""
+    try:
+        svc = _get_service()
+        return jsonify({"success": True, **svc.get_sim_stats()})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+
+
+@racing_bp.route("/live", methods=["POST"])
+@racing_bp.route("/<race_id>/live", methods=["POST"])
+def feed_live_positions():
+    """
+    Feed live running positions into the race simulation.
+    Body JSON: {"positions": {"7": 0.42, "3": 0.40, ...}} — progress 0..1 by post.
+    """
+    try:
+        svc = _get_service()
+        data = request.get_json(silent=True) or {}
+        positions = data.get("positions")
+        if not isinstance(positions, dict) or not positions:
+            return jsonify({"success": False, "error": "Missing required field: positions"}), 400
+        try:
+            progress = {int(k): float(v) for k, v in positions.items()}
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "positions must map post position to a number"}), 400
+
+        if not svc.feed_live_positions(progress):
+            return jsonify({"success": False, "error": "No race running"}), 409
+        return jsonify({"success": True, "accepted": len(progress)})
+
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+    except Exception as exc:
+        logger.exception("Error in feed_live_positions")
+        return jsonify({"success": False, "error": str(exc)}), 500
+
+
+@racing_bp.route("/journal", methods=["GET"])
+@racing_bp.route("/<race_id>/journal", methods=["GET"])
+def get_journal_stats():
+    """Return journal counters and the last startup recovery time."""
+    try:
+        svc = _get_service()
+        return jsonify({"success": True, **svc.get_journal_stats()})
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 503
+
+
+# ---------------------------------------------------------------------------
+# Routes — Race Card
+# ---------------------------------------------------------------------------
+
+@racing_bp.route("/card", methods=["GET"])
+def get_card():
+    """Return every race on the card with state, timing, and results."""
+    if _card is None:
+        return jsonify({"success": False, "error": "Race card not initialised"}), 503
+    return jsonify({
+        "success": True,
+        "featured": _card.featured_id,
+        "races": _card.summary(),
+        "stats": _card.stats(),
+    })
+
+
+@racing_bp.route("/card/featured", methods=["POST"])
+def set_featured_race():
+    """
+    Put a race on the mantle (it takes over the ESP32 LED commands).
+    Body JSON: {"race_id": "undercard-1"}
+    """
+    if _card is None:
+        return jsonify({"success": False, "error": "Race card not initialised"}), 503
+    data = request.get_json(silent=True) or {}
+    race_id = data.get("race_id")
+    if not race_id:
+        return jsonify({"success": False, "error": "Missing required field: race_id"}), 400
+    if race_id not in _card:
+        return jsonify({"success": False, "error": f"Unknown race: {race_id}"}), 404
+    _card.set_featured(race_id)
+    return jsonify({"success": True, "featured": race_id})
+
+
+@racing_bp.route("/card/import", methods=["POST"])
+def import_race_card():
+    """
+    Stream a race-card file into the card and populate the races from it.
+
+    Accepts a multipart upload (field "file") or a raw request body.
+    Query: ?format=csv|json|jsonl (otherwise detected from the filename or
+    the first character).
+    """
+    if _card is None:
+        return jsonify({"success": False, "error": "Race card not initialised"}), 503
+
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename = upload.stream, upload.filename or ""
+    else:
+        stream, filename = request.stream, ""
+    fmt = request.args.get("format")
+
+    try:
+        index, report = import_card(stream, fmt=fmt, filename=filename)
+    except (CardImportError, UnicodeDecodeError) as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+
+    if not len(index):
+        return jsonify({"success": False, "error": "No valid entries", **report}), 400
+
+    loaded = _card.load_card(index)
+    return jsonify({"success": True, "loaded": loaded, **report})
+
+
+@racing_bp.route("/card/lookup", methods=["GET"])
+def lookup_entry():
+    """
+    O(1) race-card lookups.
+    Query: ?horse=<name>  |  ?jockey=<name>  |  ?race_id=<id>&post=<n>
+    Names are matched case-, accent- and punctuation-insensitively.
+    """
+    if _card is None:
+        return jsonify({"success": False, "error": "Race card not initialised"}), 503
+    index = _card.index
+    horse = request.args.get("horse")
+    jockey = request.args.get("jockey")
+    post = request.args.get("post")
+
+    if horse:
+        matches = index.find_horse(horse)
+    elif jockey:
+        matches = index.find_jockey(jockey)
+    elif post:
+        try:
+            entry = index.get(request.args.get("race_id") or _card.featured_id, int(post))
+        except ValueError:
+            return jsonify({"success": False, "error": "post must be an integer"}), 400
+        matches = [entry] if entry else []
+    else:
+        return jsonify({"success": False, "error": "Provide horse, jockey, or post"}), 400
+
+    return jsonify({"success": True, "entries": [e.to_dict() for e in matches],
+                    "count": len(matches)})
@@ -6,10 +6,22 @@ from services.racing_data_service import (
     RacingDataService,
     SADDLE_CLOTH_COLORS,
 )
+from services.race_card import RaceCardManager
+from services.scheduler import (
+    Scheduler,
+    SystemClock,
+    ScaledClock,
+    VirtualClock,
+)
 
 __all__ = [
     "RaceState",
     "DerbyHorse",
     "RacingDataService",
     "SADDLE_CLOTH_COLORS",
+    "RaceCardManager",
+    "Scheduler",
+    "SystemClock",
+    "ScaledClock",
+    "VirtualClock",
 ]
@@ -0,0 +1,107 @@
+# services/bench_odds.py - Odds drift + serialise microbenchmark
+#
+# Run with: python -m services.bench_odds [--ticks N] [--json]  (from pi5/)
+#
+# Measures the per-tick cost of one odds drift plus building the
+# odds_update payload, for:
+#   legacy  — per-DerbyHorse Python loop + asdict() of the whole field
+#   engine  — OddsEngine.step() + delta rows for changed horses only
+# across field sizes from the real 20 up to a few thousand.
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.odds_engine import OddsEngine  # noqa: E402
+from services.racing_data_service import DerbyHorse  # noqa: E402
+
+FIELD_SIZES = (20, 100, 500, 2000)
+
+
+def _make_field(n):
+    rng = random.Random(7)
+    horses = []
+    for pos in range(1, n + 1):
+        ml = rng.choice([1.2, 2.0, 2.5, 4.0, 6.0, 10.0, 20.0, 50.0])
+        horses.append(DerbyHorse(
+            post_position=pos, horse_name=f"Horse {pos}", jockey="J", trainer="T",
+            morning_line_odds=f"{ml}/1", current_odds=ml,
+            saddle_cloth_color="#808080",
+        ))
+    return horses
+
+
+def _bench_legacy(horses, ticks):
+    start = time.perf_counter()
+    payload_bytes = 0
+    for _ in range(ticks):
+        for horse in horses:
+            drift_pct = random.uniform(-0.05, 0.05)
+            horse.current_odds = round(max(1.1, horse.current_odds * (1.0 + drift_pct)), 2)
+        payload = {"horses": [asdict(h) for h in horses]}
+        payload_bytes += len(json.dumps(payload))
+    elapsed = time.perf_counter() - start
+    return elapsed / ticks, payload_bytes / ticks
+
+
+def _bench_engine(horses, ticks):
+    engine = OddsEngine(
+        [h.post_position for h in horses],
+        [h.current_odds for h in horses],
+        seed=7,
+    )
+    start = time.perf_counter()
+    payload_bytes = 0
+    for _ in range(ticks):
+        changed = engine.step()
+        payload = {"horses": engine.deltas(changed)}
+        payload_bytes += len(json.dumps(payload))
+    elapsed = time.perf_counter() - start
+    return elapsed / ticks, payload_bytes / ticks
+
+
+def run(ticks=500):
+    rows = []
+    for n in FIELD_SIZES:
+        legacy_s, legacy_b = _bench_legacy(_make_field(n), ticks)
+        engine_s, engine_b = _bench_engine(_make_field(n), ticks)
+        rows.append({
+            "field_size": n,
+            "legacy_us_per_tick": round(legacy_s * 1e6, 1),
+            "engine_us_per_tick": round(engine_s * 1e6, 1),
+            "speedup": round(legacy_s / engine_s, 1) if engine_s else None,
+            "legacy_payload_bytes": int(legacy_b),
+            "engine_payload_bytes": int(engine_b),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Odds drift + serialise microbenchmark")
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    rows = run(args.ticks)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    print(f"Odds drift + serialise, {args.ticks} ticks per size\n")
+    print(f"{'field':>6} {'legacy µs':>10} {'engine µs':>10} {'speedup':>8} "
+          f"{'legacy B':>10} {'engine B':>10}")
+    for r in rows:
+        print(f"{r['field_size']:>6} {r['legacy_us_per_tick']:>10} "
+              f"{r['engine_us_per_tick']:>10} {r['speedup']:>7}x "
+              f"{r['legacy_payload_bytes']:>10} {r['engine_payload_bytes']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# services/bench_parimutuel.py - Pool will-pay microbenchmark
+#
+# Run with: python -m services.bench_parimutuel [--tickets N] [--repeat N] [--json]
+#           (from pi5/)
+#
+# Measures one full re-price of every pool after a sale, for:
+#   loop    — a dict of ticket counts per combination, will-pays computed
+#             combination by combination in Python
+#   vector  — ParimutuelPool.will_pays() over the count arrays
+# across field sizes up to the real 20 (6,840 trifecta combinations).
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.parimutuel import CUP_SPLIT, ParimutuelPool  # noqa: E402
+
+FIELD_SIZES = (8, 12, 20)
+
+
+def _tickets(n, tickets, seed=49):
+    rng = random.Random(seed)
+    posts = list(range(1, n + 1))
+    return {
+        "cups": [(rng.choice(posts),) for _ in range(tickets)],
+        "exacta": [tuple(rng.sample(posts, 2)) for _ in range(tickets)],
+        "trifecta": [tuple(rng.sample(posts, 3)) for _ in range(tickets)],
+    }
+
+
+def _reprice_loop(n, counts):
+    """Every combination's will-pay, one at a time (None where unbacked)."""
+    out = {}
+    cups = counts["cups"]
+    net = sum(cups.values())
+    out["cups"] = {h: (None if not cups.get((h,)) else
+                       [int(net * share / cups[(h,)] * 100) / 100 for share in CUP_SPLIT])
+                   for h in range(1, n + 1)}
+    for pool, legs in (("exacta", 2), ("trifecta", 3)):
+        held = counts[pool]
+        net = sum(held.values())
+        out[pool] = {c: (int(net / held[c] * 100) / 100 if held.get(c) else None)
+                     for c in itertools.permutations(range(1, n + 1), legs)}
+    return out
+
+
+def _median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(times)
+
+
+def run(tickets=5000, repeat=20):
+    rows = []
+    for n in FIELD_SIZES:
+        sales = _tickets(n, tickets)
+        counts = {pool: {} for pool in sales}
+        for pool, combos in sales.items():
+            for c in combos:
+                counts[pool][c] = counts[pool].get(c, 0) + 1
+        engine = ParimutuelPool(range(1, n + 1))
+        for pool, combos in sales.items():
+            engine.sell(pool, combos)
+
+        loop_ms = _median_ms(lambda: _reprice_loop(n, counts), repeat)
+        vector_ms = _median_ms(lambda: [engine.will_pays(p) for p in counts], repeat)
+        snapshot_ms = _median_ms(engine.snapshot, repeat)
+        rows.append({
+            "field_size": n,
+            "trifecta_combinations": engine.combinations["trifecta"],
+            "loop_ms": round(loop_ms, 3),
+            "vector_ms": round(vector_ms, 3),
+            "snapshot_ms": round(snapshot_ms, 3),
+            "speedup": round(loop_ms / vector_ms, 1) if vector_ms else None,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pool will-pay microbenchmark")
+    parser.add_argument("--tickets", type=int, default=5000, help="tickets per pool")
+    parser.add_argument("--repeat", type=int, default=20, help="median of N runs")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    rows = run(args.tickets, args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    print(f"Re-price every pool, {args.tickets} tickets per pool, median of {args.repeat}\n")
+    print(f"{'field':>6} {'trifectas':>10} {'loop ms':>9} {'vector ms':>10} "
+          f"{'snapshot ms':>12} {'speedup':>8}")
+    for r in rows:
+        print(f"{r['field_size']:>6} {r['trifecta_combinations']:>10} {r['loop_ms']:>9} "
+              f"{r['vector_ms']:>10} {r['snapshot_ms']:>12} {r['speedup']:>7}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
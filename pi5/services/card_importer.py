@@ -0,0 +1,420 @@
+# card_importer.py - Streaming race-card importer + indexed horse lookup
+#
+# Loads a real race card (jockeys, trainers, morning lines) from CSV, JSON
+# Lines, or JSON without ever holding the raw file in memory:
+#
+#   CSV    header row, one entry per row
+#   JSONL  one entry object per line
+#   JSON   an array of entry objects, or a nested card:
+#            {"races": [{"race_id": "derby", "race_name": "...",
+#                        "horses": [{...}, {...}]}, ...]}
+#
+# Rows are validated one at a time; bad rows are counted and reported (up
+# to MAX_REPORTED_ERRORS) and never stop the import. Valid entries go into a
+# RaceCardIndex with O(1) lookups by (race, post position), normalised horse
+# name, and jockey.
+#
+# Entry fields (aliases in FIELD_ALIASES): race_id, race_name, post_position,
+# horse_name, jockey, trainer, morning_line_odds.
+
+import csv
+import io
+import json
+import logging
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RACE_ID = "derby"
+
+# Cups on the mantle — post positions outside this range can't be shown
+MAX_POST_POSITION = 20
+
+# Keep the error report bounded no matter how bad the file is
+MAX_REPORTED_ERRORS = 100
+
+_CHUNK_SIZE = 64 * 1024
+
+FIELD_ALIASES = {
+    "race_id": ("race_id", "race", "race_number", "heat"),
+    "race_name": ("race_name", "race_title"),
+    "post_position": ("post_position", "post", "pp", "number", "cup"),
+    "horse_name": ("horse_name", "horse", "name"),
+    "jockey": ("jockey", "rider"),
+    "trainer": ("trainer",),
+    "morning_line_odds": ("morning_line_odds", "morning_line", "ml", "odds"),
+}
+
+_RACE_ID_CLEAN = re.compile(r"[^a-z0-9_-]+")
+_ODDS_FRACTION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[/\-:]\s*(\d+(?:\.\d+)?)\s*$")
+_CONTEXT_FIELD = re.compile(r'"(race_id|race_name)"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+)')
+
+
+class CardImportError(ValueError):
+    """A row that failed validation."""
+
+
+@dataclass(frozen=True, slots=True)
+class RaceEntry:
+    """One validated race-card entry."""
+    race_id: str
+    race_name: str
+    post_position: int
+    horse_name: str
+    jockey: str
+    trainer: str
+    morning_line_odds: str      # normalised "a/b"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# =============================================================================
+# Normalisation
+# =============================================================================
+
+def normalise_name(name: str) -> str:
+    """Lookup key for a horse/jockey name: accent-, case- and punctuation-insensitive."""
+    folded = unicodedata.normalize("NFKD", name or "")
+    folded = "".join(c for c in folded if not unicodedata.combining(c)).casefold()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", folded).split())
+
+
+def normalise_race_id(value) -> str:
+    race_id = _RACE_ID_CLEAN.sub("-", str(value).strip().lower()).strip("-")
+    if race_id.isdigit():
+        race_id = f"race-{race_id}"
+    return race_id[:32]
+
+
+def normalise_odds(value) -> str:
+    """'5/2', '5-2', '5:2' → '5/2'; decimal 2.5 → '5/2'; '' → '' (no line)."""
+    text = str(value or "").strip()
+    if not text:
+        return ""
+    m = _ODDS_FRACTION.match(text)
+    if m:
+        num, den = float(m.group(1)), float(m.group(2))
+        if den <= 0:
+            raise CardImportError(f"invalid odds '{text}'")
+    else:
+        try:
+            num, den = float(text), 1.0
+        except ValueError:
+            raise CardImportError(f"invalid odds '{text}'") from None
+    if num <= 0:
+        raise CardImportError(f"invalid odds '{text}'")
+    # Express as a small-integer fraction (2.5 → 5/2)
+    for d in (1, 2, 4, 5, 10):
+        n = num * d / den
+        if abs(n - round(n)) < 1e-9:
+            return f"{int(round(n))}/{d}"
+    return f"{num / den:g}/1"
+
+
+def _pick(row: dict, field: str):
+    for key in FIELD_ALIASES[field]:
+        if key in row and row[key] not in (None, ""):
+            return row[key]
+    return None
+
+
+def validate_row(row: dict, context: Optional[dict] = None) -> RaceEntry:
+    """
+    Validate and normalise one raw row.
+
+    Raises:
+        CardImportError: If a required field is missing or malformed.
+    """
+    row = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    context = context or {}
+
+    raw_race = _pick(row, "race_id") or context.get("race_id") or DEFAULT_RACE_ID
+    race_id = normalise_race_id(raw_race)
+    if not race_id:
+        raise CardImportError(f"invalid race_id '{raw_race}'")
+    race_name = str(_pick(row, "race_name") or context.get("race_name") or race_id).strip()
+
+    raw_post = _pick(row, "post_position")
+    try:
+        post = int(str(raw_post).strip())
+    except (TypeError, ValueError):
+        raise CardImportError(f"invalid post_position '{raw_post}'") from None
+    if not 1 <= post <= MAX_POST_POSITION:
+        raise CardImportError(f"post_position {post} outside 1–{MAX_POST_POSITION}")
+
+    name = str(_pick(row, "horse_name") or "").strip()
+    if not name:
+        raise CardImportError("missing horse_name")
+
+    return RaceEntry(
+        race_id=race_id,
+        race_name=race_name,
+        post_position=post,
+        horse_name=name,
+        jockey=str(_pick(row, "jockey") or "").strip(),
+        trainer=str(_pick(row, "trainer") or "").strip(),
+        morning_line_odds=normalise_odds(_pick(row, "morning_line_odds")),
+    )
+
+
+# =============================================================================
+# Streaming readers — each yields (row_number, raw_dict, context)
+# =============================================================================
+
+def iter_csv(fh: TextIO) -> Iterator[Tuple[int, dict, dict]]:
+    for n, row in enumerate(csv.DictReader(fh), start=2):  # row 1 is the header
+        yield n, row, {}
+
+
+def iter_jsonl(fh: TextIO) -> Iterator[Tuple[int, dict, dict]]:
+    for n, line in enumerate(fh, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as exc:
+            yield n, {"__error__": f"invalid JSON: {exc}"}, {}
+            continue
+        yield n, obj if isinstance(obj, dict) else {"__error__": "not an object"}, {}
+
+
+def iter_json(fh: TextIO) -> Iterator[Tuple[int, dict, dict]]:
+    """
+    Stream leaf objects (objects with no nested object/array) out of a JSON
+    document — horse entries in either a flat array or a nested card. Scalar
+    race_id / race_name on enclosing objects (written before their entries)
+    are passed as context. Only the current entry's text is buffered.
+    """
+    stack: List[list] = []       # [kind, is_leaf, context] per open container
+    in_string = escape = False
+    obj: List[str] = []          # text of the current candidate leaf object
+    gap: List[str] = []          # text outside leaves (scanned for context)
+    count = 0
+
+    def scan_gap():
+        if gap:
+            frame = next((f for f in reversed(stack) if f[0] == "{"), None)
+            if frame is not None:
+                for key, raw in _CONTEXT_FIELD.findall("".join(gap)):
+                    frame[2][key] = json.loads(raw) if raw.startswith('"') else raw
+            gap.clear()
+
+    while True:
+        chunk = fh.read(_CHUNK_SIZE)
+        if not chunk:
+            break
+        for c in chunk:
+            collecting = bool(stack) and stack[-1][1]
+            (obj if collecting else gap).append(c)
+
+            if in_string:
+                if escape:
+                    escape = False
+                elif c == "\\":
+                    escape = True
+                elif c == '"':
+                    in_string = False
+                continue
+            if c == '"':
+                in_string = True
+            elif c in "{[":
+                if collecting:
+                    # Parent turned out not to be a leaf: its text is context
+                    stack[-1][1] = False
+                    gap.extend(obj)
+                    obj.clear()
+                scan_gap()
+                stack.append([c, c == "{", {}])
+                if c == "{":
+                    obj.append(c)
+            elif c in "}]":
+                if not stack:
+                    raise CardImportError("unbalanced JSON")
+                if stack[-1][1]:
+                    stack.pop()
+                    count += 1
+                    context = {}
+                    for frame in stack:
+                        context.update(frame[2])
+                    try:
+                        yield count, json.loads("".join(obj)), context
+                    except ValueError as exc:
+                        yield count, {"__error__": f"invalid JSON: {exc}"}, {}
+                    obj.clear()
+                else:
+                    scan_gap()
+                    stack.pop()
+
+
+READERS = {"csv": iter_csv, "jsonl": iter_jsonl, "json": iter_json}
+
+
+def detect_format(filename: str = "", first_char: str = "") -> str:
+    name = (filename or "").lower()
+    for ext in ("jsonl", "ndjson"):
+        if name.endswith("." + ext):
+            return "jsonl"
+    if name.endswith(".json"):
+        return "json"
+    if name.endswith(".csv"):
+        return "csv"
+    return "json" if first_char in "[{" else "csv"
+
+
+# =============================================================================
+# Index
+# =============================================================================
+
+class RaceCardIndex:
+    """
+    Validated entries with O(1) lookups.
+
+    by_post:   (race_id, post_position) → RaceEntry
+    by_name:   normalised horse name   → [RaceEntry, ...]
+    by_jockey: normalised jockey name  → [RaceEntry, ...]
+    """
+
+    def __init__(self):
+        self.races: Dict[str, str] = {}                      # race_id → race_name (card order)
+        self.by_post: Dict[Tuple[str, int], RaceEntry] = {}
+        self._by_race: Dict[str, Dict[int, RaceEntry]] = {}
+        self.by_name: Dict[str, List[RaceEntry]] = {}
+        self.by_jockey: Dict[str, List[RaceEntry]] = {}
+
+    def add(self, entry: RaceEntry) -> None:
+        """Add an entry. Raises CardImportError on a duplicate post in a race."""
+        key = (entry.race_id, entry.post_position)
+        if key in self.by_post:
+            raise CardImportError(
+                f"duplicate post_position {entry.post_position} in race '{entry.race_id}'"
+            )
+        self.races.setdefault(entry.race_id, entry.race_name)
+        self.by_post[key] = entry
+        self._by_race.setdefault(entry.race_id, {})[entry.post_position] = entry
+        self.by_name.setdefault(normalise_name(entry.horse_name), []).append(entry)
+        if entry.jockey:
+            self.by_jockey.setdefault(normalise_name(entry.jockey), []).append(entry)
+
+    def __len__(self) -> int:
+        return len(self.by_post)
+
+    def entries(self, race_id: str) -> List[RaceEntry]:
+        """A race's entries ordered by post position."""
+        field = self._by_race.get(race_id, {})
+        return [field[p] for p in sorted(field)]
+
+    def get(self, race_id: str, post_position: int) -> Optional[RaceEntry]:
+        return self.by_post.get((race_id, post_position))
+
+    def find_horse(self, name: str) -> List[RaceEntry]:
+        return list(self.by_name.get(normalise_name(name), ()))
+
+    def find_jockey(self, name: str) -> List[RaceEntry]:
+        return list(self.by_jockey.get(normalise_name(name), ()))
+
+
+# =============================================================================
+# Import
+# =============================================================================
+
+def import_card(source, fmt: Optional[str] = None, filename: str = "",
+                index: Optional[RaceCardIndex] = None) -> Tuple[RaceCardIndex, dict]:
+    """
+    Stream a race card into an index.
+
+    Args:
+        source: Path, text file object, or binary file object.
+        fmt: "csv", "json" or "jsonl" (detected from filename/content if None).
+        filename: Used for format detection when source is a stream.
+        index: Existing index to add to (a fresh one by default).
+
+    Returns:
+        (index, report) — report has rows, imported, rejected, races, errors.
+    """
+    index = index if index is not None else RaceCardIndex()
+    report = {"rows": 0, "imported": 0, "rejected": 0, "errors": []}
+
+    close = False
+    if isinstance(source, (str, os.PathLike)):
+        filename = filename or os.fspath(source)
+        fh = open(source, encoding="utf-8-sig", newline="")
+        close = True
+    elif isinstance(source, io.TextIOBase):
+        fh = source
+    else:
+        fh = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+    try:
+        if fmt is None:
+            peek = fh.read(1)
+            while peek and peek.isspace():
+                peek = fh.read(1)
+            fmt = detect_format(filename, peek)
+            fh = _Prepend(peek, fh)
+        reader = READERS.get(fmt)
+        if reader is None:
+            raise CardImportError(f"unsupported format '{fmt}'")
+
+        for row_no, raw, context in reader(fh):
+            report["rows"] += 1
+            try:
+                if "__error__" in raw:
+                    raise CardImportError(raw["__error__"])
+                index.add(validate_row(raw, context))
+                report["imported"] += 1
+            except CardImportError as exc:
+                report["rejected"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"row": row_no, "error": str(exc)})
+    finally:
+        if close:
+            fh.close()
+
+    report["races"] = {rid: len(index._by_race[rid]) for rid in index.races}
+    logger.info("Race card import (%s): %d imported, %d rejected, %d races",
+                fmt, report["imported"], report["rejected"], len(index.races))
+    return index, report
+
+
+class _Prepend(io.TextIOBase):
+    """Text stream with a few already-read characters put back in front."""
+
+    def __init__(self, head: str, fh: TextIO):
+        self._head = head
+        self._fh = fh
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        head, self._head = self._head, ""
+        if size is None or size < 0:
+            return head + self._fh.read()
+        return head + self._fh.read(max(0, size - len(head)))
+
+    def readline(self, size: int = -1) -> str:
+        head, self._head = self._head, ""
+        if "\n" in head:
+            line, rest = head.split("\n", 1)
+            self._head = rest
+            return line + "\n"
+        return head + self._fh.readline()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def close(self) -> None:
+        self._fh.close()
+
@@ -0,0 +1,108 @@
+# odds_engine.py - Vectorized field-wide odds model
+#
+# Holds the whole field's odds as NumPy arrays (current odds, morning line,
+# per-horse volatility) and advances them with a mean-reverting random walk
+# in one vectorized step. step() reports which post positions' *displayed*
+# odds (rounded to 2 dp) changed, so broadcasts can carry only those.
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Odds never drift below this (matches the old per-horse clamp)
+MIN_ODDS = 1.1
+
+# Fraction of the gap back to the morning line closed per tick
+DEFAULT_REVERSION = 0.15
+
+# Per-tick log-space volatility for an even-money horse. Longshots get a
+# little more (scaled by log of their morning line) — matches the feel of
+# the old ±5% uniform drift (std ≈ 0.029) for mid-priced horses.
+BASE_VOLATILITY = 0.025
+
+
+class OddsEngine:
+    """
+    Mean-reverting odds model over an entire field.
+
+    Works in log space: x = ln(odds), mu = ln(morning_line)
+
+        x' = x + reversion * (mu - x) + volatility * N(0, 1)
+
+    so odds stay positive, drift proportionally, and get pulled back toward
+    the morning line instead of wandering off.
+
+    Args:
+        post_positions: Post position for each slot in the arrays.
+        morning_line: Morning-line odds (decimal, e.g. 2.5 for 5/2) per slot.
+        current: Starting odds per slot (defaults to the morning line).
+        volatility: Per-slot log-space std-dev per tick (defaults derived
+            from the morning line).
+        reversion: Mean-reversion strength per tick, 0..1.
+        seed: Optional RNG seed (tests / benchmarks).
+    """
+
+    def __init__(self, post_positions: Sequence[int], morning_line: Sequence[float],
+                 current: Optional[Sequence[float]] = None,
+                 volatility: Optional[Sequence[float]] = None,
+                 reversion: float = DEFAULT_REVERSION,
+                 seed: Optional[int] = None):
+        self.post_positions = np.asarray(post_positions, dtype=np.int32)
+        self.morning_line = np.maximum(np.asarray(morning_line, dtype=np.float64), MIN_ODDS)
+        if current is None:
+            self.current = self.morning_line.copy()
+        else:
+            self.current = np.maximum(np.asarray(current, dtype=np.float64), MIN_ODDS)
+        if volatility is None:
+            self.volatility = BASE_VOLATILITY * (1.0 + 0.15 * np.log1p(self.morning_line))
+        else:
+            self.volatility = np.asarray(volatility, dtype=np.float64)
+        self.reversion = float(reversion)
+        self.displayed = np.round(self.current, 2)
+
+        self._mu = np.log(self.morning_line)
+        self._rng = np.random.default_rng(seed)
+        self._index: Dict[int, int] = {int(p): i for i, p in enumerate(self.post_positions)}
+
+    @classmethod
+    def from_field(cls, field: Dict[int, float], morning_line: Dict[int, float],
+                   **kwargs) -> "OddsEngine":
+        """Build from {post_position: current_odds} and {post_position: ml_odds}."""
+        posts = sorted(field)
+        return cls(posts, [morning_line[p] for p in posts],
+                   current=[field[p] for p in posts], **kwargs)
+
+    def __len__(self) -> int:
+        return int(self.post_positions.size)
+
+    def step(self) -> np.ndarray:
+        """
+        Advance every horse one tick. Returns the array indices whose
+        displayed (2 dp) odds changed.
+        """
+        x = np.log(self.current)
+        x += self.reversion * (self._mu - x)
+        x += self.volatility * self._rng.standard_normal(x.shape[0])
+        np.exp(x, out=self.current)
+        np.maximum(self.current, MIN_ODDS, out=self.current)
+
+        shown = np.round(self.current, 2)
+        changed = np.flatnonzero(shown != self.displayed)
+        self.displayed = shown
+        return changed
+
+    def set_odds(self, post_position: int, odds: float) -> None:
+        """Pin one horse's odds (e.g. from a live tote feed)."""
+        i = self._index[post_position]
+        self.current[i] = max(MIN_ODDS, float(odds))
+        self.displayed[i] = round(self.current[i], 2)
+
+    def odds_for(self, post_position: int) -> float:
+        """Displayed odds for a post position."""
+        return float(self.displayed[self._index[post_position]])
+
+    def deltas(self, indices: np.ndarray) -> List[dict]:
+        """Compact broadcast rows for the given array indices."""
+        posts = self.post_positions[indices].tolist()
+        odds = self.displayed[indices].tolist()
+        return [{"post_position": p, "current_odds": o} for p, o in zip(posts, odds)]
@@ -0,0 +1,695 @@
+# parimutuel.py - Pari-mutuel pools for La Quiniela
+#
+# Guests buy $1 tickets on a cup (horse) or on an exotic combination. Each
+# pool pays everything it took in, less takeout, to the tickets holding
+# the result:
+#
+#   cups      — one pool split by finish (CUP_SPLIT, 70/20/10): the win
+#               share to tickets on the winner, place to the runner-up,
+#               show to third
+#   exacta    — first and second, in order   (n·(n-1) combinations)
+#   trifecta  — first, second, third, in order (n·(n-1)·(n-2); 6,840 for 20)
+#
+# Ticket counts live in NumPy arrays (n, n×n, n×n×n) indexed by field slot,
+# so live will-pays for every combination are one vectorized divide rather
+# than a loop over combinations. Scratched horses are masked out of every
+# pool and the tickets on them refunded.
+#
+# PoolBroadcaster pushes a pool's odds to the spectator TV and the tote board
+# through latest-wins senders, so a burst of ticket sales costs at most one
+# update per interval on each.
+#
+# PoolJournal makes the pools survive a restart: every sale, scratch and
+# settlement is appended to <dir>/<race_id>.jsonl before it is applied, and
+# replaying the file rebuilds the pool. A reset truncates it.
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from services.race_sim import LatestWinsSender
+
+logger = logging.getLogger(__name__)
+
+POOLS = ("cups", "exacta", "trifecta")
+
+# Legs per combination in each pool
+POOL_LEGS = {"cups": 1, "exacta": 2, "trifecta": 3}
+
+# Share of the cup pool paid to the win / place / show cups
+CUP_SPLIT = (0.70, 0.20, 0.10)
+
+TICKET_PRICE = 1.0
+DEFAULT_TAKEOUT = 0.0
+
+# Most-bet exotic combinations carried in each broadcast
+TOP_COMBOS = 10
+
+# Minimum seconds between pushes to each display. The tote board scrolls a
+# whole line per update, so it gets far fewer.
+SPECTATOR_INTERVAL = 1.0
+TOTE_INTERVAL = 20.0
+
+
+def _floor_cents(values):
+    """Breakage: will-pays are rounded down to the cent."""
+    return np.floor(np.asarray(values) * 100.0 + 1e-6) / 100.0
+
+
+def _combo_key(posts: Sequence[int]) -> str:
+    return "-".join(str(int(p)) for p in posts)
+
+
+class ParimutuelPool:
+    """
+    Ticket counts and live will-pays for one race's pools.
+
+    Args:
+        post_positions: Post position for each slot in the arrays.
+        split: Cup-pool shares for win / place / show (must sum to 1).
+        takeout: Fraction of every pool kept back before paying out.
+        ticket_price: Price of one ticket.
+    """
+
+    def __init__(self, post_positions: Sequence[int], split: Sequence[float] = CUP_SPLIT,
+                 takeout: float = DEFAULT_TAKEOUT, ticket_price: float = TICKET_PRICE):
+        if len(split) != 3 or abs(sum(split) - 1.0) > 1e-9 or min(split) < 0:
+            raise ValueError(f"Cup split must be three non-negative shares summing to 1, got {split}")
+        if not 0.0 <= takeout < 1.0:
+            raise ValueError(f"Takeout must be in [0, 1), got {takeout}")
+        self.post_positions = np.asarray(sorted(post_positions), dtype=np.int32)
+        if self.post_positions.size < 3 or np.any(self.post_positions < 1):
+            raise ValueError("A pool needs at least three horses with positive post positions")
+        n = int(self.post_positions.size)
+        self.split = np.asarray(split, dtype=np.float64)
+        self.takeout = float(takeout)
+        self.ticket_price = float(ticket_price)
+
+        # post position -> slot (-1 = not in the field)
+        self._slot = np.full(int(self.post_positions.max()) + 1, -1, dtype=np.int64)
+        self._slot[self.post_positions] = np.arange(n)
+
+        self.counts: Dict[str, np.ndarray] = {
+            "cups": np.zeros(n, dtype=np.int64),
+            "exacta": np.zeros((n, n), dtype=np.int64),
+            "trifecta": np.zeros((n, n, n), dtype=np.int64),
+        }
+        self.scratched = np.zeros(n, dtype=bool)
+
+        # Combinations that name one horse twice can never be sold
+        i = np.arange(n)
+        ne = i[:, None] != i[None, :]
+        self._distinct = {
+            "cups": np.ones(n, dtype=bool),
+            "exacta": ne,
+            "trifecta": ne[:, :, None] & ne[:, None, :] & ne[None, :, :],
+        }
+
+        self.version = 0
+        self.result: Optional[dict] = None
+        self.journal: Optional["PoolJournal"] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self.post_positions.size)
+
+    @property
+    def combinations(self) -> Dict[str, int]:
+        """Sellable combinations per pool (before scratches)."""
+        return {pool: int(mask.sum()) for pool, mask in self._distinct.items()}
+
+    # -----------------------------------------------------------------
+    # Ingest
+    # -----------------------------------------------------------------
+
+    def _slots(self, pool: str, combos) -> np.ndarray:
+        """(k, legs) slot indices for k combinations of post positions."""
+        if pool not in POOL_LEGS:
+            raise ValueError(f"Unknown pool '{pool}'. Must be one of: {', '.join(POOLS)}")
+        legs = POOL_LEGS[pool]
+        posts = np.asarray(combos, dtype=np.int64).reshape(-1, legs)
+        bad = (posts < 0) | (posts >= self._slot.size)
+        if bad.any():
+            raise ValueError(f"Invalid post position: {int(posts[bad][0])}")
+        slots = self._slot[posts]
+        if (slots < 0).any():
+            raise ValueError(f"Invalid post position: {int(posts[slots < 0][0])}")
+        if legs > 1 and not self._distinct[pool][tuple(slots.T)].all():
+            raise ValueError(f"A {pool} combination can't name a horse twice")
+        return slots
+
+    def _record(self, kind: str, **fields) -> None:
+        """Journal a change before applying it. Caller holds self._lock."""
+        if self.journal is not None:
+            self.journal.append(kind, **fields)
+
+    @staticmethod
+    def _parse_counts(counts: Mapping) -> tuple:
+        """{"7-3": 12, ...} or {(7, 3): 12, ...} -> (combos, tickets)."""
+        combos, tickets = [], []
+        for key, n in counts.items():
+            if isinstance(key, str):
+                key = [int(part) for part in key.split("-")]
+            combos.append(key)
+            tickets.append(int(n))
+        return combos, np.asarray(tickets, dtype=np.int64)
+
+    def sell(self, pool: str, combos, tickets=1) -> int:
+        """
+        Add tickets to a pool.
+
+        Args:
+            pool: "cups", "exacta" or "trifecta".
+            combos: Post positions (cups) or ordered tuples of them.
+            tickets: Tickets per combination (scalar or one per combo).
+
+        Returns:
+            The pool version after the sale.
+
+        Raises:
+            ValueError: On unknown pools or horses, repeated horses, a
+                scratched horse, non-positive counts, or settled pools.
+        """
+        slots = self._slots(pool, combos)
+        tickets = np.broadcast_to(np.asarray(tickets, dtype=np.int64), (slots.shape[0],))
+        if (tickets <= 0).any():
+            raise ValueError("Ticket counts must be positive")
+        with self._lock:
+            if self.result is not None:
+                raise ValueError("Pools are settled")
+            if self.scratched[slots].any():
+                raise ValueError("Horse is scratched")
+            self._record("sell", pool=pool, combos=self.post_positions[slots].tolist(),
+                         tickets=tickets.tolist())
+            np.add.at(self.counts[pool], tuple(slots.T), tickets)
+            self.version += 1
+            return self.version
+
+    def load(self, pool: str, counts: Mapping) -> int:
+        """
+        Replace a pool's counts with running totals, e.g. the cashier's tally
+        {"7-3": 12, "3-7": 4}. Totals on scratched horses are kept and refunded.
+        Returns the pool version.
+        """
+        combos, tickets = self._parse_counts(counts)
+        slots = self._slots(pool, combos)
+        if (tickets < 0).any():
+            raise ValueError("Ticket counts can't be negative")
+        fresh = np.zeros_like(self.counts[pool])
+        np.add.at(fresh, tuple(slots.T), tickets)
+        held = np.flatnonzero(fresh)
+        with self._lock:
+            if self.result is not None:
+                raise ValueError("Pools are settled")
+            self._record("load", pool=pool,
+                         combos=self.post_positions[
+                             np.stack(np.unravel_index(held, fresh.shape), axis=1)].tolist(),
+                         tickets=fresh.ravel()[held].tolist())
+            self.counts[pool] = fresh
+            self.version += 1
+            return self.version
+
+    def sell_counts(self, pool: str, counts: Mapping) -> int:
+        """sell() for a {combo: tickets} mapping."""
+        combos, tickets = self._parse_counts(counts)
+        if not combos:
+            return self.version
+        return self.sell(pool, combos, tickets)
+
+    # -----------------------------------------------------------------
+    # Scratches
+    # -----------------------------------------------------------------
+
+    def scratch(self, post_position: int) -> Dict[str, int]:
+        """
+        Take a horse out of every pool. Returns the tickets refunded per pool
+        (all tickets on the horse, in any leg of an exotic).
+        """
+        slot = int(self._slots("cups", [post_position])[0, 0])
+        with self._lock:
+            if self.result is not None:
+                raise ValueError("Pools are settled")
+            self._record("scratch", horse=int(post_position))
+            self.scratched[slot] = True
+            self.version += 1
+            return {
+                "cups": int(self.counts["cups"][slot]),
+                "exacta": int(self.counts["exacta"][slot, :].sum()
+                              + self.counts["exacta"][:, slot].sum()),
+                "trifecta": int(self.counts["trifecta"][slot].sum()
+                                + self.counts["trifecta"][:, slot].sum()
+                                + self.counts["trifecta"][:, :, slot].sum()),
+            }
+
+    def unscratch(self, post_position: int) -> None:
+        """Put a horse back in the pools (its tickets count again)."""
+        slot = int(self._slots("cups", [post_position])[0, 0])
+        with self._lock:
+            if self.result is not None:
+                raise ValueError("Pools are settled")
+            self._record("unscratch", horse=int(post_position))
+            self.scratched[slot] = False
+            self.version += 1
+
+    def _live_mask(self, pool: str) -> np.ndarray:
+        live = ~self.scratched
+        if pool == "cups":
+            return live
+        if pool == "exacta":
+            return live[:, None] & live[None, :]
+        return live[:, None, None] & live[None, :, None] & live[None, None, :]
+
+    def _live(self, pool: str) -> np.ndarray:
+        return np.where(self._live_mask(pool), self.counts[pool], 0)
+
+    # -----------------------------------------------------------------
+    # Odds / will-pays
+    # -----------------------------------------------------------------
+
+    def _totals(self, pool: str, live: np.ndarray) -> dict:
+        sold = int(self.counts[pool].sum())
+        tickets = int(live.sum())
+        gross = tickets * self.ticket_price
+        return {
+            "tickets": tickets,
+            "refunded": sold - tickets,
+            "gross": round(gross, 2),
+            "net": round(gross * (1.0 - self.takeout), 2),
+        }
+
+    def totals(self) -> Dict[str, dict]:
+        """Per pool: live tickets, refunded tickets, gross and net money."""
+        with self._lock:
+            return {pool: self._totals(pool, self._live(pool)) for pool in POOLS}
+
+    @staticmethod
+    def _pays(share: np.ndarray, holders: np.ndarray) -> np.ndarray:
+        """Money per winning ticket, NaN where nobody holds the combination."""
+        out = np.full(np.broadcast(share, holders).shape, np.nan)
+        np.divide(share, holders, out=out, where=holders > 0)
+        return _floor_cents(out)
+
+    def will_pays(self, pool: str) -> np.ndarray:
+        """
+        What one ticket returns if it wins, for every combination at once.
+
+        cups     -> (n, 3): paid if the horse finishes 1st / 2nd / 3rd
+        exacta   -> (n, n)
+        trifecta -> (n, n, n)
+
+        NaN where no live ticket holds the combination.
+        """
+        if pool not in POOL_LEGS:
+            raise ValueError(f"Unknown pool '{pool}'. Must be one of: {', '.join(POOLS)}")
+        with self._lock:
+            live = self._live(pool)
+            net = live.sum() * self.ticket_price * (1.0 - self.takeout)
+            if pool == "cups":
+                return self._pays(self.split[None, :] * net, live[:, None])
+            return self._pays(np.float64(net), live)
+
+    def held(self, pool: str, first: Optional[int] = None) -> List[dict]:
+        """
+        Every combination holding live tickets, most-bet first, with its
+        will-pay (the win pay for cups). `first` keeps combinations with
+        that horse in the first leg.
+        """
+        pays = self.will_pays(pool)
+        if pool == "cups":
+            pays = pays[:, 0]
+        with self._lock:
+            live = self._live(pool)
+        if first is not None:
+            slot = int(self._slots("cups", [first])[0, 0])
+            keep = np.zeros_like(live)
+            keep[slot] = live[slot]
+            live = keep
+        flat = live.ravel()
+        idx = np.flatnonzero(flat)
+        idx = idx[np.argsort(-flat[idx], kind="stable")]
+        legs = np.stack(np.unravel_index(idx, live.shape), axis=1)
+        posts = self.post_positions[legs].tolist()
+        return [{"combo": _combo_key(p), "tickets": int(t), "will_pay": float(w)}
+                for p, t, w in zip(posts, flat[idx].tolist(), pays.ravel()[idx].tolist())]
+
+    def win_odds(self) -> np.ndarray:
+        """Odds-to-1 on each cup winning (NaN where it has no tickets)."""
+        return np.round(self.will_pays("cups")[:, 0] / self.ticket_price - 1.0, 2)
+
+    # -----------------------------------------------------------------
+    # Settlement
+    # -----------------------------------------------------------------
+
+    def settle(self, win: int, place: int, show: int) -> dict:
+        """
+        Pay out every pool on the official result and freeze the pools.
+
+        A cup-pool share nobody holds goes to the other two finishers'
+        holders in proportion to their shares; an exotic pool nobody hit,
+        or a cup pool with no finisher held at all, is refunded.
+
+        Raises:
+            ValueError: On unknown or repeated finishers, or a scratched one.
+        """
+        order = self._slots("trifecta", [win, place, show])[0]
+        with self._lock:
+            if self.scratched[order].any():
+                raise ValueError("A scratched horse can't finish")
+            result = {"order": [int(win), int(place), int(show)], "pools": {}}
+
+            live = self._live("cups")
+            totals = self._totals("cups", live)
+            holders = live[order]
+            claimed = holders > 0
+            shares = self.split * totals["net"]
+            if claimed.any():
+                shares = np.where(claimed, shares + shares[~claimed].sum()
+                                  * self.split / self.split[claimed].sum(), 0.0)
+                per_ticket = self._pays(shares, holders)
+                paid = float(np.nansum(per_ticket * holders))
+                result["pools"]["cups"] = {
+                    **totals,
+                    "per_ticket": {f: (None if np.isnan(p) else float(p))
+                                   for f, p in zip(("win", "place", "show"), per_ticket)},
+                    "winning_tickets": {f: int(h) for f, h in
+                                        zip(("win", "place", "show"), holders)},
+                    "paid": round(paid, 2),
+                    "breakage": round(totals["net"] - paid, 2),
+                    "refund_all": False,
+                }
+            else:
+                result["pools"]["cups"] = {**totals, "per_ticket": None, "paid": 0.0,
+                                           "breakage": 0.0, "refund_all": True}
+
+            for pool, key in (("exacta", tuple(order[:2])), ("trifecta", tuple(order))):
+                live = self._live(pool)
+                totals = self._totals(pool, live)
+                holders = int(live[key])
+                if holders:
+                    per_ticket = float(self._pays(np.float64(totals["net"]), np.int64(holders)))
+                    paid = per_ticket * holders
+                    result["pools"][pool] = {
+                        **totals, "combo": _combo_key(self.post_positions[list(key)]),
+                        "per_ticket": per_ticket, "winning_tickets": holders,
+                        "paid": round(paid, 2), "breakage": round(totals["net"] - paid, 2),
+                        "refund_all": False,
+                    }
+                else:
+                    result["pools"][pool] = {
+                        **totals, "combo": _combo_key(self.post_positions[list(key)]),
+                        "per_ticket": None, "winning_tickets": 0, "paid": 0.0,
+                        "breakage": 0.0, "refund_all": True,
+                    }
+
+            self._record("settle", win=int(win), place=int(place), show=int(show))
+            self.result = result
+            self.version += 1
+            return result
+
+    def reset(self) -> None:
+        """Empty every pool and clear scratches and the result."""
+        with self._lock:
+            if self.journal is not None:
+                self.journal.truncate()
+            for counts in self.counts.values():
+                counts.fill(0)
+            self.scratched.fill(False)
+            self.result = None
+            self.version += 1
+
+    # -----------------------------------------------------------------
+    # Snapshots
+    # -----------------------------------------------------------------
+
+    def _top(self, pool: str, live: np.ndarray, pays: np.ndarray, top: int) -> List[list]:
+        """[combo, tickets, will_pay] for the `top` most-bet combinations."""
+        flat = live.ravel()
+        held = np.flatnonzero(flat)
+        if held.size > top:
+            held = held[np.argpartition(flat[held], -top)[-top:]]
+        held = held[np.argsort(-flat[held], kind="stable")]
+        rows = []
+        for idx in held.tolist():
+            slots = np.unravel_index(idx, live.shape)
+            rows.append([_combo_key(self.post_positions[list(slots)]),
+                         int(flat[idx]), float(pays.ravel()[idx])])
+        return rows
+
+    def snapshot(self, top: int = TOP_COMBOS) -> dict:
+        """
+        Broadcast payload: pool totals, each cup's odds and will-pays, and
+        the `top` most-bet exacta / trifecta combinations with theirs.
+        """
+        cup_pays = self.will_pays("cups")
+        exacta = self.will_pays("exacta")
+        trifecta = self.will_pays("trifecta")
+        with self._lock:
+            version = self.version
+            cups = self._live("cups")
+            horses = []
+            for slot, pos in enumerate(self.post_positions.tolist()):
+                win_pay = cup_pays[slot, 0]
+                horses.append({
+                    "position": pos,
+                    "tickets": int(cups[slot]),
+                    "scratched": bool(self.scratched[slot]),
+                    "odds": ("SCR" if self.scratched[slot] else "---" if np.isnan(win_pay)
+                             else f"{max(win_pay / self.ticket_price - 1.0, 0.0):.1f}-1"),
+                    "will_pay": (None if np.isnan(win_pay)
+                                 else [float(p) for p in cup_pays[slot]]),
+                })
+            return {
+                "version": version,
+                "pools": {pool: self._totals(pool, self._live(pool)) for pool in POOLS},
+                "horses": horses,
+                "exacta": self._top("exacta", self._live("exacta"), exacta, top),
+                "trifecta": self._top("trifecta", self._live("trifecta"), trifecta, top),
+                "settled": self.result is not None,
+            }
+
+
+class PoolJournal:
+    """
+    Append-only journal of one race's pool changes.
+
+    Records are {"t": kind, ...fields}: sell / load (pool, combos, tickets),
+    scratch / unscratch (horse) and settle (win, place, show). Each is
+    written before the change is applied, so the file never holds less
+    than the pool did; replay() applies them to a fresh pool. A torn final
+    line from a crash mid-write is ignored.
+
+    Args:
+        directory: Folder for <name>.jsonl.
+        name: File stem (the race_id on a card).
+        fsync: fsync every record (they are money).
+    """
+
+    def __init__(self, directory: str, name: str, fsync: bool = True):
+        self.name = name
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self._lock = threading.Lock()
+        self._fh = None
+
+        # Monitoring
+        self.records_written = 0
+        self.last_recovery: Optional[dict] = None
+
+    def append(self, kind: str, **fields) -> None:
+        """
+        Write one record durably.
+
+        Raises:
+            RuntimeError: If the record can't be written (the change is
+                then refused, never applied unrecorded).
+        """
+        line = json.dumps({"t": kind, **fields}, separators=(",", ":"))
+        with self._lock:
+            end = None
+            try:
+                if self._fh is None:
+                    self._fh = open(self.path, "a", encoding="utf-8")
+                end = self._fh.tell()
+                self._fh.write(line + "\n")
+                self._fh.flush()
+                if self.fsync:
+                    os.fsync(self._fh.fileno())
+            except OSError as exc:
+                logger.error("Pool journal %s: write failed: %s", self.name, exc)
+                self._discard(end)
+                raise RuntimeError(f"Pool journal write failed: {exc}") from exc
+            self.records_written += 1
+
+    def _discard(self, end: Optional[int]) -> None:
+        """
+        Cut a failed record back off the file, so a restart never replays a
+        change that was refused. Caller holds self._lock.
+        """
+        if self._fh is None:
+            return
+        try:
+            self._fh.close()
+        except OSError:
+            pass
+        self._fh = None
+        if end is not None:
+            try:
+                os.truncate(self.path, end)
+            except OSError as exc:
+                logger.error("Pool journal %s: couldn't drop the failed record: %s",
+                             self.name, exc)
+
+    def truncate(self) -> None:
+        """Start over (the pools were reset)."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self.path, "w", encoding="utf-8")
+
+    def replay(self, pool: ParimutuelPool) -> int:
+        """
+        Apply every journaled change to a fresh pool. Records the pool
+        refuses (e.g. a horse no longer in the field) are logged and
+        skipped. Returns the records applied; timing is in `last_recovery`.
+        """
+        start = time.perf_counter()
+        applied = skipped = 0
+        journal, pool.journal = pool.journal, None
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as fh:
+                    for line in fh:
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:
+                            logger.warning("Pool journal %s: torn record ignored", self.name)
+                            break
+                        try:
+                            self._apply(pool, rec)
+                            applied += 1
+                        except (KeyError, TypeError, ValueError) as exc:
+                            logger.error("Pool journal %s: record %r not replayed: %s",
+                                         self.name, rec, exc)
+                            skipped += 1
+        finally:
+            pool.journal = journal
+        self.last_recovery = {
+            "replayed_records": applied,
+            "skipped_records": skipped,
+            "recovery_ms": round((time.perf_counter() - start) * 1000.0, 2),
+        }
+        return applied
+
+    @staticmethod
+    def _apply(pool: ParimutuelPool, rec: dict) -> None:
+        kind = rec.get("t")
+        if kind == "sell":
+            pool.sell(rec["pool"], rec["combos"], rec["tickets"])
+        elif kind == "load":
+            pool.load(rec["pool"], {tuple(c): t for c, t in zip(rec["combos"], rec["tickets"])})
+        elif kind == "scratch":
+            pool.scratch(rec["horse"])
+        elif kind == "unscratch":
+            pool.unscratch(rec["horse"])
+        elif kind == "settle":
+            pool.settle(rec["win"], rec["place"], rec["show"])
+        else:
+            raise ValueError(f"unknown record kind {kind!r}")
+
+    def stats(self) -> dict:
+        return {"records_written": self.records_written, "last_recovery": self.last_recovery}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def tote_message(snapshot: dict, limit: int = 8) -> str:
+    """One scroll line for the tote board: the pool and the shortest prices."""
+    live = [h for h in snapshot["horses"] if h["will_pay"] is not None]
+    live.sort(key=lambda h: h["will_pay"][0])
+    prices = "  ".join(f"#{h['position']} {h['odds']}" for h in live[:limit])
+    pool = snapshot["pools"]["cups"]["gross"]
+    return f"QUINIELA ${pool:,.0f}  {prices}".rstrip()
+
+
+class PoolBroadcaster:
+    """
+    Pushes one pool's odds to the spectator TV (Socket.IO `pool_update`)
+    and the tote board at bounded rates.
+
+    changed() only offers the pool's version to each latest-wins sender;
+    the payload is built when a send actually happens, so a burst of sales
+    costs one snapshot per interval, never one per ticket.
+
+    Args:
+        pool: The ParimutuelPool to publish.
+        emit: Socket.IO emit callable (event, payload), or None.
+        tote: Callable taking one scroll line for the tote board, or None.
+        race_id: Tag for the payload (several races can run pools).
+        is_featured: Callable -> bool; the spectator only shows the featured race.
+        spectator_interval / tote_interval: Minimum seconds between sends.
+        threaded / time_fn: As LatestWinsSender (False + a virtual clock in tests).
+    """
+
+    def __init__(self, pool: ParimutuelPool, emit: Optional[Callable] = None,
+                 tote: Optional[Callable[[str], object]] = None,
+                 race_id: Optional[str] = None,
+                 is_featured: Optional[Callable[[], bool]] = None,
+                 spectator_interval: float = SPECTATOR_INTERVAL,
+                 tote_interval: float = TOTE_INTERVAL,
+                 threaded: bool = True, time_fn: Optional[Callable[[], float]] = None):
+        self.pool = pool
+        self.race_id = race_id
+        self._emit = emit
+        self._tote = tote
+        self._is_featured = is_featured
+        self._senders: Dict[str, LatestWinsSender] = {}
+        # Payloads are built at send time, so nothing offered is ever stale
+        if emit is not None:
+            self._senders["spectator"] = LatestWinsSender(
+                self._send_spectator, min_interval=spectator_interval, max_age=math.inf,
+                threaded=threaded, time_fn=time_fn, name="PoolSpectator")
+        if tote is not None:
+            self._senders["tote"] = LatestWinsSender(
+                self._send_tote, min_interval=tote_interval, max_age=math.inf,
+                threaded=threaded, time_fn=time_fn, name="PoolTote")
+
+    def payload(self) -> dict:
+        snap = self.pool.snapshot()
+        snap["race_id"] = self.race_id
+        snap["featured"] = self._is_featured() if self._is_featured else True
+        return snap
+
+    def _send_spectator(self, _version) -> None:
+        self._emit("pool_update", self.payload())
+
+    def _send_tote(self, _version) -> None:
+        if self._is_featured is None or self._is_featured():
+            self._tote(tote_message(self.pool.snapshot()))
+
+    def changed(self) -> None:
+        """The pool changed: schedule (not send) an update on each display."""
+        for sender in self._senders.values():
+            sender.offer(self.pool.version)
+
+    def flush(self) -> None:
+        """Send anything pending now (results, resets; non-threaded tests)."""
+        for sender in self._senders.values():
+            sender.flush()
+
+    def stop(self) -> None:
+        for sender in self._senders.values():
+            sender.stop()
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: sender.stats() for name, sender in self._senders.items()}
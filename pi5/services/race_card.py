@@ -0,0 +1,232 @@
+# race_card.py - Multi-race card manager for DDM Horse Dashboard
+#
+# A real Derby de Mayo day runs several heats (the Derby plus undercard
+# races). RaceCardManager owns one RacingDataService per race and drives all
+# of them from a single shared Scheduler and one Socket.IO emit path, so
+# adding races adds timers to one heap — never threads.
+#
+# Only the *featured* race (the one on the mantle) holds the ESP32 client;
+# the others still broadcast led_command events (tagged with race_id) for
+# preview screens but never fight over the cups.
+
+import logging
+import re
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from services.card_importer import RaceCardIndex
+from services.race_journal import RaceJournal
+from services.race_sim import LatestWinsSender
+from services.racing_data_service import RacingDataService
+from services.scheduler import Scheduler, VirtualClock
+
+logger = logging.getLogger(__name__)
+
+# Race IDs appear in URLs (/api/racing/<race_id>/...) — keep them slug-safe
+RACE_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+# Path segments already used by single-race routes; a race with one of these
+# IDs would be shadowed by (or shadow) the static route.
+RESERVED_RACE_IDS = {"card", "horses", "state", "mode", "override", "start",
+                     "stop", "reset", "winners", "results", "sim", "live",
+                     "journal"}
+
+DEFAULT_RACE_ID = "derby"
+
+
+class RaceCardManager:
+    """
+    Owns the day's races and their shared scheduler.
+
+    Args:
+        socketio: Flask-SocketIO instance shared by every race.
+        esp32_client: ESP32 client, handed to the featured race only.
+        scheduler: Shared Scheduler. Created on `clock` if not supplied.
+        clock: Clock for a private scheduler (ScaledClock / VirtualClock).
+        use_mock: Default for races added without an explicit use_mock.
+        journal_dir: If set, each race journals to <journal_dir>/<race_id>.*
+            and resumes from it on restart.
+    """
+
+    def __init__(self, socketio=None, esp32_client=None,
+                 scheduler: Optional[Scheduler] = None, clock=None,
+                 use_mock: bool = True, journal_dir: Optional[str] = None):
+        self.socketio = socketio
+        self.journal_dir = journal_dir
+        self.esp32_client = esp32_client
+        self.use_mock = use_mock
+        self.scheduler = scheduler if scheduler is not None else Scheduler(clock=clock)
+
+        # One latest-wins LED sender for the one mantle, shared by every race
+        self.led_sender: Optional[LatestWinsSender] = None
+        if esp32_client is not None:
+            virtual = isinstance(self.scheduler.clock, VirtualClock)
+            self.led_sender = LatestWinsSender(
+                esp32_client.send_command,
+                threaded=not virtual,
+                time_fn=self.scheduler.clock.now if virtual else None,
+            )
+
+        self._races: Dict[str, RacingDataService] = {}
+        self._featured: Optional[str] = None
+
+        # Imported race card (jockey / trainer / horse-name lookups)
+        self.index = RaceCardIndex()
+        self._lock = threading.Lock()
+
+    # -----------------------------------------------------------------
+    # Card membership
+    # -----------------------------------------------------------------
+
+    def add_race(self, race_id: str, race_name: Optional[str] = None,
+                 use_mock: Optional[bool] = None,
+                 featured: bool = False) -> RacingDataService:
+        """
+        Add a race to the card. The first race added becomes featured.
+
+        Raises:
+            ValueError: If race_id is malformed, reserved, or already used.
+        """
+        if not RACE_ID_PATTERN.match(race_id or ""):
+            raise ValueError(
+                f"Invalid race_id '{race_id}': use lowercase letters, digits, '-' or '_'"
+            )
+        if race_id in RESERVED_RACE_IDS:
+            raise ValueError(f"race_id '{race_id}' is reserved")
+        if race_id in self._races:
+            raise ValueError(f"Race '{race_id}' already on the card")
+
+        svc = RacingDataService(
+            socketio=self.socketio,
+            use_mock=self.use_mock if use_mock is None else use_mock,
+            scheduler=self.scheduler,
+            race_id=race_id,
+            race_name=race_name or race_id,
+            led_sender=self.led_sender,
+            journal=RaceJournal(self.journal_dir, race_id) if self.journal_dir else None,
+        )
+        with self._lock:
+            if race_id in self._races:
+                raise ValueError(f"Race '{race_id}' already on the card")
+            self._races[race_id] = svc
+            make_featured = featured or self._featured is None
+
+        if make_featured:
+            self.set_featured(race_id)
+        logger.info("Race '%s' added to card (%d races)", race_id, len(self._races))
+        return svc
+
+    def remove_race(self, race_id: str) -> None:
+        """Stop a race's timers and drop it from the card."""
+        with self._lock:
+            svc = self._races.pop(race_id)
+            if self._featured == race_id:
+                self._featured = None
+        svc.shutdown()
+        svc.esp32_client = None
+        logger.info("Race '%s' removed from card", race_id)
+
+    def get(self, race_id: Optional[str] = None) -> RacingDataService:
+        """
+        Return a race by ID, or the featured race when race_id is None.
+
+        Raises:
+            KeyError: If the race is not on the card (or the card is empty).
+        """
+        if race_id is None:
+            race_id = self._featured
+        return self._races[race_id]
+
+    def __contains__(self, race_id: str) -> bool:
+        return race_id in self._races
+
+    def __len__(self) -> int:
+        return len(self._races)
+
+    def __iter__(self) -> Iterator[RacingDataService]:
+        return iter(list(self._races.values()))
+
+    def race_ids(self) -> List[str]:
+        """Race IDs in card order."""
+        return list(self._races)
+
+    # -----------------------------------------------------------------
+    # Featured race (owns the mantle LEDs)
+    # -----------------------------------------------------------------
+
+    @property
+    def featured_id(self) -> Optional[str]:
+        return self._featured
+
+    def set_featured(self, race_id: str) -> RacingDataService:
+        """Hand the ESP32 client to `race_id` and take it from the previous race."""
+        with self._lock:
+            svc = self._races[race_id]
+            for other in self._races.values():
+                other.esp32_client = None
+            svc.esp32_client = self.esp32_client
+            self._featured = race_id
+        logger.info("Featured race: %s", race_id)
+        return svc
+
+    # -----------------------------------------------------------------
+    # Race-card import
+    # -----------------------------------------------------------------
+
+    def load_card(self, index: RaceCardIndex, skip_restored: bool = False) -> Dict[str, int]:
+        """
+        Populate races from an imported card, adding any races not yet on
+        it. With skip_restored, races resumed from their journal keep their
+        journaled field (startup import).
+
+        Returns:
+            {race_id: horses loaded}. Races that can't be added (bad or
+            reserved IDs) are logged and skipped.
+        """
+        loaded = {}
+        for race_id, race_name in index.races.items():
+            if race_id in self._races:
+                svc = self._races[race_id]
+            else:
+                try:
+                    svc = self.add_race(race_id, race_name, use_mock=False)
+                except ValueError as exc:
+                    logger.error("Race card: skipping race '%s' (%s)", race_id, exc)
+                    continue
+            svc.race_name = race_name
+            if skip_restored and svc.restored:
+                continue
+            loaded[race_id] = svc.load_entries(index.entries(race_id))
+        self.index = index
+        return loaded
+
+    # -----------------------------------------------------------------
+    # Card-wide operations
+    # -----------------------------------------------------------------
+
+    def stop_all(self) -> None:
+        """Stop auto progression on every race."""
+        for svc in self:
+            svc.shutdown()
+
+    def summary(self) -> List[dict]:
+        """One row per race: identity, state, timing, and results."""
+        rows = []
+        for race_id, svc in list(self._races.items()):
+            rows.append({
+                "race_id": race_id,
+                "race_name": svc.race_name,
+                "featured": race_id == self._featured,
+                "horse_count": len(svc.horses),
+                **svc.get_state(),
+            })
+        return rows
+
+    def stats(self) -> dict:
+        """Race count plus shared scheduler health."""
+        return {
+            "races": len(self._races),
+            "featured": self._featured,
+            "scheduler": self.scheduler.stats(),
+            "led_sender": self.led_sender.stats() if self.led_sender is not None else None,
+        }
@@ -0,0 +1,239 @@
+# race_journal.py - Crash-safe journal for race state
+#
+# Every RacingDataService change (state transition, mode, auto on/off,
+# horses, odds deltas, results) is appended as one JSON line to
+# <dir>/<name>.jsonl. Every `snapshot_every` records the full state is
+# written to <name>.snapshot.json (tmp file + fsync + atomic rename) and the
+# journal is truncated, so a restart reads one small snapshot plus a short
+# tail.
+#
+# Record format: {"n": seq, "t": kind, ...fields}. Records with n <= the
+# snapshot's seq are already folded into it and skipped on replay (covers a
+# crash between writing the snapshot and truncating the journal). A torn
+# final line from a crash mid-write is ignored.
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_EVERY = 500
+
+# Record kinds
+STATE = "state"
+MODE = "mode"
+AUTO = "auto"
+HORSES = "horses"
+ODDS = "odds"
+RESULTS = "results"
+CLEAR_RESULTS = "clear_results"
+
+
+def empty_state() -> dict:
+    """State a fresh service starts from (nothing journaled yet)."""
+    return {
+        "state": "DORMANT",
+        "state_changed_at": None,
+        "mode": "manual",
+        "running": False,
+        "win": None,
+        "place": None,
+        "show": None,
+        "horses": {},
+    }
+
+
+def apply_record(state: dict, rec: dict) -> None:
+    """Fold one journal record into a state dict (in place)."""
+    kind = rec.get("t")
+    if kind == STATE:
+        state["state"] = rec["state"]
+        state["state_changed_at"] = rec["at"]
+    elif kind == MODE:
+        state["mode"] = rec["mode"]
+    elif kind == AUTO:
+        state["running"] = rec["running"]
+    elif kind == HORSES:
+        state["horses"] = {int(h["post_position"]): h for h in rec["horses"]}
+    elif kind == ODDS:
+        horses = state["horses"]
+        for pos, odds in rec["d"]:
+            if pos in horses:
+                horses[pos] = {**horses[pos], "current_odds": odds}
+    elif kind == RESULTS:
+        finish = {rec["win"]: 1, rec["place"]: 2, rec["show"]: 3}
+        state.update(win=rec["win"], place=rec["place"], show=rec["show"])
+        state["horses"] = {pos: {**h, "finish_position": finish.get(pos)}
+                           for pos, h in state["horses"].items()}
+    elif kind == CLEAR_RESULTS:
+        state.update(win=None, place=None, show=None)
+        state["horses"] = {pos: {**h, "finish_position": None}
+                           for pos, h in state["horses"].items()}
+    else:
+        logger.warning("Unknown journal record kind %r — skipped", kind)
+
+
+class RaceJournal:
+    """
+    Append-only journal plus periodic snapshot for one race.
+
+    Args:
+        directory: Folder for <name>.jsonl and <name>.snapshot.json.
+        name: File stem (the race_id on a card).
+        snapshot_every: Records between snapshots.
+        fsync: fsync the journal on durable appends (state/results).
+    """
+
+    def __init__(self, directory: str, name: str = "race",
+                 snapshot_every: int = DEFAULT_SNAPSHOT_EVERY, fsync: bool = True):
+        self.directory = directory
+        self.name = name
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+
+        os.makedirs(directory, exist_ok=True)
+        self.journal_path = os.path.join(directory, f"{name}.jsonl")
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot.json")
+
+        self._lock = threading.Lock()
+        self._fh = None
+        self._seq = 0
+        self._since_snapshot = 0
+
+        # Monitoring
+        self.records_written = 0
+        self.snapshots_written = 0
+        self.last_recovery: Optional[Dict[str, object]] = None
+
+    # -----------------------------------------------------------------
+    # Writing
+    # -----------------------------------------------------------------
+
+    def _open(self):
+        if self._fh is None:
+            self._fh = open(self.journal_path, "a", encoding="utf-8")
+        return self._fh
+
+    def append(self, kind: str, durable: bool = False, **fields) -> int:
+        """
+        Append one record. durable=True fsyncs before returning (state
+        transitions, results); otherwise the line is flushed to the OS only.
+        Returns the record's sequence number.
+        """
+        with self._lock:
+            self._seq += 1
+            line = json.dumps({"n": self._seq, "t": kind, **fields}, separators=(",", ":"))
+            fh = self._open()
+            fh.write(line + "\n")
+            fh.flush()
+            if durable and self.fsync:
+                os.fsync(fh.fileno())
+            self._since_snapshot += 1
+            self.records_written += 1
+            return self._seq
+
+    @property
+    def needs_snapshot(self) -> bool:
+        return self._since_snapshot >= self.snapshot_every
+
+    def write_snapshot(self, state_fn: Callable[[], dict]) -> None:
+        """
+        Persist state_fn() atomically, then truncate the journal behind it.
+
+        state_fn is called under the journal lock, so no record can be
+        appended between reading the state and stamping the seq it covers.
+        It must not wait on anything that is held while appending.
+        """
+        with self._lock:
+            state = state_fn()
+            snap = {"seq": self._seq, "written_at": time.time(), **state}
+            snap["horses"] = list(state["horses"].values())
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(snap, fh, separators=(",", ":"))
+                fh.flush()
+                if self.fsync:
+                    os.fsync(fh.fileno())
+            os.replace(tmp, self.snapshot_path)
+
+            # Everything up to snap["seq"] is in the snapshot now
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self.journal_path, "w", encoding="utf-8")
+            self._since_snapshot = 0
+            self.snapshots_written += 1
+
+    # -----------------------------------------------------------------
+    # Recovery
+    # -----------------------------------------------------------------
+
+    def load(self) -> Optional[dict]:
+        """
+        Rebuild the last journaled state (snapshot + tail). Returns None if
+        nothing has been journaled. Timing is kept in `last_recovery`.
+        """
+        start = time.perf_counter()
+        state = None
+        snap_seq = 0
+
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, encoding="utf-8") as fh:
+                    snap = json.load(fh)
+                snap_seq = snap.pop("seq", 0)
+                snap.pop("written_at", None)
+                state = {**empty_state(), **snap}
+                state["horses"] = {int(h["post_position"]): h for h in snap.get("horses", [])}
+            except (OSError, ValueError) as exc:
+                logger.error("Race journal %s: unreadable snapshot (%s) — replaying journal only",
+                             self.name, exc)
+                state, snap_seq = None, 0
+
+        replayed = 0
+        last_seq = snap_seq
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        logger.warning("Race journal %s: torn record ignored", self.name)
+                        break
+                    if rec.get("n", 0) <= snap_seq:
+                        continue
+                    if state is None:
+                        state = empty_state()
+                    apply_record(state, rec)
+                    last_seq = rec["n"]
+                    replayed += 1
+
+        with self._lock:
+            self._seq = max(self._seq, last_seq)
+            self._since_snapshot = replayed
+
+        self.last_recovery = {
+            "recovered": state is not None,
+            "snapshot_seq": snap_seq,
+            "replayed_records": replayed,
+            "recovery_ms": round((time.perf_counter() - start) * 1000.0, 2),
+        }
+        return state
+
+    def stats(self) -> dict:
+        return {
+            "seq": self._seq,
+            "records_written": self.records_written,
+            "since_snapshot": self._since_snapshot,
+            "snapshots_written": self.snapshots_written,
+            "last_recovery": self.last_recovery,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
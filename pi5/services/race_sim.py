@@ -0,0 +1,353 @@
+# race_sim.py - 10 Hz race-running simulation for DDM Horse Dashboard
+#
+# While a race is RUNNING, RaceSimulation advances every horse's progress
+# (0.0 at the gate, 1.0 at the wire) with one vectorized step per tick.
+# The finish order is fixed up front — from declared results, from a
+# weighted draw on the current odds, or from live positions fed in — and
+# the model is pinned so horses cross the wire in exactly that order.
+#
+# Each tick produces:
+#   - a compact binary frame for spectator screens (see encode_frame)
+#   - a per-cup brightness map for the mantle (leaders glow brighter)
+#
+# LatestWinsSender pushes brightness maps to the ESP32 from one background
+# thread: it throttles to a few Hz and always sends the newest map, dropping
+# anything superseded or too old, so a slow controller never backs up ticks.
+
+import logging
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Simulation tick rate (Hz)
+SIM_TICK_HZ = 10
+
+# Fraction of the RUNNING duration at which the winner / last horse finish
+WINNER_FINISH_FRACTION = 0.80
+LAST_FINISH_FRACTION = 0.97
+
+# Mid-race jostling: mean-reverting noise (in fractions of the track),
+# faded to zero at the gate and at each horse's own finish
+NOISE_SIGMA = 0.35
+NOISE_REVERSION = 1.5
+NOISE_SCALE = 0.06
+
+# Brightness map: leader at 255, fading with distance behind, never fully
+# dark; quantised so tiny moves don't generate new LED frames
+LEVEL_FLOOR = 24
+LEVEL_FALLOFF = 12.0
+LEVEL_QUANTUM = 16
+
+# Binary frame layout (little-endian):
+#   u8 version | u8 flags | u16 seq | u32 elapsed_ms | u8 count
+#   count x u8  post position, running order (leader first)
+#   count x u16 progress (0..65535) in the same order
+FRAME_VERSION = 1
+FRAME_FLAG_FINAL = 0x01
+_FRAME_HEADER = struct.Struct("<BBHIB")
+
+
+class RaceSimulation:
+    """
+    Vectorized race model over a field.
+
+    Args:
+        post_positions: Post position per slot.
+        odds: Decimal odds per slot (used to draw a finish order).
+        finish_order: Post positions in finishing order. Any horses left
+            out are placed after them by a weighted draw on the odds.
+        duration: Clock seconds the race runs for.
+        seed: Optional RNG seed (tests).
+    """
+
+    def __init__(self, post_positions: Sequence[int], odds: Sequence[float],
+                 finish_order: Optional[Sequence[int]] = None,
+                 duration: float = 10.0, seed: Optional[int] = None):
+        self.posts = np.asarray(post_positions, dtype=np.int32)
+        self.duration = float(duration)
+        self._rng = np.random.default_rng(seed)
+        n = self.posts.size
+
+        order = self._complete_order(list(finish_order or []),
+                                     np.asarray(odds, dtype=np.float64))
+        slot_of = {int(p): i for i, p in enumerate(self.posts)}
+        self.rank = np.empty(n, dtype=np.int32)
+        for place, post in enumerate(order):
+            self.rank[slot_of[post]] = place
+
+        # Finish times spread from the winner to the last horse, wider gaps
+        # toward the back of the field
+        span = (LAST_FINISH_FRACTION - WINNER_FINISH_FRACTION) * self.duration
+        frac = self.rank / max(1, n - 1)
+        self.finish_time = WINNER_FINISH_FRACTION * self.duration + span * frac ** 0.8
+
+        self.elapsed = 0.0
+        self.seq = 0
+        self.progress = np.zeros(n, dtype=np.float64)
+        self._noise = np.zeros(n, dtype=np.float64)
+        self._live: Optional[np.ndarray] = None
+        self._finish_seq = np.full(n, -1, dtype=np.int32)
+        self._finished = 0
+        self.last_step_ms = 0.0
+
+    def _complete_order(self, given: List[int], odds: np.ndarray) -> List[int]:
+        """Append any unplaced horses by a Plackett-Luce draw on implied odds."""
+        known = set(int(p) for p in self.posts)
+        order = [int(p) for p in given if int(p) in known]
+        rest = np.array([int(p) not in order for p in self.posts])
+        if rest.any():
+            # Gumbel-max trick: sorting log(p) + Gumbel noise samples a
+            # finish order where favourites tend to win
+            weight = np.log(1.0 / (np.maximum(odds[rest], 0.01) + 1.0))
+            keys = weight + self._rng.gumbel(size=int(rest.sum()))
+            order += [int(p) for p in self.posts[rest][np.argsort(-keys)]]
+        return order
+
+    # -----------------------------------------------------------------
+    # Stepping
+    # -----------------------------------------------------------------
+
+    @property
+    def done(self) -> bool:
+        return self._finished == self.posts.size
+
+    def set_live(self, progress: Mapping[int, float]) -> None:
+        """
+        Feed live progress (0..1) by post position, e.g. from a track feed.
+        The next step uses it instead of the model for those horses.
+        """
+        live = self.progress.copy() if self._live is None else self._live
+        for i, post in enumerate(self.posts):
+            if int(post) in progress:
+                live[i] = min(1.0, max(0.0, float(progress[int(post)])))
+        self._live = live
+
+    def step(self, dt: float) -> np.ndarray:
+        """Advance dt seconds. Returns the progress array (slot order)."""
+        t0 = time.perf_counter()
+        self.elapsed += dt
+        self.seq = (self.seq + 1) & 0xFFFF
+
+        if self._live is not None:
+            target = self._live
+        else:
+            base = np.minimum(self.elapsed / self.finish_time, 1.0)
+            self._noise += (-NOISE_REVERSION * self._noise * dt
+                            + NOISE_SIGMA * np.sqrt(dt) * self._rng.standard_normal(self.posts.size))
+            bridge = 4.0 * base * (1.0 - base)
+            target = base + NOISE_SCALE * bridge * self._noise
+            # Only the scheduled finish time crosses the wire
+            target = np.where(base < 1.0, np.clip(target, 0.0, 0.999), 1.0)
+
+        np.maximum(self.progress, target, out=self.progress)
+
+        # Stamp finishers in the order they reach the wire; ties within a
+        # tick go to the better predicted rank
+        crossed = np.flatnonzero((self.progress >= 1.0) & (self._finish_seq < 0))
+        for i in crossed[np.argsort(self.rank[crossed])]:
+            self._finish_seq[i] = self._finished
+            self._finished += 1
+
+        self.last_step_ms = (time.perf_counter() - t0) * 1000.0
+        return self.progress
+
+    # -----------------------------------------------------------------
+    # Outputs
+    # -----------------------------------------------------------------
+
+    def running_order(self) -> np.ndarray:
+        """Slot indices, leader first. Finished horses rank by finish order."""
+        seq = np.where(self._finish_seq >= 0, self._finish_seq, self.posts.size + self.rank)
+        return np.lexsort((seq, -self.progress))
+
+    def finish_order(self) -> List[int]:
+        """Post positions that have crossed the wire, in order."""
+        done = np.flatnonzero(self._finish_seq >= 0)
+        return [int(p) for p in self.posts[done[np.argsort(self._finish_seq[done])]]]
+
+    def encode_frame(self) -> bytes:
+        """Compact binary frame: running order + quantised progress."""
+        order = self.running_order()
+        flags = FRAME_FLAG_FINAL if self.done else 0
+        header = _FRAME_HEADER.pack(FRAME_VERSION, flags, self.seq,
+                                    int(self.elapsed * 1000) & 0xFFFFFFFF, order.size)
+        progress = np.round(self.progress[order] * 65535).astype("<u2")
+        return header + self.posts[order].astype(np.uint8).tobytes() + progress.tobytes()
+
+    def levels(self, num_cups: int = 20) -> bytes:
+        """One brightness byte per cup (cup = post position), leader brightest."""
+        gap = self.progress.max() - self.progress
+        level = LEVEL_FLOOR + (255 - LEVEL_FLOOR) * np.exp(-gap * LEVEL_FALLOFF)
+        level = np.minimum(255, (level // LEVEL_QUANTUM) * LEVEL_QUANTUM + LEVEL_QUANTUM - 1)
+        out = np.zeros(num_cups, dtype=np.uint8)
+        in_range = (self.posts >= 1) & (self.posts <= num_cups)
+        out[self.posts[in_range] - 1] = level[in_range].astype(np.uint8)
+        return out.tobytes()
+
+
+def decode_frame(frame: bytes) -> Dict[str, object]:
+    """Decode encode_frame() output (tests / debugging)."""
+    version, flags, seq, elapsed_ms, count = _FRAME_HEADER.unpack_from(frame)
+    off = _FRAME_HEADER.size
+    posts = list(frame[off:off + count])
+    progress = np.frombuffer(frame, dtype="<u2", count=count, offset=off + count)
+    return {
+        "version": version,
+        "final": bool(flags & FRAME_FLAG_FINAL),
+        "seq": seq,
+        "elapsed_ms": elapsed_ms,
+        "order": posts,
+        "progress": [round(float(p) / 65535, 4) for p in progress],
+    }
+
+
+def levels_command(levels: bytes) -> str:
+    """ESP32 command for a brightness map: RACE:LEVELS:<hex byte per cup>."""
+    return "RACE:LEVELS:" + levels.hex().upper()
+
+
+# =============================================================================
+# Latest-wins LED sender
+# =============================================================================
+
+class LatestWinsSender:
+    """
+    Single-slot, throttled sender for one controller.
+
+    offer() replaces whatever is pending; the worker sends at most once per
+    `min_interval` seconds and drops payloads older than `max_age` rather
+    than showing stale state.
+
+    Args:
+        send: Callable taking the payload (e.g. esp32_client.send_command).
+        min_interval: Minimum seconds between sends.
+        max_age: Payloads older than this (seconds) are dropped unsent.
+        threaded: Send from a daemon thread. If False, offer() sends inline
+            when the throttle allows (tests / virtual clocks).
+        time_fn: Monotonic time source. Defaults to time.monotonic.
+    """
+
+    def __init__(self, send: Callable[[str], object], min_interval: float = 0.25,
+                 max_age: float = 0.75, threaded: bool = True,
+                 time_fn: Optional[Callable[[], float]] = None,
+                 name: str = "LedSender"):
+        self._send = send
+        self.min_interval = float(min_interval)
+        self.max_age = float(max_age)
+        self.threaded = threaded
+        self._time = time_fn or time.monotonic
+        self.name = name
+
+        self._cv = threading.Condition()
+        self._pending = None          # (payload, offered_at)
+        self._last_sent_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+        # Monitoring
+        self.offered = 0
+        self.sent = 0
+        self.superseded = 0
+        self.dropped_stale = 0
+        self.max_latency = 0.0
+        self._latency_total = 0.0
+
+    def offer(self, payload) -> None:
+        """Queue payload for sending, replacing anything not yet sent."""
+        now = self._time()
+        with self._cv:
+            self.offered += 1
+            if self._pending is not None:
+                self.superseded += 1
+            self._pending = (payload, now)
+            if self.threaded:
+                self._cv.notify()
+        if self.threaded:
+            self._ensure_started()
+        else:
+            self._send_if_due()
+
+    def flush(self) -> None:
+        """Send the pending payload now, ignoring the throttle (non-threaded)."""
+        with self._cv:
+            item, self._pending = self._pending, None
+        if item is not None:
+            self._deliver(*item)
+
+    def _send_if_due(self) -> None:
+        with self._cv:
+            now = self._time()
+            if self._last_sent_at is not None and now - self._last_sent_at < self.min_interval:
+                return
+            item, self._pending = self._pending, None
+        if item is not None:
+            self._deliver(*item)
+
+    def _deliver(self, payload, offered_at: float) -> None:
+        now = self._time()
+        if now - offered_at > self.max_age:
+            self.dropped_stale += 1
+            return
+        self._last_sent_at = now
+        try:
+            self._send(payload)
+        except Exception:
+            logger.exception("%s: send failed", self.name)
+        latency = self._time() - offered_at
+        self.sent += 1
+        self._latency_total += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cv:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._stopped:
+                    if self._pending is not None:
+                        wait = 0.0
+                        if self._last_sent_at is not None:
+                            wait = self._last_sent_at + self.min_interval - self._time()
+                        if wait <= 0:
+                            break
+                        self._cv.wait(wait)
+                    else:
+                        self._cv.wait()
+                if self._stopped:
+                    return
+                item, self._pending = self._pending, None
+            self._deliver(*item)
+
+    def stop(self) -> None:
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def stats(self) -> dict:
+        """Send counts and offer → sent latency (ms)."""
+        avg = self._latency_total / self.sent if self.sent else 0.0
+        return {
+            "offered": self.offered,
+            "sent": self.sent,
+            "superseded": self.superseded,
+            "dropped_stale": self.dropped_stale,
+            "avg_latency_ms": round(avg * 1000.0, 2),
+            "max_latency_ms": round(self.max_latency * 1000.0, 2),
+        }
@@ -4,12 +4,19 @@
 # broadcasting for the Derby de Mayo Cup system.
 
 import random
-import time
 import logging
 import threading
 from enum import Enum
-from dataclasses import dataclass, asdict
-from typing import Optional, Dict, List
+from dataclasses import dataclass, asdict, replace
+from types import MappingProxyType
+from typing import Optional, Dict, List, Mapping
+
+from services import race_journal
+from services.odds_engine import OddsEngine
+from services.race_sim import (
+    LatestWinsSender, RaceSimulation, SIM_TICK_HZ, levels_command,
+)
+from services.scheduler import Scheduler, VirtualClock
 
 logger = logging.getLogger(__name__)
 
@@ -97,9 +104,14 @@ SADDLE_CLOTH_COLORS: Dict[int, str] = {
 # Horse Data
 # =============================================================================
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DerbyHorse:
-    """Represents a single horse entry in a Derby de Mayo race."""
+    """
+    Represents a single horse entry in a Derby de Mayo race.
+
+    Immutable — changes go through dataclasses.replace() and a new
+    FieldSnapshot, never in-place mutation.
+    """
     post_position: int
     horse_name: str
     jockey: str
@@ -114,6 +126,38 @@ class DerbyHorse:
         return asdict(self)
 
 
+class FieldSnapshot:
+    """
+    Immutable, versioned view of the whole field.
+
+    Mutations build a new snapshot and swap it in under the service lock, so
+    readers grab `service._snapshot` once and never need the lock. The
+    serialised list and per-horse dicts are built on first read and cached
+    for the life of the version — repeat reads allocate nothing. Returned
+    dicts are shared: treat them as read-only.
+    """
+
+    __slots__ = ("version", "horses", "_list", "_by_pos")
+
+    def __init__(self, horses: Mapping[int, DerbyHorse], version: int):
+        self.version = version
+        self.horses: Mapping[int, DerbyHorse] = MappingProxyType(dict(sorted(horses.items())))
+        self._list: Optional[List[dict]] = None
+        self._by_pos: Optional[Dict[int, dict]] = None
+
+    def as_list(self) -> List[dict]:
+        """Horse dicts ordered by post position (cached)."""
+        if self._list is None:
+            self._list = [h.to_dict() for h in self.horses.values()]
+        return self._list
+
+    def as_dict(self, post_position: int) -> Optional[dict]:
+        """One horse's dict (cached, shared with as_list())."""
+        if self._by_pos is None:
+            self._by_pos = {d["post_position"]: d for d in self.as_list()}
+        return self._by_pos.get(post_position)
+
+
 # =============================================================================
 # Mock Data Pools
 # =============================================================================
@@ -170,49 +214,112 @@ class RacingDataService:
     Args:
         socketio: Flask-SocketIO instance (or None for headless operation).
         use_mock: If True, generate mock horse entries on init.
+        esp32_client: ESP32 client for sending LED commands (or None).
+        scheduler: Shared Scheduler for timed jobs. A private one is created
+            (on `clock`, default wall time) if not supplied.
+        clock: Clock for a private scheduler — e.g. ScaledClock for
+            time-compressed rehearsals or VirtualClock in tests.
+        race_id: Card identifier (e.g. "derby"). When set, it is added to
+            every Socket.IO payload so clients can tell races apart.
+        race_name: Display name for spectator screens.
+        led_sender: LatestWinsSender for live race brightness maps. Shared
+            across a race card; created on demand if an ESP32 client is set.
+        journal: RaceJournal to persist every change to. If it holds prior
+            state, the service resumes from it instead of generating horses.
     """
 
-    def __init__(self, socketio=None, use_mock: bool = True, esp32_client=None):
+    def __init__(self, socketio=None, use_mock: bool = True, esp32_client=None,
+                 scheduler: Optional[Scheduler] = None, clock=None,
+                 race_id: Optional[str] = None, race_name: str = "Derby de Mayo",
+                 led_sender: Optional[LatestWinsSender] = None,
+                 journal: Optional[race_journal.RaceJournal] = None):
         self.socketio = socketio
         self.use_mock = use_mock
         self.esp32_client = esp32_client
+        self.race_id = race_id
+        self.race_name = race_name
+
+        # All timing (state advances, odds drift) runs on the scheduler's clock
+        self._scheduler = scheduler if scheduler is not None else Scheduler(clock=clock)
+        self._clock = self._scheduler.clock
 
         # Race control mode: "auto" (API-driven) or "manual" (dashboard buttons)
         self._mode: str = "manual"
 
         # Race state
         self.current_state: RaceState = RaceState.DORMANT
-        self.state_changed_at: float = time.time()
+        self.state_changed_at: float = self._clock.now()
 
-        # Horse entries keyed by post position (1–20)
-        self.horses: Dict[int, DerbyHorse] = {}
+        # Horse entries keyed by post position (1–20), as a copy-on-write
+        # snapshot. Read through the `horses` property or get_horses().
+        self._snapshot = FieldSnapshot({}, version=0)
+
+        # Vectorized odds model over the field (rebuilt when horses change)
+        self._odds: Optional[OddsEngine] = None
 
         # Result positions
         self._win: Optional[int] = None
         self._place: Optional[int] = None
         self._show: Optional[int] = None
 
-        # Background threads
-        self._auto_thread: Optional[threading.Thread] = None
-        self._odds_thread: Optional[threading.Thread] = None
+        # Auto-progression timers. _auto_gen is bumped on every start/stop so
+        # a timer that fires after stop_auto_progression() is ignored.
+        self._advance_timer = None
+        self._drift_timer = None
+        self._auto_gen = 0
         self._running = False
 
+        # Live race simulation (RUNNING only), ticked at SIM_TICK_HZ on the
+        # scheduler. _sim_gen invalidates ticks from a previous run.
+        self._sim: Optional[RaceSimulation] = None
+        self._sim_timer = None
+        self._sim_gen = 0
+        self._last_levels: Optional[bytes] = None
+        self._sim_stats = {"ticks": 0, "frames": 0, "frame_bytes": 0,
+                           "max_tick_lateness_ms": 0.0, "max_step_ms": 0.0}
+        self.led_sender = led_sender
+
         # Thread lock for state changes
         self._lock = threading.Lock()
 
-        # Generate horses if mock mode
-        if self.use_mock:
+        # Resume from the journal if it has state; otherwise start fresh
+        self.journal = journal
+        restored = journal.load() if journal is not None else None
+        self.restored = restored is not None
+        if restored is not None:
+            self._restore(restored)
+        elif self.use_mock:
             self.generate_mock_horses()
 
         logger.info("RacingDataService initialised (mock=%s)", use_mock)
 
+    # -----------------------------------------------------------------
+    # Horse snapshot
+    # -----------------------------------------------------------------
+
+    @property
+    def horses(self) -> Mapping[int, DerbyHorse]:
+        """Read-only {post_position: DerbyHorse} for the current snapshot."""
+        return self._snapshot.horses
+
+    @property
+    def horses_version(self) -> int:
+        """Monotonic version of the horse snapshot; bumps on every change."""
+        return self._snapshot.version
+
+    def _publish(self, horses: Mapping[int, DerbyHorse]) -> FieldSnapshot:
+        """Swap in a new snapshot. Caller must hold self._lock."""
+        snap = FieldSnapshot(horses, self._snapshot.version + 1)
+        self._snapshot = snap
+        return snap
+
     # -----------------------------------------------------------------
     # Horse generation
     # -----------------------------------------------------------------
 
     def generate_mock_horses(self) -> None:
         """
-        Populate self.horses with 20 realistic mock entries.
+        Populate the field with 20 realistic mock entries.
         Uses the MOCK_* pools and assigns official saddle cloth colours.
         """
         names = list(MOCK_HORSE_NAMES)
@@ -225,8 +332,7 @@ class RacingDataService:
         random.shuffle(trainers)
         random.shuffle(odds_pool)
 
-        self.horses.clear()
-
+        horses: Dict[int, DerbyHorse] = {}
         for pos in range(1, 21):
             ml_odds = odds_pool[pos - 1]
             horse = DerbyHorse(
@@ -239,21 +345,69 @@ class RacingDataService:
                 saddle_cloth_color=SADDLE_CLOTH_COLORS.get(pos, "#808080"),
                 finish_position=None,
             )
-            self.horses[pos] = horse
+            horses[pos] = horse
 
+        with self._lock:
+            self._publish(horses)
+            self._rebuild_odds_engine()
+        self._journal(race_journal.HORSES, durable=True,
+                      horses=[h.to_dict() for h in horses.values()])
         logger.info("Generated %d mock horses", len(self.horses))
 
+    def load_entries(self, entries) -> int:
+        """
+        Replace the field with imported race-card entries (RaceEntry objects
+        or dicts with post_position, horse_name, jockey, trainer,
+        morning_line_odds). Current odds start at the morning line.
+
+        Returns:
+            Number of horses loaded.
+        """
+        horses: Dict[int, DerbyHorse] = {}
+        for entry in entries:
+            e = entry if isinstance(entry, dict) else entry.to_dict()
+            pos = int(e["post_position"])
+            ml = e.get("morning_line_odds") or ""
+            horses[pos] = DerbyHorse(
+                post_position=pos,
+                horse_name=e["horse_name"],
+                jockey=e.get("jockey", ""),
+                trainer=e.get("trainer", ""),
+                morning_line_odds=ml,
+                current_odds=_fraction_to_float(ml),
+                saddle_cloth_color=SADDLE_CLOTH_COLORS.get(pos, "#808080"),
+            )
+
+        with self._lock:
+            self._publish(horses)
+            self._rebuild_odds_engine()
+        self.use_mock = False  # reset() keeps the imported field
+        self._journal(race_journal.HORSES, durable=True,
+                      horses=[h.to_dict() for h in horses.values()])
+        logger.info("Loaded %d horses from race card", len(horses))
+        return len(horses)
+
+    def _rebuild_odds_engine(self) -> None:
+        """Re-seed the odds arrays from the current horse entries."""
+        if not self.horses:
+            self._odds = None
+            return
+        self._odds = OddsEngine.from_field(
+            {pos: h.current_odds for pos, h in self.horses.items()},
+            {pos: _fraction_to_float(h.morning_line_odds) for pos, h in self.horses.items()},
+        )
+
     # -----------------------------------------------------------------
     # State management
     # -----------------------------------------------------------------
 
     def get_state(self) -> dict:
         """Return current state information as a dict."""
-        elapsed = round(time.time() - self.state_changed_at, 1)
+        elapsed = round(self._clock.now() - self.state_changed_at, 1)
         duration = STATE_DURATIONS.get(self.current_state)
         remaining = max(0, round(duration - elapsed, 1)) if duration else None
 
-        return {
+        info = {
             "state": self.current_state.value,
             "mode": self._mode,
             "elapsed_seconds": elapsed,
@@ -263,6 +417,9 @@ class RacingDataService:
             "place": self._place,
             "show": self._show,
         }
+        if self.race_id is not None:
+            info["race_id"] = self.race_id
+        return info
 
     def get_mode(self) -> str:
         """Return current race control mode: 'auto' or 'manual'."""
@@ -279,6 +436,7 @@ class RacingDataService:
             raise ValueError("mode must be 'auto' or 'manual'")
         old_mode = self._mode
         self._mode = mode
+        self._journal(race_journal.MODE, durable=True, mode=mode)
         logger.info("Race control mode: %s → %s", old_mode, mode)
 
         if mode == "auto":
@@ -286,23 +444,40 @@ class RacingDataService:
         else:
             self.stop_auto_progression()
 
-    def set_state(self, state: RaceState) -> None:
+    def set_state(self, state: RaceState, at: Optional[float] = None) -> None:
         """
         Manually set the race state (override). Broadcasts the change.
 
+        While auto progression is running, the next advance is re-armed from
+        the new state's start time, so a manual override mid-run keeps the
+        timeline consistent.
+
         Args:
             state: The RaceState to transition to.
+            at: Clock time the state officially began. Auto progression passes
+                the scheduled deadline so slow LED/socket sends never push
+                later states back. Defaults to now.
         """
         with self._lock:
             old_state = self.current_state
             self.current_state = state
-            self.state_changed_at = time.time()
+            self.state_changed_at = self._clock.now() if at is None else at
+        self._journal(race_journal.STATE, durable=True,
+                      state=state.value, at=self.state_changed_at)
 
-        logger.info("State changed: %s → %s (manual)", old_state.value, state.value)
+        if self._running:
+            self._arm_advance()
+
+        logger.info("State changed: %s → %s", old_state.value, state.value)
         self.emit_state_change(old_state, state)
         self.emit_led_command(state)
 
-    def _advance_state(self) -> Optional[RaceState]:
+        if state == RaceState.RUNNING:
+            self._start_sim()
+        elif old_state == RaceState.RUNNING:
+            self._stop_sim()
+
+    def _advance_state(self, at: Optional[float] = None) -> Optional[RaceState]:
         """
         Advance to the next state in the lifecycle.
         Returns the new state, or None if already at OFFICIAL.
@@ -316,7 +491,7 @@ class RacingDataService:
             return None  # Already at OFFICIAL
 
         next_state = STATE_ORDER[idx + 1]
-        self.set_state(next_state)
+        self.set_state(next_state, at=at)
         return next_state
 
     # -----------------------------------------------------------------
@@ -325,99 +500,328 @@ class RacingDataService:
 
     def start_auto_progression(self) -> None:
         """
-        Start a background thread that automatically advances through
-        race states on the defined timers.
+        Start automatically advancing through race states on the defined
+        timers. Advances and odds drift ticks are timers on the shared
+        scheduler — no per-race threads.
         """
-        if self._running:
-            logger.warning("Auto progression already running")
-            return
-
-        self._running = True
-
-        # Start state progression thread
-        self._auto_thread = threading.Thread(
-            target=self._auto_progression_loop,
-            name="RaceAutoProgression",
-            daemon=True,
-        )
-        self._auto_thread.start()
-
-        # Start odds drifting thread
-        self._odds_thread = threading.Thread(
-            target=self._odds_drift_loop,
-            name="OddsDrift",
-            daemon=True,
-        )
-        self._odds_thread.start()
+        with self._lock:
+            if self._running:
+                logger.warning("Auto progression already running")
+                return
+            self._running = True
+            self._auto_gen += 1
+            gen = self._auto_gen
+        self._journal(race_journal.AUTO, durable=True, running=True)
+
+        # Kick off on the scheduler thread so the caller never blocks on the
+        # ESP32 for the DORMANT → ENTRIES_LOADED transition.
+        self._scheduler.call_later(0, self._auto_begin, gen)
+        self._schedule_drift(gen)
 
         logger.info("Auto progression started")
 
     def stop_auto_progression(self) -> None:
         """Stop auto progression and odds drifting."""
-        self._running = False
+        with self._lock:
+            was_running = self._running
+            self._running = False
+            self._auto_gen += 1
+            self._scheduler.cancel(self._advance_timer)
+            self._scheduler.cancel(self._drift_timer)
+            self._advance_timer = None
+            self._drift_timer = None
+        if was_running:
+            self._journal(race_journal.AUTO, durable=True, running=False)
         logger.info("Auto progression stopped")
 
-    def _auto_progression_loop(self) -> None:
-        """Background loop that advances state after each duration expires. Runs only in auto mode."""
-        # Start from ENTRIES_LOADED
+    def shutdown(self) -> None:
+        """Stop every timer this race owns: auto progression, drift and the sim."""
+        self.stop_auto_progression()
+        self._stop_sim()
+
+    def _auto_begin(self, gen: int) -> None:
+        """First auto step: leave DORMANT, then arm the advance timer."""
+        if gen != self._auto_gen:
+            return
         if self.current_state == RaceState.DORMANT:
-            self.set_state(RaceState.ENTRIES_LOADED)
+            self.set_state(RaceState.ENTRIES_LOADED)  # re-arms via set_state
+        else:
+            self._arm_advance()
+
+    def _arm_advance(self) -> None:
+        """
+        (Re)schedule the next state advance at state_changed_at + duration.
 
-        while self._running and self._mode == "auto":
+        Deadlines are absolute, derived from when the current state began,
+        so time spent inside set_state (ESP32 round trips, emits) never
+        accumulates into drift.
+        """
+        with self._lock:
+            self._scheduler.cancel(self._advance_timer)
+            self._advance_timer = None
             duration = STATE_DURATIONS.get(self.current_state)
             if duration is None:
                 # OFFICIAL or DORMANT — no auto-advance
-                break
-
-            # Sleep in small increments so we can stop quickly
-            slept = 0.0
-            while slept < duration and self._running:
-                time.sleep(0.5)
-                slept += 0.5
-
-            if not self._running:
-                break
-
-            next_state = self._advance_state()
-            if next_state is None:
-                break
+                logger.info("Auto progression reached %s (no timer)", self.current_state.value)
+                return
+            deadline = self.state_changed_at + duration
+            self._advance_timer = self._scheduler.call_at(
+                deadline, self._auto_advance, self._auto_gen, deadline,
+            )
 
-        logger.info("Auto progression loop ended (state=%s)", self.current_state.value)
+    def _auto_advance(self, gen: int, deadline: float) -> None:
+        """Timer callback: advance one state, stamped at the exact deadline."""
+        if gen != self._auto_gen or not self._running or self._mode != "auto":
+            return
+        self._advance_state(at=deadline)
 
     # -----------------------------------------------------------------
     # Odds drifting
     # -----------------------------------------------------------------
 
-    def drift_odds(self) -> None:
+    def drift_odds(self) -> List[dict]:
         """
-        Randomly adjust current_odds for all horses by a small amount.
+        Advance the field's odds one tick (vectorized mean-reverting random
+        walk) and broadcast only the horses whose displayed odds changed.
         Simulates tote board odds movement during betting periods.
+
+        Returns:
+            The delta rows broadcast: [{"post_position", "current_odds"}, ...].
         """
         with self._lock:
-            for horse in self.horses.values():
-                # Drift by ±5%
-                drift_pct = random.uniform(-0.05, 0.05)
-                new_odds = horse.current_odds * (1.0 + drift_pct)
-                # Clamp to a reasonable range (minimum 1.1)
-                horse.current_odds = round(max(1.1, new_odds), 2)
-
-        # Broadcast updated odds
-        if self.socketio:
-            self.socketio.emit("odds_update", {
-                "horses": self.get_horses(),
+            if self._odds is None:
+                return []
+            changed = self._odds.step()
+            deltas = self._odds.deltas(changed)
+            if deltas:
+                horses = dict(self._snapshot.horses)
+                for row in deltas:
+                    pos = row["post_position"]
+                    horses[pos] = replace(horses[pos], current_odds=row["current_odds"])
+                self._publish(horses)
+        if deltas:
+            self._journal(race_journal.ODDS,
+                          d=[[row["post_position"], row["current_odds"]] for row in deltas])
+
+        # Broadcast the changed horses only
+        if deltas:
+            self._emit("odds_update", {
+                "horses": deltas,
+                "changed": [row["post_position"] for row in deltas],
+                "timestamp": self._clock.now(),
             })
+        return deltas
+
+    def _schedule_drift(self, gen: int) -> None:
+        """Arm the next odds drift tick 3–6 s out."""
+        with self._lock:
+            if gen != self._auto_gen:
+                return
+            self._drift_timer = self._scheduler.call_later(
+                random.uniform(3.0, 6.0), self._drift_tick, gen,
+            )
+
+    def _drift_tick(self, gen: int) -> None:
+        """Timer callback: drift odds during betting, then re-arm."""
+        if gen != self._auto_gen or not self._running:
+            return
+        if self.current_state in (RaceState.BETTING_OPEN, RaceState.BETTING_CLOSING):
+            self.drift_odds()
+        self._schedule_drift(gen)
+
+    # -----------------------------------------------------------------
+    # Journal / recovery
+    # -----------------------------------------------------------------
+
+    def _journal(self, kind: str, durable: bool = False, **fields) -> None:
+        """
+        Append a journal record; snapshot when the tail gets long. Called
+        after the change is made and outside self._lock — the snapshot reads
+        state under the journal lock, so appends must never hold self._lock.
+        """
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(kind, durable=durable, **fields)
+            if self.journal.needs_snapshot:
+                self.journal.write_snapshot(self._journal_state)
+        except OSError:
+            logger.exception("Race journal write failed (%s)", kind)
+
+    def _journal_state(self) -> dict:
+        """Full state in journal form (for snapshots; runs under the journal
+        lock, so it reads without taking self._lock)."""
+        return {
+            "state": self.current_state.value,
+            "state_changed_at": self.state_changed_at,
+            "mode": self._mode,
+            "running": self._running,
+            "win": self._win,
+            "place": self._place,
+            "show": self._show,
+            "horses": {pos: h.to_dict() for pos, h in self._snapshot.horses.items()},
+        }
+
+    def _restore(self, state: dict) -> None:
+        """
+        Resume from journaled state: same horses, state, start time, mode and
+        results. If auto progression was running it is restarted, and the
+        advance timer picks up from the original state_changed_at — so the
+        remaining time in the current phase is preserved (and phases that
+        expired while down are caught up at their exact deadlines).
+        """
+        horses = {pos: DerbyHorse(**h) for pos, h in state["horses"].items()}
+        with self._lock:
+            if horses:
+                self._publish(horses)
+                self._rebuild_odds_engine()
+            self.current_state = RaceState(state["state"])
+            if state["state_changed_at"] is not None:
+                self.state_changed_at = state["state_changed_at"]
+            self._mode = state["mode"]
+            self._win, self._place, self._show = state["win"], state["place"], state["show"]
+
+        if not horses and self.use_mock:
+            self.generate_mock_horses()
+
+        # Compact: one fresh snapshot, empty tail (also drops any torn line)
+        self.journal.write_snapshot(self._journal_state)
 
-    def _odds_drift_loop(self) -> None:
-        """Background loop that drifts odds every few seconds during betting."""
-        while self._running:
-            if self.current_state in (RaceState.BETTING_OPEN, RaceState.BETTING_CLOSING):
-                self.drift_odds()
-            time.sleep(random.uniform(3.0, 6.0))
+        recovery = self.journal.last_recovery or {}
+        logger.info("Race state recovered: %s (%s mode) in %.1f ms (%d records replayed)",
+                    self.current_state.value, self._mode,
+                    recovery.get("recovery_ms", 0.0), recovery.get("replayed_records", 0))
+
+        if state["running"] and self._mode == "auto":
+            self.start_auto_progression()
+        if self.current_state == RaceState.RUNNING:
+            self._start_sim()
+
+    def get_journal_stats(self) -> dict:
+        """Journal counters and the last recovery's timing."""
+        if self.journal is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.journal.stats()}
+
+    # -----------------------------------------------------------------
+    # Race simulation (RUNNING)
+    # -----------------------------------------------------------------
+
+    def _start_sim(self) -> None:
+        """Build the race model and start ticking at SIM_TICK_HZ."""
+        snap = self._snapshot
+        if not snap.horses:
+            return
+        declared = [p for p in (self._win, self._place, self._show) if p is not None]
+        posts = list(snap.horses)
+        with self._lock:
+            self._scheduler.cancel(self._sim_timer)
+            self._sim_gen += 1
+            gen = self._sim_gen
+            self._sim = RaceSimulation(
+                posts, [snap.horses[p].current_odds for p in posts],
+                finish_order=declared,
+                duration=STATE_DURATIONS[RaceState.RUNNING],
+            )
+            self._last_levels = None
+            start = self.state_changed_at
+            self._sim_timer = self._scheduler.call_at(
+                start + 1.0 / SIM_TICK_HZ, self._sim_tick, gen, start + 1.0 / SIM_TICK_HZ,
+            )
+        logger.info("Race simulation started (%d horses, %d declared)", len(posts), len(declared))
+
+    def _stop_sim(self) -> None:
+        """Stop ticking. The last frame stays on screen."""
+        with self._lock:
+            self._sim_gen += 1
+            self._scheduler.cancel(self._sim_timer)
+            self._sim_timer = None
+        if self.led_sender is not None and not self.led_sender.threaded:
+            self.led_sender.flush()
+
+    def _sim_tick(self, gen: int, deadline: float) -> None:
+        """Timer callback: step the model, stream a frame, feed the LEDs."""
+        with self._lock:
+            sim = self._sim
+            if gen != self._sim_gen or sim is None:
+                return
+            lateness = self._clock.now() - deadline
+            sim.step(1.0 / SIM_TICK_HZ)
+            frame = sim.encode_frame()
+            levels = sim.levels()
+            if not sim.done:
+                # Absolute deadlines: a late tick never shifts later ones
+                nxt = deadline + 1.0 / SIM_TICK_HZ
+                self._sim_timer = self._scheduler.call_at(nxt, self._sim_tick, gen, nxt)
+            else:
+                self._sim_timer = None
+
+        stats = self._sim_stats
+        stats["ticks"] += 1
+        stats["max_tick_lateness_ms"] = max(stats["max_tick_lateness_ms"], round(lateness * 1000.0, 3))
+        stats["max_step_ms"] = max(stats["max_step_ms"], round(sim.last_step_ms, 3))
+
+        if self._emit("race_positions", {"frame": frame, "seq": sim.seq}):
+            stats["frames"] += 1
+            stats["frame_bytes"] += len(frame)
+
+        if self.esp32_client:
+            sender = self._get_led_sender()
+            if levels != self._last_levels:
+                self._last_levels = levels
+                sender.offer(levels_command(levels))
+            if sim.done and not sender.threaded:
+                sender.flush()  # threaded senders drain on their own
+
+    def _get_led_sender(self) -> LatestWinsSender:
+        if self.led_sender is None:
+            clock = self._clock
+            virtual = isinstance(clock, VirtualClock)
+            self.led_sender = LatestWinsSender(
+                self.esp32_client.send_command,
+                threaded=not virtual,
+                time_fn=clock.now if virtual else None,
+            )
+        return self.led_sender
+
+    def feed_live_positions(self, progress: Mapping[int, float]) -> bool:
+        """
+        Override the model with live progress (0..1) by post position.
+        Returns False if no race is running.
+        """
+        with self._lock:
+            if self._sim is None or self.current_state != RaceState.RUNNING:
+                return False
+            self._sim.set_live(progress)
+            return True
+
+    def get_sim_stats(self) -> dict:
+        """Simulation tick/stream health plus LED sender latency."""
+        sim = self._sim
+        return {
+            "active": sim is not None and self.current_state == RaceState.RUNNING and not sim.done,
+            "tick_hz": SIM_TICK_HZ,
+            "finish_order": sim.finish_order() if sim is not None else [],
+            **self._sim_stats,
+            "led": self.led_sender.stats() if self.led_sender is not None else None,
+        }
 
     # -----------------------------------------------------------------
     # Socket.IO broadcasting
     # -----------------------------------------------------------------
 
+    def _emit(self, event: str, payload: dict) -> bool:
+        """
+        Emit one Socket.IO event, tagged with race_id when this service is
+        part of a race card. Returns False when running headless.
+        """
+        if not self.socketio:
+            return False
+        if self.race_id is not None:
+            payload["race_id"] = self.race_id
+        self.socketio.emit(event, payload)
+        return True
+
     def emit_state_change(self, old_state: RaceState, new_state: RaceState) -> None:
         """
         Broadcast a state change event via Socket.IO.
@@ -431,13 +835,12 @@ class RacingDataService:
             "new_state": new_state.value,
             "state": new_state.value,
             "mode": self._mode,
-            "timestamp": time.time(),
+            "timestamp": self._clock.now(),
             "state_info": self.get_state(),
             "horses": self.get_horses(),
         }
 
-        if self.socketio:
-            self.socketio.emit("race_state_change", payload)
+        if self._emit("race_state_change", payload):
             logger.debug("Emitted race_state_change: %s → %s", old_state.value, new_state.value)
         else:
             logger.debug("No socketio — skipping emit for %s → %s", old_state.value, new_state.value)
@@ -463,8 +866,7 @@ class RacingDataService:
             return
 
         # Emit to Socket.IO clients
-        if self.socketio:
-            self.socketio.emit("led_command", {"command": command})
+        if self._emit("led_command", {"command": command}):
             logger.debug("LED command emitted (socketio): %s", command)
 
         # Send to ESP32
@@ -480,13 +882,13 @@ class RacingDataService:
         """
         Return a list of horse dicts sorted by post position.
 
+        Lock-free and cached per snapshot version — the same list object is
+        returned until the field changes, so callers must not mutate it.
+
         Returns:
             List of horse dictionaries, ordered by post_position 1–20.
         """
-        return [
-            self.horses[pos].to_dict()
-            for pos in sorted(self.horses.keys())
-        ]
+        return self._snapshot.as_list()
 
     def get_horse(self, post_position: int) -> Optional[dict]:
         """
@@ -498,8 +900,7 @@ class RacingDataService:
         Returns:
             Horse dict or None if not found.
         """
-        horse = self.horses.get(post_position)
-        return horse.to_dict() if horse else None
+        return self._snapshot.as_dict(post_position)
 
     # -----------------------------------------------------------------
     # Results
@@ -528,43 +929,45 @@ class RacingDataService:
             if pos not in self.horses:
                 raise ValueError(f"Invalid post position: {pos}")
 
+        finish = {win: 1, place: 2, show: 3}
         with self._lock:
-            # Clear any previous finish positions
-            for horse in self.horses.values():
-                horse.finish_position = None
-
-            # Set new results
-            self.horses[win].finish_position = 1
-            self.horses[place].finish_position = 2
-            self.horses[show].finish_position = 3
+            # Clear any previous finish positions and set the new results
+            snap = self._publish({
+                pos: replace(horse, finish_position=finish.get(pos))
+                for pos, horse in self._snapshot.horses.items()
+            })
 
             self._win = win
             self._place = place
             self._show = show
+        self._journal(race_journal.RESULTS, durable=True, win=win, place=place, show=show)
 
         logger.info(
             "Results set — WIN: #%d %s, PLACE: #%d %s, SHOW: #%d %s",
-            win, self.horses[win].horse_name,
-            place, self.horses[place].horse_name,
-            show, self.horses[show].horse_name,
+            win, snap.horses[win].horse_name,
+            place, snap.horses[place].horse_name,
+            show, snap.horses[show].horse_name,
         )
 
         # Broadcast results
-        if self.socketio:
-            self.socketio.emit("race_results", {
-                "win": self.horses[win].to_dict(),
-                "place": self.horses[place].to_dict(),
-                "show": self.horses[show].to_dict(),
-            })
+        self._emit("race_results", {
+            "win": snap.as_dict(win),
+            "place": snap.as_dict(place),
+            "show": snap.as_dict(show),
+        })
 
     def clear_results(self) -> None:
         """Clear finish positions and reset result tracking."""
         with self._lock:
-            for horse in self.horses.values():
-                horse.finish_position = None
+            if any(h.finish_position is not None for h in self._snapshot.horses.values()):
+                self._publish({
+                    pos: replace(horse, finish_position=None)
+                    for pos, horse in self._snapshot.horses.items()
+                })
             self._win = None
             self._place = None
             self._show = None
+        self._journal(race_journal.CLEAR_RESULTS, durable=True)
 
         logger.info("Results cleared")
 
@@ -596,7 +999,7 @@ class RacingDataService:
         return {
             "state": state_info["state"],
             "horses": horses,
-            "race_name": "Derby de Mayo",
+            "race_name": self.race_name,
         }
 
     # -----------------------------------------------------------------
@@ -609,11 +1012,15 @@ class RacingDataService:
         DORMANT, and optionally regenerate mock horses.
         """
         self.stop_auto_progression()
+        self._stop_sim()
+        self._sim = None
         self.clear_results()
 
         with self._lock:
             self.current_state = RaceState.DORMANT
-            self.state_changed_at = time.time()
+            self.state_changed_at = self._clock.now()
+        self._journal(race_journal.STATE, durable=True,
+                      state=RaceState.DORMANT.value, at=self.state_changed_at)
 
         if self.use_mock:
             self.generate_mock_horses()
@@ -0,0 +1,292 @@
+# results_txn.py - Server-side results transaction for DDM Horse Dashboard
+#
+# Entering results used to be driven step by step from the tablet:
+# ANIM:RESULTS_ENTRY, three CUP:LOCKs, POST /api/results, RESULTS:FINALIZE,
+# then the racing service and the tote. A dropped request part way through
+# left the mantle half-locked and the stores disagreeing.
+#
+# ResultsTransaction validates win/place/show once and runs the whole
+# sequence on the Pi:
+#
+#   1. devices   - every mantle command pipelined over one ESP32 connection;
+#                  commands left unanswered are resent (resume) up to
+#                  `device_retries` times
+#   2. store     - results file                  (undo: restore previous)
+#   3. racing    - RacingDataService.set_winners (undo: previous winners)
+#   4. hooks     - e.g. La Subasta settlement (irreversible, so it runs last)
+#   5. announce  - tote "official", SSE broadcast (best effort, never fatal)
+#
+# A failure in 1-3, or in the first hook, rolls back the steps already
+# applied (and unlocks the cups) so nothing is left half-done. Hooks can't be
+# undone, so once one has succeeded the results stand: a later hook failing
+# is reported in `steps` like an announce failure, never rolled back. Resubmitting results that already
+# committed is a no-op that returns the original outcome, so a tablet can
+# safely retry when the response (not the request) was lost.
+
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lock colours, matching the dashboard's results modal
+RESULT_COLORS = {
+    "win": (255, 215, 0),     # gold
+    "place": (192, 192, 192),  # silver
+    "show": (205, 127, 50),    # bronze
+}
+
+DEFAULT_DEVICE_RETRIES = 2
+
+ROLLBACK_COMMAND = "CUP:UNLOCK:ALL"
+
+
+def device_commands(win: int, place: int, show: int) -> List[str]:
+    """The mantle sequence for one set of results, in send order."""
+    commands = ["ANIM:RESULTS_ENTRY"]
+    for slot, cup in (("win", win), ("place", place), ("show", show)):
+        r, g, b = RESULT_COLORS[slot]
+        commands.append(f"CUP:LOCK:{cup}:{r}:{g}:{b}")
+    commands.append("RESULTS:FINALIZE")
+    return commands
+
+
+def validate_results(win, place, show, num_cups: int = 20) -> Tuple[int, int, int]:
+    """
+    Coerce and check win/place/show.
+
+    Raises:
+        ValueError: If any value isn't an integer cup, or two are equal.
+    """
+    try:
+        picks = (int(win), int(place), int(show))
+    except (TypeError, ValueError):
+        raise ValueError("win, place and show must be integers")
+    if len(set(picks)) != 3:
+        raise ValueError("Win, Place, and Show must be different cups")
+    for cup in picks:
+        if not 1 <= cup <= num_cups:
+            raise ValueError(f"Invalid cup: {cup} (must be 1-{num_cups})")
+    return picks
+
+
+class ResultsTransaction:
+    """
+    Runs the results sequence as one unit.
+
+    Args:
+        esp32_client: Client with send_batch() (send_command() is used per
+            command if it has no send_batch).
+        get_racing_service: Returns the RacingDataService to update (the
+            featured race), or None.
+        load_results / save_results / restore_results: Results store.
+            restore_results(previous) puts back what load_results returned
+            (None = no results).
+        hooks: (name, fn(win, place, show)) run after local state, in order.
+            Not undone — put irreversible steps here. Only a failure before
+            any hook has succeeded rolls the results back.
+        announce: (name, fn(win, place, show)) best-effort notifications.
+        num_cups: Highest valid cup number.
+        device_retries: Resends for commands the ESP32 didn't acknowledge.
+    """
+
+    def __init__(self, esp32_client=None,
+                 get_racing_service: Optional[Callable] = None,
+                 load_results: Optional[Callable] = None,
+                 save_results: Optional[Callable] = None,
+                 restore_results: Optional[Callable] = None,
+                 hooks: Sequence[Tuple[str, Callable]] = (),
+                 announce: Sequence[Tuple[str, Callable]] = (),
+                 num_cups: int = 20,
+                 device_retries: int = DEFAULT_DEVICE_RETRIES):
+        self.esp32_client = esp32_client
+        self.get_racing_service = get_racing_service
+        self.load_results = load_results
+        self.save_results = save_results
+        self.restore_results = restore_results
+        self.hooks = list(hooks)
+        self.announce = list(announce)
+        self.num_cups = num_cups
+        self.device_retries = device_retries
+
+        self._lock = threading.Lock()
+        self.last: Optional[dict] = None
+
+        # Monitoring
+        self.commits = 0
+        self.rollbacks = 0
+        self.replays = 0
+
+    def reset(self) -> None:
+        """Forget the last outcome (results were cleared)."""
+        with self._lock:
+            self.last = None
+
+    # -----------------------------------------------------------------
+    # Steps
+    # -----------------------------------------------------------------
+
+    def _send(self, commands: List[str]) -> List[str]:
+        send_batch = getattr(self.esp32_client, "send_batch", None)
+        if send_batch is not None:
+            return send_batch(commands)
+        return [self.esp32_client.send_command(c) for c in commands]
+
+    def _run_devices(self, commands: List[str]) -> dict:
+        """Pipeline `commands`, resending any left unacknowledged."""
+        responses: List[Optional[str]] = [None] * len(commands)
+        pending = list(range(len(commands)))
+        round_trips = 0
+        while pending and round_trips <= self.device_retries:
+            round_trips += 1
+            replies = self._send([commands[i] for i in pending])
+            for i, reply in zip(pending, replies):
+                responses[i] = reply
+            # Resume from the first unacknowledged command — the firmware
+            # applies commands in order, so everything after it is resent too
+            first_bad = next((n for n, i in enumerate(pending)
+                              if not str(responses[i]).startswith("OK")), None)
+            pending = [] if first_bad is None else pending[first_bad:]
+            if pending:
+                logger.warning("Results: ESP32 left %d command(s) unacknowledged (%s)",
+                               len(pending), responses[pending[0]])
+        return {
+            "ok": not pending,
+            "round_trips": round_trips,
+            "commands": [{"command": c, "response": r} for c, r in zip(commands, responses)],
+        }
+
+    # -----------------------------------------------------------------
+    # Transaction
+    # -----------------------------------------------------------------
+
+    def commit(self, win, place, show) -> dict:
+        """
+        Validate and apply results everywhere, or nowhere.
+
+        Returns:
+            {"success", "results", "steps": [{step, ok, ms, ...}],
+             "rolled_back", "total_ms"} — "replayed": True when these results
+            were already committed.
+
+        Raises:
+            ValueError: If win/place/show are invalid (nothing is touched).
+        """
+        win, place, show = validate_results(win, place, show, self.num_cups)
+        picks = {"win": win, "place": place, "show": show}
+
+        with self._lock:
+            last = self.last
+            if last is not None and last["success"] and last["results"] == picks:
+                self.replays += 1
+                return {**last, "replayed": True}
+
+            start = time.perf_counter()
+            steps: List[dict] = []
+            undo: List[Tuple[str, Callable]] = []
+            failed = None
+
+            def run(name, fn):
+                t0 = time.perf_counter()
+                try:
+                    detail = fn()
+                    ok = detail.pop("ok", True) if isinstance(detail, dict) else True
+                except Exception as exc:
+                    logger.error("Results step '%s' failed: %s", name, exc)
+                    detail, ok = {"error": str(exc)}, False
+                entry = {"step": name, "ok": ok,
+                         "ms": round((time.perf_counter() - t0) * 1000.0, 2)}
+                if isinstance(detail, dict):
+                    entry.update(detail)
+                steps.append(entry)
+                return ok
+
+            # 1. Mantle
+            if self.esp32_client is not None:
+                # Even a partial sequence may have locked cups — always undoable
+                undo.append(("devices", lambda: self._send([ROLLBACK_COMMAND])))
+                if not run("devices", lambda: self._run_devices(device_commands(win, place, show))):
+                    failed = "devices"
+
+            # 2. Results store
+            if failed is None and self.save_results is not None:
+                previous = self.load_results() if self.load_results is not None else None
+
+                def save():
+                    if self.save_results(win, place, show) is False:
+                        raise RuntimeError("could not write results")
+
+                if run("store", save):
+                    if self.restore_results is not None:
+                        undo.append(("store", lambda: self.restore_results(previous)))
+                else:
+                    failed = "store"
+
+            # 3. Racing service
+            svc = self.get_racing_service() if self.get_racing_service is not None else None
+            if failed is None and svc is not None:
+                before = svc.get_state()
+
+                def restore_winners():
+                    if before.get("win") is not None:
+                        svc.set_winners(before["win"], before["place"], before["show"])
+                    else:
+                        svc.clear_results()
+
+                if run("racing", lambda: svc.set_winners(win, place, show)):
+                    undo.append(("racing", restore_winners))
+                else:
+                    failed = "racing"
+
+            # 4. Hooks — after the first success there is no going back
+            settled_by = None
+            for name, fn in self.hooks:
+                if failed is not None:
+                    break
+                if run(name, lambda fn=fn: {"result": fn(win, place, show)}):
+                    settled_by = settled_by or name
+                elif settled_by is None:
+                    failed = name
+                else:
+                    logger.error("Results hook '%s' failed after '%s' applied — "
+                                 "reported, results stand", name, settled_by)
+
+            # Roll back whatever was applied, newest first
+            rolled_back = []
+            if failed is not None:
+                self.rollbacks += 1
+                for name, fn in reversed(undo):
+                    try:
+                        fn()
+                        rolled_back.append(name)
+                    except Exception as exc:
+                        logger.error("Results rollback of '%s' failed: %s", name, exc)
+                logger.warning("Results %d-%d-%d rolled back (failed at '%s')",
+                               win, place, show, failed)
+            else:
+                # 5. Announce — failures are reported but don't undo anything
+                for name, fn in self.announce:
+                    run(name, lambda fn=fn: {"result": fn(win, place, show)})
+                self.commits += 1
+                logger.info("Results %d-%d-%d committed in %.1f ms", win, place, show,
+                            (time.perf_counter() - start) * 1000.0)
+
+            outcome = {
+                "success": failed is None,
+                "results": picks,
+                "failed_step": failed,
+                "rolled_back": rolled_back,
+                "steps": steps,
+                "total_ms": round((time.perf_counter() - start) * 1000.0, 2),
+            }
+            self.last = outcome
+            return outcome
+
+    def stats(self) -> dict:
+        return {
+            "commits": self.commits,
+            "rollbacks": self.rollbacks,
+            "replays": self.replays,
+            "last": self.last,
+        }
@@ -0,0 +1,273 @@
+# scheduler.py - Timer-heap scheduler with an injectable clock
+#
+# Runs every timed racing job (auto-progression state advances, odds drift
+# ticks) from ONE daemon thread at exact deadlines instead of a polling
+# thread per job. The clock is pluggable:
+#
+#   SystemClock   — wall-clock seconds (production)
+#   ScaledClock   — runs N× faster than real time (rehearsal / demo mode)
+#   VirtualClock  — only moves when advance() is called (tests)
+#
+# With a VirtualClock no thread is started at all; Scheduler.advance() steps
+# through due timers in deadline order, so a full race lifecycle runs in
+# milliseconds.
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Clocks
+# =============================================================================
+
+class SystemClock:
+    """Wall-clock time in seconds since the epoch."""
+
+    def now(self) -> float:
+        return time.time()
+
+    def to_real(self, seconds: float) -> Optional[float]:
+        """Real seconds the scheduler thread should wait for `seconds` of clock time."""
+        return seconds
+
+
+class ScaledClock:
+    """
+    Clock that runs `factor` times faster than real time.
+
+    Starts at the current wall time (or `start`) so timestamps stay
+    meaningful when shown next to real ones.
+    """
+
+    def __init__(self, factor: float, start: Optional[float] = None):
+        if factor <= 0:
+            raise ValueError("factor must be positive")
+        self.factor = float(factor)
+        self._origin = time.time() if start is None else float(start)
+        self._origin_real = time.monotonic()
+
+    def now(self) -> float:
+        return self._origin + (time.monotonic() - self._origin_real) * self.factor
+
+    def to_real(self, seconds: float) -> Optional[float]:
+        return seconds / self.factor
+
+
+class VirtualClock:
+    """Manually driven clock for tests. Time never moves on its own."""
+
+    def __init__(self, start: float = 0.0):
+        self._now = float(start)
+
+    def now(self) -> float:
+        return self._now
+
+    def to_real(self, seconds: float) -> Optional[float]:
+        return None
+
+    def set(self, t: float) -> None:
+        if t < self._now:
+            raise ValueError("VirtualClock cannot move backwards")
+        self._now = float(t)
+
+
+# =============================================================================
+# Timers
+# =============================================================================
+
+class Timer:
+    """Handle for a scheduled call. Cancel with Scheduler.cancel(timer)."""
+
+    __slots__ = ("deadline", "seq", "fn", "args", "cancelled")
+
+    def __init__(self, deadline: float, seq: int, fn: Callable, args: tuple):
+        self.deadline = deadline
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other: "Timer") -> bool:
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
+class Scheduler:
+    """
+    Single-thread timer heap.
+
+    call_at()/call_later() push a Timer onto a heap; the worker thread sleeps
+    until the earliest deadline (woken early when a sooner timer is added)
+    and runs callbacks outside the lock. Cancelled timers are dropped lazily
+    when they reach the top of the heap.
+
+    Args:
+        clock: SystemClock (default), ScaledClock, or VirtualClock.
+        name: Worker thread name.
+    """
+
+    def __init__(self, clock=None, name: str = "RaceScheduler"):
+        self.clock = clock if clock is not None else SystemClock()
+        self.name = name
+
+        self._heap: List[Timer] = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+        # Monitoring
+        self._fired = 0
+        self._max_lateness = 0.0
+
+    # -----------------------------------------------------------------
+    # Scheduling
+    # -----------------------------------------------------------------
+
+    def now(self) -> float:
+        """Current time on the scheduler's clock."""
+        return self.clock.now()
+
+    def call_at(self, deadline: float, fn: Callable, *args) -> Timer:
+        """Run fn(*args) at `deadline` (clock seconds). Returns the Timer handle."""
+        timer = Timer(float(deadline), next(self._seq), fn, args)
+        with self._cv:
+            heapq.heappush(self._heap, timer)
+            # Only wake the worker if this timer is now the earliest
+            if self._heap[0] is timer:
+                self._cv.notify()
+        self._ensure_started()
+        return timer
+
+    def call_later(self, delay: float, fn: Callable, *args) -> Timer:
+        """Run fn(*args) `delay` clock-seconds from now."""
+        return self.call_at(self.clock.now() + max(0.0, delay), fn, *args)
+
+    def cancel(self, timer: Optional[Timer]) -> None:
+        """Cancel a pending timer. Safe to call with None or an already-fired timer."""
+        if timer is not None:
+            timer.cancelled = True
+
+    def pending(self) -> int:
+        """Number of live (non-cancelled) timers."""
+        with self._cv:
+            return sum(1 for t in self._heap if not t.cancelled)
+
+    def stats(self) -> dict:
+        """Return timer counts and worst observed lateness (ms)."""
+        return {
+            "pending": self.pending(),
+            "fired": self._fired,
+            "max_lateness_ms": round(self._max_lateness * 1000.0, 3),
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+    # -----------------------------------------------------------------
+    # Execution
+    # -----------------------------------------------------------------
+
+    def _pop_due(self, now: float) -> Optional[Timer]:
+        """Pop the earliest due, non-cancelled timer (caller holds the lock)."""
+        while self._heap:
+            head = self._heap[0]
+            if head.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if head.deadline <= now:
+                return heapq.heappop(self._heap)
+            return None
+        return None
+
+    def _fire(self, timer: Timer, now: float) -> None:
+        self._fired += 1
+        lateness = now - timer.deadline
+        if lateness > self._max_lateness:
+            self._max_lateness = lateness
+        try:
+            timer.fn(*timer.args)
+        except Exception:
+            logger.exception("Scheduled job %r failed", timer.fn)
+
+    def run_due(self) -> int:
+        """Run every timer whose deadline has passed. Returns the number run."""
+        ran = 0
+        while True:
+            now = self.clock.now()
+            with self._cv:
+                timer = self._pop_due(now)
+            if timer is None:
+                return ran
+            self._fire(timer, now)
+            ran += 1
+
+    def advance(self, seconds: float) -> int:
+        """
+        VirtualClock only: move time forward by `seconds`, stopping at each
+        deadline on the way so timers fire in order with the clock reading
+        exactly their deadline. Timers scheduled by callbacks inside the
+        window also fire. Returns the number of timers run.
+        """
+        if not isinstance(self.clock, VirtualClock):
+            raise RuntimeError("advance() requires a VirtualClock")
+        target = self.clock.now() + seconds
+        ran = 0
+        while True:
+            with self._cv:
+                while self._heap and self._heap[0].cancelled:
+                    heapq.heappop(self._heap)
+                next_deadline = self._heap[0].deadline if self._heap else None
+            if next_deadline is None or next_deadline > target:
+                break
+            if next_deadline > self.clock.now():
+                self.clock.set(next_deadline)
+            ran += self.run_due()
+        self.clock.set(target)
+        return ran
+
+    # -----------------------------------------------------------------
+    # Worker thread
+    # -----------------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if isinstance(self.clock, VirtualClock):
+            return  # tests drive time explicitly via advance()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cv:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        logger.info("Scheduler thread %s started", self.name)
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                timer = None
+                while not self._stopped:
+                    now = self.clock.now()
+                    timer = self._pop_due(now)
+                    if timer is not None:
+                        break
+                    if not self._heap:
+                        self._cv.wait()
+                    else:
+                        self._cv.wait(self.clock.to_real(self._heap[0].deadline - now))
+                if self._stopped:
+                    return
+            self._fire(timer, now)
+
+    def stop(self) -> None:
+        """Stop the worker thread. Pending timers are kept (restart resumes them)."""
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
@@ -0,0 +1,1123 @@
+# services/test_smoke.py - Racing service smoke test
+#
+# Run with: python -m services.test_smoke  (from the pi5/ dir)
+#
+# Verifies:
+#   - Scheduler fires timers in deadline order on a VirtualClock
+#   - Auto progression walks DORMANT → OFFICIAL at exact deadlines
+#   - Stop / manual override re-arm the timeline correctly
+#   - Odds drift ticks run only while betting is open
+#   - A race card runs many races on one scheduler, no extra threads
+#   - The RUNNING simulation streams frames and throttled LED levels
+#   - Journal + snapshot restore the exact prior race state quickly
+#   - Race-card importer streams CSV/JSON/JSONL into O(1) indexes
+#   - Results transaction pipelines the mantle and rolls back on failure
+#   - La Quiniela pools price every combination and push odds rate-bounded
+#   - Pool sales, scratches and settlements are rebuilt from the journal
+#   - /api/batch runs dashboard steps in order, stopping or continuing on error
+
+import io
+import os
+import sys
+import traceback
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    sys.stderr.reconfigure(encoding="utf-8", errors="replace")
+except (AttributeError, io.UnsupportedOperation):
+    pass
+
+# Make sure pi5/ is on sys.path when run directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.racing_data_service import (  # noqa: E402
+    RaceState, RacingDataService, STATE_DURATIONS, STATE_ORDER,
+)
+from services.scheduler import Scheduler, VirtualClock  # noqa: E402
+
+
+# -----------------------------------------------------------------------------
+# Tiny test runner (no pytest dependency)
+# -----------------------------------------------------------------------------
+
+_results = []
+
+
+def _check(name, condition, detail=""):
+    status = "PASS" if condition else "FAIL"
+    _results.append((status, name, detail))
+    marker = "[OK]" if condition else "[XX]"
+    print(f"  {marker} {name}" + (f"  -- {detail}" if detail and not condition else ""))
+    return condition
+
+
+def _run(name, fn):
+    print(f"\n=== {name} ===")
+    try:
+        fn()
+    except Exception as exc:
+        traceback.print_exc()
+        _check(f"{name} (uncaught exception)", False, str(exc))
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+
+class _StubSocketIO:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, payload, room=None):
+        self.events.append((event, payload))
+
+
+class _StubESP32:
+    def __init__(self):
+        self.commands = []
+
+    def send_command(self, command):
+        self.commands.append(command)
+        return "OK"
+
+
+def _make_service(start=1000.0):
+    clock = VirtualClock(start=start)
+    sched = Scheduler(clock=clock)
+    sio = _StubSocketIO()
+    esp = _StubESP32()
+    svc = RacingDataService(socketio=sio, use_mock=True, esp32_client=esp,
+                            scheduler=sched)
+    return svc, sched, sio, esp
+
+
+# -----------------------------------------------------------------------------
+# Tests
+# -----------------------------------------------------------------------------
+
+def test_scheduler_deadline_order():
+    clock = VirtualClock(start=0.0)
+    sched = Scheduler(clock=clock)
+    fired = []
+    sched.call_at(5.0, lambda: fired.append(("b", clock.now())))
+    sched.call_at(2.0, lambda: fired.append(("a", clock.now())))
+    cancelled = sched.call_at(3.0, lambda: fired.append(("x", clock.now())))
+    sched.cancel(cancelled)
+    # A callback that schedules a follow-up inside the same advance window
+    sched.call_at(4.0, lambda: sched.call_later(0.5, lambda: fired.append(("c", clock.now()))))
+
+    ran = sched.advance(10.0)
+    _check("timers fire in deadline order, cancelled one skipped",
+           [f[0] for f in fired] == ["a", "c", "b"], f"got {fired}")
+    _check("clock reads each timer's exact deadline",
+           [f[1] for f in fired] == [2.0, 4.5, 5.0], f"got {fired}")
+    _check("advance() returns number of timers run", ran == 4, f"ran={ran}")
+    _check("clock lands on advance target", clock.now() == 10.0)
+    _check("no pending timers left", sched.pending() == 0)
+
+
+def test_full_lifecycle_virtual_time():
+    svc, sched, sio, esp = _make_service(start=1000.0)
+    svc.set_mode("auto")
+    sched.advance(0)
+    _check("auto start leaves DORMANT immediately",
+           svc.current_state == RaceState.ENTRIES_LOADED,
+           f"state={svc.current_state}")
+
+    total = sum(STATE_DURATIONS.values())
+    stamps = []
+    t = 1000.0
+    for prev, state in zip(STATE_ORDER[1:-1], STATE_ORDER[2:]):
+        t += STATE_DURATIONS[prev]
+        stamps.append((state, t))
+
+    seen = []
+    for state, expected_at in stamps:
+        sched.advance(expected_at - sched.now())
+        seen.append((svc.current_state, svc.state_changed_at))
+
+    _check("every state reached in order",
+           [s for s, _ in seen] == [s for s, _ in stamps], f"got {seen}")
+    _check("each state stamped at its exact deadline",
+           [a for _, a in seen] == [a for _, a in stamps], f"got {seen}")
+    _check("lifecycle spans sum(STATE_DURATIONS)",
+           svc.state_changed_at - 1000.0 == total)
+
+    sched.advance(3600)
+    _check("OFFICIAL has no timer — stays put",
+           svc.current_state == RaceState.OFFICIAL)
+    state_events = [e for e in sio.events if e[0] == "race_state_change"]
+    _check("one race_state_change per transition", len(state_events) == 7,
+           f"got {len(state_events)}")
+    _check("LED command sent for RUNNING", "ANIM:RACE_START" in esp.commands)
+
+
+def test_stop_cancels_timers():
+    svc, sched, sio, esp = _make_service()
+    svc.set_mode("auto")
+    sched.advance(5)
+    svc.set_mode("manual")
+    before = svc.current_state
+    sched.advance(600)
+    _check("no advances after stop", svc.current_state == before,
+           f"state={svc.current_state}")
+    _check("stop leaves no live timers", sched.pending() == 0,
+           f"pending={sched.pending()}")
+
+
+def test_manual_override_rearms():
+    svc, sched, sio, esp = _make_service(start=0.0)
+    svc.set_mode("auto")
+    sched.advance(10)                      # ENTRIES_LOADED since t=0
+    svc.set_state(RaceState.AT_THE_POST)   # override at t=10
+    sched.advance(STATE_DURATIONS[RaceState.AT_THE_POST] - 0.001)
+    _check("override state holds until its own duration elapses",
+           svc.current_state == RaceState.AT_THE_POST)
+    sched.advance(0.001)
+    _check("advance re-armed from override time",
+           svc.current_state == RaceState.RUNNING
+           and svc.state_changed_at == 10 + STATE_DURATIONS[RaceState.AT_THE_POST],
+           f"state={svc.current_state} at={svc.state_changed_at}")
+
+
+def test_drift_only_while_betting():
+    svc, sched, sio, esp = _make_service(start=0.0)
+    svc.set_mode("auto")
+    sched.advance(STATE_DURATIONS[RaceState.ENTRIES_LOADED] - 1)
+    drift_before = sum(1 for e in sio.events if e[0] == "odds_update")
+    _check("no odds drift during ENTRIES_LOADED", drift_before == 0,
+           f"got {drift_before}")
+    sched.advance(STATE_DURATIONS[RaceState.BETTING_OPEN])
+    drift_during = sum(1 for e in sio.events if e[0] == "odds_update")
+    _check("odds drift ticks every 3–6 s while BETTING_OPEN",
+           10 <= drift_during <= 21, f"got {drift_during}")
+
+
+def test_scaled_clock_real_thread():
+    """The threaded path: a 1000x clock runs the 150 s lifecycle in ~0.15 s."""
+    import time
+    from services.scheduler import ScaledClock
+    sched = Scheduler(clock=ScaledClock(1000.0))
+    svc = RacingDataService(socketio=None, use_mock=True, scheduler=sched)
+    svc.set_mode("auto")
+    deadline = time.monotonic() + 5.0
+    while svc.current_state != RaceState.OFFICIAL and time.monotonic() < deadline:
+        time.sleep(0.01)
+    _check("scaled clock reaches OFFICIAL on the scheduler thread",
+           svc.current_state == RaceState.OFFICIAL, f"state={svc.current_state}")
+    svc.stop_auto_progression()
+    sched.stop()
+
+
+def test_odds_engine_deltas_and_reversion():
+    from services.odds_engine import OddsEngine, MIN_ODDS
+    engine = OddsEngine(list(range(1, 201)), [5.0] * 200, current=[40.0] * 200, seed=1)
+    for _ in range(60):
+        engine.step()
+    _check("mean reversion pulls a 200-horse field back toward ML",
+           3.0 < float(engine.current.mean()) < 8.0,
+           f"mean={engine.current.mean():.2f}")
+    _check("odds never below MIN_ODDS", float(engine.current.min()) >= MIN_ODDS)
+
+    quiet = OddsEngine([1, 2, 3], [2.0, 4.0, 8.0], volatility=[0.0, 0.0, 0.0],
+                       reversion=0.0, seed=1)
+    _check("no movement → no changed positions", quiet.step().size == 0)
+
+
+def test_drift_broadcasts_only_changes():
+    import numpy as np
+
+    svc, sched, sio, esp = _make_service()
+    svc._odds._rng = np.random.default_rng(27)   # a draw too small to show is possible
+    svc._odds.volatility[:] = 0.0
+    svc._odds.reversion = 0.0
+    svc._odds.volatility[4] = 0.2          # only post position 5 can move
+    deltas = svc.drift_odds()
+    _check("drift returns only the horse that moved",
+           [d["post_position"] for d in deltas] == [5], f"got {deltas}")
+    payload = [e[1] for e in sio.events if e[0] == "odds_update"][-1]
+    _check("odds_update carries delta rows, not the full field",
+           len(payload["horses"]) == 1
+           and set(payload["horses"][0]) == {"post_position", "current_odds"})
+    _check("horse record updated to displayed odds",
+           svc.get_horse(5)["current_odds"] == deltas[0]["current_odds"])
+
+    svc._odds.volatility[:] = 0.0
+    sio.events.clear()
+    svc.drift_odds()
+    _check("no odds_update emitted when nothing changed",
+           not any(e[0] == "odds_update" for e in sio.events))
+
+
+def test_horse_snapshots_copy_on_write():
+    import dataclasses
+    svc, sched, sio, esp = _make_service()
+    v0 = svc.horses_version
+    first = svc.get_horses()
+    _check("repeat reads return the cached list object",
+           svc.get_horses() is first and svc.get_horse(3) is first[2])
+    try:
+        svc.horses[1].current_odds = 99.0
+        frozen = False
+    except dataclasses.FrozenInstanceError:
+        frozen = True
+    _check("DerbyHorse is immutable", frozen)
+    try:
+        svc.horses[1] = None
+        read_only = False
+    except TypeError:
+        read_only = True
+    _check("horses mapping is read-only", read_only)
+
+    svc.set_winners(4, 9, 1)
+    after = svc.get_horses()
+    _check("set_winners publishes a new snapshot version",
+           svc.horses_version == v0 + 1 and after is not first)
+    _check("old snapshot list left untouched for in-flight readers",
+           all(h["finish_position"] is None for h in first))
+    _check("new snapshot carries finish positions",
+           svc.get_horse(4)["finish_position"] == 1
+           and svc.get_horse(9)["finish_position"] == 2
+           and svc.get_horse(1)["finish_position"] == 3)
+
+    svc.clear_results()
+    v_cleared = svc.horses_version
+    svc.clear_results()
+    _check("clearing already-clear results doesn't bump the version",
+           svc.horses_version == v_cleared)
+
+
+def test_get_state_uses_clock():
+    svc, sched, sio, esp = _make_service(start=500.0)
+    svc.set_state(RaceState.BETTING_OPEN)
+    sched.advance(12.5)
+    info = svc.get_state()
+    _check("elapsed reads the injected clock", info["elapsed_seconds"] == 12.5,
+           f"got {info['elapsed_seconds']}")
+    _check("remaining = duration - elapsed",
+           info["remaining_seconds"] == STATE_DURATIONS[RaceState.BETTING_OPEN] - 12.5)
+
+
+def test_race_card_shared_scheduler():
+    import threading
+    from services.race_card import RaceCardManager
+
+    clock = VirtualClock(start=0.0)
+    sched = Scheduler(clock=clock)
+    sio = _StubSocketIO()
+    esp = _StubESP32()
+    card = RaceCardManager(socketio=sio, esp32_client=esp, scheduler=sched)
+
+    threads_before = threading.active_count()
+    ids = ["derby"] + [f"heat-{i}" for i in range(1, 8)]
+    for race_id in ids:
+        card.add_race(race_id, race_id.title())
+    _check("first race is featured", card.featured_id == "derby")
+    _check("only the featured race holds the ESP32 client",
+           [svc.race_id for svc in card if svc.esp32_client is not None] == ["derby"])
+
+    for i, svc in enumerate(card):
+        sched.call_later(i * 7.0, svc.set_mode, "auto")
+    sched.advance(sum(STATE_DURATIONS.values()) + 8 * 7.0 + 1)
+
+    _check("every race reached OFFICIAL",
+           all(svc.current_state == RaceState.OFFICIAL for svc in card),
+           str([svc.current_state.value for svc in card]))
+    _check("no threads added per race (virtual clock)",
+           threading.active_count() == threads_before)
+
+    tagged = {p.get("race_id") for ev, p in sio.events if ev == "race_state_change"}
+    _check("state changes tagged with every race_id", tagged == set(ids))
+    _check("ESP32 saw only the featured race's transitions",
+           esp.commands.count("ANIM:RACE_START") == 1)
+
+    card.get("heat-3").set_winners(1, 2, 3)
+    _check("results are per race",
+           card.get("heat-3").get_state()["win"] == 1 and card.get()._win is None)
+
+    card.set_featured("heat-3")
+    _check("featuring a race moves the ESP32 client",
+           card.get("heat-3").esp32_client is esp and card.get("derby").esp32_client is None)
+
+    bad = []
+    for race_id in ("derby", "state", "Bad ID"):
+        try:
+            card.add_race(race_id)
+        except ValueError:
+            bad.append(race_id)
+    _check("duplicate, reserved and malformed IDs rejected", len(bad) == 3)
+    _check("summary lists every race", [r["race_id"] for r in card.summary()] == ids)
+
+    # Removing a race mid-run stops its sim along with its other timers
+    heat = card.get("heat-5")
+    heat.set_state(RaceState.RUNNING)
+    sched.advance(1.0)
+    card.remove_race("heat-5")
+    before = len(sio.events)
+    sched.advance(5.0)
+    _check("removed race stops streaming frames",
+           not any(ev == "race_positions" and p.get("race_id") == "heat-5"
+                   for ev, p in sio.events[before:]) and "heat-5" not in card)
+
+
+def test_race_card_routes():
+    try:
+        from flask import Flask
+    except ImportError:
+        print("  (flask not installed — skipped)")
+        return
+    from routes import racing_routes
+
+    app = Flask(__name__)
+    racing_routes.init_racing_service(
+        socketio=_StubSocketIO(), clock=VirtualClock(start=0.0),
+        races=[("derby", "Derby de Mayo"), ("juvenile", "Juvenile Sprint")],
+    )
+    app.register_blueprint(racing_routes.racing_bp)
+    client = app.test_client()
+
+    card = client.get("/api/racing/card").get_json()
+    _check("GET /card lists both races",
+           [r["race_id"] for r in card["races"]] == ["derby", "juvenile"])
+
+    resp = client.post("/api/racing/juvenile/state", json={"state": "betting"})
+    _check("POST /<race_id>/state targets that race",
+           resp.status_code == 200 and resp.get_json()["race_id"] == "juvenile")
+    legacy = client.get("/api/racing/state").get_json()
+    _check("un-prefixed routes still address the featured race",
+           legacy["race_id"] == "derby" and legacy["state"] == "DORMANT")
+    _check("GET /<race_id>/horses works",
+           client.get("/api/racing/juvenile/horses").get_json()["count"] == 20)
+    _check("unknown race is a 404",
+           client.get("/api/racing/nope/state").status_code == 404)
+
+
+def test_race_sim_finish_consistent():
+    from services.race_sim import RaceSimulation, decode_frame
+
+    posts = list(range(1, 21))
+    sim = RaceSimulation(posts, [3.0] * 20, finish_order=[7, 3, 12], duration=10.0, seed=1)
+    prev = sim.progress.copy()
+    monotonic = True
+    frame = b""
+    for _ in range(100):
+        sim.step(0.1)
+        monotonic = monotonic and bool((sim.progress >= prev).all())
+        prev = sim.progress.copy()
+        frame = sim.encode_frame()
+    _check("every horse finishes within the race duration", sim.done)
+    _check("declared results lead the finish order", sim.finish_order()[:3] == [7, 3, 12])
+    _check("progress never goes backwards", monotonic)
+    decoded = decode_frame(frame)
+    _check("binary frame is 9 + 3n bytes", len(frame) == 9 + 3 * 20, f"got {len(frame)}")
+    _check("final frame flagged and ordered by finish",
+           decoded["final"] and decoded["order"] == sim.finish_order())
+    levels = sim.levels()
+    _check("brightness map has one byte per cup", len(levels) == 20)
+
+    undeclared = RaceSimulation(posts, [3.0] * 20, seed=2)
+    while not undeclared.done:
+        undeclared.step(0.1)
+    _check("undeclared race still produces a full finish order",
+           sorted(undeclared.finish_order()) == posts)
+
+    live = RaceSimulation(posts, [3.0] * 20, seed=3)
+    live.step(0.1)
+    live.set_live({5: 0.5, 9: 0.4})
+    live.step(0.1)
+    order = live.posts[live.running_order()][:2].tolist()
+    _check("live positions override the model", order == [5, 9], str(order))
+
+
+def test_running_streams_frames():
+    from services.race_sim import decode_frame
+
+    svc, sched, sio, esp = _make_service(start=0.0)
+    svc.set_winners(4, 9, 1)  # declared up front → the sim must match it
+    svc.set_state(RaceState.RUNNING)
+    sched.advance(STATE_DURATIONS[RaceState.RUNNING])
+
+    frames = [p for ev, p in sio.events if ev == "race_positions"]
+    _check("~10 Hz frames while running", 90 <= len(frames) <= 100, f"got {len(frames)}")
+    last = decode_frame(frames[-1]["frame"])
+    _check("stream ends on the declared finish", last["final"] and last["order"][:3] == [4, 9, 1])
+
+    levels = [c for c in esp.commands if c.startswith("RACE:LEVELS:")]
+    _check("LED levels sent to the mantle", len(levels) > 0)
+    _check("LED levels throttled well below the tick rate",
+           len(levels) <= STATE_DURATIONS[RaceState.RUNNING] / 0.25 + 2, f"got {len(levels)}")
+    _check("final LED map delivered",
+           levels[-1] == "RACE:LEVELS:" + svc._sim.levels().hex().upper())
+
+    stats = svc.get_sim_stats()
+    _check("sim stats report zero lateness on a virtual clock",
+           stats["max_tick_lateness_ms"] == 0.0 and stats["ticks"] == len(frames))
+
+    svc.set_state(RaceState.FINISHED)
+    before = len(sio.events)
+    sched.advance(5.0)
+    _check("no frames after leaving RUNNING",
+           not any(ev == "race_positions" for ev, _ in sio.events[before:]))
+
+
+def test_journal_recovery():
+    import tempfile
+    from services.race_journal import RaceJournal
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clock = VirtualClock(start=10_000.0)
+        sched = Scheduler(clock=clock)
+        svc = RacingDataService(socketio=_StubSocketIO(), scheduler=sched,
+                                journal=RaceJournal(tmp, "derby", snapshot_every=50))
+        svc.set_mode("auto")
+        at_post = sum(STATE_DURATIONS[s] for s in STATE_ORDER[1:4])
+        sched.advance(at_post + 4.0)
+        _check("original reached AT_THE_POST", svc.current_state == RaceState.AT_THE_POST)
+        for _ in range(200):
+            svc.drift_odds()
+        horses_before = svc.get_horses()
+        state_before = svc.get_state()
+        _check("snapshots taken as the journal grows", svc.journal.snapshots_written > 0)
+
+        # "Crash": abandon the service mid-phase (its scheduler never runs
+        # again) and start a new one on the same files
+        svc.journal.close()
+        with open(os.path.join(tmp, "derby.jsonl"), "a") as fh:
+            fh.write('{"n": 99999, "t": "sta')  # torn final write
+
+        sched2 = Scheduler(clock=clock)
+        svc2 = RacingDataService(socketio=_StubSocketIO(), scheduler=sched2,
+                                 journal=RaceJournal(tmp, "derby", snapshot_every=50))
+        _check("same horses and odds after restart", svc2.get_horses() == horses_before)
+        info = svc2.get_state()
+        _check("same state, mode and phase timing",
+               info["state"] == state_before["state"] and info["mode"] == "auto"
+               and info["remaining_seconds"] == state_before["remaining_seconds"],
+               f"{info} vs {state_before}")
+        recovery = svc2.get_journal_stats()["last_recovery"]
+        _check("recovery under 300 ms", recovery["recovery_ms"] < 300, str(recovery))
+
+        deadline = state_before["remaining_seconds"]
+        sched2.advance(deadline)
+        _check("auto progression resumes at the original deadline",
+               svc2.current_state == RaceState.RUNNING
+               and svc2.state_changed_at == 10_000.0 + at_post + STATE_DURATIONS[RaceState.AT_THE_POST])
+
+        svc2.set_winners(3, 1, 2)
+        svc2.stop_auto_progression()
+        svc2.journal.close()
+        svc3 = RacingDataService(scheduler=Scheduler(clock=clock),
+                                 journal=RaceJournal(tmp, "derby"))
+        _check("results survive a restart",
+               svc3.get_state()["win"] == 3 and svc3.get_horse(1)["finish_position"] == 2)
+        svc3.journal.close()
+
+        # A record appended by another thread while a snapshot is being
+        # taken lands after it (seq above the snapshot's), not inside it
+        import threading
+        import time
+        from services import race_journal
+
+        journal = RaceJournal(os.path.join(tmp, "race"), "race")
+        journal.append(race_journal.STATE, state="RUNNING", at=1.0)
+        writer = threading.Thread(target=journal.append, args=(race_journal.RESULTS,),
+                                  kwargs={"win": 1, "place": 2, "show": 3})
+
+        def state_fn():
+            writer.start()
+            time.sleep(0.05)           # the writer is waiting on the journal
+            return {**race_journal.empty_state(), "state": "RUNNING"}
+
+        journal.write_snapshot(state_fn)
+        writer.join()
+        journal.close()
+        state = RaceJournal(os.path.join(tmp, "race"), "race").load()
+        _check("record appended during a snapshot survives recovery",
+               state["state"] == "RUNNING" and state["win"] == 1, str(state))
+
+
+class _ChunkOnlyReader(io.TextIOBase):
+    """Text stream that refuses whole-file reads and tracks the largest read."""
+
+    def __init__(self, text):
+        self._buf = io.StringIO(text)
+        self.max_read = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            raise AssertionError("importer tried to read the whole file")
+        self.max_read = max(self.max_read, size)
+        return self._buf.read(size)
+
+    def readline(self, size=-1):
+        return self._buf.readline(size)
+
+
+def test_card_importer():
+    import json
+    from services.card_importer import import_card
+
+    races = []
+    for r in range(1, 31):
+        races.append({"race_id": f"heat-{r}", "race_name": f"Heat {r}", "horses": [
+            {"post": p, "horse": f"Runner {r}-{p}", "jockey": f"Rider {p}", "ml": f"{p}-1"}
+            for p in range(1, 21)
+        ]})
+    races[0]["horses"].append({"post": 5, "horse": "Duplicate"})
+    races[1]["horses"].append({"post": 21, "horse": "Off The Mantle"})
+    text = json.dumps({"event": "DDM", "races": races})
+
+    reader = _ChunkOnlyReader(text)
+    index, report = import_card(reader, fmt="json")
+    _check("600 entries across 30 races imported",
+           report["imported"] == 600 and len(index.races) == 30, str(report)[:200])
+    _check("bad rows rejected with row-level errors",
+           report["rejected"] == 2 and len(report["errors"]) == 2)
+    _check("streamed in bounded chunks (never read whole file)",
+           0 < reader.max_read <= 64 * 1024)
+    _check("race context carried into nested entries",
+           index.get("heat-7", 3).horse_name == "Runner 7-3")
+    _check("horse lookup is case/punctuation-insensitive",
+           [e.post_position for e in index.find_horse("RUNNER 12 4")] == [4])
+    _check("jockey lookup spans races", len(index.find_jockey("rider 1")) == 30)
+    _check("morning lines normalised", index.get("heat-1", 5).morning_line_odds == "5/1")
+
+    csv_text = ("Race,PP,Horse,Jockey,Trainer,ML\n"
+                "Derby,1,Sovereignty,J. Velazquez,B. Baffert,5-2\n"
+                "Derby,2,Café Olé,F. Prat,T. Pletcher,3.5\n"
+                "Derby,x,Nope,,,\n")
+    index, report = import_card(io.StringIO(csv_text), fmt="csv")
+    _check("CSV with header aliases", report["imported"] == 2 and report["rejected"] == 1)
+    _check("accents folded for lookup", index.find_horse("cafe ole")[0].morning_line_odds == "7/2")
+
+    svc, sched, sio, esp = _make_service()
+    svc.load_entries(index.entries("derby"))
+    _check("service populates from imported entries",
+           [h["horse_name"] for h in svc.get_horses()] == ["Sovereignty", "Café Olé"]
+           and svc.get_horse(1)["current_odds"] == 2.5)
+
+
+class _FakeMantle:
+    """Records batches; `drop_after` answers only that many per batch."""
+
+    def __init__(self, drop_after=None, fail_always=False):
+        self.batches = []
+        self.drop_after = drop_after
+        self.fail_always = fail_always
+
+    def send_batch(self, commands):
+        self.batches.append(list(commands))
+        if self.fail_always:
+            return ["ERROR:TIMEOUT"] * len(commands)
+        n = len(commands) if self.drop_after is None else self.drop_after
+        self.drop_after = None
+        return [f"OK:{c}" for c in commands[:n]] + ["ERROR:NO_RESPONSE"] * (len(commands) - n)
+
+
+def test_results_transaction():
+    import socket
+    import threading
+    from communication.esp32_client import ESP32Client
+    from services.results_txn import ROLLBACK_COMMAND, ResultsTransaction, device_commands
+
+    svc, _sched, _sio, _esp = _make_service()
+    store = {"results": None}
+    told = []
+
+    def make_txn(mantle, hooks=()):
+        return ResultsTransaction(
+            esp32_client=mantle,
+            get_racing_service=lambda: svc,
+            load_results=lambda: store["results"],
+            save_results=lambda w, p, s: store.update(results={"win": w, "place": p, "show": s}),
+            restore_results=lambda prev: store.update(results=prev),
+            hooks=hooks,
+            announce=[("tote", lambda w, p, s: told.append((w, p, s)))],
+        )
+
+    # Happy path: one pipelined batch, everything updated, timed
+    mantle = _FakeMantle()
+    txn = make_txn(mantle)
+    out = txn.commit(7, "3", 12)
+    _check("commit succeeds", out["success"], str(out))
+    _check("one pipelined batch with every mantle command",
+           mantle.batches == [device_commands(7, 3, 12)])
+    _check("store, racing service and tote updated",
+           store["results"] == {"win": 7, "place": 3, "show": 12}
+           and svc.get_state()["win"] == 7 and told == [(7, 3, 12)])
+    _check("per-step and total timing reported",
+           [st["step"] for st in out["steps"]] == ["devices", "store", "racing", "tote"]
+           and all("ms" in st for st in out["steps"]) and out["total_ms"] >= 0)
+
+    # Lost response → tablet retries → no second run
+    again = txn.commit(7, 3, 12)
+    _check("identical resubmit is replayed, not re-run",
+           again.get("replayed") and len(mantle.batches) == 1 and told == [(7, 3, 12)])
+
+    # Validation happens once, before anything is touched
+    for bad in ((7, 7, 3), (0, 1, 2), ("x", 1, 2)):
+        try:
+            txn.commit(*bad)
+            _check(f"invalid results {bad} rejected", False)
+        except ValueError:
+            pass
+    _check("invalid results rejected without device traffic", len(mantle.batches) == 1)
+
+    # Partial pipeline: only the unacknowledged tail is resent
+    txn.reset()
+    mantle = _FakeMantle(drop_after=2)
+    txn = make_txn(mantle)
+    out = txn.commit(1, 2, 3)
+    cmds = device_commands(1, 2, 3)
+    _check("device step resumes from the first unacknowledged command",
+           out["success"] and mantle.batches == [cmds, cmds[2:]]
+           and out["steps"][0]["round_trips"] == 2, str(mantle.batches))
+
+    # Mantle unreachable: nothing committed, cups unlocked
+    store["results"] = None
+    svc.clear_results()
+    mantle = _FakeMantle(fail_always=True)
+    out = make_txn(mantle).commit(4, 5, 6)
+    _check("unreachable mantle fails at devices and unlocks cups",
+           not out["success"] and out["failed_step"] == "devices"
+           and mantle.batches[-1] == [ROLLBACK_COMMAND])
+    _check("nothing else touched after device failure",
+           store["results"] is None and svc.get_state()["win"] is None)
+
+    # A failing hook rolls back the store and racing service
+    svc.set_winners(9, 8, 7)
+    store["results"] = {"win": 9, "place": 8, "show": 7}
+
+    def broken_hook(w, p, s):
+        raise RuntimeError("auction DB locked")
+
+    mantle = _FakeMantle()
+    out = make_txn(mantle, hooks=[("la_subasta", broken_hook)]).commit(4, 5, 6)
+    _check("hook failure rolls back racing, store and devices",
+           not out["success"] and out["rolled_back"] == ["racing", "store", "devices"])
+    _check("previous results restored everywhere",
+           store["results"] == {"win": 9, "place": 8, "show": 7}
+           and svc.get_state()["win"] == 9 and svc.get_horse(9)["finish_position"] == 1)
+
+    # Once an irreversible hook has run, a later hook failing can't undo it
+    auction = {"state": "LOCKED"}
+
+    def settle_hook(w, p, s):
+        auction["state"] = "SETTLED"
+        return "settled"
+
+    mantle = _FakeMantle()
+    told.clear()
+    out = make_txn(mantle, hooks=[("la_subasta", settle_hook),
+                                  ("quiniela", broken_hook)]).commit(4, 5, 6)
+    hook_steps = {st["step"]: st for st in out["steps"]}
+    _check("a hook failing after an irreversible hook is reported, not rolled back",
+           out["success"] and out["failed_step"] is None and out["rolled_back"] == []
+           and hook_steps["la_subasta"]["ok"] and not hook_steps["quiniela"]["ok"]
+           and hook_steps["quiniela"]["error"] == "auction DB locked", str(out))
+    _check("results stand everywhere with the settled hook",
+           auction["state"] == "SETTLED"
+           and store["results"] == {"win": 4, "place": 5, "show": 6}
+           and svc.get_state()["win"] == 4 and told == [(4, 5, 6)]
+           and ROLLBACK_COMMAND not in sum(mantle.batches, []))
+
+    # Real client against a local controller: pipelined and one-per-connection
+    def serve(server, pipelined):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                buf = b""
+                while True:
+                    chunk = conn.recv(1024)
+                    if not chunk:
+                        break
+                    buf += chunk
+                    while b"\n" in buf:
+                        line, buf = buf.split(b"\n", 1)
+                        conn.sendall(b"OK:" + line + b"\r\n")
+                        if not pipelined:
+                            buf = b""
+                            break
+                    if not pipelined and chunk:
+                        break
+
+    for pipelined in (True, False):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen(4)
+        threading.Thread(target=serve, args=(server, pipelined), daemon=True).start()
+        client = ESP32Client(ip="127.0.0.1", port=server.getsockname()[1], timeout=2)
+        replies = client.send_batch(["A", "B", "C"])
+        server.close()
+        label = "pipelined firmware" if pipelined else "one-command firmware"
+        _check(f"send_batch answers every command ({label})",
+               replies == ["OK:A", "OK:B", "OK:C"], str(replies))
+
+
+def test_parimutuel_pools():
+    import itertools
+    import numpy as np
+    from services.parimutuel import ParimutuelPool
+
+    pool = ParimutuelPool(range(1, 21))
+    _check("6,840 ordered trifecta combinations for 20 horses",
+           pool.combinations == {"cups": 20, "exacta": 380, "trifecta": 6840})
+
+    # Cups: 100 tickets, 20 on #7, 40 on #3, 10 on #12, 30 on #5
+    pool.sell_counts("cups", {"7": 20, "3": 40, "12": 10, "5": 30})
+    pays = pool.will_pays("cups")
+    _check("cup will-pays split 70/20/10 of the pool",
+           pays[6].tolist() == [3.5, 1.0, 0.5] and pays[2].tolist() == [1.75, 0.5, 0.25],
+           str(pays[6]))
+    _check("cups nobody backed have no price", np.isnan(pays[0]).all())
+
+    rng = np.random.default_rng(49)
+    combos = [c for c in itertools.permutations(range(1, 21), 3)]
+    picks = [combos[i] for i in rng.integers(0, len(combos), 3000)]
+    pool.sell("trifecta", picks)
+    pool.sell("exacta", [(7, 3)] * 5 + [(3, 7)] * 15)
+
+    # Vectorized will-pays agree with the per-combination loop
+    tri = pool.will_pays("trifecta")
+    tally = {}
+    for c in picks:
+        tally[c] = tally.get(c, 0) + 1
+    worst = max(abs(tri[a - 1, b - 1, c - 1] - np.floor(3000 / n * 100 + 1e-6) / 100)
+                for (a, b, c), n in tally.items())
+    _check("trifecta will-pays match a per-combination loop",
+           worst < 1e-9 and np.isnan(tri).sum() == 8000 - len(tally), f"max diff {worst}")
+    try:
+        pool.sell("exacta", [(7, 7)])
+        repeated = False
+    except ValueError:
+        repeated = True
+    _check("a combination can't name a horse twice", repeated)
+
+    # Scratch #5: its 30 cup tickets and every exotic through it refunded
+    through5 = sum(n for c, n in tally.items() if 5 in c)
+    refunds = pool.scratch(5)
+    totals = pool.totals()
+    _check("scratch refunds every ticket on the horse",
+           refunds == {"cups": 30, "exacta": 0, "trifecta": through5}
+           and totals["cups"]["tickets"] == 70 and totals["trifecta"]["refunded"] == through5,
+           f"{refunds} / {totals}")
+    _check("cup prices re-computed without the scratched money",
+           pool.will_pays("cups")[6, 0] == 2.45 and np.isnan(pool.will_pays("cups")[4]).all())
+    try:
+        pool.sell("cups", [5])
+        blocked = False
+    except ValueError:
+        blocked = True
+    _check("no tickets on a scratched horse", blocked)
+
+    # Nobody holds #9, 2nd: its $14 goes 7:1 to win and show ($61.25 / $8.75)
+    result = pool.settle(7, 9, 12)
+    cups = result["pools"]["cups"]
+    _check("unclaimed place share goes to win and show pro rata",
+           cups["per_ticket"] == {"win": 3.06, "place": None, "show": 0.87}
+           and abs(cups["paid"] + cups["breakage"] - 70) < 1e-9, str(cups))
+    _check("exacta nobody hit is refunded",
+           result["pools"]["exacta"]["refund_all"] and result["pools"]["exacta"]["combo"] == "7-9")
+    try:
+        pool.sell("cups", [1])
+        frozen = False
+    except ValueError:
+        frozen = True
+    _check("settled pools take no more tickets", frozen)
+
+    small = ParimutuelPool(range(1, 5), takeout=0.10)
+    small.sell_counts("exacta", {"1-2": 3, "2-1": 1, "3-4": 6})
+    paid = small.settle(1, 2, 3)["pools"]["exacta"]
+    _check("exacta pays the net pool to the winning tickets after takeout",
+           paid["per_ticket"] == 3.0 and paid["winning_tickets"] == 3
+           and paid["net"] == 9.0, str(paid))
+
+
+def test_pool_routes_and_broadcast():
+    try:
+        from flask import Flask
+    except ImportError:
+        print("  (flask not installed — skipped)")
+        return
+    from routes import pool_routes, racing_routes
+
+    sio = _StubSocketIO()
+    tote = []
+    app = Flask(__name__)
+    clock = VirtualClock(start=0.0)
+    racing_routes.init_racing_service(
+        socketio=sio, clock=clock,
+        races=[("derby", "Derby de Mayo"), ("juvenile", "Juvenile Sprint")],
+    )
+    pool_routes.init_pool_service(racing_routes.get_race_card(), socketio=sio,
+                                  tote=tote.append, spectator_interval=1.0, tote_interval=20.0)
+    app.register_blueprint(racing_routes.racing_bp)
+    app.register_blueprint(pool_routes.pools_bp)
+    client = app.test_client()
+
+    def updates():
+        return [p for ev, p in sio.events if ev == "pool_update"]
+
+    # A burst of 50 sales inside one second: one push each way
+    for n in range(50):
+        r = client.post("/api/pools/tickets",
+                        json={"pool": "cups", "counts": {str(1 + n % 4): 1}})
+    _check("tickets recorded", r.status_code == 200
+           and r.get_json()["pools"]["cups"]["tickets"] == 50, str(r.get_json()))
+    _check("a burst of sales is one spectator push and one tote line",
+           len(updates()) == 1 and len(tote) == 1, f"{len(updates())} / {len(tote)}")
+    clock.set(1.5)
+    client.post("/api/pools/tickets", json={"pool": "exacta", "counts": {"1-2": 4}})
+    last = updates()[-1]
+    _check("the next push after the interval carries the latest pool",
+           len(updates()) == 2 and last["pools"]["cups"]["tickets"] == 50
+           and last["exacta"][0][:2] == ["1-2", 4] and last["featured"]
+           and last["race_id"] == "derby", str(last.get("exacta")))
+    _check("tote board stays at its slower rate",
+           len(tote) == 1 and tote[0].startswith("QUINIELA $"), str(tote))
+
+    r = client.post("/api/pools/juvenile/tickets",
+                    json={"pool": "trifecta", "counts": {"1-2-3": 2}, "replace": True})
+    _check("each race on the card has its own pools",
+           r.status_code == 200 and r.get_json()["pools"]["cups"]["tickets"] == 0)
+    _check("undercard pools never reach the tote board",
+           updates()[-1]["race_id"] == "juvenile" and not updates()[-1]["featured"]
+           and len(tote) == 1)
+
+    rows = client.get("/api/pools/willpays/cups?horse=2").get_json()["rows"]
+    _check("will-pays for one horse", len(rows) == 1 and rows[0]["combo"] == "2"
+           and rows[0]["tickets"] == 13, str(rows))
+    r = client.post("/api/pools/scratch", json={"horse": 4})
+    _check("scratch endpoint refunds the horse's tickets",
+           r.get_json()["refunds"]["cups"] == 12, str(r.get_json()))
+    _check("bad sales are rejected",
+           client.post("/api/pools/tickets",
+                       json={"pool": "exacta", "counts": {"3-3": 1}}).status_code == 400)
+
+    client.post("/api/racing/state", json={"state": "post"})
+    _check("no sales once the field is at the post",
+           client.post("/api/pools/tickets",
+                       json={"pool": "cups", "counts": {"1": 1}}).status_code == 409)
+
+    result = pool_routes.settle_on_results(1, 2, 3)
+    _check("official results settle the featured race's pools",
+           result["status"] == "settled"
+           and result["pools"]["cups"]["per_ticket"]["win"] == 2.04   # 26.60 / 13, breakage
+           and updates()[-1]["settled"], str(result.get("pools", result)))
+    _check("the same results again report already_settled",
+           pool_routes.settle_on_results(1, 2, 3) == {"status": "already_settled",
+                                                      "order": [1, 2, 3]})
+    _check("corrected results are reported, not silently ignored",
+           pool_routes.settle_on_results(2, 1, 3)
+           == {"status": "settled_elsewhere", "order": [1, 2, 3], "results": [2, 1, 3]}
+           and pool_routes.get_pool()[0].result["order"] == [1, 2, 3])
+    _check("a race with no tickets reports it",
+           pool_routes.settle_on_results(1, 2, 3) is not None
+           and client.post("/api/pools/reset").status_code == 200
+           and pool_routes.settle_on_results(1, 2, 3) == {"status": "no_tickets"})
+    body = client.get("/api/pools").get_json()
+    _check("GET /api/pools reports result and broadcast stats",
+           body["result"] is None and body["broadcast"]["spectator"]["sent"] >= 3
+           and body["journal"] is None)
+
+
+def test_pool_journal_recovery():
+    import tempfile
+    from services.parimutuel import ParimutuelPool, PoolJournal
+    try:
+        from routes import pool_routes, racing_routes
+    except ImportError:
+        print("  (flask not installed — skipped)")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def boot():
+            racing_routes.init_racing_service(socketio=_StubSocketIO(),
+                                              clock=VirtualClock(start=0.0))
+            pool_routes.init_pool_service(racing_routes.get_race_card(), journal_dir=tmp)
+            return pool_routes.get_pool()[0]
+
+        pool = boot()
+        pool.sell_counts("cups", {"1": 20, "2": 10, "3": 5, "4": 8})
+        pool.sell("exacta", [(1, 2), (2, 1), (1, 2)])
+        pool.load("trifecta", {"1-2-3": 4, "3-2-1": 2})
+        pool.load("trifecta", {"1-2-3": 6, "2-1-3": 1})
+        pool.scratch(4)
+        before = pool.snapshot()
+
+        pool = boot()
+        journal = pool.journal
+        _check("a restart rebuilds sales, running totals and scratches",
+               pool.snapshot()["pools"] == before["pools"]
+               and pool.snapshot()["horses"] == before["horses"]
+               and pool.held("trifecta") == [{"combo": "1-2-3", "tickets": 6, "will_pay": 1.16},
+                                             {"combo": "2-1-3", "tickets": 1, "will_pay": 7.0}]
+               and journal.last_recovery["replayed_records"] == 5,
+               str(journal.last_recovery))
+
+        # The journal can't be written (disk full): reported, pools stay open
+        def full_disk(fd):
+            raise OSError(28, "No space left on device")
+
+        real_fsync, os.fsync = os.fsync, full_disk
+        try:
+            failed = pool_routes.settle_on_results(1, 2, 3)
+        finally:
+            os.fsync = real_fsync
+        _check("a failed journal write during settlement is a status, not an exception",
+               failed["status"] == "error" and "No space left" in failed["error"]
+               and pool.result is None, str(failed))
+        with open(pool.journal.path, encoding="utf-8") as fh:
+            _check("the refused settlement is not left in the journal",
+                   '"settle"' not in fh.read())
+
+        settled = pool.settle(1, 2, 3)
+        pool = boot()
+        _check("a settlement survives a restart, frozen",
+               pool.result == settled and pool_routes.settle_on_results(1, 2, 3)["status"]
+               == "already_settled")
+
+        pool.reset()
+        pool = boot()
+        _check("a reset empties the journal",
+               pool.result is None and pool.totals()["cups"]["tickets"] == 0
+               and pool.journal.last_recovery["replayed_records"] == 0)
+
+        # A crash mid-write leaves a torn line: everything before it counts
+        pool.sell_counts("cups", {"2": 3})
+        pool.journal.close()
+        with open(pool.journal.path, "a", encoding="utf-8") as fh:
+            fh.write('{"t":"sell","pool":"cu')
+        pool = boot()
+        _check("a torn final record is ignored",
+               pool.totals()["cups"]["tickets"] == 3)
+
+        # Records the pool refuses are skipped, not fatal
+        other = ParimutuelPool(range(1, 4))
+        other.journal = PoolJournal(tmp, "small", fsync=False)
+        other.sell_counts("cups", {"3": 2})
+        other.journal.append("sell", pool="cups", combos=[[9]], tickets=[1])
+        fresh = ParimutuelPool(range(1, 4))
+        replayed = PoolJournal(tmp, "small").replay(fresh)
+        _check("unplayable records are skipped and counted",
+               replayed == 1 and fresh.totals()["cups"]["tickets"] == 2)
+        other.journal.close()
+        pool.journal.close()
+
+
+def test_batch_endpoint():
+    try:
+        import main
+    except ImportError as exc:
+        print(f"  (main app dependencies missing — skipped: {exc})")
+        return
+    client = main.app.test_client()
+
+    def batch(steps, on_error=None):
+        body = {"steps": steps}
+        if on_error is not None:
+            body["on_error"] = on_error
+        return client.post("/api/batch", json=body)
+
+    def sell(n):
+        return {"path": "/api/pools/tickets", "body": {"pool": "cups", "counts": {"1": n}}}
+
+    bad = {"path": "/api/pools/tickets", "body": {"pool": "nope", "counts": {}}}
+
+    # Steps run in order: each sale sees the one before it
+    r = batch([{"path": "/api/pools/reset"}, sell(2), {"method": "GET", "path": "/api/pools"},
+               sell(1)]).get_json()
+    results = r["results"]
+    _check("steps run in order",
+           r["success"] and r["completed"] == 4 and [e["index"] for e in results] == [0, 1, 2, 3]
+           and results[1]["data"]["pools"]["cups"]["tickets"] == 2
+           and results[3]["data"]["pools"]["cups"]["tickets"] == 3, str(results))
+    _check("each step timed", all("ms" in e for e in results))
+
+    # on_error: stop skips what follows a failure; continue runs it
+    r = batch([{"path": "/api/pools/reset"}, bad, sell(1)]).get_json()
+    _check("failing step reported, later steps skipped (stop)",
+           not r["success"] and r["completed"] == 2
+           and r["results"][1]["ok"] is False and r["results"][1]["status"] == 400
+           and r["results"][2] == {"index": 2, "method": "POST",
+                                   "path": "/api/pools/tickets", "ok": False, "skipped": True},
+           str(r["results"]))
+    r = batch([{"path": "/api/pools/reset"}, bad, sell(1)], "continue").get_json()
+    _check("continue runs past a failure, batch still unsuccessful",
+           not r["success"] and r["completed"] == 3 and r["results"][2]["ok"]
+           and r["results"][2]["data"]["pools"]["cups"]["tickets"] == 1)
+    r = batch([{"path": "/api/pools/reset"}, {**bad, "on_error": "continue"}, sell(1),
+               bad, sell(1)], "stop").get_json()
+    _check("a step's own on_error overrides the batch's",
+           r["completed"] == 4 and r["results"][2]["ok"] and r["results"][4].get("skipped"))
+
+    # Validation happens before anything runs
+    rejected = [
+        batch([sell(1)] * (main.BATCH_MAX_STEPS + 1)).status_code,
+        batch([{"path": "/api/batch"}]).status_code,
+        batch([{"path": "/api/results/stream", "method": "GET"}]).status_code,
+        batch([{"path": "/la-subasta/api/state", "method": "GET"}]).status_code,
+        batch([{"path": "/api/pools", "method": "PUT"}]).status_code,
+        batch([sell(1)], "sometimes").status_code,
+        batch([]).status_code,
+    ]
+    _check("step limit, excluded paths and bad options rejected with 400",
+           rejected == [400] * len(rejected), str(rejected))
+    before = client.get("/api/pools").get_json()["pools"]["cups"]["tickets"]
+    batch([sell(5), {"path": "/api/batch"}])
+    _check("a rejected batch runs none of its steps",
+           client.get("/api/pools").get_json()["pools"]["cups"]["tickets"] == before)
+    _check("exactly the step limit is accepted",
+           batch([{"method": "GET", "path": "/api/pools"}] * main.BATCH_MAX_STEPS)
+           .get_json()["completed"] == main.BATCH_MAX_STEPS)
+    client.post("/api/pools/reset")
+
+
+# -----------------------------------------------------------------------------
+# Entry point
+# -----------------------------------------------------------------------------
+
+def main():
+    print("Racing service smoke test")
+
+    _run("scheduler — deadline order + cancel", test_scheduler_deadline_order)
+    _run("auto progression — full lifecycle on virtual clock",
+         test_full_lifecycle_virtual_time)
+    _run("auto progression — stop cancels timers", test_stop_cancels_timers)
+    _run("auto progression — manual override re-arms", test_manual_override_rearms)
+    _run("odds drift — only while betting", test_drift_only_while_betting)
+    _run("scheduler — scaled clock on real thread", test_scaled_clock_real_thread)
+    _run("get_state — elapsed from injected clock", test_get_state_uses_clock)
+    _run("odds engine — reversion + deltas", test_odds_engine_deltas_and_reversion)
+    _run("odds drift — broadcasts only changed horses", test_drift_broadcasts_only_changes)
+    _run("horses — copy-on-write snapshots + cached serialisation",
+         test_horse_snapshots_copy_on_write)
+    _run("race card — many races on one scheduler", test_race_card_shared_scheduler)
+    _run("race card — /api/racing/<race_id>/ routes", test_race_card_routes)
+    _run("race sim — finish-consistent vectorized model", test_race_sim_finish_consistent)
+    _run("race sim — 10 Hz stream + throttled LED levels", test_running_streams_frames)
+    _run("journal — crash recovery to the exact prior state", test_journal_recovery)
+    _run("card importer — streaming CSV/JSON + indexed lookup", test_card_importer)
+    _run("results transaction — pipelined, rollback, resume", test_results_transaction)
+    _run("parimutuel — vectorized pools, scratches, settlement", test_parimutuel_pools)
+    _run("parimutuel — /api/pools routes + rate-bounded pushes",
+         test_pool_routes_and_broadcast)
+    _run("parimutuel — pool journal survives a restart", test_pool_journal_recovery)
+    _run("batch — ordered steps, stop/continue, limits", test_batch_endpoint)
+
+    passed = sum(1 for r in _results if r[0] == "PASS")
+    failed = sum(1 for r in _results if r[0] == "FAIL")
+    print(f"\n{'=' * 50}")
+    print(f"RESULTS: {passed} passed, {failed} failed, {len(_results)} total")
+    print("=" * 50)
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
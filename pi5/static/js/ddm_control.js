@@ -547,6 +547,18 @@ async function updateEsp32Config() {
     }
 }
 
+// Run several dashboard API calls in one round trip (server-side, in order).
+// steps: [{ method, path, body }]. onError: 'stop' skips the remaining steps
+// after a failure; 'continue' runs them all. Resolves to the /api/batch reply.
+async function apiBatch(steps, onError = 'stop') {
+    const response = await fetch('/api/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ steps: steps, on_error: onError })
+    });
+    return response.json();
+}
+
 // Send command to ESP32
 async function sendCommand(command, buttonElement, toggle = false) {
     // If toggle mode and button is already active, turn it off
@@ -899,26 +911,18 @@ async function sendReset() {
         clearAllActiveButtons();
         showLoader();
         try {
-            // Clear results on server (deletes results.json and turns off LEDs)
-            const response = await fetch('/api/results/clear', {
-                method: 'POST'
-            });
+            // Clear results on server (deletes results.json and turns off LEDs);
+            // only if that worked, RESET the ESP32 to stop animations (best
+            // effort) and unlock all cups
+            const batch = await apiBatch([
+                { method: 'POST', path: '/api/results/clear' },
+                { method: 'POST', path: '/api/command', body: { command: 'RESET' }, on_error: 'continue' },
+                { method: 'POST', path: '/api/cup/unlock', body: { cup: 'ALL' } }
+            ], 'stop');
+            const first = (batch.results || [])[0] || {};
+            const data = (first.data && typeof first.data === 'object') ? first.data : batch;
             
-            const data = await response.json();
-            
-            if (data.success) {
-                // Also send RESET to ESP32 to stop animations
-                await fetch('/api/command', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ command: 'RESET' })
-                });
-                // Unlock all cups on ESP32
-                await fetch('/api/cup/unlock', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ cup: 'ALL' })
-                });
+            if (first.ok) {
                 showNotification('Race reset - all systems cleared', 'success');
                 document.getElementById('current-mode').textContent = 'IDLE';
                 filterTuningGroups('IDLE');
@@ -1397,16 +1401,10 @@ async function closeResultsModal(keepAnimation = false) {
     // Only unlock cups and stop animation if NOT confirmed
     if (!keepAnimation) {
         try {
-            await fetch('/api/cup/unlock', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ cup: 'ALL' })
-            });
-            await fetch('/api/command', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ command: 'LED:ALL_OFF' })
-            });
+            await apiBatch([
+                { method: 'POST', path: '/api/cup/unlock', body: { cup: 'ALL' } },
+                { method: 'POST', path: '/api/command', body: { command: 'LED:ALL_OFF' } }
+            ], 'continue');
         } catch (error) {
             console.error('Error stopping animation on modal close:', error);
         }
@@ -1424,7 +1422,9 @@ async function resultsConfirm() {
     
     showLoader();
     try {
-        const response = await fetch('/api/results', {
+        // One server-side transaction: re-locks the cups, finalizes the
+        // winner blend, saves results everywhere (rolled back on failure)
+        const response = await fetch('/api/results/commit', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ win: winHorse, place: placeHorse, show: showHorse })
@@ -1441,9 +1441,6 @@ async function resultsConfirm() {
             }));
             showResultsBanner(winHorse, placeHorse, showHorse);
 
-            // Signal ESP32 to blend winner chase into heartbeat seamlessly
-            await fetch('/api/results/finalize', { method: 'POST' });
-
             closeResultsModal(true);
 
             await checkESP32Status();
@@ -59,6 +59,7 @@ const STATE_BADGES = {
 let currentState   = 'DORMANT';
 let currentHorses  = [];
 let currentResults = null;
+let currentRaceId  = null;
 
 // =====================================================================
 // CORE: Screen Transition
@@ -159,17 +160,21 @@ function createHorseRow(horse) {
 
 /**
  * Flash individual horse odds from a Socket.IO odds_update event.
- * @param {Array} oddsData - Array of {position, odds} objects
+ * The racing service sends only the horses whose odds changed, as
+ * {post_position, current_odds}; {position, odds} rows are also accepted.
+ * @param {Array} oddsData - Array of changed-horse rows
  */
 function flashOddsUpdate(oddsData) {
     if (!oddsData || !Array.isArray(oddsData)) return;
 
     oddsData.forEach(function (item) {
-        var rows = document.querySelectorAll('[data-position="' + item.position + '"]');
+        var position = item.position || item.post_position;
+        var odds = item.odds || (item.current_odds != null ? item.current_odds.toFixed(1) + '-1' : null);
+        var rows = document.querySelectorAll('[data-position="' + position + '"]');
         rows.forEach(function (row) {
             var oddsEl = row.querySelector('.horse-odds');
-            if (oddsEl && item.odds) {
-                oddsEl.textContent = item.odds;
+            if (oddsEl && odds) {
+                oddsEl.textContent = odds;
                 oddsEl.classList.add('flash');
                 row.classList.add('odds-flash');
                 setTimeout(function () {
@@ -183,6 +188,32 @@ function flashOddsUpdate(oddsData) {
     updateFooterTimestamp();
 }
 
+// Live La Quiniela pool odds. Once the featured race's cup pool has
+// tickets, its odds replace the simulated drift on the board.
+var poolOddsLive = false;
+var poolOdds = {};
+
+/**
+ * Apply a (rate-bounded) pool_update: flash only the cups whose pool odds
+ * moved since the last one.
+ * @param {Object} data - {featured, pools: {cups: {tickets}}, horses: [{position, odds}]}
+ */
+function onPoolUpdate(data) {
+    if (!data || data.featured === false) return;
+    if (!data.pools || !data.pools.cups || !data.pools.cups.tickets) {
+        poolOddsLive = false;  // emptied / reset: back to the race odds
+        poolOdds = {};
+        return;
+    }
+    poolOddsLive = true;
+    var changed = (data.horses || []).filter(function (h) {
+        if (poolOdds[h.position] === h.odds) return false;
+        poolOdds[h.position] = h.odds;
+        return true;
+    });
+    if (changed.length) flashOddsUpdate(changed);
+}
+
 function updateFooterTimestamp() {
     var el = document.getElementById('odds-updated');
     if (!el) return;
@@ -213,6 +244,83 @@ function updateAtPostScreen(horses) {
     });
 }
 
+// =====================================================================
+// RUNNING SCREEN — live race stream
+// =====================================================================
+
+// race_positions frames are binary (little-endian), see services/race_sim.py:
+//   u8 version | u8 flags | u16 seq | u32 elapsed_ms | u8 count
+//   count x u8 post (leader first) | count x u16 progress (0..65535)
+let latestRaceFrame = null;
+let raceFramePending = false;
+
+function decodeRaceFrame(buf) {
+    var bytes = buf instanceof ArrayBuffer ? new Uint8Array(buf) : new Uint8Array(buf.buffer || buf);
+    var view  = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    var count = view.getUint8(8);
+    var order = [];
+    for (var i = 0; i < count; i++) {
+        order.push({
+            post:     view.getUint8(9 + i),
+            progress: view.getUint16(9 + count + i * 2, true) / 65535
+        });
+    }
+    return {
+        final:     (view.getUint8(1) & 1) === 1,
+        seq:       view.getUint16(2, true),
+        elapsedMs: view.getUint32(4, true),
+        order:     order
+    };
+}
+
+function onRacePositions(data) {
+    if (!data || !data.frame) return;
+    if (currentRaceId && data.race_id && data.race_id !== currentRaceId) return;
+    latestRaceFrame = decodeRaceFrame(data.frame);
+    // Latest frame wins: draw once per display refresh, never queue frames
+    if (!raceFramePending) {
+        raceFramePending = true;
+        requestAnimationFrame(renderRaceTrack);
+    }
+}
+
+function renderRaceTrack() {
+    raceFramePending = false;
+    var frame = latestRaceFrame;
+    var track = document.getElementById('race-track');
+    if (!frame || !track) return;
+
+    if (track.children.length !== frame.order.length) {
+        track.innerHTML = '';
+        frame.order
+            .map(function (h) { return h.post; })
+            .sort(function (a, b) { return a - b; })
+            .forEach(function (post) {
+                var colors = SADDLE_CLOTHS[post] || { bg: '#808080', text: '#FFF' };
+                var lane = document.createElement('div');
+                lane.className = 'race-lane';
+                lane.innerHTML =
+                    '<div class="race-runner" id="runner-' + post + '" ' +
+                    'style="background:' + colors.bg + ';color:' + colors.text + '">' + post + '</div>';
+                track.appendChild(lane);
+            });
+    }
+
+    frame.order.forEach(function (h, rank) {
+        var el = document.getElementById('runner-' + h.post);
+        if (!el) return;
+        el.style.left = (h.progress * 100).toFixed(2) + '%';
+        el.classList.toggle('leader', rank < 3);
+    });
+
+    var leaders = document.getElementById('race-leaders');
+    if (leaders) {
+        leaders.textContent = frame.order.slice(0, 3).map(function (h, i) {
+            return ['1ST', '2ND', '3RD'][i] + ' #' + h.post;
+        }).join('   ');
+    }
+}
+
 // =====================================================================
 // RESULTS SCREEN
 // =====================================================================
@@ -292,15 +400,21 @@ function connectSocketIO() {
         var newState = data.state || data.race_state || data.new_state || 'DORMANT';
         var horses   = data.horses || data.race_data?.horses || currentHorses;
         if (horses && horses.length > 0) currentHorses = horses;
+        if (newState === 'RUNNING') currentRaceId = data.race_id || null;
         transitionTo(newState, currentHorses, currentResults);
     });
 
     socket.on('odds_update', function (data) {
         console.log('[Spectator] Odds update:', data);
+        if (poolOddsLive) return;  // real pool odds win over the drift
         var oddsArray = data.horses || data.odds || [];
         flashOddsUpdate(oddsArray);
     });
 
+    socket.on('pool_update', onPoolUpdate);
+
+    socket.on('race_positions', onRacePositions);
+
     socket.on('disconnect', function () {
         console.log('[Spectator] Socket.IO disconnected, will auto-reconnect');
     });